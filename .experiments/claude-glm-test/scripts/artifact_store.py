@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Artifact Store for generated files
+
+Every phase/iteration of the orchestrator writes straight into the working
+tree. This store keeps a record of what each generation produced:
+- blobs/ab/<sha256>.z       zlib-compressed file content, keyed by SHA-256
+- manifests/<story>/<phase>/iter<N>.json   path -> blob hash for one generation
+
+Identical content across iterations and stories is stored once. Looking up
+"what did P3 iter1 write for 01.2" is a single file read.
+
+Usage:
+    python artifact_store.py --story 01.2                     # list generations
+    python artifact_store.py --story 01.2 --show P3:1         # files of P3 iter1
+    python artifact_store.py --story 01.2 --diff P3:1 P3:2    # changed files
+    python artifact_store.py --story 01.2 --restore P3:1 --base-dir .
+    python artifact_store.py --stats
+"""
+
+import os
+import json
+import zlib
+import hashlib
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+DEFAULT_STORE_DIR = Path(__file__).parent.parent / "artifacts"
+
+
+def content_hash(content: str) -> str:
+    """SHA-256 of UTF-8 encoded content"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def _atomic_write(path: Path, data: bytes):
+    """Write via temp file + rename so readers never see partial files"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class ArtifactStore:
+    """Deduplicated, compressed store of generated files with per-generation manifests"""
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = Path(root) if root else DEFAULT_STORE_DIR
+        self.blobs_dir = self.root / "blobs"
+        self.manifests_dir = self.root / "manifests"
+        self._lock = threading.Lock()
+
+    # ---- blobs ---------------------------------------------------------
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blobs_dir / digest[:2] / f"{digest}.z"
+
+    def put_blob(self, content: str) -> str:
+        """Store content (no-op if already present). Returns its hash."""
+        digest = content_hash(content)
+        path = self.blob_path(digest)
+        if not path.exists():
+            _atomic_write(path, zlib.compress(content.encode('utf-8'), 6))
+        return digest
+
+    def get_blob(self, digest: str) -> Optional[str]:
+        path = self.blob_path(digest)
+        if not path.exists():
+            return None
+        with open(path, 'rb') as f:
+            return zlib.decompress(f.read()).decode('utf-8')
+
+    # ---- manifests -----------------------------------------------------
+
+    def manifest_path(self, story_id: str, phase: str, iteration: int = 1) -> Path:
+        return self.manifests_dir / story_id / phase / f"iter{iteration}.json"
+
+    def record(self, story_id: str, phase: str, iteration: int, files: List[dict],
+               metadata: Optional[Dict] = None) -> Dict:
+        """
+        Record one generation's files.
+
+        Args:
+            files: List of {"path": ..., "content": ...} dicts (GLM files output)
+            metadata: Extra info stored with the manifest (model, tokens, ...)
+
+        Returns:
+            The manifest dict. Re-recording the same generation merges files in.
+        """
+        entries = {}
+        new_bytes = 0
+        for file_info in files:
+            path = file_info.get("path")
+            content = file_info.get("content")
+            if not path or content is None:
+                continue
+            blob_exists = self.blob_path(content_hash(content)).exists()
+            digest = self.put_blob(content)
+            if not blob_exists:
+                new_bytes += len(content)
+            entries[path] = {
+                "sha256": digest,
+                "size": len(content),
+                "lines": content.count('\n') + 1
+            }
+
+        manifest_file = self.manifest_path(story_id, phase, iteration)
+        with self._lock:
+            manifest = self.get_manifest(story_id, phase, iteration) or {
+                "story": story_id,
+                "phase": phase,
+                "iteration": iteration,
+                "files": {}
+            }
+            manifest["files"].update(entries)
+            manifest["recorded_at"] = datetime.now().isoformat()
+            if metadata:
+                manifest.setdefault("metadata", {}).update(metadata)
+            _atomic_write(manifest_file, json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8'))
+
+        print(f"  [ARTIFACTS] {story_id} {phase} iter{iteration}: {len(entries)} files "
+              f"({new_bytes} new bytes)")
+        return manifest
+
+    def get_manifest(self, story_id: str, phase: str, iteration: int = 1) -> Optional[Dict]:
+        """O(1) lookup of a generation's manifest"""
+        path = self.manifest_path(story_id, phase, iteration)
+        if not path.exists():
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def read_file(self, story_id: str, phase: str, iteration: int, path: str) -> Optional[str]:
+        """Content of `path` as written by one generation"""
+        manifest = self.get_manifest(story_id, phase, iteration)
+        if not manifest or path not in manifest["files"]:
+            return None
+        return self.get_blob(manifest["files"][path]["sha256"])
+
+    def list_generations(self, story_id: str) -> List[Dict]:
+        """All recorded (phase, iteration) generations for a story"""
+        story_dir = self.manifests_dir / story_id
+        if not story_dir.exists():
+            return []
+        generations = []
+        for phase_dir in sorted(story_dir.iterdir()):
+            for manifest_file in sorted(phase_dir.glob("iter*.json")):
+                generations.append({
+                    "phase": phase_dir.name,
+                    "iteration": int(manifest_file.stem[4:]),
+                    "manifest": str(manifest_file)
+                })
+        return generations
+
+    def diff(self, story_id: str, a: tuple, b: tuple) -> Dict:
+        """
+        Compare two generations by hash only (no blob reads).
+
+        Args:
+            a, b: (phase, iteration) tuples
+        """
+        files_a = (self.get_manifest(story_id, *a) or {}).get("files", {})
+        files_b = (self.get_manifest(story_id, *b) or {}).get("files", {})
+        return {
+            "added": sorted(set(files_b) - set(files_a)),
+            "removed": sorted(set(files_a) - set(files_b)),
+            "changed": sorted(p for p in set(files_a) & set(files_b)
+                              if files_a[p]["sha256"] != files_b[p]["sha256"]),
+            "unchanged": sorted(p for p in set(files_a) & set(files_b)
+                                if files_a[p]["sha256"] == files_b[p]["sha256"]),
+        }
+
+    def restore(self, story_id: str, phase: str, iteration: int, base_dir: str) -> Dict:
+        """Roll the working tree back to what one generation wrote"""
+        from glm_call_updated import write_files_to_disk
+
+        manifest = self.get_manifest(story_id, phase, iteration)
+        if not manifest:
+            return {"written": [], "errors": [{"error": f"No manifest for {story_id} {phase} iter{iteration}"}],
+                    "total_written": 0, "total_errors": 1}
+
+        files = [
+            {"path": path, "content": self.get_blob(entry["sha256"])}
+            for path, entry in manifest["files"].items()
+        ]
+        return write_files_to_disk(files, base_dir)
+
+    def stats(self) -> Dict:
+        """Blob count and on-disk vs logical size"""
+        blobs = list(self.blobs_dir.glob("*/*.z")) if self.blobs_dir.exists() else []
+        manifests = list(self.manifests_dir.glob("*/*/iter*.json")) if self.manifests_dir.exists() else []
+        logical = 0
+        for manifest_file in manifests:
+            with open(manifest_file, encoding='utf-8') as f:
+                logical += sum(e["size"] for e in json.load(f)["files"].values())
+        return {
+            "blobs": len(blobs),
+            "manifests": len(manifests),
+            "stored_bytes": sum(b.stat().st_size for b in blobs),
+            "logical_bytes": logical
+        }
+
+
+def _parse_generation(spec: str) -> tuple:
+    """'P3:2' -> ('P3', 2); 'P3' -> ('P3', 1)"""
+    phase, _, iteration = spec.partition(":")
+    return phase, int(iteration or 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the generated-artifact store")
+    parser.add_argument("--store", default=str(DEFAULT_STORE_DIR), help="Store directory")
+    parser.add_argument("--story", help="Story ID (e.g., 01.2)")
+    parser.add_argument("--show", metavar="PHASE:ITER", help="Show manifest for one generation")
+    parser.add_argument("--diff", nargs=2, metavar="PHASE:ITER", help="Diff two generations")
+    parser.add_argument("--restore", metavar="PHASE:ITER", help="Write a generation back to disk")
+    parser.add_argument("--base-dir", default=".", help="Base directory for --restore")
+    parser.add_argument("--stats", action="store_true", help="Show store statistics")
+    args = parser.parse_args()
+
+    store = ArtifactStore(Path(args.store))
+
+    if args.stats:
+        print(json.dumps(store.stats(), indent=2))
+        return
+
+    if not args.story:
+        parser.error("--story is required (unless --stats)")
+
+    if args.show:
+        print(json.dumps(store.get_manifest(args.story, *_parse_generation(args.show)), indent=2))
+    elif args.diff:
+        a, b = (_parse_generation(spec) for spec in args.diff)
+        print(json.dumps(store.diff(args.story, a, b), indent=2))
+    elif args.restore:
+        result = store.restore(args.story, *_parse_generation(args.restore), base_dir=args.base_dir)
+        print(f"Restored {result['total_written']} files ({result['total_errors']} errors)")
+    else:
+        for gen in store.list_generations(args.story):
+            print(f"  {gen['phase']} iter{gen['iteration']}: {gen['manifest']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Async Core - event-loop execution for the pilot without a thread per API call
+
+The threaded schedulers park one OS thread per in-flight LLM call (blocking
+anthropic/requests clients inside a ThreadPoolExecutor). For whole epics of
+50+ stories on a small CI box that means hundreds of mostly idle threads.
+Here every node is an asyncio task:
+
+- AsyncGLMClient: GLMClient.call on httpx.AsyncClient (same result dict shape)
+- AsyncLimiter: awaits a slot of the shared per-model AdaptiveLimiter, so the
+  AIMD rules and learned limits are unchanged; a call that exceeds its timeout
+  counts as a slow/failed call for the limiter
+- AsyncDagScheduler: DagScheduler on tasks - a bounded number of running
+  nodes, optional per-node timeouts, and run() never returns (or raises)
+  while one of its nodes is still running: cancelling it cancels them all
+- Blocking file I/O (checkpoints, prompt building, file writes) goes to a
+  small bounded thread pool via io_executor()
+
+Usage (library):
+    scheduler = AsyncDagScheduler(max_concurrency=64)
+    scheduler.add(("01.2", "P2", 1), lambda: run_p2_async())
+    scheduler.add(("01.2", "P3", 1), lambda: run_p3_async(), deps=[("01.2", "P2", 1)])
+    results = await scheduler.run(on_complete=grow_fix_loop)
+"""
+
+import sys
+import json
+import time
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+import httpx
+
+from glm_call_updated import GLMClient
+from concurrency import AdaptiveLimiter
+from dag_scheduler import format_key
+
+# Nodes are cheap coroutines; per-model limiters decide how many API calls actually run
+DEFAULT_MAX_CONCURRENCY = 64
+# Threads for blocking file/SQLite work only - API calls never occupy one
+IO_WORKERS = 4
+
+GLM_TIMEOUT = httpx.Timeout(connect=30.0, read=1200.0, write=60.0, pool=None)
+GLM_CONNECTION_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+
+
+def io_executor() -> ThreadPoolExecutor:
+    """Bounded pool to install as the loop's default executor (asyncio.to_thread uses it)"""
+    return ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="pilot-io")
+
+
+class AsyncGLMClient(GLMClient):
+    """GLMClient.call over a shared httpx.AsyncClient (non-streaming)"""
+
+    def __init__(self, api_key: str, provider: Optional[str] = None):
+        super().__init__(api_key, provider)
+        self.http = httpx.AsyncClient(headers=self.headers, timeout=GLM_TIMEOUT, limits=GLM_CONNECTION_LIMITS)
+
+    async def call(
+        self,
+        prompt: str,
+        context_files: Optional[List[str]] = None,
+        model: str = "glm-4-plus",
+        temperature: float = 0.7,
+        max_tokens: int = 4096,
+        enable_thinking: bool = False
+    ) -> dict:
+        """
+        Call GLM API (see GLMClient.call). Context files are read on the I/O pool.
+
+        Returns:
+            dict with 'response', 'reasoning', 'usage', 'model' - or 'error'
+        """
+        if context_files:
+            context = await asyncio.to_thread(self.build_context, context_files)
+            full_prompt = f"""{context}
+
+─────────────────────────────────────
+TASK:
+{prompt}
+"""
+        else:
+            full_prompt = prompt
+
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": full_prompt}],
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        if enable_thinking:
+            payload["thinking"] = {"type": "enabled"}
+
+        base_url = self.get_base_url(model)
+        try:
+            print(f"[DEBUG] Calling {model} with {len(full_prompt)} chars prompt (async)", file=sys.stderr)
+            response = await self.http.post(base_url, json=payload)
+            if response.status_code != 200:
+                print(f"[DEBUG] Response body: {response.text}", file=sys.stderr)
+            response.raise_for_status()
+
+            data = response.json()
+            message = data["choices"][0]["message"]
+            result = {
+                "response": message.get("content", ""),
+                "usage": data.get("usage", {}),
+                "model": data.get("model", model),
+                "finish_reason": data["choices"][0].get("finish_reason", "unknown")
+            }
+            if message.get("reasoning_content"):
+                result["reasoning"] = message["reasoning_content"]
+            return result
+
+        except httpx.HTTPStatusError as e:
+            error_msg = f"{e.response.status_code} {e.response.reason_phrase} for url: {e.request.url}"
+            try:
+                error_msg = f"{error_msg}\nAPI Error: {json.dumps(e.response.json(), indent=2)}"
+            except ValueError:
+                error_msg = f"{error_msg}\nResponse: {e.response.text}"
+            return {"error": error_msg, "response": None, "usage": {}}
+        except httpx.HTTPError as e:
+            return {"error": f"{type(e).__name__}: {e}", "response": None, "usage": {}}
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+class AsyncLimiter:
+    """Awaitable slots on an AdaptiveLimiter (AIMD state stays in the shared limiter)"""
+
+    def __init__(self, limiter: AdaptiveLimiter):
+        self.limiter = limiter
+        self._cond = asyncio.Condition()
+
+    async def call(self, fn: Callable[[], Awaitable[Dict]], timeout: Optional[float] = None,
+                   workload: Optional[str] = None) -> Dict:
+        """
+        Await fn() inside a slot (workload: phase, keys the latency baseline).
+
+        Raises:
+            asyncio.TimeoutError: fn() exceeded timeout (recorded as a failed call)
+        """
+        async with self._cond:
+            while (started := self.limiter.try_acquire()) is None:
+                await self._cond.wait()
+
+        error = None
+        try:
+            result = await asyncio.wait_for(fn(), timeout) if timeout else await fn()
+            if not result.get("success", True):
+                error = result.get("error") or "failed"
+            return result
+        except asyncio.TimeoutError:
+            error = f"timeout after {timeout:.0f}s"
+            raise
+        except asyncio.CancelledError:
+            # Cancelled by us (shutdown / sibling failure) - says nothing about the provider
+            self.limiter.abandon()
+            started = None
+            raise
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            if started is not None:
+                self.limiter.release(started, error, workload)
+            async with self._cond:
+                self._cond.notify_all()
+
+
+class AsyncDagScheduler:
+    """DagScheduler on asyncio tasks: bounded concurrency, per-node timeouts, structured cancellation"""
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, log: Callable[[str], None] = print,
+                 priority: Optional[Callable[[Hashable], float]] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.log = log
+        self.priority = priority
+        self._tasks: Dict[Hashable, Callable[[], Awaitable[Dict]]] = {}
+        self._deps: Dict[Hashable, set] = {}
+        self._timeouts: Dict[Hashable, Optional[float]] = {}
+        self._order: List[Hashable] = []
+        self.results: Dict[Hashable, Dict] = {}
+        self.timings: Dict[Hashable, tuple] = {}
+        self.ready_at: Dict[Hashable, float] = {}
+
+    def add(self, key: Hashable, fn: Callable[[], Awaitable[Dict]], deps: Optional[Iterable[Hashable]] = None,
+            timeout: Optional[float] = None):
+        """
+        Add a node. Safe to call from on_complete while the scheduler runs.
+
+        Args:
+            key: Unique node key, e.g. (story_id, phase, iteration)
+            fn: Zero-argument coroutine function returning the node's result dict
+            deps: Keys that must complete first (may be added later)
+            timeout: Seconds before the node is cancelled and recorded as failed
+        """
+        if key in self._tasks:
+            raise ValueError(f"Duplicate DAG node: {key}")
+        self._tasks[key] = fn
+        self._deps[key] = set(deps or ())
+        self._timeouts[key] = timeout
+        self._order.append(key)
+
+    def _ready(self, running: set) -> List[Hashable]:
+        ready = [
+            key for key in self._order
+            if key not in self.results and key not in running
+            and all(dep in self.results for dep in self._deps[key])
+        ]
+        if self.priority:
+            ready.sort(key=lambda key: -self.priority(key))
+        return ready
+
+    async def _execute(self, key: Hashable) -> Dict:
+        start = time.monotonic()
+        try:
+            timeout = self._timeouts[key]
+            coro = self._tasks[key]()
+            return await (asyncio.wait_for(coro, timeout) if timeout else coro)
+        finally:
+            self.timings[key] = (start, time.monotonic())
+
+    async def run(self, on_complete: Optional[Callable[[Hashable, Dict, "AsyncDagScheduler"], None]] = None) -> Dict:
+        """
+        Run until every node has completed (same failure semantics as DagScheduler.run).
+
+        on_complete may be a plain function or a coroutine function.
+
+        Returns:
+            {key: result}
+        """
+        running: Dict[asyncio.Task, Hashable] = {}
+        try:
+            while True:
+                for key in self._ready(set(running.values())):
+                    self.ready_at.setdefault(key, time.monotonic())
+                    if len(running) < self.max_concurrency:
+                        running[asyncio.ensure_future(self._execute(key))] = key
+
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(list(running), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    key = running.pop(task)
+                    try:
+                        result = task.result()
+                    except asyncio.TimeoutError:
+                        self.log(f"   ✗ {format_key(key)} timed out after {self._timeouts[key]:.0f}s")
+                        result = {"success": False, "error": f"timeout after {self._timeouts[key]:.0f}s",
+                                  "tokens": {"total": 0}, "cost": 0, "time": self._timeouts[key]}
+                    except Exception as e:
+                        self.log(f"   ✗ {format_key(key)} failed: {e}")
+                        result = {"success": False, "error": str(e), "tokens": {"total": 0}, "cost": 0, "time": 0}
+                    self.results[key] = result
+                    if on_complete:
+                        outcome = on_complete(key, result, self)
+                        if inspect.isawaitable(outcome):
+                            await outcome
+        finally:
+            # Nothing outlives run(): on cancellation/error every running node is cancelled and awaited
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+                self.log(f"⚠️  Cancelled {len(running)} running DAG nodes: "
+                         f"{', '.join(format_key(key) for key in running.values())}")
+
+        blocked = [key for key in self._order if key not in self.results]
+        if blocked:
+            self.log(f"⚠️  {len(blocked)} DAG nodes never became runnable: "
+                     f"{', '.join(format_key(key) for key in blocked)}")
+        return self.results
+
+    def dependencies(self) -> Dict[Hashable, set]:
+        """key -> dependency keys (copy)"""
+        return {key: set(deps) for key, deps in self._deps.items()}
+
+    def makespan(self) -> float:
+        """Wall-clock seconds from the first node start to the last node end"""
+        if not self.timings:
+            return 0.0
+        return max(end for _, end in self.timings.values()) - min(start for start, _ in self.timings.values())
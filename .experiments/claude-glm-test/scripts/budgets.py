@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Budgets - per-story and per-phase limits on tokens, dollars and seconds
+
+Without limits a story that keeps failing review loops through P3/P5 fix
+iterations, and a stuck GLM call holds a worker for the full 1200 s read
+timeout, while other stories of the batch wait for slots. Budgets are
+declared in config.json ("budgets", same shape as DEFAULT_BUDGETS) and
+enforced when a phase starts:
+
+- Story budget: cost/tokens/seconds summed over all of a story's calls
+  (fix iterations and speculative calls included). Once any limit is used
+  up, the story's remaining phases are preempted - they return a failed
+  result without a call and no fix iteration is scheduled
+- Phase budget: limits for a single call. If the router's expected cost or
+  tokens exceed what is left (phase limit, or the story's remainder if
+  smaller), the call is downgraded to the cheapest fitting candidate model
+  (without Deep Thinking). Gate phases with a single candidate run as routed
+- Seconds: every call gets min(phase seconds, story seconds left) as its
+  timeout, so one hung call cannot hold a slot for longer than its share
+- A call that ends up over its phase limits anyway is recorded as "exceeded"
+
+Every preempt/downgrade/timeout/exceeded event is counted in
+pilot_budget_events_total{phase,action,limit} and listed in the report.
+
+Config example:
+    "budgets": {
+        "story":  {"cost": 3.0, "tokens": 1500000, "seconds": 3600},
+        "phases": {"P3": {"cost": 0.5, "seconds": 900}},
+        "stories": {"01.4": {"cost": 5.0}}
+    }
+
+Usage:
+    python budgets.py                  # effective limits from config.json
+    python budgets.py --story 01.4
+"""
+
+import json
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_CONFIG_PATH = Path(__file__).parent.parent / "config.json"
+
+LIMITS = ("cost", "tokens", "seconds")
+
+DEFAULT_BUDGETS = {
+    # Whole story: all phases, fix iterations and speculation
+    "story": {"cost": 3.0, "tokens": 1_500_000, "seconds": 3600},
+    # One call; seconds is the call timeout (GLM code generation is the slowest)
+    "phases": {
+        "P1": {"cost": 0.50, "tokens": 150_000, "seconds": 600},
+        "P2": {"cost": 0.40, "tokens": 200_000, "seconds": 1200},
+        "P3": {"cost": 0.40, "tokens": 200_000, "seconds": 1200},
+        "P4": {"cost": 0.30, "tokens": 200_000, "seconds": 900},
+        "P5": {"cost": 0.60, "tokens": 200_000, "seconds": 600},
+        "P6": {"cost": 0.60, "tokens": 200_000, "seconds": 600},
+        "P7": {"cost": 0.15, "tokens": 150_000, "seconds": 600},
+    },
+    # Per-story overrides of "story" (and optionally "phases")
+    "stories": {},
+}
+
+
+def merge_budgets(overrides: Optional[Dict]) -> Dict:
+    """DEFAULT_BUDGETS with config.json "budgets" applied per limit (null removes a limit)"""
+    budgets = json.loads(json.dumps(DEFAULT_BUDGETS))
+    overrides = overrides or {}
+    budgets["story"].update(overrides.get("story", {}))
+    for phase, limits in overrides.get("phases", {}).items():
+        budgets["phases"].setdefault(phase, {}).update(limits)
+    budgets["stories"].update(overrides.get("stories", {}))
+    return budgets
+
+
+class BudgetTracker:
+    """Spend per story and the run/downgrade/preempt decision for each phase call (thread-safe)"""
+
+    def __init__(self, budgets: Optional[Dict] = None):
+        self.budgets = merge_budgets(budgets)
+        self._lock = threading.Lock()
+        self._used: Dict[str, Dict[str, float]] = {}
+        self.events: List[Dict] = []
+
+    def story_limits(self, story_id: str) -> Dict:
+        override = self.budgets["stories"].get(story_id, {})
+        return {**self.budgets["story"], **{k: v for k, v in override.items() if k in LIMITS}}
+
+    def phase_limits(self, story_id: str, phase: str) -> Dict:
+        override = self.budgets["stories"].get(story_id, {}).get("phases", {}).get(phase, {})
+        return {**self.budgets["phases"].get(phase, {}), **override}
+
+    def used(self, story_id: str) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._used.get(story_id, {limit: 0 for limit in LIMITS}))
+
+    def remaining(self, story_id: str, phase: str) -> Dict[str, Optional[float]]:
+        """Per limit: what one call of this phase may still use (None = unlimited)"""
+        story, phase_limits, used = self.story_limits(story_id), self.phase_limits(story_id, phase), self.used(story_id)
+        remaining = {}
+        for limit in LIMITS:
+            options = [value for value in (phase_limits.get(limit),
+                                           story[limit] - used[limit] if story.get(limit) is not None else None)
+                       if value is not None]
+            remaining[limit] = max(0, min(options)) if options else None
+        return remaining
+
+    def exhausted(self, story_id: str) -> Optional[str]:
+        """First story limit that is used up ("cost" / "tokens" / "seconds"), else None"""
+        story, used = self.story_limits(story_id), self.used(story_id)
+        for limit in LIMITS:
+            if story.get(limit) is not None and used[limit] >= story[limit]:
+                return limit
+        return None
+
+    def preemption(self, story_id: str) -> Optional[Dict]:
+        """
+        Whether the story's next phase must be preempted.
+
+        Returns:
+            {"limit", "reason"} once a story limit is used up, else None
+        """
+        limit = self.exhausted(story_id)
+        if not limit:
+            return None
+        used, story = self.used(story_id), self.story_limits(story_id)
+        return {"limit": limit, "reason": f"story {limit} budget used up ({format_amount(limit, used[limit])} "
+                                          f"of {format_amount(limit, story[limit])})"}
+
+    def check(self, story_id: str, phase: str, estimate: Dict[str, float]) -> Dict:
+        """
+        Decide how a routed phase call may run (call preemption() first).
+
+        Args:
+            estimate: Expected {"cost", "tokens"} of the routed call
+
+        Returns:
+            {"action": "run" | "downgrade", "limit", "reason", "remaining", "timeout"}
+        """
+        remaining = self.remaining(story_id, phase)
+        plan = {"action": "run", "limit": None, "reason": None, "remaining": remaining,
+                "timeout": remaining["seconds"]}
+        for limit in ("cost", "tokens"):
+            if remaining[limit] is not None and estimate.get(limit, 0) > remaining[limit]:
+                plan.update(action="downgrade", limit=limit,
+                            reason=f"expected {format_amount(limit, estimate[limit])} > "
+                                   f"{format_amount(limit, remaining[limit])} left for {phase}")
+                break
+        return plan
+
+    def record(self, story_id: str, phase: str, result: Dict) -> List[str]:
+        """
+        Add a finished call's spend to its story.
+
+        Returns:
+            Phase limits the call went over (recorded as "exceeded" events)
+        """
+        spent = {"cost": result.get("cost", 0), "tokens": result.get("tokens", {}).get("total", 0),
+                 "seconds": result.get("time", 0)}
+        with self._lock:
+            used = self._used.setdefault(story_id, {limit: 0 for limit in LIMITS})
+            for limit in LIMITS:
+                used[limit] += spent[limit]
+        limits = self.phase_limits(story_id, phase)
+        return [limit for limit in LIMITS if limits.get(limit) is not None and spent[limit] > limits[limit]]
+
+    def event(self, story_id: str, phase: str, action: str, limit: str, detail: str):
+        with self._lock:
+            self.events.append({"story": story_id, "phase": phase, "action": action, "limit": limit,
+                                "detail": detail})
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            stories = {story: {limit: round(value, 4) for limit, value in used.items()}
+                       for story, used in self._used.items()}
+            events = list(self.events)
+        return {
+            "limits": {"story": self.budgets["story"], "phases": self.budgets["phases"],
+                       **({"stories": self.budgets["stories"]} if self.budgets["stories"] else {})},
+            "used": {story: {**used, "exhausted": self.exhausted(story)} for story, used in stories.items()},
+            "events": events,
+        }
+
+
+def format_amount(limit: str, value: float) -> str:
+    if limit == "cost":
+        return f"${value:.2f}" if value >= 1 else f"${value:.4f}"
+    if limit == "tokens":
+        return f"{int(value):,} tokens"
+    return f"{value:.0f}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show effective story/phase budgets")
+    parser.add_argument("--config", default=str(DEFAULT_CONFIG_PATH), help="config.json with a \"budgets\" section")
+    parser.add_argument("--story", help="Story ID (applies its overrides)")
+    args = parser.parse_args()
+
+    config = {}
+    if Path(args.config).exists():
+        with open(args.config) as f:
+            config = json.load(f)
+    tracker = BudgetTracker(config.get("budgets"))
+    story_id = args.story or ""
+    story = tracker.story_limits(story_id)
+    print(f"[BUDGET] story{' ' + story_id if story_id else ''}: "
+          + ", ".join(format_amount(limit, story[limit]) for limit in LIMITS if story.get(limit) is not None))
+    for phase in sorted(tracker.budgets["phases"]):
+        limits = tracker.phase_limits(story_id, phase)
+        print(f"  {phase}: " + ", ".join(format_amount(limit, limits[limit])
+                                         for limit in LIMITS if limits.get(limit) is not None))
+
+
+if __name__ == "__main__":
+    main()
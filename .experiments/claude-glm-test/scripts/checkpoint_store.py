@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+SQLite Checkpoint Store - resumable (story, phase, iteration) state
+
+Replaces free-text appends to .claude/checkpoints/{story}.yaml as the source
+of truth. One row per (story, phase, iteration) holds status, timings,
+token usage, cost, model, review decision and the artifact manifest.
+
+- WAL mode: readers never block the worker threads writing checkpoints
+- One connection per thread, every write is a single transaction
+- A row is marked "running" when a phase starts, so a crashed run resumes
+  exactly at the nodes that never finished
+- The legacy YAML files are regenerated from the database after each write
+  (same line format), so existing readers keep working
+
+Usage:
+    python checkpoint_store.py --story 01.2                    # show rows
+    python checkpoint_store.py --export-yaml                   # rewrite all YAML files
+    python checkpoint_store.py --import-yaml                   # migrate legacy YAML lines
+"""
+
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from review_stream import REVIEW_DECISIONS, parse_decision
+
+DEFAULT_CHECKPOINTS_DIR = Path(__file__).resolve().parents[3] / ".claude" / "checkpoints"
+DB_FILENAME = "checkpoints.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    story         TEXT NOT NULL,
+    phase         TEXT NOT NULL,
+    iteration     INTEGER NOT NULL DEFAULT 1,
+    status        TEXT NOT NULL,            -- running | success | failed
+    agent         TEXT,
+    model         TEXT,
+    started_at    REAL,
+    finished_at   REAL,
+    duration      REAL,
+    input_tokens  INTEGER DEFAULT 0,
+    output_tokens INTEGER DEFAULT 0,
+    total_tokens  INTEGER DEFAULT 0,
+    cost          REAL DEFAULT 0,
+    decision      TEXT,                     -- APPROVED / REQUEST_CHANGES / PASS / FAIL
+    error         TEXT,
+    artifacts     TEXT,                     -- JSON: artifact manifest path, files written
+    extra         TEXT,                     -- JSON: tests/issues/... from the caller
+    PRIMARY KEY (story, phase, iteration)
+);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_status ON checkpoints (story, status);
+"""
+
+STATUS_SYMBOL = {"success": "✓", "failed": "✗", "running": "…"}
+
+
+def extract_decision(phase: str, response: Optional[str]) -> Optional[str]:
+    """Review/QA verdict from a P5/P6 response's DECISION line (None for other phases)"""
+    if phase not in REVIEW_DECISIONS:
+        return None
+    return parse_decision(phase, response)
+
+
+class CheckpointStore:
+    """Transactional checkpoint rows in SQLite (WAL), exported to the legacy YAML"""
+
+    def __init__(self, checkpoints_dir: Optional[Path] = None, export_yaml: bool = True):
+        self.checkpoints_dir = Path(checkpoints_dir) if checkpoints_dir else DEFAULT_CHECKPOINTS_DIR
+        self.checkpoints_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.checkpoints_dir / DB_FILENAME
+        self.export_yaml = export_yaml
+        self._local = threading.local()
+        self._yaml_lock = threading.Lock()
+
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    # ---- writes --------------------------------------------------------
+
+    def start(self, story_id: str, phase: str, iteration: int = 1, agent: Optional[str] = None):
+        """Mark a phase as running (overwrites an earlier failed/running attempt)"""
+        with self._connection() as conn:
+            conn.execute(
+                """INSERT INTO checkpoints (story, phase, iteration, status, agent, started_at)
+                   VALUES (?, ?, ?, 'running', ?, ?)
+                   ON CONFLICT (story, phase, iteration) DO UPDATE SET
+                       status = 'running', agent = excluded.agent, started_at = excluded.started_at,
+                       finished_at = NULL, error = NULL""",
+                (story_id, phase, iteration, agent, time.time())
+            )
+
+    def finish(self, story_id: str, phase: str, iteration: int, data: Dict):
+        """
+        Record a finished phase.
+
+        Args:
+            data: {"success", "agent", "model", "tokens" (int or {"input","output","total"}),
+                   "cost", "time", "decision", "error", "artifacts", ...extra}
+        """
+        tokens = data.get("tokens", 0)
+        if not isinstance(tokens, dict):
+            tokens = {"total": tokens}
+        known = {"success", "agent", "model", "tokens", "cost", "time", "decision", "error", "artifacts"}
+        extra = {k: v for k, v in data.items() if k not in known}
+        now = time.time()
+
+        with self._connection() as conn:
+            conn.execute(
+                """INSERT INTO checkpoints (story, phase, iteration, status, agent, model, started_at,
+                       finished_at, duration, input_tokens, output_tokens, total_tokens, cost,
+                       decision, error, artifacts, extra)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (story, phase, iteration) DO UPDATE SET
+                       status = excluded.status, agent = excluded.agent, model = excluded.model,
+                       started_at = COALESCE(checkpoints.started_at, excluded.started_at),
+                       finished_at = excluded.finished_at, duration = excluded.duration,
+                       input_tokens = excluded.input_tokens, output_tokens = excluded.output_tokens,
+                       total_tokens = excluded.total_tokens, cost = excluded.cost,
+                       decision = excluded.decision, error = excluded.error,
+                       artifacts = excluded.artifacts, extra = excluded.extra""",
+                (
+                    story_id, phase, iteration,
+                    "success" if data.get("success") else "failed",
+                    data.get("agent"), data.get("model"),
+                    now - (data.get("time") or 0), now, data.get("time"),
+                    tokens.get("input", 0), tokens.get("output", 0), tokens.get("total", 0),
+                    data.get("cost", 0), data.get("decision"), data.get("error"),
+                    json.dumps(data["artifacts"]) if data.get("artifacts") else None,
+                    json.dumps(extra) if extra else None
+                )
+            )
+
+        if self.export_yaml:
+            self.export_story_yaml(story_id)
+
+    # ---- reads ---------------------------------------------------------
+
+    def get(self, story_id: str, phase: str, iteration: int = 1) -> Optional[Dict]:
+        """Indexed point lookup"""
+        row = self._connection().execute(
+            "SELECT * FROM checkpoints WHERE story = ? AND phase = ? AND iteration = ?",
+            (story_id, phase, iteration)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def rows(self, story_id: str) -> List[Dict]:
+        return [dict(row) for row in self._connection().execute(
+            "SELECT * FROM checkpoints WHERE story = ? ORDER BY COALESCE(started_at, 0), phase, iteration",
+            (story_id,)
+        )]
+
+    def completed_phases(self, story_id: str) -> List[str]:
+        """Phases with at least one successful iteration, in completion order"""
+        phases = []
+        for row in self._connection().execute(
+            "SELECT phase FROM checkpoints WHERE story = ? AND status = 'success' ORDER BY finished_at",
+            (story_id,)
+        ):
+            if row["phase"] not in phases:
+                phases.append(row["phase"])
+        return phases
+
+    def review_iterations(self) -> Dict[str, int]:
+        """story -> highest P5 iteration that finished (1 = approved at the first review)"""
+        return {row["story"]: row["iterations"] for row in self._connection().execute(
+            "SELECT story, MAX(iteration) AS iterations FROM checkpoints "
+            "WHERE phase = 'P5' AND status != 'running' GROUP BY story"
+        )}
+
+    def as_result(self, row: Dict) -> Dict:
+        """Orchestrator result dict for a completed row (resume without re-running)"""
+        return {
+            "success": row["status"] == "success",
+            "response": row["decision"] or "[RESUMED] completed in an earlier run",
+            "decision": row["decision"],
+            "model": row["model"],
+            "tokens": {"input": row["input_tokens"], "output": row["output_tokens"], "total": row["total_tokens"]},
+            "cost": 0,   # already paid in the earlier run
+            "time": 0,
+            "resumed": True
+        }
+
+    # ---- legacy YAML ---------------------------------------------------
+
+    def yaml_path(self, story_id: str) -> Path:
+        return self.checkpoints_dir / f"{story_id}.yaml"
+
+    def export_story_yaml(self, story_id: str):
+        """Rewrite {story}.yaml from the database in the legacy line format"""
+        lines = []
+        for row in self.rows(story_id):
+            stamp = datetime.fromtimestamp(row["finished_at"] or row["started_at"] or 0).strftime("%H:%M")
+            entry = f"{row['phase']}: {STATUS_SYMBOL.get(row['status'], '?')} {row['agent'] or 'unknown'} {stamp}"
+            extra = json.loads(row["extra"]) if row["extra"] else {}
+            if row["iteration"] > 1:
+                entry += f" iter:{row['iteration']}"
+            for key in ("tests", "issues"):
+                if key in extra:
+                    entry += f" {key}:{extra[key]}"
+            if row["decision"]:
+                entry += f" decision:{row['decision']}"
+            if row["model"]:
+                entry += f" model:{row['model']} tokens:{row['total_tokens']} cost:{row['cost']:.4f}"
+            lines.append(entry)
+
+        path = self.yaml_path(story_id)
+        with self._yaml_lock:
+            tmp_path = path.with_name(f".{path.name}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+            tmp_path.replace(path)
+
+    def export_all_yaml(self) -> int:
+        stories = [row[0] for row in self._connection().execute("SELECT DISTINCT story FROM checkpoints")]
+        for story_id in stories:
+            self.export_story_yaml(story_id)
+        return len(stories)
+
+    def import_yaml(self) -> int:
+        """Migrate legacy {story}.yaml lines (phase, status, agent) for stories not in the database yet"""
+        imported = 0
+        for path in sorted(self.checkpoints_dir.glob("*.yaml")):
+            story_id = path.stem
+            if self.rows(story_id):
+                continue
+            iterations = {}
+            for line in path.read_text(encoding='utf-8').splitlines():
+                if not line.strip().startswith('P') or ':' not in line:
+                    continue
+                phase = line.split(':')[0].strip()
+                fields = line.split(':', 1)[1].split()
+                iterations[phase] = iterations.get(phase, 0) + 1
+                self.finish(story_id, phase, iterations[phase], {
+                    "success": '✓' in line,
+                    "agent": fields[1] if len(fields) > 1 else None,
+                })
+                imported += 1
+        return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the SQLite checkpoint store")
+    parser.add_argument("--dir", default=str(DEFAULT_CHECKPOINTS_DIR), help="Checkpoints directory")
+    parser.add_argument("--story", help="Show checkpoint rows for a story")
+    parser.add_argument("--export-yaml", action="store_true", help="Regenerate all {story}.yaml files")
+    parser.add_argument("--import-yaml", action="store_true", help="Import legacy YAML checkpoints")
+    args = parser.parse_args()
+
+    store = CheckpointStore(Path(args.dir), export_yaml=False)
+
+    if args.import_yaml:
+        print(f"Imported {store.import_yaml()} legacy checkpoint lines")
+    if args.export_yaml:
+        print(f"Exported {store.export_all_yaml()} stories to YAML")
+    if args.story:
+        for row in store.rows(args.story):
+            iter_str = f" iter{row['iteration']}" if row["iteration"] > 1 else ""
+            print(f"  {row['phase']}{iter_str}: {row['status']:<8} {row['model'] or '-':<18} "
+                  f"{row['total_tokens'] or 0:>7} tok  ${row['cost'] or 0:.4f}  {row['decision'] or ''}")
+
+
+if __name__ == "__main__":
+    main()
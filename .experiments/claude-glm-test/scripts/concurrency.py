@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Adaptive (AIMD) concurrency limits per model/provider
+
+A fixed max_workers=4 neither uses spare provider capacity nor backs off when
+the provider throttles. Each limiter here gates in-flight calls for one key
+(a model name such as "glm-4.5-air" or "claude-sonnet"):
+
+- Additive increase: +1 after `limit` healthy calls made while the limit was saturated
+- Multiplicative decrease: x0.5 on 429/overload, x0.75 on a latency spike
+  (> LATENCY_SPIKE_FACTOR x the latency baseline of the same workload,
+  i.e. phase - a long P3 generation is not a spike next to P7 docs) or when
+  the recent error rate exceeds MAX_ERROR_RATE
+- The baseline is an EWMA over every successful call, spikes included, and
+  needs MIN_BASELINE_SAMPLES before anything counts as a spike - one fast
+  first call must not make every normal call look slow
+- Calls that started before a decrease don't trigger another one
+
+Learned limits are persisted per hour of day (.cache/concurrency_state.json),
+so a run at 09:00 starts from what worked at 09:00 before.
+
+Usage:
+    python concurrency.py --stats
+"""
+
+import os
+import re
+import json
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from datetime import datetime
+from collections import deque
+from typing import Callable, Dict, Optional
+
+DEFAULT_STATE_PATH = Path(__file__).parent.parent / ".cache" / "concurrency_state.json"
+
+# (initial, min, max) per provider; key prefix "claude" -> Claude, everything else -> GLM
+PROVIDER_LIMITS = {
+    "claude": (4, 1, 8),
+    "glm": (4, 1, 12),
+}
+
+DECREASE_ON_THROTTLE = 0.5
+DECREASE_ON_SLOWDOWN = 0.75
+LATENCY_SPIKE_FACTOR = 2.0
+LATENCY_EWMA_ALPHA = 0.2
+MIN_BASELINE_SAMPLES = 3
+ERROR_WINDOW = 10
+MAX_ERROR_RATE = 0.3
+
+_THROTTLE_PATTERN = re.compile(r"\b(429|529)\b|rate.?limit|too many requests|overloaded", re.IGNORECASE)
+
+
+def is_throttle_error(error: Optional[str]) -> bool:
+    """429 / 529 / rate-limit / overloaded errors from GLM (HTTPError text) or Anthropic"""
+    return bool(error) and bool(_THROTTLE_PATTERN.search(str(error)))
+
+
+def provider_for(key: str) -> str:
+    return "claude" if key.startswith("claude") else "glm"
+
+
+class AdaptiveLimiter:
+    """AIMD limit on concurrent calls for one model"""
+
+    def __init__(self, key: str, initial: int, min_limit: int, max_limit: int,
+                 on_change: Optional[Callable[["AdaptiveLimiter", int, str], None]] = None,
+                 log: Callable[[str], None] = print):
+        self.key = key
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = min(max(initial, min_limit), max_limit)
+        self.in_flight = 0
+        self.on_change = on_change
+        self.log = log
+
+        self._cond = threading.Condition()
+        self._healthy_streak = 0
+        # Latency EWMA and sample count per workload (phase); None = caller gave no workload
+        self._baselines: Dict[Optional[str], float] = {}
+        self._baseline_samples: Dict[Optional[str], int] = {}
+        self._recent_errors = deque(maxlen=ERROR_WINDOW)
+        self._last_decrease = 0.0
+
+    def acquire(self) -> float:
+        """Block until a slot is free. Returns the call start time (pass to release)."""
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+        return time.monotonic()
+
+    def try_acquire(self) -> Optional[float]:
+        """Take a slot without blocking. Returns the start time, or None if the limit is reached."""
+        with self._cond:
+            if self.in_flight >= self.limit:
+                return None
+            self.in_flight += 1
+        return time.monotonic()
+
+    def abandon(self):
+        """Free a slot without adapting (call cancelled by the caller, not failed by the provider)"""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def release(self, started: float, error: Optional[str] = None, workload: Optional[str] = None):
+        """Free the slot and adapt the limit from this call's outcome
+
+        workload: kind of call (phase) - latency is compared only with calls of the same kind
+        """
+        latency = time.monotonic() - started
+        with self._cond:
+            self.in_flight -= 1
+            self._recent_errors.append(bool(error))
+            old = self.limit
+            reason = self._adapt(started, latency, error, workload)
+            self._cond.notify_all()
+
+        if reason:
+            self.log(f"[CONCURRENCY] {self.key}: {old} → {self.limit} ({reason})")
+            if self.on_change:
+                self.on_change(self, old, reason)
+
+    def _adapt(self, started: float, latency: float, error: Optional[str],
+               workload: Optional[str] = None) -> Optional[str]:
+        """Apply AIMD rules (called with the lock held). Returns the reason if the limit changed."""
+        # Calls already in flight when we last cut were measured under the old limit
+        stale = started < self._last_decrease
+
+        if is_throttle_error(error):
+            return None if stale else self._decrease(DECREASE_ON_THROTTLE, "throttled: 429/overloaded")
+
+        error_rate = sum(self._recent_errors) / len(self._recent_errors)
+        if error and len(self._recent_errors) >= ERROR_WINDOW // 2 and error_rate > MAX_ERROR_RATE:
+            return None if stale else self._decrease(DECREASE_ON_SLOWDOWN, f"error rate {error_rate:.0%}")
+        if error:
+            self._healthy_streak = 0
+            return None
+
+        baseline = self._baselines.get(workload)
+        samples = self._baseline_samples.get(workload, 0)
+        label = f"{workload} " if workload else ""
+        # Every success moves the baseline, so a sustained slowdown becomes the new normal
+        self._baselines[workload] = latency if baseline is None else (
+            (1 - LATENCY_EWMA_ALPHA) * baseline + LATENCY_EWMA_ALPHA * latency
+        )
+        self._baseline_samples[workload] = samples + 1
+        if samples >= MIN_BASELINE_SAMPLES and latency > LATENCY_SPIKE_FACTOR * baseline:
+            return None if stale else self._decrease(
+                DECREASE_ON_SLOWDOWN, f"{label}latency spike {latency:.1f}s vs baseline {baseline:.1f}s"
+            )
+
+        # Only grow when the limit was actually the bottleneck for this call
+        if self.in_flight + 1 >= self.limit:
+            self._healthy_streak += 1
+        if self._healthy_streak >= self.limit and self.limit < self.max_limit:
+            self._healthy_streak = 0
+            self.limit += 1
+            return f"healthy: {self.limit - 1} ok calls, {label}baseline {self._baselines[workload]:.1f}s"
+        return None
+
+    def _decrease(self, factor: float, reason: str) -> Optional[str]:
+        self._healthy_streak = 0
+        self._last_decrease = time.monotonic()
+        new_limit = max(self.min_limit, int(self.limit * factor))
+        if new_limit == self.limit:
+            return None
+        self.limit = new_limit
+        return reason
+
+    def call(self, fn: Callable[[], Dict], workload: Optional[str] = None) -> Dict:
+        """Run fn() inside a slot; its result dict's "error" (if any) drives the adaptation"""
+        started = self.acquire()
+        error = None
+        try:
+            result = fn()
+            if not result.get("success", True):
+                error = result.get("error") or "failed"
+            return result
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            self.release(started, error, workload)
+
+
+class LimiterRegistry:
+    """One AdaptiveLimiter per model, seeded from limits learned at this hour of day"""
+
+    def __init__(self, state_path: Optional[Path] = None, log: Callable[[str], None] = print):
+        self.state_path = Path(state_path) if state_path else DEFAULT_STATE_PATH
+        self.log = log
+        self._lock = threading.Lock()
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        self.state: Dict[str, Dict[str, int]] = {}
+        if self.state_path.exists():
+            try:
+                with open(self.state_path, encoding='utf-8') as f:
+                    self.state = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    @staticmethod
+    def _hour() -> str:
+        return f"{datetime.now().hour:02d}"
+
+    def get(self, key: str) -> AdaptiveLimiter:
+        with self._lock:
+            if key not in self._limiters:
+                initial, min_limit, max_limit = PROVIDER_LIMITS[provider_for(key)]
+                learned = self.state.get(key, {}).get(self._hour())
+                limiter = AdaptiveLimiter(key, learned or initial, min_limit, max_limit,
+                                          on_change=self._remember, log=self.log)
+                self._limiters[key] = limiter
+                source = f"learned for {self._hour()}:00" if learned else "default"
+                self.log(f"[CONCURRENCY] {key}: starting limit {limiter.limit} ({source}, max {max_limit})")
+            return self._limiters[key]
+
+    def max_limit(self) -> int:
+        """Upper bound on concurrency any limiter can reach (sizes thread pools)"""
+        return max(limits[2] for limits in PROVIDER_LIMITS.values())
+
+    def _remember(self, limiter: AdaptiveLimiter, old: int, reason: str):
+        with self._lock:
+            self.state.setdefault(limiter.key, {})[self._hour()] = limiter.limit
+            try:
+                self.state_path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=str(self.state_path.parent), prefix=".tmp-")
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.state, f, indent=2)
+                os.replace(tmp_path, self.state_path)
+            except OSError:
+                pass
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                key: {"limit": limiter.limit, "in_flight": limiter.in_flight, "max": limiter.max_limit}
+                for key, limiter in self._limiters.items()
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive concurrency limits")
+    parser.add_argument("--stats", action="store_true", help="Show learned limits per model and hour")
+    parser.add_argument("--state", default=str(DEFAULT_STATE_PATH), help="State file")
+    args = parser.parse_args()
+
+    registry = LimiterRegistry(Path(args.state))
+    print(json.dumps(registry.state, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
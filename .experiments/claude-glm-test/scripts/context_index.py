@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+BM25 Context Index - ranked snippet retrieval for GLM prompts
+
+Instead of blind 500-char previews (often just imports), context files are
+split into sections (markdown headings / top-level code blocks) and ranked
+with BM25 against the task and story ID. The best sections are packed up to
+a token budget.
+
+The index (per-section term frequencies plus corpus statistics) persists to
+.cache/ and is updated incrementally by file mtime/size, so re-querying the
+whole repo stays sub-second. Context-file-only queries use a separate small
+index so they never pay for loading the repo-wide one.
+
+Usage:
+    python context_index.py --query "org_id service validation" --story 01.2 --roots apps/frontend/lib,docs
+    python context_index.py --stats
+"""
+
+import os
+import re
+import json
+import math
+import pickle
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+DEFAULT_INDEX_PATH = Path(__file__).parent.parent / ".cache" / "context_index.pickle"
+REPO_INDEX_PATH = Path(__file__).parent.parent / ".cache" / "context_index_repo.pickle"
+
+# Optional repo-wide roots (--index-repo in glm_wrapper)
+REPO_ROOTS = ["apps/frontend/lib", "docs"]
+INDEXED_EXTENSIONS = {".md", ".ts", ".tsx", ".sql", ".json"}
+SKIP_DIRS = {"node_modules", ".next", ".git", "__pycache__", "dist", "build", "coverage"}
+
+INDEX_VERSION = 1
+CHARS_PER_TOKEN = 4
+MAX_CHUNK_LINES = 60
+MIN_CHUNK_LINES = 8
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Only the most discriminative query terms are scored (task templates are wordy)
+MAX_QUERY_TERMS = 24
+
+_STOPWORDS = {
+    "the", "and", "for", "with", "from", "this", "that", "are", "not", "use", "all",
+    "import", "export", "const", "return", "function", "type", "interface", "string",
+    "number", "true", "false", "null", "undefined", "async", "await", "new", "let",
+}
+
+# Lines that start a new section once the current one has MIN_CHUNK_LINES
+_SECTION_START = re.compile(
+    r"^(#{1,6}\s|export\s|function\s|class\s|interface\s|type\s|const\s+\w+\s*=|"
+    r"describe\(|it\(|test\(|create\s+table|create\s+policy)",
+    re.IGNORECASE
+)
+_STORY_ID = re.compile(r"\b\d{2}\.\d{1,2}[a-z]?\b")
+_WORD = re.compile(r"[A-Za-z][a-z0-9]+|[A-Z]+(?![a-z])|\d+")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms; camelCase/snake_case split, story IDs (01.2) kept whole"""
+    terms = _STORY_ID.findall(text)
+    for word in _WORD.findall(text):
+        term = word.lower()
+        if len(term) >= 2 and term not in _STOPWORDS:
+            terms.append(term)
+    return terms
+
+
+def split_sections(lines: List[str]) -> List[tuple]:
+    """Split file lines into (start, end) sections, end exclusive"""
+    sections = []
+    start = 0
+    for i, line in enumerate(lines):
+        length = i - start
+        if length >= MAX_CHUNK_LINES or (length >= MIN_CHUNK_LINES and _SECTION_START.match(line)):
+            sections.append((start, i))
+            start = i
+    if start < len(lines):
+        sections.append((start, len(lines)))
+    return sections
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+class ContextIndex:
+    """Persistent BM25 inverted index over file sections"""
+
+    def __init__(self, index_path: Optional[Path] = None):
+        self.index_path = Path(index_path) if index_path else DEFAULT_INDEX_PATH
+        self.files: Dict[str, Dict] = {}
+        self.df: Dict[str, int] = {}
+        self.total_chunks = 0
+        self.total_length = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    # ---- persistence ---------------------------------------------------
+
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return
+        if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+            return
+        self.files = data["files"]
+        self.df = data["df"]
+        self.total_chunks = data["total_chunks"]
+        self.total_length = data["total_length"]
+
+    def save(self):
+        """Persist if anything changed (atomic replace)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=str(self.index_path.parent), prefix=".tmp-")
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({
+                    "version": INDEX_VERSION,
+                    "files": self.files,
+                    "df": self.df,
+                    "total_chunks": self.total_chunks,
+                    "total_length": self.total_length,
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+    # ---- indexing ------------------------------------------------------
+
+    def _count(self, entry: Dict, sign: int):
+        """Add (+1) or remove (-1) a file's chunks from corpus statistics"""
+        for chunk in entry["chunks"]:
+            self.total_chunks += sign
+            self.total_length += sign * chunk["len"]
+            for term in chunk["tf"]:
+                self.df[term] = self.df.get(term, 0) + sign
+                if self.df[term] <= 0:
+                    del self.df[term]
+
+    def update_file(self, path: str) -> bool:
+        """(Re)index one file if its mtime/size changed. Returns True if reindexed."""
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return self.remove_file(path)
+
+        with self._lock:
+            entry = self.files.get(path)
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                return False
+
+            text = _read_text(path)
+            if text is None:
+                return False
+
+            lines = text.splitlines()
+            chunks = []
+            for start, end in split_sections(lines):
+                terms = tokenize("\n".join(lines[start:end]))
+                if not terms:
+                    continue
+                tf = {}
+                for term in terms:
+                    tf[term] = tf.get(term, 0) + 1
+                # Path terms make "services", "validation" etc. match by location too
+                for term in tokenize(os.path.relpath(path, REPO_ROOT)):
+                    tf[term] = tf.get(term, 0) + 1
+                chunks.append({"start": start, "end": end, "len": len(terms), "tf": tf})
+
+            if entry:
+                self._count(entry, -1)
+            entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "chunks": chunks}
+            self.files[path] = entry
+            self._count(entry, +1)
+            self._dirty = True
+            return True
+
+    def remove_file(self, path: str) -> bool:
+        with self._lock:
+            entry = self.files.pop(os.path.abspath(path), None)
+            if entry:
+                self._count(entry, -1)
+                self._dirty = True
+            return entry is not None
+
+    def update_paths(self, paths: Iterable[str]) -> int:
+        """Incrementally refresh the given files. Returns number reindexed."""
+        return sum(1 for path in paths if self.update_file(path))
+
+    def update_roots(self, roots: Iterable[str]) -> int:
+        """Walk roots (relative to repo root) and refresh changed/new/deleted files"""
+        seen = set()
+        for root in roots:
+            root_path = Path(root) if os.path.isabs(root) else REPO_ROOT / root
+            for dirpath, dirnames, filenames in os.walk(root_path):
+                dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+                for name in filenames:
+                    if os.path.splitext(name)[1] in INDEXED_EXTENSIONS:
+                        seen.add(os.path.join(dirpath, name))
+
+        changed = self.update_paths(seen)
+
+        # Drop files that disappeared from indexed roots
+        prefixes = tuple(str(Path(r) if os.path.isabs(r) else REPO_ROOT / r) + os.sep for r in roots)
+        with self._lock:
+            gone = [p for p in self.files if p.startswith(prefixes) and p not in seen]
+        for path in gone:
+            self.remove_file(path)
+            changed += 1
+        return changed
+
+    # ---- retrieval -----------------------------------------------------
+
+    def search(self, query: str, paths: Optional[Iterable[str]] = None, limit: int = 50) -> List[Dict]:
+        """
+        BM25-rank sections for a query (under the index lock - the daemon may reindex concurrently).
+
+        Args:
+            paths: Restrict to these files (default: whole index)
+
+        Returns:
+            [{"path", "start", "end", "score"}] best first
+        """
+        query_terms = set(tokenize(query))
+        with self._lock:
+            results = self._score(query_terms, paths)
+        results.sort(key=lambda r: r["score"], reverse=True)
+        return results[:limit]
+
+    def _score(self, query_terms: set, paths: Optional[Iterable[str]]) -> List[Dict]:
+        if not query_terms or not self.total_chunks:
+            return []
+
+        avgdl = self.total_length / self.total_chunks
+        idf = {
+            term: math.log(1 + (self.total_chunks - self.df[term] + 0.5) / (self.df[term] + 0.5))
+            for term in query_terms if term in self.df
+        }
+        idf = dict(sorted(idf.items(), key=lambda item: item[1], reverse=True)[:MAX_QUERY_TERMS])
+
+        candidates = [os.path.abspath(p) for p in paths] if paths is not None else list(self.files)
+        results = []
+        for path in candidates:
+            entry = self.files.get(path)
+            if not entry:
+                continue
+            for chunk in entry["chunks"]:
+                tf = chunk["tf"]
+                matched = idf.keys() & tf.keys() if len(tf) < len(idf) * 4 else [t for t in idf if t in tf]
+                if not matched:
+                    continue
+                score = 0.0
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * chunk["len"] / avgdl)
+                for term in matched:
+                    freq = tf[term]
+                    score += idf[term] * freq * (BM25_K1 + 1) / (freq + norm)
+                if score > 0:
+                    results.append({"path": path, "start": chunk["start"], "end": chunk["end"], "score": score})
+        return results
+
+    def select_context(self, query: str, context_files: List[str], budget_tokens: int,
+                       extra_roots: Optional[List[str]] = None) -> str:
+        """
+        Build a context summary from the most relevant sections within a token budget.
+
+        Context files that fit entirely are included whole; the rest of the budget
+        goes to the highest-ranked sections (from context files first, then
+        extra_roots). Every context file contributes at least its best section,
+        cut to its first lines when the section alone exceeds the remaining budget.
+        """
+        self.update_paths(context_files)
+        if extra_roots:
+            self.update_roots(extra_roots)
+        self.save()
+
+        context_abs = [os.path.abspath(p) for p in context_files]
+        texts = {}
+
+        def file_lines(path):
+            if path not in texts:
+                texts[path] = (_read_text(path) or "").splitlines()
+            return texts[path]
+
+        selected: Dict[str, List[tuple]] = {}
+        used = 0
+
+        def take(path, start, end, truncate=False) -> bool:
+            nonlocal used
+            cost = estimate_tokens("\n".join(file_lines(path)[start:end]))
+            while truncate and used + cost > budget_tokens and end - start > 1:
+                end -= 1
+                cost = estimate_tokens("\n".join(file_lines(path)[start:end]))
+            if used + cost > budget_tokens:
+                return False
+            selected.setdefault(path, []).append((start, end))
+            used += cost
+            return True
+
+        # Whole files when the entire context set fits
+        total = sum(estimate_tokens("\n".join(file_lines(p))) for p in context_abs)
+        if total <= budget_tokens and not extra_roots:
+            for path in context_abs:
+                take(path, 0, len(file_lines(path)))
+        else:
+            ranked = self.search(query, paths=context_abs, limit=500)
+
+            # Best section of every context file first, then by score
+            best_per_file = {}
+            for hit in ranked:
+                best_per_file.setdefault(hit["path"], hit)
+            for path in context_abs:
+                hit = best_per_file.get(path)
+                if hit:
+                    take(path, hit["start"], hit["end"], truncate=True)
+                elif file_lines(path):
+                    take(path, 0, min(MIN_CHUNK_LINES, len(file_lines(path))), truncate=True)
+
+            for hit in ranked:
+                if (hit["start"], hit["end"]) not in selected.get(hit["path"], []):
+                    take(hit["path"], hit["start"], hit["end"])
+
+            if extra_roots:
+                for hit in self.search(query, limit=200):
+                    if hit["path"] in context_abs:
+                        continue
+                    if (hit["start"], hit["end"]) not in selected.get(hit["path"], []):
+                        take(hit["path"], hit["start"], hit["end"])
+
+        parts = []
+        for path in context_abs + [p for p in selected if p not in context_abs]:
+            ranges = sorted(selected.get(path, []))
+            if not ranges:
+                if path in context_abs:
+                    parts.append(f"FILE: {path}\n[not readable or no relevant sections]\n")
+                continue
+            lines = file_lines(path)
+            if ranges == [(0, len(lines))]:
+                parts.append(f"FILE: {path}\n" + "\n".join(lines) + "\n")
+                continue
+            body = []
+            for start, end in ranges:
+                body.append(f"--- lines {start + 1}-{end} ---\n" + "\n".join(lines[start:end]))
+            parts.append(f"FILE: {path} ({len(lines)} lines, relevant sections)\n" + "\n".join(body) + "\n")
+
+        return "\n".join(parts)
+
+    def stats(self) -> Dict:
+        return {
+            "files": len(self.files),
+            "chunks": self.total_chunks,
+            "terms": len(self.df),
+            "index_path": str(self.index_path)
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 context index for GLM prompts")
+    parser.add_argument("--query", "-q", help="Query text")
+    parser.add_argument("--story", help="Story ID to add to the query")
+    parser.add_argument("--context", default="", help="Comma-separated context files")
+    parser.add_argument("--roots", default="", help="Comma-separated extra roots (e.g. apps/frontend/lib,docs)")
+    parser.add_argument("--budget", type=int, default=4000, help="Token budget (default: 4000)")
+    parser.add_argument("--stats", action="store_true", help="Show index statistics")
+    args = parser.parse_args()
+
+    roots = [r.strip() for r in args.roots.split(',') if r.strip()]
+    index = ContextIndex(REPO_INDEX_PATH if roots else DEFAULT_INDEX_PATH)
+    if args.stats:
+        print(json.dumps(index.stats(), indent=2))
+        return
+
+    if not args.query and not args.story:
+        parser.error("--query or --story is required")
+
+    query = " ".join(filter(None, [args.query, args.story]))
+    context_files = [f.strip() for f in args.context.split(',') if f.strip()]
+    print(index.select_context(query, context_files, args.budget, extra_roots=roots or None))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+DAG Scheduler - run (story, phase, iteration) nodes as soon as their own
+predecessors finish
+
+The barrier pipeline runs one phase for all stories, waits, then starts the
+next phase, so the slowest story in every phase stalls the batch. Here each
+node only waits for its own dependencies; a global worker cap still bounds
+concurrency. Completion callbacks may add nodes, which is how the P5 ->
+P3 iter2 -> P5 iter2 fix loop is grown per story at runtime. With a
+priority function, ready nodes start highest priority first (e.g. most
+remaining work, work_estimates.py) instead of in insertion order.
+
+Usage (library):
+    scheduler = DagScheduler(max_workers=8, priority=estimator.priority)
+    scheduler.add(("01.2", "P2", 1), run_p2)
+    scheduler.add(("01.2", "P3", 1), run_p3, deps=[("01.2", "P2", 1)])
+    results = scheduler.run(on_complete=grow_fix_loop)
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+# Global ceiling only - per-model AIMD limiters (concurrency.py) decide actual parallelism
+DEFAULT_MAX_WORKERS = 8
+
+
+class DagScheduler:
+    """Dependency-driven executor with a global worker cap and dynamic nodes"""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, log: Callable[[str], None] = print,
+                 priority: Optional[Callable[[Hashable], float]] = None):
+        self.max_workers = max(1, max_workers)
+        self.log = log
+        self.priority = priority
+        self._lock = threading.Lock()
+        self._tasks: Dict[Hashable, Callable[[], Dict]] = {}
+        self._deps: Dict[Hashable, set] = {}
+        self._order: List[Hashable] = []       # insertion order = submit order among ready nodes
+        self.results: Dict[Hashable, Dict] = {}
+        self.timings: Dict[Hashable, tuple] = {}   # key -> (start, end) monotonic seconds
+        self.ready_at: Dict[Hashable, float] = {}  # key -> first seen runnable (start - ready_at = worker wait)
+
+    def add(self, key: Hashable, fn: Callable[[], Dict], deps: Optional[Iterable[Hashable]] = None):
+        """
+        Add a node. Safe to call from on_complete while the scheduler runs.
+
+        Args:
+            key: Unique node key, e.g. (story_id, phase, iteration)
+            fn: Zero-argument callable returning the node's result dict
+            deps: Keys that must complete first (may be added later)
+        """
+        with self._lock:
+            if key in self._tasks:
+                raise ValueError(f"Duplicate DAG node: {key}")
+            self._tasks[key] = fn
+            self._deps[key] = set(deps or ())
+            self._order.append(key)
+
+    def _ready(self, running: set) -> List[Hashable]:
+        """Runnable nodes in start order: highest priority first, then insertion order"""
+        with self._lock:
+            ready = [
+                key for key in self._order
+                if key not in self.results and key not in running
+                and all(dep in self.results for dep in self._deps[key])
+            ]
+        if self.priority:
+            ready.sort(key=lambda key: -self.priority(key))
+        return ready
+
+    def _execute(self, key: Hashable) -> Dict:
+        start = time.monotonic()
+        try:
+            return self._tasks[key]()
+        finally:
+            self.timings[key] = (start, time.monotonic())
+
+    def run(self, on_complete: Optional[Callable[[Hashable, Dict, "DagScheduler"], None]] = None) -> Dict:
+        """
+        Run until every node has completed.
+
+        A node that raises is recorded as {"success": False, "error": ...}; like the
+        barrier pipeline, its dependents still run. Nodes whose dependencies never
+        appear are reported and left out of the results.
+
+        Returns:
+            {key: result}
+        """
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                for key in self._ready(set(running.values())):
+                    self.ready_at.setdefault(key, time.monotonic())
+                    if len(running) < self.max_workers:
+                        running[executor.submit(self._execute, key)] = key
+
+                if not running:
+                    break
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.log(f"   ✗ {format_key(key)} failed: {e}")
+                        result = {"success": False, "error": str(e), "tokens": {"total": 0}, "cost": 0, "time": 0}
+                    self.results[key] = result
+                    if on_complete:
+                        on_complete(key, result, self)
+
+        blocked = [key for key in self._order if key not in self.results]
+        if blocked:
+            self.log(f"⚠️  {len(blocked)} DAG nodes never became runnable: "
+                     f"{', '.join(format_key(key) for key in blocked)}")
+        return self.results
+
+    def dependencies(self) -> Dict[Hashable, set]:
+        """key -> dependency keys (copy)"""
+        with self._lock:
+            return {key: set(deps) for key, deps in self._deps.items()}
+
+    def makespan(self) -> float:
+        """Wall-clock seconds from the first node start to the last node end"""
+        if not self.timings:
+            return 0.0
+        return max(end for _, end in self.timings.values()) - min(start for start, _ in self.timings.values())
+
+
+def format_key(key: Hashable) -> str:
+    """('01.2', 'P3', 2) -> '01.2 P3 iter2'"""
+    if isinstance(key, tuple) and len(key) == 3:
+        story_id, phase, iteration = key
+        return f"{story_id} {phase}" + (f" iter{iteration}" if iteration > 1 else "")
+    return str(key)
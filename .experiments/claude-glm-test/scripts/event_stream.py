@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+NDJSON progress events for glm_wrapper consumers
+
+With --events ndjson, glm_wrapper writes one JSON object per line to stdout
+as things happen instead of a single summary at the end:
+
+    {"event": "started", "t": 0.0, "task": "implement", "story": "01.2", ...}
+    {"event": "first_token", "t": 4.2, "ttft": 4.2}
+    {"event": "file_completed", "t": 31.7, "path": "lib/services/x.ts", "size": 2411, "lines": 80, "written": true}
+    {"event": "usage", "t": 58.0, "prompt_tokens": 5120, "completion_tokens": 9001, ...}
+    {"event": "fallback", "t": 90.1, "reason": "hedge", "status": "started"}
+    {"event": "done", "t": 58.1, "success": true, "output": {...}}
+
+"t" is seconds since the stream was created. Events from implement-parallel
+sub-tasks carry a "subtask" field. file_completed is emitted while GLM is
+still generating the remaining files (StreamingFileExtractor).
+
+Usage:
+    python glm_wrapper.py --task implement --story 01.2 --context tests.ts --auto-write --events ndjson
+    python event_stream.py < glm_response.txt     # files the extractor finds in a saved response
+"""
+
+import sys
+import json
+import time
+import threading
+from typing import Callable, List
+
+EVENT_TYPES = ("started", "first_token", "file_completed", "usage", "fallback", "done")
+
+
+class EventStream:
+    """Thread-safe NDJSON writer (sub-tasks and the streaming thread emit concurrently)"""
+
+    def __init__(self, stream=None):
+        stream = stream or sys.stdout
+        # Daemon requests: bind to this request's stream, not the per-thread stdout proxy,
+        # so events from GLM streaming threads still reach the right client
+        self._stream = stream.current() if hasattr(stream, "current") else stream
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+
+    def emit(self, event: str, **fields):
+        record = {"event": event, "t": round(time.monotonic() - self._start, 3)}
+        record.update((key, value) for key, value in fields.items() if value is not None)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._stream.write(line)
+            self._stream.flush()
+
+
+class StreamingFileExtractor:
+    """
+    Incrementally find complete {"path": ..., "content": ...} objects in a
+    streamed JSON response (the GLM "files" array).
+
+    Characters are scanned once as they arrive; string/escape state is tracked
+    so braces inside file contents are ignored. When an object that sits inside
+    an array closes, it is parsed and passed to on_file if it looks like a file.
+    Markdown fences and prose before the JSON are skipped.
+    """
+
+    def __init__(self, on_file: Callable[[dict], None]):
+        self.on_file = on_file
+        self._parts: List[str] = []
+        self._offset = 0
+        self._stack: List[tuple] = []   # (open char, absolute offset)
+        self._in_string = False
+        self._escape = False
+        self.files_found = 0
+
+    def feed(self, text: str):
+        chunk_start = self._offset
+        self._parts.append(text)
+        self._offset += len(text)
+
+        for i, char in enumerate(text):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                # Quotes in prose before the JSON don't start strings
+                if self._stack:
+                    self._in_string = True
+            elif char in "{[":
+                self._stack.append((char, chunk_start + i))
+            elif char in "}]" and self._stack:
+                opener, start = self._stack.pop()
+                if char == "}" and opener == "{" and self._stack and self._stack[-1][0] == "[":
+                    self._object_closed(start, chunk_start + i + 1)
+
+    def _object_closed(self, start: int, end: int):
+        text = "".join(self._parts)
+        self._parts = [text]
+        try:
+            candidate = json.loads(text[start:end])
+        except ValueError:
+            return
+        if (isinstance(candidate, dict) and isinstance(candidate.get("path"), str)
+                and isinstance(candidate.get("content"), str)):
+            self.files_found += 1
+            self.on_file(candidate)
+
+
+def file_event_fields(file_info: dict) -> dict:
+    """path/size/lines for a file_completed event"""
+    content = file_info.get("content") or ""
+    return {
+        "path": file_info.get("path"),
+        "size": len(content),
+        "lines": content.count('\n') + 1
+    }
+
+
+def main():
+    """Read a response from stdin in small chunks and print the files found as they complete"""
+    extractor = StreamingFileExtractor(
+        lambda f: print(json.dumps(file_event_fields(f)))
+    )
+    data = sys.stdin.read()
+    for i in range(0, len(data), 64):
+        extractor.feed(data[i:i + 64])
+    print(f"[EVENTS] {extractor.files_found} files", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
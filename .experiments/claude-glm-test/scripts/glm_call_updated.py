@@ -7,9 +7,13 @@ import requests
 import sys
 import os
 import json
+import socket
 import argparse
+import tempfile
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional
 
 
 def write_files_to_disk(files: List[dict], base_dir: str) -> dict:
@@ -67,6 +71,130 @@ def write_files_to_disk(files: List[dict], base_dir: str) -> dict:
     }
 
 
+# Read once at import - os.umask() can only be queried by setting it, which races other threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def write_files_atomic(files: List[dict], base_dir: str) -> dict:
+    """
+    Write a batch of generated files all-or-nothing.
+
+    Every file is first written to a temp file next to its target; only when
+    all temp writes succeed are they renamed into place. If a rename fails,
+    already-replaced files are restored from their previous content.
+
+    Returns:
+        Same shape as write_files_to_disk()
+    """
+    staged = []   # (tmp_path, full_path, content)
+    errors = []
+
+    for file_info in files:
+        file_path = file_info.get("path", "")
+        content = file_info.get("content", "")
+        if not file_path:
+            errors.append({"error": "Missing path in file entry"})
+            continue
+        full_path = Path(base_dir) / file_path
+        try:
+            full_path.parent.mkdir(parents=True, exist_ok=True)
+            # Unique per writer - concurrent daemon requests/threads may target the same path
+            fd, tmp_name = tempfile.mkstemp(dir=str(full_path.parent), prefix=f".{full_path.name}.tmp-")
+            tmp_path = Path(tmp_name)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            # mkstemp creates 0600 - keep the replaced file's mode, else the umask default
+            try:
+                mode = full_path.stat().st_mode & 0o7777
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+            os.chmod(tmp_path, mode)
+            staged.append((tmp_path, full_path, content))
+        except Exception as e:
+            errors.append({"path": file_path, "error": str(e)})
+
+    if errors:
+        for tmp_path, _, _ in staged:
+            tmp_path.unlink(missing_ok=True)
+        print(f"  [ERROR] Batch aborted - {len(errors)} files failed to stage, nothing written", file=sys.stderr)
+        return {"written": [], "errors": errors, "total_written": 0, "total_errors": len(errors)}
+
+    replaced = []  # (full_path, previous content or None)
+    try:
+        for tmp_path, full_path, _ in staged:
+            previous = full_path.read_text(encoding='utf-8') if full_path.exists() else None
+            os.replace(tmp_path, full_path)
+            replaced.append((full_path, previous))
+    except Exception as e:
+        for full_path, previous in reversed(replaced):
+            if previous is None:
+                full_path.unlink(missing_ok=True)
+            else:
+                full_path.write_text(previous, encoding='utf-8')
+        for tmp_path, _, _ in staged:
+            tmp_path.unlink(missing_ok=True)
+        print(f"  [ERROR] Batch rolled back: {e}", file=sys.stderr)
+        return {"written": [], "errors": [{"error": f"Batch rolled back: {e}"}],
+                "total_written": 0, "total_errors": 1}
+
+    written = []
+    for _, full_path, content in staged:
+        written.append({
+            "path": str(full_path),
+            "size": len(content),
+            "lines": content.count('\n') + 1
+        })
+        print(f"  [WROTE] {full_path} ({len(content)} bytes)", file=sys.stderr)
+
+    return {
+        "written": written,
+        "errors": [],
+        "total_written": len(written),
+        "total_errors": 0
+    }
+
+
+# How often a cancellable streaming call checks its cancel_event
+CANCEL_POLL = 0.2
+
+
+# Characters kept in the file cache; least recently read files are dropped beyond it
+FILE_CACHE_MAX_CHARS = 32_000_000
+
+# path -> (mtime_ns, size, content), least recently read first; one cache per process
+# (GLMClient and glm_wrapper context reads)
+_FILE_CACHE: "OrderedDict[str, tuple]" = OrderedDict()
+_FILE_CACHE_CHARS = 0
+_FILE_CACHE_LOCK = threading.Lock()
+
+
+def read_cached_file(path: str) -> str:
+    """Read a file, cached until its mtime/size changes (matters for the long-lived daemon)
+
+    The cache is an LRU bounded by FILE_CACHE_MAX_CHARS.
+    """
+    global _FILE_CACHE_CHARS
+    stat = os.stat(path)
+    with _FILE_CACHE_LOCK:
+        cached = _FILE_CACHE.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            _FILE_CACHE.move_to_end(path)
+            return cached[2]
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    with _FILE_CACHE_LOCK:
+        previous = _FILE_CACHE.pop(path, None)
+        if previous:
+            _FILE_CACHE_CHARS -= len(previous[2])
+        _FILE_CACHE[path] = (stat.st_mtime_ns, stat.st_size, content)
+        _FILE_CACHE_CHARS += len(content)
+        while _FILE_CACHE_CHARS > FILE_CACHE_MAX_CHARS and len(_FILE_CACHE) > 1:
+            _, (_, _, dropped) = _FILE_CACHE.popitem(last=False)
+            _FILE_CACHE_CHARS -= len(dropped)
+    return content
+
+
 def extract_files_from_response(response_text: str) -> List[dict]:
     """
     Extract files array from GLM response (JSON or markdown code blocks).
@@ -145,6 +273,14 @@ class GLMClient:
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        # Keep-alive session - repeated calls reuse the TLS connection
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # Sockets of the call running on each thread, so a cancel can shut them down
+        self._call_sockets = threading.local()
+        adapter = self._tracking_adapter()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
     def get_base_url(self, model: str) -> str:
         """Get appropriate base URL for the model"""
@@ -155,10 +291,9 @@ class GLMClient:
         return self.BASE_URLS[provider]
 
     def read_file(self, path: str) -> str:
-        """Read file from disk"""
+        """Read file from disk (cached until mtime/size changes)"""
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return f.read()
+            return read_cached_file(path)
         except Exception as e:
             return f"[ERROR reading {path}: {str(e)}]"
 
@@ -170,6 +305,104 @@ class GLMClient:
             context_parts.append(f"=== FILE: {file_path} ===\n{content}\n")
         return "\n".join(context_parts)
 
+    def _tracking_adapter(self) -> "requests.adapters.HTTPAdapter":
+        """Adapter whose connections record the socket a request waits on in the calling
+        thread's list - new and reused keep-alive connections alike"""
+        from urllib3.connection import HTTPConnection, HTTPSConnection
+        from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+        call_sockets = self._call_sockets
+
+        def tracked(connection_cls):
+            class Tracked(connection_cls):
+                def getresponse(self, *args, **kwargs):
+                    sockets = getattr(call_sockets, "sockets", None)
+                    if sockets is not None and self.sock is not None:
+                        sockets.append(self.sock)
+                    return super().getresponse(*args, **kwargs)
+            return Tracked
+
+        adapter = requests.adapters.HTTPAdapter()
+        adapter.poolmanager.pool_classes_by_scheme = {
+            "http": type("TrackedPool", (HTTPConnectionPool,), {"ConnectionCls": tracked(HTTPConnection)}),
+            "https": type("TrackedPool", (HTTPSConnectionPool,), {"ConnectionCls": tracked(HTTPSConnection)}),
+        }
+        return adapter
+
+    @staticmethod
+    def _watch_cancel(cancel_event, done, sockets: list):
+        """Once cancel_event is set (and the call is not done), shut the call's sockets down -
+        this wakes a read blocked before the first byte as well as mid-stream. Only that
+        connection dies; the session and its other pooled connections stay usable"""
+        shut = set()
+        while not done.is_set():
+            if cancel_event.wait(CANCEL_POLL):
+                # Keep polling until the call returns - the socket may register after the cancel
+                for sock in list(sockets):
+                    if id(sock) in shut:
+                        continue
+                    shut.add(id(sock))
+                    try:
+                        sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                done.wait(CANCEL_POLL)
+
+    def _read_stream(self, response, model: str, on_delta, cancel_event) -> dict:
+        """Consume an SSE chat-completions stream into the non-streaming result shape"""
+        content_parts = []
+        reasoning_parts = []
+        usage = {}
+        finish_reason = "unknown"
+        response_model = model
+
+        try:
+            for raw_line in response.iter_lines(decode_unicode=True):
+                if cancel_event is not None and cancel_event.is_set():
+                    return {"cancelled": True, "usage": usage}
+                if not raw_line or not raw_line.startswith("data:"):
+                    continue
+                data_str = raw_line[5:].strip()
+                if data_str == "[DONE]":
+                    break
+
+                try:
+                    chunk = json.loads(data_str)
+                except json.JSONDecodeError:
+                    continue
+
+                response_model = chunk.get("model", response_model)
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+
+                for choice in chunk.get("choices", []):
+                    delta = choice.get("delta", {})
+                    if delta.get("reasoning_content"):
+                        reasoning_parts.append(delta["reasoning_content"])
+                        if on_delta:
+                            on_delta("reasoning", delta["reasoning_content"])
+                    if delta.get("content"):
+                        content_parts.append(delta["content"])
+                        if on_delta:
+                            on_delta("content", delta["content"])
+                    if choice.get("finish_reason"):
+                        finish_reason = choice["finish_reason"]
+            if cancel_event is not None and cancel_event.is_set():
+                # Socket shut down by the cancel path - the stream just ended early
+                return {"cancelled": True, "usage": usage}
+        finally:
+            response.close()
+
+        result = {
+            "response": "".join(content_parts),
+            "usage": usage,
+            "model": response_model,
+            "finish_reason": finish_reason
+        }
+        if reasoning_parts:
+            result["reasoning"] = "".join(reasoning_parts)
+        return result
+
     def call(
         self,
         prompt: str,
@@ -177,7 +410,11 @@ class GLMClient:
         model: str = "glm-4-plus",
         temperature: float = 0.7,
         max_tokens: int = 4096,
-        enable_thinking: bool = False
+        enable_thinking: bool = False,
+        stream: bool = False,
+        on_delta: Optional[Callable[[str, str], None]] = None,
+        cancel_event=None,
+        timeout: float = 1200
     ) -> dict:
         """
         Call GLM API with prompt and optional context
@@ -189,9 +426,15 @@ class GLMClient:
             temperature: Temperature (0-1)
             max_tokens: Maximum response length
             enable_thinking: Enable Deep Thinking mode (for glm-4.7 and glm-4.5-air)
+            stream: Use SSE streaming (needed for first-token timing / incremental output)
+            on_delta: Streaming callback on_delta(kind, text), kind is "content" or "reasoning"
+            cancel_event: threading.Event - when set, a streaming call's socket is shut down,
+                          also while waiting for the first byte
+            timeout: Seconds to wait for the response (default 20 min for long code generation)
 
         Returns:
             dict with 'response', 'reasoning', 'usage', 'model'
+            (plus 'cancelled': True if cancel_event stopped a stream)
         """
         # Build full prompt with context
         if context_files:
@@ -215,6 +458,9 @@ TASK:
             "max_tokens": max_tokens
         }
 
+        if stream:
+            payload["stream"] = True
+
         # Add Deep Thinking parameter if enabled (Z.AI API format)
         if enable_thinking:
             payload["thinking"] = {"type": "enabled"}
@@ -223,16 +469,24 @@ TASK:
         # Get appropriate base URL for the model
         base_url = self.get_base_url(model)
 
+        done = threading.Event()
+        if stream and cancel_event is not None:
+            # Cancelling shuts down only the socket this call is using
+            sockets = []
+            self._call_sockets.sockets = sockets
+            threading.Thread(target=self._watch_cancel, args=(cancel_event, done, sockets),
+                             daemon=True).start()
+
         # Call API
         try:
             print(f"[DEBUG] Calling {model} with {len(full_prompt)} chars prompt", file=sys.stderr)
             print(f"[DEBUG] Using endpoint: {base_url}", file=sys.stderr)
 
-            response = requests.post(
+            response = self.session.post(
                 base_url,
-                headers=self.headers,
                 json=payload,
-                timeout=1200  # 20 min timeout for long code generation
+                timeout=timeout,
+                stream=stream
             )
             print(f"[DEBUG] Response status: {response.status_code}", file=sys.stderr)
 
@@ -241,19 +495,28 @@ TASK:
                 print(f"[DEBUG] Response body: {response.text}", file=sys.stderr)
 
             response.raise_for_status()
-            data = response.json()
-
-            # Extract response and reasoning content
-            message = data["choices"][0]["message"]
-            response_content = message.get("content", "")
-            reasoning_content = message.get("reasoning_content", None)
-
-            result = {
-                "response": response_content,
-                "usage": data.get("usage", {}),
-                "model": data.get("model", model),
-                "finish_reason": data["choices"][0].get("finish_reason", "unknown")
-            }
+
+            if stream:
+                result = self._read_stream(response, model, on_delta, cancel_event)
+                if result.get("cancelled"):
+                    print(f"[DEBUG] Stream cancelled", file=sys.stderr)
+                    return {"error": "cancelled", "cancelled": True, "response": None,
+                            "usage": result.get("usage", {})}
+                reasoning_content = result.pop("reasoning", None)
+            else:
+                data = response.json()
+
+                # Extract response and reasoning content
+                message = data["choices"][0]["message"]
+                response_content = message.get("content", "")
+                reasoning_content = message.get("reasoning_content", None)
+
+                result = {
+                    "response": response_content,
+                    "usage": data.get("usage", {}),
+                    "model": data.get("model", model),
+                    "finish_reason": data["choices"][0].get("finish_reason", "unknown")
+                }
 
             # Add reasoning if present
             if reasoning_content:
@@ -283,11 +546,23 @@ TASK:
                 "usage": {}
             }
         except requests.exceptions.RequestException as e:
+            if cancel_event is not None and cancel_event.is_set():
+                print(f"[DEBUG] Call cancelled", file=sys.stderr)
+                return {"error": "cancelled", "cancelled": True, "response": None, "usage": {}}
             return {
                 "error": str(e),
                 "response": None,
                 "usage": {}
             }
+        except (OSError, ValueError, AttributeError):
+            # Reading a connection the cancel path already shut down
+            if cancel_event is not None and cancel_event.is_set():
+                print(f"[DEBUG] Call cancelled", file=sys.stderr)
+                return {"error": "cancelled", "cancelled": True, "response": None, "usage": {}}
+            raise
+        finally:
+            done.set()
+            self._call_sockets.sockets = None
 
 
 def main():
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Warm daemon for glm_wrapper over a Unix domain socket
+
+Agents invoke glm_wrapper.py hundreds of times a day; each fresh process pays
+interpreter start, `requests` import, key loading and a new TLS handshake.
+The daemon keeps one warm GLMClient (keep-alive HTTPS session) and the
+context file cache in memory; clients forward their CLI arguments and get
+stdout/stderr streamed back unchanged.
+
+Usage:
+    python glm_wrapper.py --serve                      # start daemon
+    python glm_wrapper.py --via-daemon --task implement --story 01.2 --context tests.ts
+
+Protocol (one request per connection, JSON lines):
+    client -> {"argv": [...], "cwd": "/abs/dir"}
+    server -> {"fd": "stdout"|"stderr", "data": "..."}   (repeated)
+    server -> {"exit": 0}
+"""
+
+import os
+import sys
+import json
+import socket
+import tempfile
+import threading
+import traceback
+import contextvars
+import socketserver
+from typing import List, Optional
+
+DEFAULT_SOCKET = os.getenv("GLM_WRAPPER_SOCKET") or os.path.join(
+    tempfile.gettempdir(), f"glm_wrapper-{getattr(os, 'getuid', lambda: 0)()}.sock"
+)
+
+CONNECT_TIMEOUT = 2.0
+
+
+def unix_sockets_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+class _ContextStream:
+    """
+    sys.stdout/sys.stderr proxy that routes writes to a per-request stream.
+
+    The binding is a context variable: threads started with
+    contextvars.copy_context().run (P3 sub-tasks, the hedged GLM call)
+    keep writing to the request that started them.
+    """
+
+    def __init__(self, default, name: str):
+        self._default = default
+        self._stream = contextvars.ContextVar(f"glm_daemon_{name}", default=None)
+
+    def _target(self):
+        return self._stream.get() or self._default
+
+    def current(self):
+        """Stream bound to the calling context (for handing to worker threads)"""
+        return self._target()
+
+    def bind(self, stream):
+        self._stream.set(stream)
+
+    def unbind(self):
+        self._stream.set(None)
+
+    def write(self, data):
+        return self._target().write(data)
+
+    def flush(self):
+        return self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+
+class _FrameWriter:
+    """File-like object that sends each write as a JSON frame to the client"""
+
+    def __init__(self, wfile, fd: str, lock: threading.Lock):
+        self._wfile = wfile
+        self._fd = fd
+        self._lock = lock
+
+    def write(self, data: str) -> int:
+        if not data:
+            return 0
+        frame = json.dumps({"fd": self._fd, "data": data}, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._wfile.write(frame.encode("utf-8"))
+            self._wfile.flush()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+
+class _WrapperRequestHandler(socketserver.StreamRequestHandler):
+    """Run one glm_wrapper invocation with output streamed back over the socket"""
+
+    def handle(self):
+        import glm_wrapper
+
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8"))
+        except (ValueError, UnicodeDecodeError):
+            return
+
+        lock = threading.Lock()
+        stdout = _FrameWriter(self.wfile, "stdout", lock)
+        stderr = _FrameWriter(self.wfile, "stderr", lock)
+        sys.stdout.bind(stdout)
+        sys.stderr.bind(stderr)
+
+        try:
+            exit_code = glm_wrapper.main(request.get("argv", []), cwd=request.get("cwd")) or 0
+        except SystemExit as e:
+            # argparse errors / --help
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            stderr.write(traceback.format_exc())
+            exit_code = 1
+        finally:
+            sys.stdout.unbind()
+            sys.stderr.unbind()
+
+        try:
+            with lock:
+                self.wfile.write((json.dumps({"exit": exit_code}) + "\n").encode("utf-8"))
+                self.wfile.flush()
+        except OSError:
+            pass  # Client went away
+
+
+if unix_sockets_supported():
+    class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+def serve(socket_path: str = DEFAULT_SOCKET):
+    """Run the daemon until interrupted"""
+    if not unix_sockets_supported():
+        print("[GLM DAEMON] Unix domain sockets are not available on this platform", file=sys.stderr)
+        return 1
+
+    if os.path.exists(socket_path):
+        # Refuse to steal a live daemon's socket; clean up a stale one
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+            print(f"[GLM DAEMON] Already running on {socket_path}", file=sys.stderr)
+            return 1
+        except OSError:
+            os.unlink(socket_path)
+        finally:
+            probe.close()
+
+    # Warm up: imports, API key, HTTPS session
+    import glm_wrapper
+    api_key = glm_wrapper.load_api_key()
+    if api_key:
+        glm_wrapper.get_client(api_key)
+
+    sys.stdout = _ContextStream(sys.stdout, "stdout")
+    sys.stderr = _ContextStream(sys.stderr, "stderr")
+
+    server = _ThreadingUnixServer(socket_path, _WrapperRequestHandler)
+    os.chmod(socket_path, 0o600)
+    print(f"[GLM DAEMON] Listening on {socket_path} (api key: {'loaded' if api_key else 'MISSING'})",
+          file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[GLM DAEMON] Shutting down", file=sys.stderr)
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+    return 0
+
+
+def run_via_daemon(argv: List[str], socket_path: str = DEFAULT_SOCKET) -> Optional[int]:
+    """
+    Forward a wrapper invocation to the daemon and stream its output.
+
+    Returns:
+        The remote exit code, or None if the daemon is not reachable
+        (caller should then run locally).
+    """
+    if not unix_sockets_supported() or not os.path.exists(socket_path):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+
+    # Generation can take many minutes - no read timeout once connected
+    sock.settimeout(None)
+    request = {"argv": argv, "cwd": os.getcwd()}
+
+    with sock, sock.makefile("rb") as reader:
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        for raw in reader:
+            frame = json.loads(raw.decode("utf-8"))
+            if "exit" in frame:
+                return frame["exit"]
+            stream = sys.stderr if frame.get("fd") == "stderr" else sys.stdout
+            stream.write(frame.get("data", ""))
+            stream.flush()
+
+    print("[GLM WRAPPER] Daemon closed connection unexpectedly", file=sys.stderr)
+    return 1
@@ -7,6 +7,11 @@ Usage by agent:
     python glm_wrapper.py --task write-tests --story 01.2 --context story.md,wireframes.md
     python glm_wrapper.py --task implement --story 01.2 --context tests.ts
     python glm_wrapper.py --task document --story 01.2 --context code.tsx
+    python glm_wrapper.py --task refactor --diff --story 01.2 --context service.ts --auto-write
+
+Warm daemon (skips interpreter/import/TLS startup per call):
+    python glm_wrapper.py --serve &
+    python glm_wrapper.py --via-daemon --task implement --story 01.2 --context tests.ts
 
 Returns:
     JSON with generated content that agent writes to files
@@ -15,10 +20,16 @@ Returns:
 import sys
 import os
 import json
+import time
 import argparse
+import functools
+import threading
+import contextvars
 from pathlib import Path
-from typing import List
-from glm_call_updated import GLMClient
+from typing import Callable, Dict, List, Optional
+from patch_apply import (
+    apply_diff_response, delete_files, diff_mode_prompt, FULL_FILE_FALLBACK_INSTRUCTIONS
+)
 
 # MonoPilot Tech Stack - MUST include in all prompts
 TECH_STACK_INFO = """
@@ -352,6 +363,19 @@ Output as JSON:
 """
 }
 
+# Tasks that support --diff (unified diff output, applied locally)
+DIFF_CAPABLE_TASKS = {
+    "implement", "implement-services", "implement-routes",
+    "implement-components", "implement-pages", "refactor",
+}
+
+# implement-parallel: P3a-d sub-tasks run concurrently in one invocation.
+# Routes import service types, so they wait for services; the rest start at once.
+PARALLEL_SUBTASKS = ["implement-services", "implement-routes", "implement-components", "implement-pages"]
+SUBTASK_DEPENDENCIES = {
+    "implement-routes": "implement-services",
+}
+
 # Agent type → task mapping
 AGENT_TO_TASK = {
     "test-writer": "write-tests",   # P2 RED
@@ -428,72 +452,30 @@ def write_files_to_disk(files: List[dict], base_dir: str) -> dict:
     }
 
 
-def load_context_files(file_paths: List[str]) -> str:
-    """Load and summarize context files"""
-    summaries = []
-    for path in file_paths:
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                # Truncate large files
-                preview = content[:500] + "..." if len(content) > 500 else content
-                summaries.append(f"FILE: {path}\n{preview}\n")
-        except Exception as e:
-            summaries.append(f"FILE: {path}\nERROR: {e}\n")
+def combine_write_results(results: List[dict]) -> dict:
+    """Merge several write_files_to_disk() results into one"""
+    written = [w for result in results for w in result["written"]]
+    errors = [e for result in results for e in result["errors"]]
+    return {
+        "written": written,
+        "errors": errors,
+        "total_written": len(written),
+        "total_errors": len(errors)
+    }
 
-    return "\n".join(summaries)
 
-def main():
-    parser = argparse.ArgumentParser(description="GLM Wrapper for Claude Code Agents")
+REPO_ROOT = str(Path(__file__).parent.parent.parent.parent)
 
-    # Option 1: Use --agent (auto-selects task and model)
-    parser.add_argument("--agent",
-                       choices=["test-writer", "backend-dev", "frontend-dev", "senior-dev", "code-reviewer", "tech-writer"],
-                       help="Agent type (auto-selects task and model)")
+# Token budget for BM25-selected context sections (see context_index.py)
+DEFAULT_CONTEXT_BUDGET = 12000
 
-    # Option 2: Use --task directly (includes P3 parallel sub-tasks)
-    parser.add_argument("--task",
-                       choices=[
-                           "write-tests",           # P2 RED
-                           "implement",             # P3 GREEN (all-in-one)
-                           "implement-services",    # P3a: Services/Types/Validation
-                           "implement-routes",      # P3b: API Routes
-                           "implement-components",  # P3c: React Components
-                           "implement-pages",       # P3d: Pages/Hooks
-                           "refactor",              # P4 REFACTOR
-                           "review",                # P5 Code Review
-                           "document"               # P7 Docs
-                       ],
-                       help="Task type (if not using --agent). P3 can be split: implement-services, implement-routes, implement-components, implement-pages")
-
-    parser.add_argument("--story", required=True, help="Story ID (e.g., 01.2)")
-    parser.add_argument("--context", required=True,
-                       help="Comma-separated context file paths")
-    parser.add_argument("--model", help="GLM model to use (auto-selected if using --agent)")
-    parser.add_argument("--output-json", action="store_true",
-                       help="Output raw JSON (for agent parsing)")
-    parser.add_argument("--output-file", "-o",
-                       help="Save full output to file (reduces Claude context usage)")
-    parser.add_argument("--auto-write", action="store_true",
-                       help="Automatically write generated files to disk (bypasses Claude context)")
-    parser.add_argument("--base-dir",
-                       help="Base directory for --auto-write (default: current dir)",
-                       default=".")
+# Warm state - reused across invocations when running as a daemon (--serve)
+_CLIENTS: Dict[str, "GLMClient"] = {}
+_CONTEXT_INDEXES: Dict[bool, object] = {}
 
-    args = parser.parse_args()
-
-    # Resolve task and model from agent if provided
-    if args.agent:
-        args.task = AGENT_TO_TASK.get(args.agent, "implement")
-        if not args.model:
-            args.model = AGENT_TO_MODEL.get(args.agent, "glm-4.7")
-    elif not args.task:
-        parser.error("Either --agent or --task is required")
-
-    if not args.model:
-        args.model = "glm-4.7"
 
-    # Load GLM API key from environment (preferred) or config (fallback)
+def load_api_key() -> Optional[str]:
+    """GLM API key from environment (preferred) or config.json (fallback)"""
     api_key = os.getenv("ZHIPU_API_KEY")
 
     if not api_key:
@@ -504,53 +486,265 @@ def main():
                 config = json.load(f)
                 api_key = config.get("zhipu_api_key")
 
-    if not api_key:
-        print(json.dumps({"error": "GLM API key not found. Set ZHIPU_API_KEY env var"}))
-        return 0  # Don't crash, return error in JSON
+    return api_key
 
-    # Parse context files
-    context_files = [f.strip() for f in args.context.split(',') if f.strip()]
 
-    # Build prompt
-    template = TASK_TEMPLATES[args.task]
-    context_summary = load_context_files(context_files)
+def get_client(api_key: str) -> "GLMClient":
+    """GLMClient per API key - keeps its HTTPS session warm between calls"""
+    from glm_call_updated import GLMClient
 
-    prompt = template.format(
-        story_id=args.story,
-        context_summary=context_summary,
-        tech_stack=TECH_STACK_INFO
+    if api_key not in _CLIENTS:
+        _CLIENTS[api_key] = GLMClient(api_key)
+    return _CLIENTS[api_key]
+
+
+def read_context_file(path: str) -> str:
+    """Read file through the process-wide (mtime, size) cache shared with GLMClient"""
+    from glm_call_updated import read_cached_file
+
+    return read_cached_file(path)
+
+
+def haiku_fallback_command(prompt: str) -> List[str]:
+    """Claude CLI fallback (Haiku - NOT Opus, too expensive for docs!)"""
+    return ["claude", "--model", "haiku", "--print", prompt[:4000]]  # Truncate for CLI
+
+
+def get_context_index(repo: bool = False):
+    """Persistent BM25 index (context-files-only or repo-wide), loaded once per process"""
+    from context_index import ContextIndex, DEFAULT_INDEX_PATH, REPO_INDEX_PATH
+
+    if repo not in _CONTEXT_INDEXES:
+        _CONTEXT_INDEXES[repo] = ContextIndex(REPO_INDEX_PATH if repo else DEFAULT_INDEX_PATH)
+    return _CONTEXT_INDEXES[repo]
+
+
+def build_context_query(task: str, story_id: str) -> str:
+    """Retrieval query: task instructions (minus boilerplate) + story ID"""
+    template = TASK_TEMPLATES[task].split("Output as JSON:")[0]
+    return f"{story_id} {story_id} " + template.replace("{tech_stack}", "").replace("{context_summary}", "")
+
+
+def select_context(file_paths: List[str], task: str, story_id: str,
+                   budget_tokens: int = DEFAULT_CONTEXT_BUDGET, index_repo: bool = False) -> str:
+    """Most relevant sections of the context files (and optionally the repo) within a token budget"""
+    from context_index import REPO_ROOTS
+
+    index = get_context_index(repo=index_repo)
+    return index.select_context(
+        build_context_query(task, story_id),
+        file_paths,
+        budget_tokens,
+        extra_roots=REPO_ROOTS if index_repo else None
     )
 
-    # Call GLM
-    print(f"[GLM WRAPPER] Task: {args.task} | Story: {args.story} | Model: {args.model}",
-          file=sys.stderr)
-    print(f"[GLM WRAPPER] Context files: {len(context_files)}", file=sys.stderr)
 
-    client = GLMClient(api_key)
-    result = client.call(
+def load_context_files(file_paths: List[str], full: bool = False) -> str:
+    """Load and summarize context files
+
+    Args:
+        file_paths: Context file paths
+        full: Include complete file contents (diff mode needs exact lines to patch)
+    """
+    summaries = []
+    for path in file_paths:
+        try:
+            content = read_context_file(path)
+            # Truncate large files
+            if full:
+                preview = content
+            else:
+                preview = content[:500] + "..." if len(content) > 500 else content
+            summaries.append(f"FILE: {path}\n{preview}\n")
+        except Exception as e:
+            summaries.append(f"FILE: {path}\nERROR: {e}\n")
+
+    return "\n".join(summaries)
+
+
+def apply_diff_output(client: "GLMClient", result: dict, prompt: str, args) -> dict:
+    """
+    Apply a diff-mode GLM response against args.base_dir.
+
+    Files whose hunks fail to apply are re-requested as full files in a second,
+    much smaller call. Nothing is written here - the returned "data.files" has
+    the same shape as full-file output so --auto-write works unchanged.
+    """
+    from glm_call_updated import extract_files_from_response
+
+    response_text = result.get("response") or ""
+    applied = apply_diff_response(response_text, args.base_dir)
+    usage = result.get("usage", {})
+    tokens = usage.get("total_tokens", 0)
+
+    print(f"[GLM WRAPPER] Diff: {applied['patch_count']} patches, "
+          f"{len(applied['applied'])} applied, {len(applied['failed'])} failed", file=sys.stderr)
+    for failure in applied["failed"]:
+        print(f"  [DIFF FAILED] {failure['path']}: {failure['reason']}", file=sys.stderr)
+
+    files = applied["files"]
+    fallback_paths = [failure["path"] for failure in applied["failed"]]
+
+    if applied["patch_count"] == 0:
+        # Model ignored diff format - maybe it sent full files anyway
+        files = extract_files_from_response(response_text)
+
+    elif fallback_paths:
+        print(f"[GLM WRAPPER] Full-file fallback for {len(fallback_paths)} files...", file=sys.stderr)
+        fallback_prompt = prompt + "\n" + FULL_FILE_FALLBACK_INSTRUCTIONS.format(
+            paths="\n".join(f"- {path}" for path in fallback_paths)
+        )
+        fallback = client.call(
+            prompt=fallback_prompt,
+            context_files=None,
+            model=args.model,
+            temperature=0.7,
+            max_tokens=16000
+        )
+        if not fallback.get("error"):
+            tokens += fallback.get("usage", {}).get("total_tokens", 0)
+            fallback_files = [
+                f for f in extract_files_from_response(fallback.get("response") or "")
+                if f.get("path") in fallback_paths
+            ]
+            # Files with failed hunks are not in `files` - only full fallback content gets written
+            files = files + fallback_files
+            for path in sorted(set(fallback_paths) - {f["path"] for f in fallback_files}):
+                print(f"  [DIFF UNCHANGED] {path}: no fallback content", file=sys.stderr)
+        else:
+            print(f"[GLM WRAPPER] Fallback error: {fallback['error']} - "
+                  f"{len(fallback_paths)} files left unchanged", file=sys.stderr)
+
+    if not files and applied["patch_count"] == 0:
+        return {
+            "success": True,
+            "data": {"raw_response": response_text},
+            "tokens": tokens,
+            "model": result.get("model", "unknown"),
+            "warning": "GLM response contained no diff"
+        }
+
+    return {
+        "success": True,
+        "data": {
+            "files": files,
+            "summary": applied["summary"] or f"Applied diff to {len(files)} files"
+        },
+        "tokens": tokens,
+        "model": result.get("model", "unknown"),
+        "diff": {
+            "patches": applied["patch_count"],
+            "applied": applied["applied"],
+            "failed": applied["failed"],
+            "fallback_files": fallback_paths,
+            "deleted": applied["deleted"]
+        }
+    }
+
+
+def first_token_hook(events, on_file: Optional[Callable[[dict], None]], subtask: Optional[str]):
+    """Streaming on_delta: emits first_token once and feeds content to a file extractor
+
+    Args:
+        on_file: Called with each file as soon as it is complete (None in diff mode -
+                 diff-mode files only exist after patches are applied)
+    """
+    from event_stream import StreamingFileExtractor
+
+    extractor = StreamingFileExtractor(on_file) if on_file else None
+    started = time.monotonic()
+    first_token = threading.Event()
+
+    def on_delta(kind, text):
+        if not first_token.is_set():
+            first_token.set()
+            events.emit("first_token", subtask=subtask, kind=kind,
+                        ttft=round(time.monotonic() - started, 3))
+        if kind == "content" and extractor:
+            extractor.feed(text)
+
+    return on_delta
+
+
+def run_task(client: "GLMClient", args, prompt: str, events=None,
+             on_file: Optional[Callable[[dict], None]] = None, subtask: Optional[str] = None) -> dict:
+    """Call GLM for one task prompt (hedged unless --no-hedge) and parse the response
+
+    Args:
+        events: EventStream for --events ndjson (first_token/usage/fallback events)
+        on_file: Called with each generated file as soon as it is complete
+        subtask: implement-parallel sub-task name, added to events
+
+    Returns:
+        Wrapper output dict ({"success", "data", "tokens", "model", ...})
+    """
+    call_kwargs = dict(
         prompt=prompt,
-        context_files=context_files,
+        context_files=None,  # Context already embedded in prompt
         model=args.model,
         temperature=0.7,
         max_tokens=16000  # Increased for large code responses
     )
 
+    on_delta = first_token_hook(events, on_file if not args.diff else None, subtask) if events else None
+
+    def emit_fallback(reason: str, status: str, **fields):
+        if events:
+            events.emit("fallback", subtask=subtask, reason=reason, status=status, **fields)
+
+    hedge = None
+    if args.no_hedge:
+        # Stream only when someone consumes the deltas
+        result = client.call(stream=on_delta is not None, on_delta=on_delta, **call_kwargs)
+    else:
+        # Stream GLM; if no first token by the percentile deadline, race Haiku in parallel
+        from hedging import hedged_call
+        hedge = hedged_call(
+            functools.partial(client.call, stream=True, **call_kwargs),
+            args.model,
+            haiku_fallback_command(prompt),
+            fallback_cwd=REPO_ROOT,
+            log=lambda message: print(message, file=sys.stderr),
+            on_delta=on_delta,
+            on_hedge=lambda deadline: emit_fallback("hedge", "started", deadline=round(deadline, 1))
+        )
+        result = hedge["glm_result"] or {"error": "GLM cancelled (fallback won)", "response": None, "usage": {}}
+
+    if events and result.get("usage"):
+        events.emit("usage", subtask=subtask, model=result.get("model", args.model), **result["usage"])
+
     # Wrap all processing in try/except to prevent crashes
     try:
-        if "error" in result and result.get("error"):
+        if hedge and hedge["winner"] == "fallback":
+            output = {
+                "success": True,
+                "data": {"raw_response": hedge["fallback_output"]},
+                "tokens": 0,  # Unknown for CLI
+                "model": "claude-haiku-fallback",
+                "fallback": True,
+                "hedged": True
+            }
+            print(f"[GLM WRAPPER] Hedged Haiku fallback won", file=sys.stderr)
+            emit_fallback("hedge", "succeeded")
+        elif hedge and hedge["fallback_failed"] and result.get("error"):
+            # Hedge already ran the fallback and it failed - don't run it twice
+            output = {"error": result["error"], "success": False, "fallback_failed": True, "hedged": True}
+            emit_fallback("hedge", "failed")
+        elif "error" in result and result.get("error"):
             # FALLBACK: If GLM fails, try Claude Haiku (NOT Opus - too expensive for docs!)
             print(f"[GLM WRAPPER] GLM error: {result['error']}", file=sys.stderr)
             print(f"[GLM WRAPPER] FALLBACK: Trying Claude Haiku...", file=sys.stderr)
+            emit_fallback("glm_error", "started")
 
             try:
                 import subprocess
                 # Call claude with haiku model
                 haiku_result = subprocess.run(
-                    ["claude", "--model", "haiku", "--print", prompt[:4000]],  # Truncate for CLI
+                    haiku_fallback_command(prompt),
                     capture_output=True,
                     text=True,
                     timeout=120,
-                    cwd=str(Path(__file__).parent.parent.parent.parent)
+                    cwd=REPO_ROOT
                 )
                 if haiku_result.returncode == 0:
                     output = {
@@ -561,11 +755,19 @@ def main():
                         "fallback": True
                     }
                     print(f"[GLM WRAPPER] Haiku fallback SUCCESS", file=sys.stderr)
+                    emit_fallback("glm_error", "succeeded")
                 else:
                     output = {"error": result["error"], "success": False, "fallback_failed": True}
+                    emit_fallback("glm_error", "failed")
             except Exception as fallback_error:
                 print(f"[GLM WRAPPER] Haiku fallback also failed: {fallback_error}", file=sys.stderr)
+                emit_fallback("glm_error", "failed", error=str(fallback_error))
                 output = {"error": result["error"], "success": False, "fallback_error": str(fallback_error)}
+        elif args.diff and result.get("response") is not None:
+            output = apply_diff_output(client, result, prompt, args)
+            if on_file:
+                for file_info in output.get("data", {}).get("files", []) or []:
+                    on_file(file_info)
         else:
             # Parse JSON response from GLM
             response_text = result.get("response", "")
@@ -630,13 +832,318 @@ def main():
             "data": {}
         }
 
+    return output
+
+
+def run_single_task(client: "GLMClient", args, context_files: List[str], events=None,
+                    on_file: Optional[Callable[[dict], None]] = None) -> dict:
+    """Build the prompt for args.task and run it"""
+    # Build prompt - diff mode needs exact full files, otherwise ranked sections
+    template = TASK_TEMPLATES[args.task]
+    if args.diff:
+        context_summary = load_context_files(context_files, full=True)
+    else:
+        context_summary = select_context(
+            context_files, args.task, args.story,
+            budget_tokens=args.context_budget, index_repo=args.index_repo
+        )
+
+    prompt = template.format(
+        story_id=args.story,
+        context_summary=context_summary,
+        tech_stack=TECH_STACK_INFO
+    )
+    if args.diff:
+        prompt = diff_mode_prompt(prompt)
+
+    # Call GLM
+    mode_str = " | Mode: diff" if args.diff else ""
+    print(f"[GLM WRAPPER] Task: {args.task} | Story: {args.story} | Model: {args.model}{mode_str}",
+          file=sys.stderr)
+    print(f"[GLM WRAPPER] Context files: {len(context_files)}", file=sys.stderr)
+
+    return run_task(client, args, prompt, events=events, on_file=on_file)
+
+
+def merge_subtask_files(subtask_outputs: Dict[str, dict]) -> tuple:
+    """
+    Merge generated files from P3 sub-tasks.
+
+    The first sub-task (in PARALLEL_SUBTASKS order) that produced a path owns it;
+    a second different version of the same path is reported as a collision.
+
+    Returns:
+        (files, collisions)
+    """
+    owners = {}
+    merged = {}
+    collisions = []
+
+    for task in PARALLEL_SUBTASKS:
+        output = subtask_outputs.get(task) or {}
+        for file_info in output.get("data", {}).get("files", []) or []:
+            path = file_info.get("path")
+            if not path:
+                continue
+            if path not in merged:
+                merged[path] = file_info
+                owners[path] = task
+            elif merged[path].get("content") != file_info.get("content"):
+                collisions.append({"path": path, "kept": owners[path], "dropped": task})
+
+    return list(merged.values()), collisions
+
+
+def run_parallel_implement(client: "GLMClient", args, context_files: List[str], events=None,
+                           on_file: Optional[Callable[[dict, str], None]] = None) -> dict:
+    """
+    P3 fan-out: run implement-services/-routes/-components/-pages concurrently.
+
+    Context is selected and packed once and shared by every sub-task. Routes
+    start when services finish and get the generated service/type files in
+    their prompt. Wall-clock ~ services + routes vs. the slowest of the others.
+
+    on_file is called as on_file(file_info, subtask).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    context_summary = select_context(
+        context_files, "implement", args.story,
+        budget_tokens=args.context_budget, index_repo=args.index_repo
+    )
+
+    def build(task: str, extra: str = "") -> str:
+        return TASK_TEMPLATES[task].format(
+            story_id=args.story,
+            context_summary=context_summary + extra,
+            tech_stack=TECH_STACK_INFO
+        )
+
+    def run(task: str, extra: str = "") -> dict:
+        print(f"[GLM WRAPPER] P3 sub-task started: {task}", file=sys.stderr)
+        if events:
+            events.emit("started", subtask=task)
+        output = run_task(
+            client, args, build(task, extra), events=events, subtask=task,
+            on_file=functools.partial(on_file, subtask=task) if on_file else None
+        )
+        files = len(output.get("data", {}).get("files", []) or [])
+        print(f"[GLM WRAPPER] P3 sub-task done: {task} (success={output.get('success')}, files={files})",
+              file=sys.stderr)
+        return output
+
+    outputs = {}
+    with ThreadPoolExecutor(max_workers=len(PARALLEL_SUBTASKS)) as executor:
+        futures = {
+            task: executor.submit(contextvars.copy_context().run, run, task)
+            for task in PARALLEL_SUBTASKS if task not in SUBTASK_DEPENDENCIES
+        }
+
+        # Dependent sub-tasks start as soon as their dependency finishes
+        for task, dependency in SUBTASK_DEPENDENCIES.items():
+            outputs[dependency] = futures[dependency].result()
+            dep_files = outputs[dependency].get("data", {}).get("files", []) or []
+            extra = ""
+            if dep_files:
+                extra = "\n\nAlready implemented by " + dependency + " (import from these, do not redefine):\n"
+                extra += "\n".join(f"FILE: {f.get('path')}\n{f.get('content', '')}\n" for f in dep_files)
+            futures[task] = executor.submit(contextvars.copy_context().run, run, task, extra)
+
+        for task, future in futures.items():
+            outputs[task] = future.result()
+
+    files, collisions = merge_subtask_files(outputs)
+    for collision in collisions:
+        print(f"[GLM WRAPPER] COLLISION {collision['path']}: kept {collision['kept']}, "
+              f"dropped {collision['dropped']}", file=sys.stderr)
+
+    failed = [task for task in PARALLEL_SUBTASKS if not outputs[task].get("success")]
+    summaries = [
+        outputs[task].get("data", {}).get("summary", "")
+        for task in PARALLEL_SUBTASKS if outputs[task].get("success")
+    ]
+
+    return {
+        # Partial success still returns files; failed sub-tasks are listed
+        "success": len(failed) < len(PARALLEL_SUBTASKS),
+        "data": {
+            "files": files,
+            "summary": " | ".join(s for s in summaries if s) or "No sub-task summaries"
+        },
+        "tokens": sum(outputs[task].get("tokens", 0) for task in PARALLEL_SUBTASKS),
+        "model": args.model,
+        "subtasks": {
+            task: {
+                "success": outputs[task].get("success"),
+                "files": len(outputs[task].get("data", {}).get("files", []) or []),
+                "tokens": outputs[task].get("tokens", 0),
+                "model": outputs[task].get("model"),
+                "error": outputs[task].get("error")
+            }
+            for task in PARALLEL_SUBTASKS
+        },
+        "failed_subtasks": failed,
+        "collisions": collisions
+    }
+
+
+def add_daemon_arguments(parser: argparse.ArgumentParser):
+    """Daemon flags - handled by cli() before the main parser runs"""
+    from glm_daemon import DEFAULT_SOCKET
+
+    parser.add_argument("--serve", action="store_true",
+                       help="Run as a warm daemon on a Unix socket (keeps GLM client and file cache loaded)")
+    parser.add_argument("--via-daemon", action="store_true",
+                       help="Forward this invocation to a running --serve daemon (runs locally if none)")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET,
+                       help=f"Daemon socket path (default: {DEFAULT_SOCKET}, env GLM_WRAPPER_SOCKET)")
+
+
+def main(argv: Optional[List[str]] = None, cwd: Optional[str] = None):
+    """Run one wrapper invocation
+
+    Args:
+        argv: CLI arguments (default: sys.argv[1:])
+        cwd: Directory relative paths are resolved against (daemon requests)
+    """
+    parser = argparse.ArgumentParser(description="GLM Wrapper for Claude Code Agents")
+
+    # Option 1: Use --agent (auto-selects task and model)
+    parser.add_argument("--agent",
+                       choices=["test-writer", "backend-dev", "frontend-dev", "senior-dev", "code-reviewer", "tech-writer"],
+                       help="Agent type (auto-selects task and model)")
+
+    # Option 2: Use --task directly (includes P3 parallel sub-tasks)
+    parser.add_argument("--task",
+                       choices=[
+                           "write-tests",           # P2 RED
+                           "implement",             # P3 GREEN (all-in-one)
+                           "implement-services",    # P3a: Services/Types/Validation
+                           "implement-routes",      # P3b: API Routes
+                           "implement-components",  # P3c: React Components
+                           "implement-pages",       # P3d: Pages/Hooks
+                           "implement-parallel",    # P3a-d concurrently, one merged batch
+                           "refactor",              # P4 REFACTOR
+                           "review",                # P5 Code Review
+                           "document"               # P7 Docs
+                       ],
+                       help="Task type (if not using --agent). P3 can be split: implement-services, implement-routes, implement-components, implement-pages "
+                            "(or implement-parallel to run all four concurrently)")
+
+    parser.add_argument("--story", required=True, help="Story ID (e.g., 01.2)")
+    parser.add_argument("--context", required=True,
+                       help="Comma-separated context file paths")
+    parser.add_argument("--model", help="GLM model to use (auto-selected if using --agent)")
+    parser.add_argument("--output-json", action="store_true",
+                       help="Output raw JSON (for agent parsing)")
+    parser.add_argument("--output-file", "-o",
+                       help="Save full output to file (reduces Claude context usage)")
+    parser.add_argument("--auto-write", action="store_true",
+                       help="Automatically write generated files to disk (bypasses Claude context)")
+    parser.add_argument("--base-dir",
+                       help="Base directory for --auto-write (default: current dir)",
+                       default=".")
+    parser.add_argument("--diff", action="store_true",
+                       help="Ask GLM for unified diffs against the context files and apply them locally "
+                            "(implement/refactor tasks; failed hunks fall back to full-file output)")
+    parser.add_argument("--context-budget", type=int, default=DEFAULT_CONTEXT_BUDGET,
+                       help=f"Token budget for BM25-ranked context sections (default: {DEFAULT_CONTEXT_BUDGET})")
+    parser.add_argument("--index-repo", action="store_true",
+                       help="Also retrieve relevant sections from apps/frontend/lib and docs/")
+    parser.add_argument("--no-hedge", action="store_true",
+                       help="Disable hedging (don't race Claude Haiku against a GLM call that has no first token yet)")
+    parser.add_argument("--events", choices=["ndjson"],
+                       help="Stream progress to stdout as NDJSON events (started, first_token, file_completed, "
+                            "usage, fallback, done) instead of the final summary")
+    add_daemon_arguments(parser)
+
+    args = parser.parse_args(argv)
+
+    if cwd:
+        # Daemon request - resolve paths against the client's working directory
+        args.context = ",".join(os.path.join(cwd, f.strip()) for f in args.context.split(',') if f.strip())
+        args.base_dir = os.path.join(cwd, args.base_dir)
+        if args.output_file:
+            args.output_file = os.path.join(cwd, args.output_file)
+
+    # Resolve task and model from agent if provided
+    if args.agent:
+        args.task = AGENT_TO_TASK.get(args.agent, "implement")
+        if not args.model:
+            args.model = AGENT_TO_MODEL.get(args.agent, "glm-4.7")
+    elif not args.task:
+        parser.error("Either --agent or --task is required")
+
+    if not args.model:
+        args.model = "glm-4.7"
+
+    if args.diff and args.task not in DIFF_CAPABLE_TASKS:
+        parser.error(f"--diff is not supported for task '{args.task}'")
+
+    events = None
+    if args.events == "ndjson":
+        from event_stream import EventStream
+        events = EventStream()
+
+    # Load GLM API key from environment (preferred) or config (fallback)
+    api_key = load_api_key()
+
+    if not api_key:
+        error = {"error": "GLM API key not found. Set ZHIPU_API_KEY env var"}
+        if events:
+            events.emit("done", success=False, **error)
+        else:
+            print(json.dumps(error))
+        return 0  # Don't crash, return error in JSON
+
+    # Parse context files
+    context_files = [f.strip() for f in args.context.split(',') if f.strip()]
+
+    client = get_client(api_key)
+
+    # --events: report each file as soon as it is complete; single unhedged tasks with
+    # --auto-write also write it right away. A hedged call's files wait for the final
+    # response (the fallback may still win), implement-parallel keeps its atomic batch
+    streamed_writes = []
+    streamed_content = {}
+    on_file = None
+    if events:
+        from event_stream import file_event_fields
+
+        events.emit("started", task=args.task, story=args.story, model=args.model,
+                    context_files=len(context_files), diff=args.diff, auto_write=args.auto_write)
+
+        def on_file(file_info: dict, subtask: Optional[str] = None):
+            written = False
+            if args.auto_write and args.no_hedge and args.task != "implement-parallel":
+                write_result = write_files_to_disk([file_info], args.base_dir)
+                streamed_writes.append(write_result)
+                written = write_result["total_written"] == 1
+                if written:
+                    streamed_content[file_info["path"]] = file_info.get("content", "")
+            events.emit("file_completed", subtask=subtask, written=written, **file_event_fields(file_info))
+
+    if args.task == "implement-parallel":
+        print(f"[GLM WRAPPER] Task: {args.task} | Story: {args.story} | Model: {args.model}", file=sys.stderr)
+        print(f"[GLM WRAPPER] Context files: {len(context_files)} (packed once for 4 sub-tasks)", file=sys.stderr)
+        output = run_parallel_implement(client, args, context_files, events=events, on_file=on_file)
+    else:
+        output = run_single_task(client, args, context_files, events=events, on_file=on_file)
+
     # AUTO-WRITE: Write files directly to disk, bypassing Claude context
     write_result = None
     if args.auto_write and output.get("success"):
         files = output.get("data", {}).get("files", [])
         if files:
             print(f"[GLM WRAPPER] Auto-writing {len(files)} files to {args.base_dir}...", file=sys.stderr)
-            write_result = write_files_to_disk(files, args.base_dir)
+            if args.task == "implement-parallel":
+                # Merged P3a-d output lands in one all-or-nothing batch
+                from glm_call_updated import write_files_atomic
+                write_result = write_files_atomic(files, args.base_dir)
+            else:
+                # Skip files already written unchanged while streaming
+                pending = [f for f in files if streamed_content.get(f.get("path")) != f.get("content")]
+                write_result = combine_write_results(streamed_writes + [write_files_to_disk(pending, args.base_dir)])
 
             # Remove file contents from output (no longer needed - already on disk)
             # Keep only paths for reference
@@ -646,10 +1153,32 @@ def main():
             ]
             output["write_result"] = write_result
 
+    deletions = output.get("diff", {}).get("deleted") if args.auto_write and output.get("success") else None
+    if deletions:
+        output["delete_result"] = delete_files(deletions, args.base_dir)
+        for path in output["delete_result"]["deleted"]:
+            print(f"  [DELETED] {path}", file=sys.stderr)
+        for error in output["delete_result"]["errors"]:
+            print(f"  [ERROR] {error['path']}: {error['error']}", file=sys.stderr)
+
+    if streamed_writes and write_result is None:
+        # Files went to disk while streaming but the final response didn't parse
+        write_result = combine_write_results(streamed_writes)
+        output["write_result"] = write_result
+
     # Output - wrap in try/except to never crash
     try:
+        if events:
+            # Compact final event instead of the summary / indented dump
+            if args.output_file:
+                with open(args.output_file, 'w', encoding='utf-8') as f:
+                    f.write(json.dumps(output, indent=2, ensure_ascii=False))
+            events.emit("done", success=output.get("success"), error=output.get("error"),
+                        model=output.get("model"), tokens=output.get("tokens", 0),
+                        output_file=args.output_file, output=output)
+
         # If --auto-write was used, print only summary (files already on disk)
-        if args.auto_write:
+        elif args.auto_write:
             summary = output.get("data", {}).get("summary", "No summary")
             print(f"\n[GLM] AUTO-WRITE COMPLETE")
             print(f"  Success: {output.get('success')}")
@@ -708,5 +1237,27 @@ def main():
     return 0
 
 
+def cli(argv: Optional[List[str]] = None):
+    """Entry point: --serve / --via-daemon dispatch, otherwise run main() in-process"""
+    argv = list(sys.argv[1:] if argv is None else argv)
+
+    pre_parser = argparse.ArgumentParser(add_help=False)
+    add_daemon_arguments(pre_parser)
+    daemon_args, rest = pre_parser.parse_known_args(argv)
+
+    if daemon_args.serve:
+        from glm_daemon import serve
+        return serve(daemon_args.socket)
+
+    if daemon_args.via_daemon:
+        from glm_daemon import run_via_daemon
+        exit_code = run_via_daemon(rest, daemon_args.socket)
+        if exit_code is not None:
+            return exit_code
+        print("[GLM WRAPPER] Daemon not reachable - running locally", file=sys.stderr)
+
+    return main(rest)
+
+
 if __name__ == "__main__":
-    main()  # Don't use sys.exit() - just run main()
+    cli()  # Don't use sys.exit() - just run main()
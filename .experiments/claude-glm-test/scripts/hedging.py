@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Hedged GLM calls - race a Claude Haiku fallback against a slow GLM request
+
+GLM occasionally hangs for many minutes before producing anything. Instead of
+waiting for an outright failure, the GLM call is streamed and, if no first
+token arrives within a percentile-based deadline, the Haiku fallback is
+started in parallel. Whichever finishes successfully first wins; the other is
+cancelled.
+
+Deadline: p90 of recorded time-to-first-token per model (clamped), or a
+default until enough samples exist. Cost cap: hedges per hour and hedge
+ratio over the last day are limited. One policy is shared per process; saves
+merge into the state file under a file lock, so parallel runs keep each
+other's samples.
+
+Usage:
+    python hedging.py --stats
+"""
+
+import os
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+import contextvars
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves still merge, just without the cross-process lock
+    fcntl = None
+
+DEFAULT_STATE_PATH = Path(__file__).parent.parent / ".cache" / "hedge_state.json"
+
+TTFT_PERCENTILE = 0.90
+MIN_SAMPLES = 10
+MAX_SAMPLES = 200
+DEFAULT_DEADLINE = 90.0      # seconds, until MIN_SAMPLES exist
+MIN_DEADLINE = 15.0
+MAX_DEADLINE = 300.0
+
+MAX_HEDGES_PER_HOUR = 6
+MAX_HEDGE_RATIO = 0.10       # of calls in the last 24h
+FALLBACK_TIMEOUT = 120       # seconds, same as the blocking Haiku fallback
+
+POLL_INTERVAL = 0.2
+
+_POLICIES: Dict[Path, "HedgePolicy"] = {}
+_POLICIES_LOCK = threading.Lock()
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class HedgePolicy:
+    """Time-to-first-token history and hedge budget, persisted between runs"""
+
+    def __init__(self, state_path: Optional[Path] = None):
+        self.state_path = Path(state_path) if state_path else DEFAULT_STATE_PATH
+        self._lock = threading.Lock()
+        self.state = self._load()
+        # Recorded since the last save - merged into the file, never overwriting it
+        self._unsaved = {"ttft": {}, "calls": [], "hedges": []}
+
+    def _load(self) -> Dict:
+        state = {"ttft": {}, "calls": [], "hedges": []}
+        if self.state_path.exists():
+            try:
+                with open(self.state_path, encoding='utf-8') as f:
+                    state.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+        return state
+
+    def save(self):
+        """Merge this process's new records into the state file (under a file lock, so
+        concurrent processes don't drop each other's samples) and adopt the merged state"""
+        with self._lock:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.state_path.with_name(self.state_path.name + ".lock"), 'w') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                state = self._load()
+                state["calls"].extend(self._unsaved["calls"])
+                state["hedges"].extend(self._unsaved["hedges"])
+                for model, new_samples in self._unsaved["ttft"].items():
+                    samples = state["ttft"].setdefault(model, [])
+                    samples.extend(new_samples)
+                    del samples[:-MAX_SAMPLES]
+                self.state = state
+                self._prune(time.time())
+                fd, tmp_path = tempfile.mkstemp(dir=str(self.state_path.parent), prefix=".tmp-")
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(self.state, f)
+                os.replace(tmp_path, self.state_path)
+            self._unsaved = {"ttft": {}, "calls": [], "hedges": []}
+
+    def deadline(self, model: str) -> float:
+        """Seconds to wait for a first token before hedging"""
+        samples = self.state["ttft"].get(model, [])
+        if len(samples) < MIN_SAMPLES:
+            return DEFAULT_DEADLINE
+        return min(max(percentile(samples, TTFT_PERCENTILE), MIN_DEADLINE), MAX_DEADLINE)
+
+    def _prune(self, now: float):
+        day_ago = now - 86400
+        self.state["calls"] = [t for t in self.state["calls"] if t > day_ago]
+        self.state["hedges"] = [t for t in self.state["hedges"] if t > day_ago]
+
+    def allow_hedge(self) -> tuple:
+        """(allowed, reason) under the hourly cap and daily ratio cap"""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            last_hour = sum(1 for t in self.state["hedges"] if t > now - 3600)
+            if last_hour >= MAX_HEDGES_PER_HOUR:
+                return False, f"hourly cap reached ({last_hour}/{MAX_HEDGES_PER_HOUR})"
+            calls = max(len(self.state["calls"]), 1)
+            ratio = (len(self.state["hedges"]) + 1) / calls
+            if len(self.state["calls"]) >= MIN_SAMPLES and ratio > MAX_HEDGE_RATIO:
+                return False, f"daily hedge ratio cap ({ratio:.0%} > {MAX_HEDGE_RATIO:.0%})"
+        return True, "ok"
+
+    def record_call(self):
+        with self._lock:
+            now = time.time()
+            self.state["calls"].append(now)
+            self._unsaved["calls"].append(now)
+
+    def record_hedge(self):
+        with self._lock:
+            now = time.time()
+            self.state["hedges"].append(now)
+            self._unsaved["hedges"].append(now)
+
+    def record_ttft(self, model: str, seconds: float):
+        with self._lock:
+            for state in (self.state, self._unsaved):
+                samples = state["ttft"].setdefault(model, [])
+                samples.append(round(seconds, 3))
+                del samples[:-MAX_SAMPLES]
+
+    def stats(self) -> Dict:
+        return {
+            "deadlines": {model: round(self.deadline(model), 1) for model in self.state["ttft"]},
+            "samples": {model: len(s) for model, s in self.state["ttft"].items()},
+            "calls_24h": len(self.state["calls"]),
+            "hedges_24h": len(self.state["hedges"]),
+        }
+
+
+def shared_policy(state_path: Optional[Path] = None) -> HedgePolicy:
+    """HedgePolicy per state file, loaded once per process and shared by all calls"""
+    path = Path(state_path) if state_path else DEFAULT_STATE_PATH
+    with _POLICIES_LOCK:
+        if path not in _POLICIES:
+            _POLICIES[path] = HedgePolicy(path)
+        return _POLICIES[path]
+
+
+def _stop_fallback(process: Optional[subprocess.Popen], output):
+    """Kill and reap the fallback process (if still running) and close its output file"""
+    if process is not None:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+    if output is not None:
+        output.close()
+
+
+def hedged_call(glm_call: Callable[..., dict], model: str, fallback_cmd: List[str],
+                fallback_cwd: Optional[str] = None, policy: Optional[HedgePolicy] = None,
+                log: Callable[[str], None] = print,
+                on_delta: Optional[Callable[[str, str], None]] = None,
+                on_hedge: Optional[Callable[[float], None]] = None) -> Dict:
+    """
+    Run a streaming GLM call, hedging with a fallback subprocess if it stalls.
+
+    Args:
+        glm_call: Callable accepting on_delta= and cancel_event= (e.g. partial of GLMClient.call
+                  with stream=True) and returning the GLMClient result dict
+        fallback_cmd: Fallback command (Claude CLI), started only when hedging
+        on_delta: Forwarded streaming callback
+        on_hedge: Called with the deadline when the fallback is started
+
+    Returns:
+        {"winner": "glm"|"fallback"|"none", "glm_result", "fallback_output",
+         "hedged", "ttft", "deadline", "hedge_skipped"}
+    """
+    policy = policy or shared_policy()
+    policy.record_call()
+
+    first_token = threading.Event()
+    glm_done = threading.Event()
+    cancel = threading.Event()
+    box = {}
+    start = time.monotonic()
+
+    def delta_hook(kind, text):
+        if not first_token.is_set():
+            box["ttft"] = time.monotonic() - start
+            first_token.set()
+        if on_delta:
+            on_delta(kind, text)
+
+    def run_glm():
+        try:
+            box["glm"] = glm_call(on_delta=delta_hook, cancel_event=cancel)
+        except Exception as e:
+            box["glm"] = {"error": str(e), "response": None, "usage": {}}
+        finally:
+            glm_done.set()
+
+    # Copied context: under the daemon, GLM output still goes to the requesting client
+    threading.Thread(target=contextvars.copy_context().run, args=(run_glm,), daemon=True).start()
+
+    deadline = policy.deadline(model)
+    outcome = {"winner": "none", "glm_result": None, "fallback_output": None, "fallback_failed": False,
+               "hedged": False, "ttft": None, "deadline": deadline, "hedge_skipped": None}
+
+    # Phase 1: wait for first token, GLM completion, or the hedge deadline
+    while not first_token.is_set() and not glm_done.is_set():
+        if time.monotonic() - start >= deadline:
+            break
+        time.sleep(POLL_INTERVAL)
+
+    fallback = None
+    fallback_out = None
+    if not first_token.is_set() and not glm_done.is_set():
+        allowed, reason = policy.allow_hedge()
+        if allowed:
+            log(f"[HEDGE] No first token from {model} after {deadline:.1f}s - starting fallback in parallel")
+            policy.record_hedge()
+            outcome["hedged"] = True
+            try:
+                # Temp file instead of a pipe - a long answer must not block the child
+                fallback_out = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+                fallback = subprocess.Popen(fallback_cmd, stdout=fallback_out, stderr=subprocess.DEVNULL,
+                                            text=True, cwd=fallback_cwd)
+                fallback_start = time.monotonic()
+                if on_hedge:
+                    on_hedge(deadline)
+            except OSError as e:
+                log(f"[HEDGE] Could not start fallback: {e}")
+                _stop_fallback(None, fallback_out)
+                fallback_out = None
+        else:
+            log(f"[HEDGE] Deadline passed but hedging skipped: {reason}")
+            outcome["hedge_skipped"] = reason
+
+    # Phase 2: race (or just wait for GLM if no fallback is running)
+    try:
+        while True:
+            if glm_done.is_set():
+                glm_result = box["glm"]
+                glm_ok = not glm_result.get("error")
+                if glm_ok or fallback is None:
+                    outcome["glm_result"] = glm_result
+                    outcome["winner"] = "glm" if glm_ok else "none"
+                    break
+
+            if fallback is not None:
+                code = fallback.poll()
+                timed_out = time.monotonic() - fallback_start > FALLBACK_TIMEOUT
+                if code is not None or timed_out:
+                    _stop_fallback(fallback, None)
+                    fallback_out.seek(0)
+                    stdout = fallback_out.read()
+                    _stop_fallback(None, fallback_out)
+                    fallback, fallback_out = None, None
+                    if code == 0:
+                        cancel.set()
+                        outcome["winner"] = "fallback"
+                        outcome["fallback_output"] = stdout
+                        log(f"[HEDGE] Fallback won after {time.monotonic() - start:.1f}s - cancelling GLM")
+                        break
+                    outcome["fallback_failed"] = True  # Keep waiting for GLM
+
+            time.sleep(POLL_INTERVAL)
+    finally:
+        # GLM won (or we were interrupted): no zombie child, no open temp file
+        _stop_fallback(fallback, fallback_out)
+
+    if "ttft" in box:
+        outcome["ttft"] = box["ttft"]
+        policy.record_ttft(model, box["ttft"])
+    elif outcome["winner"] == "fallback":
+        # Censored sample: GLM was at least this slow
+        policy.record_ttft(model, time.monotonic() - start)
+
+    try:
+        policy.save()
+    except OSError:
+        pass
+
+    return outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hedging policy state")
+    parser.add_argument("--stats", action="store_true", help="Show deadlines and hedge budget usage")
+    parser.parse_args()
+
+    policy = HedgePolicy()
+    print(json.dumps(policy.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
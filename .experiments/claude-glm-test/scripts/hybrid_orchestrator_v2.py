@@ -10,6 +10,9 @@ Combines:
 
 Usage:
     python hybrid_orchestrator_v2.py --stories 01.2,01.6,01.4 --start-phase P1
+    python hybrid_orchestrator_v2.py --stories 01.2,01.6,01.4 --scheduler barrier   # phase-by-phase
+    python hybrid_orchestrator_v2.py --stories 01.1,01.2,... --scheduler async       # whole epics, asyncio
+    python hybrid_orchestrator_v2.py --stories 01.1,01.2,... --scheduler queue --queue /mnt/shared/q.db  # per runner
 
 Expected Results:
 - Cost: ~$0.60 (vs $1.31 Claude-only = 54% savings)
@@ -22,9 +25,12 @@ import os
 import json
 import time
 import argparse
+import asyncio
+import threading
 from pathlib import Path
-from typing import List, Dict, Optional, Literal
+from typing import List, Dict, Optional, Literal, Sequence
 from datetime import datetime
+from collections import Counter
 import subprocess
 import anthropic
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -32,6 +38,31 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 # Import GLM client and helpers (use updated version with Deep Thinking support)
 sys.path.append(str(Path(__file__).parent))
 from glm_call_updated import GLMClient, write_files_to_disk, extract_files_from_response
+from patch_apply import apply_diff_response, delete_files, DIFF_OUTPUT_INSTRUCTIONS, FULL_FILE_FALLBACK_INSTRUCTIONS
+from artifact_store import ArtifactStore
+from dag_scheduler import DagScheduler, DEFAULT_MAX_WORKERS, format_key
+from concurrency import LimiterRegistry
+from checkpoint_store import CheckpointStore, extract_decision
+from model_router import (
+    ModelRouter, static_routes, MODEL_PROFILES, USE_GLM_FOR_PHASE, GLM_MODEL_FOR_PHASE, DEEP_THINKING_FOR_PHASE,
+    EXPECTED_OUTPUT_TOKENS
+)
+from metrics_registry import MetricsRegistry, serve_metrics
+from prompt_cache import build_system_blocks, cache_usage, cache_cost
+from path_index import PathIndex
+from review_stream import (
+    FormatMonitor, REVIEW_DECISIONS, END_MARKER, format_instructions, format_reminder, estimate_output_tokens
+)
+from test_impact import ImportGraph, TestResultCache, verify_changes, run_vitest
+from vitest_pool import VitestPool
+from speculation import SpeculationLedger, commit_files, DEFAULT_BUDGET_USD
+from budgets import BudgetTracker, format_amount
+from tracing import Tracer, critical_path
+from pilot_sim import CallDistributions, build_routes, default_limits, simulate, format_summary
+from work_estimates import WorkEstimator, lower_bound
+from work_queue import WorkQueue, QueueWorker, DEFAULT_LEASE_SECONDS
+from review_cache import ReviewCache, review_key, file_digest
+from async_core import AsyncGLMClient, AsyncLimiter, AsyncDagScheduler, DEFAULT_MAX_CONCURRENCY, io_executor
 
 # Phase types
 Phase = Literal["P1", "P2", "P3", "P4", "P5", "P6", "P7"]
@@ -47,32 +78,49 @@ PHASE_AGENTS = {
     "P7": "tech-writer",
 }
 
-# Model routing: True = use GLM internally, False = use Claude
-USE_GLM_FOR_PHASE = {
-    "P1": False,  # Claude Sonnet (strategic UX decisions)
-    "P2": True,   # GLM-4.7 (test writing)
-    "P3": True,   # GLM-4.7 (code implementation - GREEN phase)
-    "P4": True,   # GLM-4.7 (refactoring - REFACTOR phase)
-    "P5": False,  # Claude Sonnet (CRITICAL quality gate)
-    "P6": False,  # Claude Sonnet (QA validation)
-    "P7": True,   # GLM-4.5-Air (documentation)
+# Full story pipeline; P5 may loop back through P3 iter2 -> P5 iter2 before P6
+PIPELINE_PHASES: List[Phase] = ["P1", "P2", "P3", "P4", "P5", "P6", "P7"]
+MAX_REVIEW_ITERATIONS = 2
+
+# Shared prefix of every Claude call - keep it identical across phases so the prompt cache hits
+CLAUDE_SYSTEM_PROMPT = """You are a senior engineer on MonoPilot, a food manufacturing MES
+(Next.js 15, React 19, TypeScript, Supabase with RLS, Zod, Vitest, Playwright).
+You act as the agent named in each task: UX designer (P1), code reviewer (P5) or QA (P6).
+The project reference documents follow; the task itself is in the user message."""
+
+# Reference files sent to Claude as cached system blocks (opt-in: --claude-context), per phase
+# and most stable first. Only what the phase checks against: P5 reviews code against patterns
+# and tables (no PRD - ~23k tokens for settings), P1 designs from and P6 tests against the
+# story's epic PRD, appended after these. A 5-minute cache rarely spans P1 -> P5/P6, so a
+# prefix that is not read again within a phase costs a 1.25x write on every call.
+CLAUDE_PHASE_FILES: Dict[str, List[str]] = {
+    "P1": [],
+    "P5": [".claude/PATTERNS.md", ".claude/TABLES.md"],
+    "P6": [],
 }
+CLAUDE_PRD_PHASES = ("P1", "P6")
 
-# GLM model per phase (only used when USE_GLM_FOR_PHASE is True)
-GLM_MODEL_FOR_PHASE = {
-    "P2": "glm-4.7",      # Best model for test writing
-    "P3": "glm-4.7",      # Best model for code implementation
-    "P4": "glm-4.7",      # Best model for refactoring
-    "P7": "glm-4.5-air",  # Cheaper/faster for documentation
-}
+# Path index refresh is ~1k directory stats; reuse it across phases started together
+PATH_INDEX_MAX_AGE = 2.0
 
-# Deep Thinking per phase (complex reasoning tasks)
-DEEP_THINKING_FOR_PHASE = {
-    "P2": True,   # Tests need careful reasoning
-    "P3": True,   # Code implementation needs reasoning
-    "P4": False,  # Refactoring is more mechanical
-    "P7": False,  # Docs don't need deep thinking
-}
+# A gate response with a malformed opening is aborted and re-asked this many times
+MALFORMED_RETRIES = 1
+
+# GREEN/REFACTOR phases whose written files are checked against the affected Vitest tests (--verify)
+VERIFY_PHASES = ("P3", "P4")
+
+def use_diff_mode(phase: Phase, iteration: int) -> bool:
+    """Fix iterations and refactoring touch few lines - request unified diffs instead of whole files"""
+    return phase == "P4" or (phase == "P3" and iteration > 1)
+
+def estimated_cost(decision: Dict) -> float:
+    """Router's expected USD for the chosen model (history mean, else prior from prompt size)"""
+    if "expected_cost" in decision:
+        return decision["expected_cost"]
+    for candidate in decision.get("candidates", []):
+        if (candidate["model"], candidate["thinking"]) == (decision["model"], decision["enable_thinking"]):
+            return (candidate["stats"] or {}).get("cost", 0.0)
+    return 0.0
 
 class HybridOrchestratorV2:
     """
@@ -80,10 +128,40 @@ class HybridOrchestratorV2:
     Manages parallel story execution with Claude/GLM hybrid approach
     """
 
-    def __init__(self, project_root: Path):
+    def __init__(self, project_root: Path, resume: bool = False, verify: bool = False,
+                 test_workers: Optional[int] = None, speculate: Sequence[str] = (),
+                 speculation_budget: float = DEFAULT_BUDGET_USD, longest_first: bool = True,
+                 reuse_reviews: bool = True, claude_context: bool = False):
         self.project_root = project_root
         self.config_path = project_root / ".experiments/claude-glm-test/config.json"
         self.checkpoints_dir = project_root / ".claude/checkpoints"
+        # SQLite (WAL) source of truth; {story}.yaml is regenerated from it after each write
+        self.checkpoints = CheckpointStore(self.checkpoints_dir)
+        # Resume: skip (story, phase, iteration) nodes that already succeeded
+        self.resume = resume
+        self.artifact_store = ArtifactStore(project_root / ".experiments/claude-glm-test/artifacts")
+        # Per-model AIMD concurrency limits (shared by barrier and DAG schedulers)
+        self.limiters = LimiterRegistry(project_root / ".experiments/claude-glm-test/.cache/concurrency_state.json")
+        # Story -> story/PRD/wireframe/test/implementation files across all epics
+        self.path_index = PathIndex(project_root / ".experiments/claude-glm-test/.cache/path_index.pickle",
+                                    repo_root=project_root)
+        # P3/P4: run only the Vitest tests whose import graph reaches the written files
+        self.verify = verify
+        self.import_graph = ImportGraph(project_root / "apps/frontend",
+                                        project_root / ".experiments/claude-glm-test/.cache/import_graph.pickle",
+                                        extra_roots=[project_root / "e2e"]) if verify else None
+        self.test_results = TestResultCache(
+            project_root / ".experiments/claude-glm-test/.cache/test_results.json") if verify else None
+        # Warm Vitest workers shared by all stories (test_workers=0: cold `vitest run` per verification)
+        self.test_pool = VitestPool(project_root / "apps/frontend", size=test_workers) \
+            if verify and test_workers != 0 else None
+        # P6/P7 started during P5 review, staged until the verdict (DAG/async schedulers)
+        self.speculation = SpeculationLedger(
+            project_root / ".experiments/claude-glm-test/.cache/staging", speculate, speculation_budget
+        ) if speculate else None
+        # P5 verdicts by hash of prompt + reviewed files: an unchanged re-review reuses the verdict
+        self.review_cache = ReviewCache(
+            project_root / ".experiments/claude-glm-test/.cache/review_cache.json") if reuse_reviews else None
 
         # Load configuration
         with open(self.config_path) as f:
@@ -98,39 +176,78 @@ class HybridOrchestratorV2:
         if not anthropic_key:
             raise ValueError("ANTHROPIC_API_KEY not set in environment")
 
+        # Story/phase limits on cost, tokens and seconds (config.json "budgets", see budgets.py)
+        self.budgets = BudgetTracker(self.config.get("budgets"))
+
+        # Model/thinking choice per call (static tables are the default route)
+        self.router = ModelRouter(
+            static_routes(),
+            project_root / ".experiments/claude-glm-test/.cache/route_history.jsonl",
+            claude_pricing=self.config.get("pricing", {}).get("claude")
+        )
+
+        # Remaining work per story: ready nodes / parallel stories with the most work left start first
+        self.work = WorkEstimator(self.router, self.checkpoints, self.path_index, MAX_REVIEW_ITERATIONS)
+        self.longest_first = longest_first
+        self.dispatch_priority = self.work.priority if longest_first else None
+
         # Initialize API clients
         self.glm_client = GLMClient(zhipu_key)
         self.claude_client = anthropic.Anthropic(api_key=anthropic_key)
-
-        # Metrics tracking
+        # Async clients live on run_pilot_async's event loop (created/closed there)
+        self._api_keys = {"zhipu": zhipu_key, "anthropic": anthropic_key}
+        self.async_glm: Optional[AsyncGLMClient] = None
+        self.async_claude = None
+        self._async_limiters: Dict[str, AsyncLimiter] = {}
+
+        # Metrics: thread-safe registry for calls/tokens/cost/latency; per-story phase
+        # records and wall-clock stay in self.metrics (guarded by _metrics_lock)
+        self.registry = MetricsRegistry()
+        self._calls = self.registry.counter(
+            "pilot_calls_total", "Phase executions", ["provider", "model", "phase", "status"])
+        self._latency = self.registry.histogram(
+            "pilot_call_duration_seconds", "Phase execution latency", ["provider", "model", "phase"])
+        self._tokens = self.registry.counter(
+            "pilot_tokens_total", "Tokens used", ["provider", "model", "phase", "direction"])
+        self._cost = self.registry.counter(
+            "pilot_cost_usd_total", "Cost in USD (config.json pricing)", ["provider", "model", "phase"])
+        self._inflight = self.registry.gauge(
+            "pilot_inflight_calls", "API calls currently running", ["provider", "model"])
+        self._tests = self.registry.counter(
+            "pilot_tests_total", "Affected Vitest files after P3/P4", ["phase", "outcome"])
+        self._budget_events = self.registry.counter(
+            "pilot_budget_events_total", "Budget enforcement (preempt/downgrade/timeout/exceeded)",
+            ["phase", "action", "limit"])
+        self._prompt_cache = self.registry.counter(
+            "pilot_prompt_cache_calls_total", "Claude calls by prompt cache use (hit: prefix read)", ["outcome"])
+        self._reviews = self.registry.counter(
+            "pilot_review_cache_total", "P5 reviews by memoized-verdict lookup (hit: no call)", ["outcome"])
+        # Spans per phase/call/wait, exported next to the report (Chrome trace + OTLP JSON)
+        self.tracer = Tracer()
+        self._metrics_lock = threading.Lock()
         self.metrics = {
             "stories": {},
-            "total_cost": 0.0,
             "total_time": 0.0,
-            "claude_tokens": 0,
-            "glm_tokens": 0,
+            "reused_reviews": [],
         }
 
         # Static file cache - files that don't change during execution
         # Loaded once, reused across all phases/stories
         self._static_file_cache = {}
-        self._cache_static_files()
+        self._static_lock = threading.Lock()
+        # Claude reference files as cached system blocks (CLAUDE_PHASE_FILES); off: prompt only
+        self.claude_context = claude_context
+        if claude_context:
+            self._cache_static_files()
 
     def _cache_static_files(self):
         """Pre-cache static reference files used across all phases"""
-        static_files = [
-            ".claude/PATTERNS.md",
-            ".claude/TABLES.md",
-            # Add more static files as needed
-        ]
+        static_files = list(dict.fromkeys(path for files in CLAUDE_PHASE_FILES.values() for path in files))
 
         print("[CACHE] Loading static reference files...")
         for rel_path in static_files:
-            full_path = self.project_root / rel_path
-            if full_path.exists():
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                self._static_file_cache[rel_path] = content
+            content = self.load_static_file(rel_path)
+            if content is not None:
                 print(f"  ✓ {rel_path} ({len(content)} bytes)")
             else:
                 print(f"  ⚠ {rel_path} not found")
@@ -141,6 +258,22 @@ class HybridOrchestratorV2:
         """Get content from static cache (if available)"""
         return self._static_file_cache.get(rel_path)
 
+    def load_static_file(self, rel_path: str) -> Optional[str]:
+        """Static file content, read once on first use (e.g. the PRD of each epic)"""
+        with self._static_lock:
+            if rel_path not in self._static_file_cache:
+                full_path = self.project_root / rel_path
+                if not full_path.exists():
+                    return None
+                with open(full_path, 'r', encoding='utf-8') as f:
+                    self._static_file_cache[rel_path] = f.read()
+            return self._static_file_cache[rel_path]
+
+    def story_paths(self, story_id: str) -> Dict:
+        """Repo-relative files for a story from the path index (refreshed from mtime deltas)"""
+        self.path_index.refresh(max_age=PATH_INDEX_MAX_AGE)
+        return self.path_index.lookup(story_id, absolute=False)
+
     def build_context_with_cache(self, context_files: List[str]) -> str:
         """Build context string, using cache for static files"""
         context_parts = []
@@ -172,97 +305,267 @@ class HybridOrchestratorV2:
 
         return "\n".join(context_parts)
 
+    def claude_static_files(self, story_id: str, phase: Phase) -> Optional[List[str]]:
+        """Reference files for a Claude call's cached prefix (None without --claude-context)"""
+        if not self.claude_context:
+            return None
+        files = list(CLAUDE_PHASE_FILES.get(phase, []))
+        prd = self.story_paths(story_id)["prd"] if phase in CLAUDE_PRD_PHASES else None
+        return files + [prd] if prd else files
+
+    def claude_system_blocks(self, model: str, static_files: Optional[List[str]] = None) -> List[Dict]:
+        """Claude system prompt plus static_files as system blocks with cache breakpoints
+
+        Files come most stable first (shared per phase, then the epic PRD), so
+        stories of different epics still hit the cache on the shared part.
+        """
+        sections = [("instructions", CLAUDE_SYSTEM_PROMPT)]
+        for rel_path in static_files or []:
+            content = self.load_static_file(rel_path)
+            if content is not None:
+                sections.append((rel_path, f"=== FILE: {rel_path} ===\n{content}\n"))
+        return build_system_blocks(sections, model)
+
     def get_checkpoint_file(self, story_id: str) -> Path:
         """Get checkpoint file path for story"""
         return self.checkpoints_dir / f"{story_id}.yaml"
 
     def read_checkpoint(self, story_id: str) -> Dict:
         """Read checkpoint data for story"""
-        checkpoint_file = self.get_checkpoint_file(story_id)
-        if not checkpoint_file.exists():
-            return {"completed_phases": [], "current_phase": None}
-
-        # Parse YAML checkpoint
-        with open(checkpoint_file) as f:
-            content = f.read()
-
-        completed = []
-        for line in content.split('\n'):
-            if line.strip().startswith('P') and '✓' in line:
-                phase = line.split(':')[0].strip()
-                completed.append(phase)
-
+        completed = self.checkpoints.completed_phases(story_id)
         return {
             "completed_phases": completed,
             "current_phase": completed[-1] if completed else None
         }
 
-    def append_checkpoint(self, story_id: str, phase: str, data: Dict):
-        """Append checkpoint entry for story/phase"""
-        checkpoint_file = self.get_checkpoint_file(story_id)
-        checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+    def append_checkpoint(self, story_id: str, phase: str, data: Dict, iteration: int = 1):
+        """Record checkpoint for story/phase/iteration (transactional, exported to YAML)"""
+        self.checkpoints.finish(story_id, phase, iteration, data)
+
+    def pricing_for(self, model: str) -> Dict:
+        """USD per 1M tokens: config.json pricing by model, then by provider, else list price"""
+        provider = "claude" if model.startswith("claude") else "glm"
+        pricing = self.config.get("pricing", {})
+        return (pricing.get(model) or pricing.get(provider)
+                or MODEL_PROFILES.get(model) or MODEL_PROFILES["claude" if provider == "claude" else "glm-4.7"])
+
+    def call_cost(self, model: str, input_tokens: int, output_tokens: int,
+                  cache_write: int = 0, cache_read: int = 0) -> float:
+        pricing = self.pricing_for(model)
+        return (input_tokens / 1_000_000 * pricing["input_per_1m"] +
+                output_tokens / 1_000_000 * pricing["output_per_1m"] +
+                cache_cost(pricing, cache_write, cache_read))
+
+    def record_call_metrics(self, phase: str, decision: Dict, result: Dict):
+        """Count one phase execution (tokens include any diff-mode fallback call)"""
+        labels = {"provider": decision["provider"], "model": decision["model"], "phase": phase}
+        tokens = result.get("tokens", {})
+        self._calls.inc(status="success" if result.get("success") else "failed", **labels)
+        self._latency.observe(result.get("time", 0), **labels)
+        self._tokens.inc(tokens.get("input", 0), direction="input", **labels)
+        self._tokens.inc(tokens.get("output", 0), direction="output", **labels)
+        self._tokens.inc(tokens.get("cache_write", 0), direction="cache_write", **labels)
+        self._tokens.inc(tokens.get("cache_read", 0), direction="cache_read", **labels)
+        self._cost.inc(result.get("cost", 0), **labels)
+
+    def run_limited(self, decision: Dict, fn, phase: Optional[str] = None) -> Dict:
+        """Run an API call under its model's concurrency limit, tracked as in-flight (slot wait traced)
+
+        phase keys the limiter's latency baseline (P3 generation vs P7 docs)
+        """
+        wait = self.tracer.start("slot wait", model=decision["model"])
 
-        timestamp = datetime.now().strftime("%H:%M")
-        status = "✓" if data.get("success") else "✗"
+        def tracked():
+            self.tracer.end(wait)
+            with self._inflight.track_inprogress(provider=decision["provider"], model=decision["model"]):
+                return fn()
+        try:
+            return self.limiters.get(decision["model"]).call(tracked, workload=phase)
+        finally:
+            self.tracer.end(wait)
 
-        entry = f"{phase}: {status} {data.get('agent', 'unknown')} {timestamp}"
+    def budget_event(self, story_id: str, phase: str, action: str, limit: str, detail: str):
+        """Count a budget enforcement event and keep it for the report"""
+        self.budgets.event(story_id, phase, action, limit, detail)
+        self._budget_events.inc(phase=phase, action=action, limit=limit)
 
-        if "tests" in data:
-            entry += f" tests:{data['tests']}"
-        if "issues" in data:
-            entry += f" issues:{data['issues']}"
-        if "decision" in data:
-            entry += f" decision:{data['decision']}"
+    def totals(self) -> Dict:
+        """Run totals from the registry"""
+        return {
+            "cost": self._cost.value(),
+            "claude_cost": self._cost.value(provider="claude"),
+            "glm_cost": self._cost.value(provider="glm"),
+            "claude_tokens": int(self._tokens.value(provider="claude")),
+            "glm_tokens": int(self._tokens.value(provider="glm")),
+            "claude_cache_read_tokens": int(self._tokens.value(provider="claude", direction="cache_read")),
+            "claude_cache_write_tokens": int(self._tokens.value(provider="claude", direction="cache_write")),
+            "claude_cache_calls": {outcome: int(self._prompt_cache.value(outcome=outcome))
+                                   for outcome in ("hit", "write", "none")},
+        }
 
-        entry += "\n"
+    def execute_with_claude(self, prompt: str, model: str = "claude-opus-4-5-20250929",
+                            static_files: Optional[List[str]] = None, review_phase: Optional[str] = None,
+                            timeout: Optional[float] = None) -> Dict:
+        """Execute task with Claude API (streamed)
 
-        with open(checkpoint_file, 'a') as f:
-            f.write(entry)
+        Static reference files go into cached system blocks; only the per-story
+        phase prompt (user message) is prefilled at full price on repeat calls.
+        Gate phases are checked while streaming (review_stream.py): generation
+        stops at the end marker, and a malformed opening aborts the stream and
+        is retried once with a format reminder.
 
-    def execute_with_claude(self, prompt: str, model: str = "claude-opus-4-5-20250929") -> Dict:
-        """Execute task with Claude API"""
+        Args:
+            static_files: Repo-relative files for the cached prefix (claude_static_files())
+            review_phase: "P5" / "P6" to enforce the DECISION/ISSUES output format
+            timeout: Budget seconds for the whole call (stream closed and failed when over)
+        """
         start_time = time.time()
+        deadline = start_time + timeout if timeout else None
 
         try:
-            message = self.claude_client.messages.create(
-                model=model,
-                max_tokens=8000,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            with self.tracer.span("context build"):
+                system = self.claude_system_blocks(model, static_files)
+            result = None
+            with self.tracer.span("provider call", kind="client", provider="claude", model=model) as call_span:
+                for attempt in range(1 + MALFORMED_RETRIES):
+                    monitor = FormatMonitor(review_phase) if review_phase in REVIEW_DECISIONS else None
+                    request = self.claude_request(model, system, prompt, review_phase, result)
+                    if deadline:
+                        request["timeout"] = max(1.0, deadline - time.time())
+                    with self.claude_client.messages.stream(**request) as stream:
+                        for text in stream.text_stream:
+                            if deadline and time.time() > deadline:
+                                raise TimeoutError(f"timeout after {timeout:.0f}s")
+                            if monitor and monitor.feed(text):
+                                break
+                        # Closed early: the final usage event never arrives - use the partial message
+                        message = stream.current_message_snapshot if monitor and monitor.outcome \
+                            else stream.get_final_message()
+                    result = self.claude_result(message, model, start_time, monitor, previous=result)
+                    if result["success"] or not (monitor and monitor.malformed):
+                        break
+                call_span.set(tokens=result["tokens"]["total"], retried=result.get("retried"))
+            return result
+        except Exception as e:
+            return self.failed_result("claude-opus-4-5", str(e), start_time)
 
-            elapsed = time.time() - start_time
+    async def execute_with_claude_async(self, prompt: str, model: str = "claude-opus-4-5-20250929",
+                                        static_files: Optional[List[str]] = None,
+                                        review_phase: Optional[str] = None) -> Dict:
+        """execute_with_claude on the AsyncAnthropic client (run_pilot_async)"""
+        start_time = time.time()
 
-            # Track tokens
-            input_tokens = message.usage.input_tokens
-            output_tokens = message.usage.output_tokens
-            self.metrics["claude_tokens"] += input_tokens + output_tokens
+        try:
+            with self.tracer.span("context build"):
+                system = await asyncio.to_thread(self.claude_system_blocks, model, static_files)
+            result = None
+            with self.tracer.span("provider call", kind="client", provider="claude", model=model) as call_span:
+                for attempt in range(1 + MALFORMED_RETRIES):
+                    monitor = FormatMonitor(review_phase) if review_phase in REVIEW_DECISIONS else None
+                    async with self.async_claude.messages.stream(
+                            **self.claude_request(model, system, prompt, review_phase, result)) as stream:
+                        async for text in stream.text_stream:
+                            if monitor and monitor.feed(text):
+                                break
+                        message = stream.current_message_snapshot if monitor and monitor.outcome \
+                            else await stream.get_final_message()
+                    result = self.claude_result(message, model, start_time, monitor, previous=result)
+                    if result["success"] or not (monitor and monitor.malformed):
+                        break
+                call_span.set(tokens=result["tokens"]["total"], retried=result.get("retried"))
+            return result
+        except Exception as e:
+            return self.failed_result("claude-opus-4-5", str(e), start_time)
+
+    @staticmethod
+    def claude_request(model: str, system: List[Dict], prompt: str, review_phase: Optional[str],
+                       rejected: Optional[Dict] = None) -> Dict:
+        """messages.stream kwargs; a retry after a malformed gate response adds a format reminder"""
+        if rejected:
+            prompt += format_reminder(review_phase, rejected["error"])
+        request = {
+            "model": model,
+            "max_tokens": 8000,
+            "system": system,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        if review_phase in REVIEW_DECISIONS:
+            request["stop_sequences"] = [END_MARKER]
+        return request
 
-            # Calculate cost
-            pricing = self.config["pricing"]["claude"]
-            cost = (input_tokens / 1_000_000 * pricing["input_per_1m"] +
-                   output_tokens / 1_000_000 * pricing["output_per_1m"])
-            self.metrics["total_cost"] += cost
+    def claude_result(self, message, model: str, start_time: float, monitor: Optional[FormatMonitor] = None,
+                      previous: Optional[Dict] = None) -> Dict:
+        """Result dict (tokens incl. prompt cache, cost) for a Claude message
 
-            return {
-                "success": True,
-                "response": message.content[0].text,
-                "model": "claude-opus-4-5",
-                "tokens": {"input": input_tokens, "output": output_tokens, "total": input_tokens + output_tokens},
-                "cost": cost,
-                "time": elapsed
-            }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "model": "claude-opus-4-5",
-                "tokens": {"input": 0, "output": 0, "total": 0},
-                "cost": 0,
-                "time": time.time() - start_time
-            }
+        Args:
+            monitor: Gate format monitor - its text/outcome replace the message's when it stopped the stream
+            previous: Result of a rejected earlier attempt (its tokens/cost are added)
+        """
+        elapsed = time.time() - start_time
+
+        # Closed by the monitor: the snapshot's output count is from message_start only
+        stopped_early = bool(monitor and monitor.outcome)
+        if monitor:
+            monitor.finish()
+            text = monitor.text
+        else:
+            text = message.content[0].text
+
+        # Track tokens (input_tokens excludes the cached prefix)
+        input_tokens = message.usage.input_tokens
+        output_tokens = message.usage.output_tokens
+        if stopped_early:
+            output_tokens = max(output_tokens or 0, estimate_output_tokens(monitor.buffer))
+        cached = cache_usage(message.usage)
+        if cached["cache_write"] or cached["cache_read"]:
+            print(f"   [PROMPT CACHE] read {cached['cache_read']:,} / wrote {cached['cache_write']:,} tokens")
+        self._prompt_cache.inc(outcome="hit" if cached["cache_read"] else "write" if cached["cache_write"] else "none")
+
+        # Calculate cost
+        cost = self.call_cost(model, input_tokens, output_tokens, **cached)
+
+        result = {
+            "success": True,
+            "response": text,
+            "model": "claude-opus-4-5",
+            "tokens": {
+                "input": input_tokens,
+                "output": output_tokens,
+                "total": input_tokens + output_tokens + cached["cache_write"] + cached["cache_read"],
+                **cached
+            },
+            "cost": cost,
+            "time": elapsed
+        }
+        if monitor:
+            result["format"] = monitor.outcome
+            result["decision"] = monitor.decision
+            if monitor.malformed:
+                print(f"   ✗ [STREAM] {'aborted' if stopped_early else 'rejected'} after ~{output_tokens} "
+                      f"output tokens: {monitor.outcome}")
+                result.update(success=False, error=monitor.outcome)
+        if previous:
+            for key, value in previous["tokens"].items():
+                result["tokens"][key] = result["tokens"].get(key, 0) + value
+            result["cost"] += previous["cost"]
+            result["retried"] = previous.get("retried", 0) + 1
+        return result
+
+    @staticmethod
+    def failed_result(model: str, error: str, start_time: float) -> Dict:
+        return {
+            "success": False,
+            "error": error,
+            "model": model,
+            "tokens": {"input": 0, "output": 0, "total": 0},
+            "cost": 0,
+            "time": time.time() - start_time
+        }
 
     def execute_with_glm(self, prompt: str, context_files: List[str] = None, model: str = "glm-4.7",
-                          auto_write: bool = False, base_dir: str = None, enable_thinking: bool = False) -> Dict:
+                          auto_write: bool = False, base_dir: str = None, enable_thinking: bool = False,
+                          diff_mode: bool = False, artifact_key: Optional[tuple] = None,
+                          timeout: Optional[float] = None) -> Dict:
         """Execute task with GLM API
 
         Args:
@@ -272,116 +575,312 @@ class HybridOrchestratorV2:
             auto_write: If True, extract and write files directly to disk (bypasses Claude context)
             base_dir: Base directory for auto_write (defaults to project_root)
             enable_thinking: Enable Deep Thinking mode (for glm-4.7, glm-4.5-air)
+            diff_mode: Request unified diffs and apply them locally (full-file fallback for failed hunks)
+            artifact_key: (story_id, phase, iteration) - record written files in the artifact store
+            timeout: Budget seconds to wait for the response (default: GLMClient's 20 min)
         """
         start_time = time.time()
 
+        try:
+            with self.tracer.span("context build"):
+                full_prompt = self.build_glm_prompt(prompt, context_files, diff_mode)
+
+            # Call GLM without context_files (already embedded in prompt)
+            with self.tracer.span("provider call", kind="client", provider="glm", model=model) as call_span:
+                result = self.glm_client.call(
+                    prompt=full_prompt,
+                    context_files=None,  # Context already in prompt
+                    model=model,
+                    temperature=0.7,
+                    max_tokens=8000,
+                    enable_thinking=enable_thinking,
+                    **({"timeout": timeout} if timeout else {})
+                )
+                call_span.set(tokens=result.get("usage", {}).get("total_tokens"))
+            return self.glm_result(result, full_prompt, model, start_time, auto_write=auto_write,
+                                   base_dir=base_dir, diff_mode=diff_mode, artifact_key=artifact_key)
+
+        except Exception as e:
+            return self.failed_result(model, str(e), start_time)
+
+    async def execute_with_glm_async(self, prompt: str, context_files: List[str] = None, model: str = "glm-4.7",
+                                     auto_write: bool = False, base_dir: str = None, enable_thinking: bool = False,
+                                     diff_mode: bool = False, artifact_key: Optional[tuple] = None,
+                                     defer_write: bool = False) -> Dict:
+        """execute_with_glm on the async GLM client; prompt building and file writes run on the I/O pool
+
+        The diff-mode fallback call is awaited on the loop like the main call.
+
+        Args:
+            defer_write: Leave extracted files in result["pending_write"] for write_pending_files()
+                         instead of writing them - callers that time out the call keep writes outside it
+        """
+        start_time = time.time()
         if base_dir is None:
             base_dir = str(self.project_root)
 
         try:
-            # Build context using cache for static files
-            if context_files:
-                context = self.build_context_with_cache(context_files)
-                full_prompt = f"""{context}
+            with self.tracer.span("context build"):
+                full_prompt = await asyncio.to_thread(self.build_glm_prompt, prompt, context_files, diff_mode)
+            with self.tracer.span("provider call", kind="client", provider="glm", model=model) as call_span:
+                result = await self.async_glm.call(
+                    prompt=full_prompt,
+                    model=model,
+                    temperature=0.7,
+                    max_tokens=8000,
+                    enable_thinking=enable_thinking
+                )
+                call_span.set(tokens=(result.get("usage") or {}).get("total_tokens"))
+
+            response_data = self.glm_response_data(result, model, start_time)
+            if not auto_write or not response_data["success"]:
+                return response_data
+
+            response_text = result.get("response", "")
+            with self.tracer.span("extract", diff_mode=diff_mode) as extract_span:
+                if diff_mode:
+                    applied, files, fallback_paths = await asyncio.to_thread(
+                        self.apply_diff_files, response_text, base_dir)
+                    if fallback_paths:
+                        fallback = await self.async_glm.call(
+                            prompt=self.fallback_prompt(full_prompt, fallback_paths),
+                            model=model,
+                            temperature=0.7,
+                            max_tokens=8000
+                        )
+                        files = self.merge_fallback_files(files, fallback, fallback_paths, model, response_data)
+                    response_data["diff"] = self.diff_info(applied, fallback_paths)
+                else:
+                    files = extract_files_from_response(response_text)
+                extract_span.set(files=len(files))
+
+            response_data["pending_write"] = {"files": files, "base_dir": base_dir, "artifact_key": artifact_key}
+            if not defer_write:
+                await asyncio.to_thread(self.write_pending_files, response_data)
+            return response_data
+
+        except Exception as e:
+            return self.failed_result(model, str(e), start_time)
+
+    def build_glm_prompt(self, prompt: str, context_files: Optional[List[str]], diff_mode: bool) -> str:
+        """Task prompt with context files embedded (static files from cache)"""
+        if context_files:
+            context = self.build_context_with_cache(context_files)
+            full_prompt = f"""{context}
 
 ─────────────────────────────────────
 TASK:
 {prompt}
 """
-            else:
-                full_prompt = prompt
+        else:
+            full_prompt = prompt
 
-            # Call GLM without context_files (already embedded in prompt)
-            result = self.glm_client.call(
-                prompt=full_prompt,
-                context_files=None,  # Context already in prompt
-                model=model,
-                temperature=0.7,
-                max_tokens=8000,
-                enable_thinking=enable_thinking
-            )
+        if diff_mode:
+            full_prompt += "\n" + DIFF_OUTPUT_INSTRUCTIONS
+        return full_prompt
+
+    def glm_response_data(self, result: Dict, model: str, start_time: float) -> Dict:
+        """Result dict (tokens, cost, response) for a GLM API response"""
+        elapsed = time.time() - start_time
 
-            elapsed = time.time() - start_time
-
-            if "error" in result:
-                return {
-                    "success": False,
-                    "error": result["error"],
-                    "model": model,
-                    "tokens": {"input": 0, "output": 0, "total": 0},
-                    "cost": 0,
-                    "time": elapsed
-                }
-
-            # Track tokens
-            usage = result.get("usage", {})
-            total_tokens = usage.get("total_tokens", 0)
-            self.metrics["glm_tokens"] += total_tokens
-
-            # Calculate cost (GLM-4.7: $0.60 input, $2.20 output per 1M tokens)
-            input_tokens = usage.get("prompt_tokens", 0)
-            output_tokens = usage.get("completion_tokens", 0)
-            cost = (input_tokens / 1_000_000 * 0.60) + (output_tokens / 1_000_000 * 2.20)
-            self.metrics["total_cost"] += cost
-
-            response_data = {
-                "success": True,
-                "response": result["response"],
+        if "error" in result:
+            return {
+                "success": False,
+                "error": result["error"],
                 "model": model,
-                "tokens": {
-                    "input": usage.get("prompt_tokens", 0),
-                    "output": usage.get("completion_tokens", 0),
-                    "total": total_tokens
-                },
-                "cost": cost,
+                "tokens": {"input": 0, "output": 0, "total": 0},
+                "cost": 0,
                 "time": elapsed
             }
 
+        # Track tokens
+        usage = result.get("usage", {})
+        total_tokens = usage.get("total_tokens", 0)
+
+        # Calculate cost (per-model pricing from config.json)
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+        cost = self.call_cost(model, input_tokens, output_tokens)
+
+        return {
+            "success": True,
+            "response": result["response"],
+            "model": model,
+            "tokens": {
+                "input": usage.get("prompt_tokens", 0),
+                "output": usage.get("completion_tokens", 0),
+                "total": total_tokens
+            },
+            "cost": cost,
+            "time": elapsed
+        }
+
+    def glm_result(self, result: Dict, full_prompt: str, model: str, start_time: float,
+                   auto_write: bool = False, base_dir: str = None, diff_mode: bool = False,
+                   artifact_key: Optional[tuple] = None) -> Dict:
+        """Result dict for a GLM response; with auto_write, extract/apply and write its files"""
+        if base_dir is None:
+            base_dir = str(self.project_root)
+
+        try:
+            response_data = self.glm_response_data(result, model, start_time)
+
             # AUTO-WRITE: Extract files and write directly to disk
-            if auto_write:
+            if auto_write and response_data["success"]:
                 response_text = result.get("response", "")
-                files = extract_files_from_response(response_text)
+                with self.tracer.span("extract", diff_mode=diff_mode) as extract_span:
+                    if diff_mode:
+                        files, diff_info = self.resolve_diff_files(
+                            response_text, full_prompt, model, base_dir, response_data
+                        )
+                        response_data["diff"] = diff_info
+                    else:
+                        files = extract_files_from_response(response_text)
+                    extract_span.set(files=len(files))
+
+                response_data["pending_write"] = {"files": files, "base_dir": base_dir,
+                                                  "artifact_key": artifact_key}
+                self.write_pending_files(response_data)
 
-                if files:
-                    print(f"  [AUTO-WRITE] Writing {len(files)} files directly to disk...")
-                    write_result = write_files_to_disk(files, base_dir)
-                    response_data["write_result"] = write_result
-                    response_data["files_written"] = write_result["total_written"]
+            return response_data
 
-                    # Replace full response with summary (saves context)
-                    response_data["response"] = f"[AUTO-WRITTEN] {write_result['total_written']} files to disk. See write_result for details."
+        except Exception as e:
+            return self.failed_result(model, str(e), start_time)
 
-                    for f in write_result.get("written", []):
-                        print(f"    ✓ {f['path']} ({f['lines']} lines)")
+    def write_pending_files(self, response_data: Dict) -> Dict:
+        """Write the files a GLM result extracted (result["pending_write"]) and record them
 
+        Replaces the response with a summary once files are written (saves context).
+        Files a diff deleted are removed at the same point.
+        """
+        pending = response_data.pop("pending_write", None)
+        deletions = response_data.get("diff", {}).get("deleted", [])
+        if pending and deletions:
+            response_data["delete_result"] = delete_files(deletions, pending["base_dir"])
+            for path in response_data["delete_result"]["deleted"]:
+                print(f"    ✗ {path} (deleted)")
+        if not pending or not pending["files"]:
             return response_data
 
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "model": model,
-                "tokens": {"input": 0, "output": 0, "total": 0},
-                "cost": 0,
-                "time": time.time() - start_time
+        files, artifact_key, model = pending["files"], pending["artifact_key"], response_data["model"]
+        print(f"  [AUTO-WRITE] Writing {len(files)} files directly to disk...")
+        with self.tracer.span("file write", files=len(files)):
+            if artifact_key:
+                self.artifact_store.record(*artifact_key, files, metadata={"model": model})
+            write_result = write_files_to_disk(files, pending["base_dir"])
+        response_data["write_result"] = write_result
+        response_data["files_written"] = write_result["total_written"]
+        if artifact_key:
+            response_data["artifacts"] = {
+                "manifest": str(self.artifact_store.manifest_path(*artifact_key)),
+                "files": [f["path"] for f in write_result.get("written", [])]
             }
 
+        # Replace full response with summary (saves context)
+        response_data["response"] = f"[AUTO-WRITTEN] {write_result['total_written']} files to disk. See write_result for details."
+
+        for f in write_result.get("written", []):
+            print(f"    ✓ {f['path']} ({f['lines']} lines)")
+        return response_data
+
+    def resolve_diff_files(self, response_text: str, full_prompt: str, model: str,
+                           base_dir: str, response_data: Dict) -> tuple:
+        """Apply a diff-mode GLM response; re-request full files only where hunks failed
+
+        Fallback tokens/cost are added to response_data in place.
+
+        Returns:
+            (files, diff_info) - files in the same {"path", "content"} shape as full-file output
+        """
+        applied, files, fallback_paths = self.apply_diff_files(response_text, base_dir)
+        if fallback_paths:
+            fallback = self.glm_client.call(
+                prompt=self.fallback_prompt(full_prompt, fallback_paths),
+                model=model,
+                temperature=0.7,
+                max_tokens=8000
+            )
+            files = self.merge_fallback_files(files, fallback, fallback_paths, model, response_data)
+        return files, self.diff_info(applied, fallback_paths)
+
+    @staticmethod
+    def apply_diff_files(response_text: str, base_dir: str) -> tuple:
+        """
+        Apply a diff-mode response's patches in memory.
+
+        Returns:
+            (applied, files, fallback_paths) - fallback_paths are files whose hunks failed
+            (empty when the model ignored the diff format and full files were taken instead)
+        """
+        applied = apply_diff_response(response_text, base_dir)
+        files = applied["files"]
+        fallback_paths = [failure["path"] for failure in applied["failed"]]
+
+        print(f"  [DIFF] {applied['patch_count']} patches, {len(applied['applied'])} applied, "
+              f"{len(fallback_paths)} need full-file fallback")
+
+        if applied["patch_count"] == 0:
+            # Model ignored the diff format - accept full files if present
+            return applied, extract_files_from_response(response_text), []
+        return applied, files, fallback_paths
+
+    @staticmethod
+    def fallback_prompt(full_prompt: str, fallback_paths: List[str]) -> str:
+        return full_prompt + "\n" + FULL_FILE_FALLBACK_INSTRUCTIONS.format(
+            paths="\n".join(f"- {path}" for path in fallback_paths)
+        )
+
+    def merge_fallback_files(self, files: List[Dict], fallback: Dict, fallback_paths: List[str],
+                             model: str, response_data: Dict) -> List[Dict]:
+        """Patched files plus the fallback's full files; fallback tokens/cost added to response_data"""
+        if fallback.get("error"):
+            print(f"  [DIFF] Full-file fallback failed: {fallback['error']} - "
+                  f"{len(fallback_paths)} files left unchanged")
+            return files
+
+        usage = fallback.get("usage", {})
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+        cost = self.call_cost(model, input_tokens, output_tokens)
+        response_data["tokens"]["input"] += input_tokens
+        response_data["tokens"]["output"] += output_tokens
+        response_data["tokens"]["total"] += usage.get("total_tokens", 0)
+        response_data["cost"] += cost
+
+        fallback_files = [
+            f for f in extract_files_from_response(fallback.get("response") or "")
+            if f.get("path") in fallback_paths
+        ]
+        # Failed files are not in `files` - only full fallback content gets written
+        missing = sorted(set(fallback_paths) - {f["path"] for f in fallback_files})
+        if missing:
+            print(f"  [DIFF] Fallback returned no content for {', '.join(missing)} - left unchanged")
+        return files + fallback_files
+
+    @staticmethod
+    def diff_info(applied: Dict, fallback_paths: List[str]) -> Dict:
+        return {
+            "patches": applied["patch_count"],
+            "applied": applied["applied"],
+            "failed": applied["failed"],
+            "fallback_files": fallback_paths,
+            "deleted": applied["deleted"],
+        }
+
     def build_phase_prompt(self, story_id: str, phase: Phase) -> str:
         """Build prompt for story/phase execution"""
         agent_type = PHASE_AGENTS[phase]
-        story_file = self.project_root / f"docs/2-MANAGEMENT/epics/current/01-settings/{story_id}.*.md"
-
-        # Find story markdown file
-        import glob
-        story_files = glob.glob(str(story_file))
-        story_path = story_files[0] if story_files else f"Story {story_id}"
+        paths = self.story_paths(story_id)
+        story_path = paths["story"] or f"Story {story_id}"
+        prd_path = paths["prd"] or "docs/1-BASELINE/product/modules/"
+        wireframes = ", ".join(paths["wireframes"][:5]) or "docs/3-ARCHITECTURE/ux/wireframes/"
 
         prompts = {
             "P1": f"""Execute Phase P1 (UX Design) for Story {story_id}.
 
 Read story: {story_path}
-Read PRD: docs/1-BASELINE/product/modules/settings.md
-Reference existing wireframes: docs/3-ARCHITECTURE/ux/wireframes/SET-*.md
+Read PRD: {prd_path}
+Reference existing wireframes: {wireframes}
 
 Design wireframes following ShadCN UI patterns and MonoPilot wireframe standards.
 Document all UI states (loading, empty, error, success).
@@ -475,42 +974,280 @@ Output: Documentation markdown files.
 """
         }
 
-        return prompts.get(phase, f"Execute phase {phase} for story {story_id}")
+        prompt = prompts.get(phase, f"Execute phase {phase} for story {story_id}")
+        if phase in REVIEW_DECISIONS:
+            prompt += format_instructions(phase)
+        return prompt
+
+    def execute_phase_for_story(self, story_id: str, phase: Phase, iteration: int = 1,
+                                speculative: bool = False, resume_since: Optional[float] = None) -> Dict:
+        """Execute single phase for single story (iteration > 1 = P5 fix loop)
 
-    def execute_phase_for_story(self, story_id: str, phase: Phase) -> Dict:
-        """Execute single phase for single story"""
-        print(f"\n🚀 Executing {story_id} {phase} ({PHASE_AGENTS[phase]})...")
+        speculative: run P6/P7 ahead of the P5 verdict for review iteration `iteration`,
+                     output staged (see speculation.py)
+        resume_since: Reuse a successful checkpoint finished at/after this time (re-claimed queue task)
+        """
+        with self.tracer.span("phase", root=True, story=story_id, phase=phase, iteration=iteration,
+                              speculative=speculative or None) as span:
+            plan = self.begin_phase(story_id, phase, iteration, speculative, resume_since)
+            if "result" in plan:
+                return self.traced(span, plan["result"])
+
+            decision = plan["decision"]
+            if decision["provider"] == "glm":
+                result = self.run_limited(decision, lambda: self.execute_with_glm(**plan["glm_args"],
+                                                                                   timeout=plan["timeout"]), phase)
+            else:
+                result = self.run_limited(decision, lambda: self.execute_with_claude(
+                    plan["prompt"], static_files=plan["static_files"], review_phase=phase, timeout=plan["timeout"]),
+                    phase)
+
+            return self.traced(span, self.finish_phase(story_id, phase, iteration, decision, result, speculative))
+
+    async def execute_phase_for_story_async(self, story_id: str, phase: Phase, iteration: int = 1,
+                                            speculative: bool = False) -> Dict:
+        """execute_phase_for_story on the event loop: API call awaited, checkpoint/file I/O on the I/O pool"""
+        with self.tracer.span("phase", root=True, story=story_id, phase=phase, iteration=iteration,
+                              speculative=speculative or None) as span:
+            plan = await asyncio.to_thread(self.begin_phase, story_id, phase, iteration, speculative)
+            if "result" in plan:
+                return self.traced(span, plan["result"])
+
+            decision = plan["decision"]
+            if decision["provider"] == "glm":
+                call = lambda: self.execute_with_glm_async(**plan["glm_args"], defer_write=True)
+            else:
+                call = lambda: self.execute_with_claude_async(plan["prompt"], static_files=plan["static_files"],
+                                                              review_phase=phase)
+
+            wait = self.tracer.start("slot wait", model=decision["model"])
+
+            async def tracked():
+                self.tracer.end(wait)
+                with self._inflight.track_inprogress(provider=decision["provider"], model=decision["model"]):
+                    return await call()
+
+            limiter = self._async_limiters.setdefault(decision["model"],
+                                                      AsyncLimiter(self.limiters.get(decision["model"])))
+            start_time = time.time()
+            try:
+                result = await limiter.call(tracked, timeout=plan["timeout"], workload=phase)
+            except asyncio.TimeoutError:
+                print(f"   ✗ {story_id} {phase} timed out after {plan['timeout']:.0f}s")
+                result = self.failed_result(decision["model"], f"timeout after {plan['timeout']:.0f}s", start_time)
+            finally:
+                self.tracer.end(wait)
+
+            if result.get("pending_write"):
+                # Written after the timed call - a timed-out phase never writes files
+                result = await asyncio.to_thread(self.write_pending_files, result)
+
+            return self.traced(span, await asyncio.to_thread(
+                self.finish_phase, story_id, phase, iteration, decision, result, speculative))
+
+    @staticmethod
+    def traced(span, result: Dict) -> Dict:
+        """Copy a phase result's model/tokens/cost/outcome onto its span"""
+        span.set(model=result.get("model"), tokens=result.get("tokens", {}).get("total"),
+                 cost=round(result.get("cost", 0), 6), success=bool(result.get("success")),
+                 skipped=result.get("skipped"))
+        if not result.get("success"):
+            span.fail(result.get("error") or "failed")
+        return result
 
-        use_glm = USE_GLM_FOR_PHASE[phase]
-        prompt = self.build_phase_prompt(story_id, phase)
+    def begin_phase(self, story_id: str, phase: Phase, iteration: int = 1, speculative: bool = False,
+                    resume_since: Optional[float] = None) -> Dict:
+        """
+        Resume check, checkpoint start, prompt/context build and model routing.
 
-        if use_glm:
-            # Get model and settings for this phase
-            model = GLM_MODEL_FOR_PHASE.get(phase, "glm-4.7")
-            enable_thinking = DEEP_THINKING_FOR_PHASE.get(phase, False)
+        Without --resume a successful checkpoint is only reused when it finished at or after
+        resume_since (a queue task re-claimed from a lost worker that got that far).
+
+        Returns:
+            {"result": result} when no call is needed (completed in an earlier run, speculative
+            output committed, speculation over budget, story budget used up), else the call plan
+            {"decision", "prompt", "static_files", "glm_args", "timeout"}
+        """
+        iter_str = f" iter{iteration}" if iteration > 1 else ""
+
+        if self.resume or resume_since is not None:
+            previous = self.checkpoints.get(story_id, phase, 1 if speculative else iteration)
+            if previous and previous["status"] == "success" and \
+                    (self.resume or (previous["finished_at"] or 0) >= resume_since):
+                if speculative:
+                    return {"result": self.skipped_result("already completed")}
+                print(f"\n⏭️  {story_id} {phase}{iter_str} already completed - resuming past it")
+                return {"result": self.checkpoints.as_result(previous)}
+
+        preemption = self.budgets.preemption(story_id)
+        if speculative:
+            if preemption:
+                return {"result": self.skipped_result("story budget")}
+            print(f"\n🔮 Speculating {story_id} {phase} during P5{iter_str} review ({PHASE_AGENTS[phase]})...")
+        else:
+            staged = self.speculation.claim(story_id, phase) if self.speculation else None
+            if staged:
+                return {"result": self.commit_speculation(story_id, phase, iteration, staged)}
+            print(f"\n🚀 Executing {story_id} {phase}{iter_str} ({PHASE_AGENTS[phase]})...")
+            self.checkpoints.start(story_id, phase, iteration, PHASE_AGENTS[phase])
+            if preemption:
+                return {"result": self.preempt_phase(story_id, phase, iteration, preemption)}
+
+        with self.tracer.span("prepare"):
+            prompt = self.build_phase_prompt(story_id, phase)
+            context_files = self.get_context_files_for_story(story_id, phase, iteration)
+
+            # Route by history + prompt size (context files count only if GLM ends up sending them)
+            context_chars = sum(os.path.getsize(path) for path in context_files if os.path.exists(path))
+            decision = self.router.route(phase, len(prompt) + context_chars)
+        print(f"   [ROUTER] {decision['model']}{' + thinking' if decision['enable_thinking'] else ''}: "
+              f"{decision['reason']}")
+        budget = self.budgets.check(story_id, phase, {"cost": estimated_cost(decision),
+                                                      "tokens": decision["prompt_tokens"] + EXPECTED_OUTPUT_TOKENS})
+        if budget["action"] == "downgrade":
+            if speculative:
+                print(f"   ⏸ {story_id} {phase}: {budget['reason']} - runs after review instead")
+                return {"result": self.skipped_result("phase budget")}
+            decision = self.downgrade(story_id, phase, decision, budget)
+        if speculative and self.speculation.reserve(story_id, phase, iteration, estimated_cost(decision)) is None:
+            print(f"   ⏸ {story_id} {phase}: speculation budget (${self.speculation.budget:.2f}) reached - "
+                  f"runs after review instead")
+            return {"result": self.skipped_result("speculation budget")}
+
+        plan = {"decision": decision, "prompt": prompt, "static_files": None, "glm_args": None,
+                "timeout": budget["timeout"]}
+        if decision["provider"] == "glm":
+            model = decision["model"]
+            enable_thinking = decision["enable_thinking"]
 
             thinking_str = " + Deep Thinking" if enable_thinking else ""
             print(f"   Using {model}{thinking_str} (cost optimization)")
 
-            # Get context files for GLM
-            context_files = self.get_context_files_for_story(story_id, phase)
-
             # Enable auto_write for file-generating phases (P2=tests, P3=code, P4=refactor, P7=docs)
             # This bypasses Claude context - files written directly to disk
             auto_write = phase in ["P2", "P3", "P4", "P7"]
             if auto_write:
                 print(f"   [AUTO-WRITE ENABLED] Files will be written directly to disk")
 
-            result = self.execute_with_glm(
-                prompt, context_files,
-                model=model,
-                auto_write=auto_write,
-                enable_thinking=enable_thinking
-            )
+            diff_mode = use_diff_mode(phase, iteration)
+            if diff_mode:
+                print(f"   [DIFF MODE] Requesting unified diffs instead of full files")
+
+            plan["glm_args"] = {
+                "prompt": prompt,
+                "context_files": context_files,
+                "model": model,
+                "auto_write": auto_write,
+                "enable_thinking": enable_thinking,
+                "diff_mode": diff_mode,
+                "artifact_key": (story_id, phase, iteration),
+            }
+            if speculative:
+                # Staged outside the tree; artifacts are recorded on commit
+                plan["glm_args"].update(
+                    base_dir=str(self.speculation.staging_dir(story_id, phase, iteration)), artifact_key=None)
         else:
             print(f"   Using Claude Sonnet 4.5 (quality gate)")
-            result = self.execute_with_claude(prompt)
-
+            plan["static_files"] = self.claude_static_files(story_id, phase)
+
+        if phase == "P5" and self.review_cache:
+            key = self.review_key(story_id, prompt, decision, plan["static_files"], context_files)
+            cached = self.review_cache.get(story_id, key)
+            self._reviews.inc(outcome="hit" if cached else "miss")
+            if cached:
+                return {"result": self.reuse_review(story_id, iteration, cached)}
+            # finish_phase stores the verdict under this key
+            plan["decision"] = {**decision, "review_key": key}
+        return plan
+
+    def review_inputs(self, story_id: str) -> List[str]:
+        """Repo-relative files a P5 review reads: the story's implementation and tests (path index)
+        plus every file its P2-P4 generations wrote (artifact manifests)"""
+        paths = self.story_paths(story_id)
+        files = set(paths["implementation"]) | set(paths["tests"])
+        for generation in self.artifact_store.list_generations(story_id):
+            if generation["phase"] in ("P2", "P3", "P4"):
+                manifest = self.artifact_store.get_manifest(story_id, generation["phase"], generation["iteration"])
+                files.update((manifest or {}).get("files", {}))
+        return sorted(files)
+
+    def review_key(self, story_id: str, prompt: str, decision: Dict, static_files: Optional[List[str]],
+                   context_files: List[str]) -> str:
+        """Hash of everything a P5 call sees: prompt, model, static prefix and reviewed file contents"""
+        static_contents = [self.load_static_file(rel_path) or "" for rel_path in static_files or []]
+        files = set(self.review_inputs(story_id))
+        if decision["provider"] == "glm":
+            files.update(os.path.relpath(path, self.project_root) for path in context_files)
+        return review_key(prompt, f"{decision['model']}:{decision['enable_thinking']}", static_contents,
+                          {path: file_digest(self.project_root / path) for path in files})
+
+    def reuse_review(self, story_id: str, iteration: int, cached: Dict) -> Dict:
+        """Checkpoint a P5 node with the memoized verdict of an identical earlier review (no call)"""
+        no_op_fix = iteration > 1
+        print(f"   ♻️  {story_id} P5: reviewed files and prompt unchanged since iter{cached['iteration']} - "
+              f"reusing its verdict ({extract_decision('P5', cached['response']) or 'no decision'})")
+        if no_op_fix:
+            print(f"   ⚠️  {story_id} P3 iter{iteration} changed none of the reviewed files - fix round was a no-op")
+        result = {
+            "success": True,
+            "response": cached["response"],
+            "model": cached["model"],
+            "tokens": {"input": 0, "output": 0, "total": 0},
+            "cost": 0,
+            "time": 0,
+            "reused_review": {"from_iteration": cached["iteration"], "no_op_fix": no_op_fix},
+        }
+        self.record_review_verdict(story_id, iteration, result)
+        with self._metrics_lock:
+            self.metrics["reused_reviews"].append({"story": story_id, "iteration": iteration, **result["reused_review"]})
+            if no_op_fix:
+                fix = self.metrics["stories"].get(story_id, {}).get(f"P3_iter{iteration}")
+                if fix is not None:
+                    fix["no_op"] = True
+        return self.record_phase(story_id, "P5", iteration, result)
+
+    @staticmethod
+    def review_verdict(phase: Phase, result: Dict) -> Optional[str]:
+        """Gate verdict of a P5/P6 result (monitor decision or DECISION line); None when the call
+        failed or its output was malformed - such a review approves nothing"""
+        if not result.get("success"):
+            return None
+        return result.get("decision") or extract_decision(phase, result.get("response"))
+
+    def record_review_verdict(self, story_id: str, iteration: int, result: Dict):
+        """P5 verdict -> router outcome of the P3 generation and speculation ledger"""
+        verdict = self.review_verdict("P5", result)
+        approved = verdict == "APPROVED"
+        if verdict:
+            # A failed review says nothing about the generation it was meant to judge
+            self.router.record_review(story_id, iteration, approved)
+        if self.speculation:
+            self.speculation.verdict(story_id, iteration, approved)
+
+    def finish_phase(self, story_id: str, phase: Phase, iteration: int, decision: Dict, result: Dict,
+                     speculative: bool = False) -> Dict:
+        """Record routing history, checkpoint, metrics and budget spend for a finished phase call"""
+        self.router.record(story_id, phase, iteration, decision, result)
+        self.record_call_metrics(phase, decision, result)
+        self.record_budget(story_id, phase, decision, result)
+        if speculative:
+            # No checkpoint yet - the result waits in the ledger for the P5 verdict
+            self.speculation.settle(story_id, phase, iteration, result)
+            print(f"   🔮 {story_id} {phase} staged in {result['time']:.1f}s | Cost: ${result['cost']:.4f}")
+            return result
+
+        if self.verify and phase in VERIFY_PHASES and result.get("write_result"):
+            with self.tracer.span("verify"):
+                result["verification"] = self.verify_written_files(story_id, phase, result["write_result"])
+        if phase == "P5":
+            self.record_review_verdict(story_id, iteration, result)
+            if self.review_verdict(phase, result) and "review_key" in decision:
+                self.review_cache.put(story_id, decision["review_key"], iteration, result)
+
+        return self.record_phase(story_id, phase, iteration, result)
+
+    def record_phase(self, story_id: str, phase: Phase, iteration: int, result: Dict) -> Dict:
+        """Checkpoint and per-story metrics for a phase result"""
         # Record checkpoint
         checkpoint_data = {
             "success": result["success"],
@@ -521,38 +1258,129 @@ Output: Documentation markdown files.
             "time": result["time"]
         }
 
-        self.append_checkpoint(story_id, phase, checkpoint_data)
-
-        # Track metrics
-        if story_id not in self.metrics["stories"]:
-            self.metrics["stories"][story_id] = {}
-        self.metrics["stories"][story_id][phase] = checkpoint_data
-        self.metrics["total_time"] += result["time"]
+        with self.tracer.span("checkpoint"):
+            self.append_checkpoint(story_id, phase, {
+                **checkpoint_data,
+                "tokens": result["tokens"],
+                "decision": result.get("decision") or extract_decision(phase, result.get("response")),
+                "error": result.get("error"),
+                "artifacts": result.get("artifacts"),
+                **({"cache": {key: result["tokens"][key] for key in ("cache_write", "cache_read")}}
+                   if "cache_read" in result["tokens"] else {}),
+                **({"tests": f"{result['verification']['passed']}/{result['verification']['selected']}",
+                    "verification": result["verification"]} if "verification" in result else {}),
+                **({"budget": result["budget"]} if "budget" in result else {}),
+                **({"reused_review": result["reused_review"]} if "reused_review" in result else {}),
+            }, iteration)
+
+        # Track metrics (fix iterations keep their own entry, e.g. P3_iter2)
+        phase_key = phase if iteration == 1 else f"{phase}_iter{iteration}"
+        with self._metrics_lock:
+            self.metrics["stories"].setdefault(story_id, {})[phase_key] = checkpoint_data
 
         print(f"   ✓ Completed in {result['time']:.1f}s | Cost: ${result['cost']:.4f} | Tokens: {result['tokens']['total']}")
 
         return result
 
-    def execute_phase_parallel(self, story_ids: List[str], phase: Phase) -> Dict[str, Dict]:
+    def commit_speculation(self, story_id: str, phase: Phase, iteration: int, staged: Dict) -> Dict:
+        """Move a speculative phase's staged files into the tree and checkpoint its held result"""
+        self.checkpoints.start(story_id, phase, iteration, PHASE_AGENTS[phase])
+        result = dict(staged["result"])
+        written = commit_files(staged["staging_dir"], self.project_root)
+        if written:
+            files = [{"path": os.path.relpath(f["path"], self.project_root),
+                      "content": Path(f["path"]).read_text(encoding='utf-8', errors='ignore')} for f in written]
+            self.artifact_store.record(story_id, phase, iteration, files, metadata={"model": result["model"]})
+            result["write_result"] = {"written": written, "total_written": len(written), "errors": []}
+            result["artifacts"] = {
+                "manifest": str(self.artifact_store.manifest_path(story_id, phase, iteration)),
+                "files": [f["path"] for f in written]
+            }
+        print(f"\n✅ {story_id} {phase}: committed speculative output from P5 iter{staged['attempt']} "
+              f"review ({len(written)} files, no new call)")
+        return self.record_phase(story_id, phase, iteration, result)
+
+    def downgrade(self, story_id: str, phase: Phase, decision: Dict, budget: Dict) -> Dict:
+        """Cheaper model for a call whose expected cost/tokens exceed the budget left (else the routed one)"""
+        cheaper = self.router.downgrade(phase, decision, max_cost=budget["remaining"]["cost"])
+        if not cheaper:
+            print(f"   [BUDGET] {budget['reason']} - no cheaper candidate for {phase}, running as routed")
+            return decision
+        print(f"   [BUDGET] {budget['reason']} - downgraded to {cheaper['model']}")
+        self.budget_event(story_id, phase, "downgrade", budget["limit"],
+                          f"{decision['model']} -> {cheaper['model']}: {budget['reason']}")
+        return {**cheaper, "budget": {"action": "downgrade", "limit": budget["limit"], "reason": budget["reason"],
+                                      "from": decision["model"]}}
+
+    def preempt_phase(self, story_id: str, phase: Phase, iteration: int, preemption: Dict) -> Dict:
+        """Fail a phase without a call because its story's budget is used up"""
+        print(f"   ⛔ {story_id} {phase} preempted: {preemption['reason']}")
+        self.budget_event(story_id, phase, "preempt", preemption["limit"], preemption["reason"])
+        result = self.failed_result(None, f"budget: {preemption['reason']}", time.time())
+        result["budget"] = {"action": "preempt", **preemption}
+        return self.record_phase(story_id, phase, iteration, result)
+
+    def record_budget(self, story_id: str, phase: Phase, decision: Dict, result: Dict):
+        """Add a call's spend to its story; timeouts and phase overruns become budget events"""
+        if "budget" in decision:
+            result["budget"] = decision["budget"]
+        error = (result.get("error") or "").lower()
+        if "timeout" in error or "timed out" in error:
+            self.budget_event(story_id, phase, "timeout", "seconds", result["error"][:200])
+        for limit in self.budgets.record(story_id, phase, result):
+            spent = {"cost": result.get("cost", 0), "tokens": result["tokens"].get("total", 0),
+                     "seconds": result.get("time", 0)}[limit]
+            self.budget_event(story_id, phase, "exceeded", limit, f"used {format_amount(limit, spent)}")
+
+    def skipped_result(self, reason: str) -> Dict:
+        """Result of a speculative node that made no call"""
+        return {"success": True, "skipped": reason, "model": None, "tokens": {"total": 0}, "cost": 0, "time": 0}
+
+    def verify_written_files(self, story_id: str, phase: Phase, write_result: Dict) -> Dict:
+        """Run (or reuse cached results of) the Vitest tests affected by auto-written files"""
+        changed = [f["path"] for f in write_result.get("written", [])]
+        # Full stat walk (~30ms warm) so tests written by P2 since the last refresh are in the graph
+        self.import_graph.refresh()
+        if self.test_pool:
+            durations = self.test_results.durations()
+            runner = lambda tests: self.test_pool.run(tests, changed, durations)
+        else:
+            runner = lambda tests: run_vitest(tests, self.import_graph.frontend_root)
+        verification = verify_changes(changed, self.import_graph, self.test_results, runner=runner)
+        for outcome in ("passed", "failed", "cached"):
+            self._tests.inc(verification[outcome], phase=phase, outcome=outcome)
+
+        status = "✓" if not verification["failed"] else "✗"
+        print(f"   {status} [VERIFY] {story_id} {phase}: {verification['passed']}/{verification['selected']} tests passed "
+              f"({verification['cached']} cached, {verification['time']:.1f}s)"
+              + (f", {len(verification['e2e'])} e2e specs affected" if verification["e2e"] else ""))
+        for test in verification["failures"]:
+            print(f"      ✗ {test}")
+        return verification
+
+    def execute_phase_parallel(self, story_ids: List[str], phase: Phase, iteration: int = 1) -> Dict[str, Dict]:
         """Execute phase for multiple stories in parallel using threading"""
         print(f"\n{'='*70}")
         print(f"PHASE {phase}: {PHASE_AGENTS[phase]} (Parallel: {len(story_ids)} stories)")
         if USE_GLM_FOR_PHASE[phase]:
             model = GLM_MODEL_FOR_PHASE.get(phase, "glm-4.7")
             thinking = " + Deep Thinking" if DEEP_THINKING_FOR_PHASE.get(phase, False) else ""
-            print(f"Model: {model}{thinking}")
+            print(f"Default model: {model}{thinking} (routed per story)")
         else:
-            print(f"Model: Claude Sonnet 4.5")
+            print(f"Default model: Claude Sonnet 4.5 (routed per story)")
         print(f"{'='*70}")
 
         phase_start = time.time()
         results = {}
+        if self.longest_first:
+            # Submission order is start order once the pool is full
+            story_ids = self.work.order(story_ids, phase, iteration)
 
-        # Execute in parallel using ThreadPoolExecutor
-        with ThreadPoolExecutor(max_workers=min(len(story_ids), 4)) as executor:
+        # Execute in parallel using ThreadPoolExecutor - per-model limiters gate the actual API calls
+        with ThreadPoolExecutor(max_workers=min(len(story_ids), self.limiters.max_limit())) as executor:
             # Submit all stories
             future_to_story = {
-                executor.submit(self.execute_phase_for_story, story_id, phase): story_id
+                executor.submit(self.execute_phase_for_story, story_id, phase, iteration): story_id
                 for story_id in story_ids
             }
 
@@ -576,42 +1404,333 @@ Output: Documentation markdown files.
 
         return results
 
-    def get_context_files_for_story(self, story_id: str, phase: Phase) -> List[str]:
+    def get_context_files_for_story(self, story_id: str, phase: Phase, iteration: int = 1) -> List[str]:
         """Get context files needed for GLM execution"""
+        paths = self.story_paths(story_id)
         context_files = []
 
         # Always include story file
-        story_pattern = str(self.project_root / f"docs/2-MANAGEMENT/epics/current/01-settings/{story_id}.*.md")
-        import glob
-        story_files = glob.glob(story_pattern)
-        if story_files:
-            context_files.append(story_files[0])
+        if paths["story"]:
+            context_files.append(paths["story"])
 
         # Phase-specific context
         if phase == "P2":
             # Include wireframes from P1
-            wireframe_pattern = str(self.project_root / "docs/3-ARCHITECTURE/ux/wireframes/SET-*.md")
-            context_files.extend(glob.glob(wireframe_pattern)[:5])  # Limit to 5 files
+            context_files.extend(paths["wireframes"][:5])  # Limit to 5 files
 
         elif phase == "P3":
             # Include test files from P2
-            test_pattern = str(self.project_root / f"apps/frontend/__tests__/01-settings/{story_id}.*.test.ts")
-            context_files.extend(glob.glob(test_pattern)[:3])
+            context_files.extend(paths["tests"][:3])
+            if use_diff_mode(phase, iteration):
+                # Fix iteration patches the implementation - model needs the exact current files
+                context_files.extend(paths["implementation"][:5])
+
+        elif phase == "P4":
+            if use_diff_mode(phase, iteration):
+                # Diff mode patches existing implementation - model needs the exact current files
+                context_files.extend(paths["implementation"][:5])
 
         elif phase == "P7":
             # Include implementation files from P3
-            impl_pattern = str(self.project_root / f"apps/frontend/**/*{story_id}*.tsx")
-            context_files.extend(glob.glob(impl_pattern, recursive=True)[:3])
+            context_files.extend([path for path in paths["implementation"] if path.endswith(".tsx")][:3])
 
-        return context_files
+        return [str(self.project_root / path) for path in context_files]
 
     def check_phase_status(self, story_id: str, phase: Phase) -> bool:
         """Check if phase is completed for story"""
         checkpoint = self.read_checkpoint(story_id)
         return phase in checkpoint["completed_phases"]
 
-    def run_pilot(self, story_ids: List[str], start_phase: Phase = "P1"):
-        """Run full pilot for multiple stories"""
+    def run_pilot(self, story_ids: List[str], start_phase: Phase = "P1", scheduler: str = "dag",
+                  max_workers: int = DEFAULT_MAX_WORKERS, queue: Optional[WorkQueue] = None,
+                  worker_id: Optional[str] = None, clear_queue: bool = False):
+        """Run full pilot for multiple stories
+
+        Args:
+            scheduler: "dag" (each story advances independently), "async" (same graph on
+                       the event loop, no thread per call), "queue" (same graph in a shared
+                       SQLite queue, see work_queue.py) or "barrier" (phase by phase)
+            max_workers: Global cap on concurrent phase executions (dag/async/queue scheduler)
+            queue: Work queue for scheduler="queue" (default: tasks table in checkpoints.db)
+            worker_id: This process's name in the queue (default: hostname:pid)
+            clear_queue: Drop the stories' tasks of an earlier queue run before seeding
+        """
+        if self.test_pool:
+            self.test_pool.warm()
+        if self.longest_first:
+            self.print_work_estimates(story_ids, start_phase)
+        if self.speculation and scheduler == "barrier":
+            print("⚠️  Speculation needs the dag or async scheduler - barrier runs P6/P7 after all reviews")
+        if self.speculation and scheduler == "queue":
+            print("⚠️  Speculation stages output inside one process - disabled for the queue scheduler")
+            self.speculation = None
+        try:
+            if scheduler == "barrier":
+                return self.run_pilot_barrier(story_ids, start_phase)
+            if scheduler == "queue":
+                return self.run_pilot_queue(story_ids, start_phase, max_workers,
+                                            queue or WorkQueue(self.checkpoints.db_path,
+                                                               priority=self.dispatch_priority),
+                                            worker_id, clear_queue)
+            if scheduler == "async":
+                return asyncio.run(self.run_pilot_async(story_ids, start_phase, max_workers))
+            return self.run_pilot_dag(story_ids, start_phase, max_workers)
+        finally:
+            if self.test_pool:
+                self.test_pool.close()
+                print(f"[VERIFY] Vitest pool: {self.test_pool.stats}")
+            if self.speculation:
+                print(f"[SPECULATION] {self.speculation.snapshot()}")
+
+    def print_work_estimates(self, story_ids: List[str], start_phase: Phase):
+        """Expected work per story (work_estimates.py) - the longest-first dispatch order"""
+        self.path_index.refresh(max_age=PATH_INDEX_MAX_AGE)
+        self.work.refresh()
+        ordered = self.work.order(story_ids, start_phase)
+        print(f"[PRIORITY] Longest expected work first: " + ", ".join(
+            f"{story_id} {self.work.remaining(story_id, start_phase) / 60:.0f}m"
+            f" ({self.work.story(story_id)['complexity']})" for story_id in ordered[:12])
+              + (f", ... {len(ordered) - 12} more" if len(ordered) > 12 else ""))
+
+    def seed_pilot_graph(self, dag, story_ids: List[str], start_phase: Phase, make_node):
+        """
+        Add each story's chain up to its first review; return the on_complete callback
+        that grows the P5 fix loop or P6 -> P7 per story.
+
+        With speculation on, each review also gets speculative P6/P7 nodes that run
+        alongside it on the same code; the real P6/P7 nodes then depend on them and
+        commit their staged output if that review approved.
+
+        Args:
+            dag: DagScheduler or AsyncDagScheduler
+            make_node: (story_id, phase, iteration, speculative) -> node callable for that scheduler
+        """
+        def add_node(story_id: str, phase: Phase, iteration: int = 1, after: Sequence[tuple] = ()) -> tuple:
+            key = (story_id, phase, iteration)
+            dag.add(key, make_node(story_id, phase, iteration, False), deps=[dep for dep in after if dep])
+            return key
+
+        speculated: Dict[tuple, tuple] = {}
+
+        def add_speculation(story_id: str, review_iteration: int, after: Optional[tuple]):
+            """Speculative P6/P7 on the code P5 iter<review_iteration> reviews"""
+            for phase in (self.speculation.phases if self.speculation else ()):
+                key = (story_id, f"spec-{phase}", review_iteration)
+                dag.add(key, make_node(story_id, phase, review_iteration, True), deps=[after] if after else None)
+                speculated[(story_id, phase, review_iteration)] = key
+
+        # Static part of each chain: start phase up to the first review (or P7 if review is skipped)
+        chain = PIPELINE_PHASES[PIPELINE_PHASES.index(start_phase):]
+        if "P5" in chain:
+            chain = chain[:chain.index("P5") + 1]
+
+        for story_id in story_ids:
+            previous = None
+            for phase in chain:
+                if phase == "P5":
+                    add_speculation(story_id, 1, after=previous)
+                previous = add_node(story_id, phase, after=[previous])
+
+        def on_complete(key: tuple, result: Dict, scheduler):
+            story_id, phase, iteration = key
+            if phase == "P7" and self.speculation:
+                self.speculation.release(story_id)
+            if phase != "P5":
+                return
+
+            preemption = self.budgets.preemption(story_id)
+            if preemption:
+                # Story budget used up: no fix iteration, no QA/docs (a preempted review already counted)
+                if result.get("budget", {}).get("action") != "preempt":
+                    print(f"\n⛔ {story_id} stops after P5{'' if iteration == 1 else f' iter{iteration}'}: "
+                          f"{preemption['reason']}")
+                    self.budget_event(story_id, phase, "preempt", preemption["limit"], preemption["reason"])
+            elif not self.review_verdict(phase, result):
+                print(f"\n✗ {story_id} P5{'' if iteration == 1 else f' iter{iteration}'} gave no verdict "
+                      f"({result.get('error') or 'no DECISION line'}) - not approved, no QA/docs scheduled")
+                if self.speculation:
+                    self.speculation.release(story_id)
+            elif self.review_verdict(phase, result) == "REQUEST_CHANGES" and iteration < MAX_REVIEW_ITERATIONS:
+                print(f"\n⚠️  {story_id} needs bug fixes - scheduling P3 iter{iteration + 1} → P5 iter{iteration + 1}")
+                fix = add_node(story_id, "P3", iteration + 1, after=[key])
+                add_speculation(story_id, iteration + 1, after=fix)
+                add_node(story_id, "P5", iteration + 1, after=[fix])
+            else:
+                print(f"\n✅ {story_id} review done - scheduling QA and Documentation")
+                qa = add_node(story_id, "P6", after=[key, speculated.get((story_id, "P6", iteration))])
+                add_node(story_id, "P7", after=[qa, speculated.get((story_id, "P7", iteration))])
+
+        return on_complete
+
+    def report_dag_run(self, dag, results: Dict, pilot_start: float):
+        """Overlap summary, failed nodes, critical path and the final report for a DAG run"""
+        pilot_elapsed = time.time() - pilot_start
+        self.metrics["total_time"] = pilot_elapsed
+        timings = dag.timings
+        busy = sum(end - start for start, end in timings.values())
+        print(f"\n✓ DAG complete: {len(results)} nodes in {pilot_elapsed:.1f}s "
+              f"(sum of node times {busy:.1f}s, {busy / max(pilot_elapsed, 1e-9):.1f}x overlap)")
+        if timings:
+            makespan = max(end for _, end in timings.values()) - min(start for start, _ in timings.values())
+            bound = lower_bound(timings, getattr(dag, "max_workers", None) or dag.max_concurrency)
+            print(f"   Makespan {makespan:.1f}s vs lower bound {bound:.1f}s "
+                  f"(longest story or total work / workers): +{makespan / max(bound, 1e-9) - 1:.0%}")
+        failed = [format_key(key) for key, res in results.items() if not res.get("success")]
+        if failed:
+            print(f"   ✗ Failed nodes: {', '.join(failed)}")
+
+        # Worker waits: node runnable (deps done) -> picked up by the scheduler
+        for key, (start, _) in timings.items():
+            ready = dag.ready_at.get(key)
+            if ready is not None and start > ready:
+                story_id, phase, iteration = key
+                speculative = phase.startswith("spec-")
+                self.tracer.add("worker wait", ready, start, story=story_id, phase=phase[5:] if speculative else phase,
+                                iteration=iteration, speculative=speculative or None)
+        self.print_critical_path(critical_path(timings, dag.dependencies()), timings)
+
+        self.print_final_report()
+
+    def print_critical_path(self, path: List[tuple], timings: Dict):
+        """The node chain that set the makespan, and where its time went (from the trace)"""
+        if not path:
+            return
+        length = timings[path[-1]][1] - min(start for start, _ in timings.values())
+        spans = [span for story_id, phase, iteration in path
+                 for span in self.tracer.node_spans(story_id, phase.replace("spec-", ""), iteration,
+                                                    speculative=phase.startswith("spec-"))]
+        breakdown = self.tracer.breakdown(spans)
+        print(f"\n🧭 Critical path ({length:.1f}s): {' → '.join(format_key(key) for key in path)}")
+        if breakdown:
+            print("   " + " | ".join(f"{name} {seconds:.1f}s ({seconds / max(length, 1e-9):.0%})"
+                                      for name, seconds in breakdown.items()))
+
+    async def run_pilot_async(self, story_ids: List[str], start_phase: Phase = "P1",
+                              max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        """
+        Run the pilot DAG on an asyncio event loop.
+
+        Same graph and fix loop as run_pilot_dag, but every node is a task and API
+        calls are awaited on AsyncAnthropic / httpx - only IO_WORKERS threads exist
+        for checkpoint and file I/O, however many stories are in flight. Each API
+        call has its budget timeout (budgets.py); Ctrl-C cancels all running nodes (their
+        checkpoints stay "running", so --resume re-runs exactly those).
+        """
+        print(f"""
+╔═══════════════════════════════════════════════════════════════════╗
+║  HYBRID ORCHESTRATOR V2 - Async DAG + GLM                         ║
+║  Stories: {', '.join(story_ids)}
+║  Start Phase: {start_phase} | Max concurrent nodes: {max_concurrency}
+╚═══════════════════════════════════════════════════════════════════╝
+""")
+
+        loop = asyncio.get_running_loop()
+        executor = io_executor()
+        loop.set_default_executor(executor)
+        self.async_glm = AsyncGLMClient(self._api_keys["zhipu"])
+        self.async_claude = anthropic.AsyncAnthropic(api_key=self._api_keys["anthropic"])
+        self._async_limiters = {}
+
+        pilot_start = time.time()
+        dag = AsyncDagScheduler(max_concurrency=max_concurrency, priority=self.dispatch_priority)
+        on_complete = self.seed_pilot_graph(
+            dag, story_ids, start_phase,
+            lambda story_id, phase, iteration, speculative:
+                lambda: self.execute_phase_for_story_async(story_id, phase, iteration, speculative)
+        )
+
+        try:
+            results = await dag.run(on_complete=on_complete)
+        finally:
+            await self.async_glm.aclose()
+            await self.async_claude.close()
+            self.async_glm = self.async_claude = None
+
+        await asyncio.to_thread(self.report_dag_run, dag, results, pilot_start)
+
+    def run_pilot_dag(self, story_ids: List[str], start_phase: Phase = "P1",
+                      max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        Run the pilot as a dependency graph of (story, phase, iteration) nodes.
+
+        Each node starts as soon as its own story's previous phase finishes, so a
+        slow story no longer holds every other story at the phase barrier. P6/P7
+        are added after a story's final review; a REQUEST_CHANGES verdict first
+        grows P3 iter2 -> P5 iter2 for that story only.
+        """
+        print(f"""
+╔═══════════════════════════════════════════════════════════════════╗
+║  HYBRID ORCHESTRATOR V2 - DAG Scheduler + GLM                     ║
+║  Stories: {', '.join(story_ids)}
+║  Start Phase: {start_phase} | Max workers: {max_workers}
+╚═══════════════════════════════════════════════════════════════════╝
+""")
+
+        pilot_start = time.time()
+        dag = DagScheduler(max_workers=max_workers, priority=self.dispatch_priority)
+        on_complete = self.seed_pilot_graph(
+            dag, story_ids, start_phase,
+            lambda story_id, phase, iteration, speculative:
+                lambda: self.execute_phase_for_story(story_id, phase, iteration, speculative)
+        )
+
+        results = dag.run(on_complete=on_complete)
+        self.report_dag_run(dag, results, pilot_start)
+
+    def run_pilot_queue(self, story_ids: List[str], start_phase: Phase, max_workers: int, queue: WorkQueue,
+                        worker_id: Optional[str] = None, clear_queue: bool = False):
+        """
+        Run the pilot DAG as one worker of a shared lease-based work queue.
+
+        Every worker seeds the same chains (existing tasks are kept), then claims
+        runnable tasks until no task is pending or leased anywhere. Tasks re-claimed
+        after a worker crash resume from the checkpoint store when they had already
+        succeeded in this run, so completed work is never paid twice.
+
+        Finished tasks with no live lease are an earlier run's: without --resume the
+        worker refuses to start rather than skip them; clear_queue drops them first.
+        """
+        def run_task(key: tuple) -> Dict:
+            task = queue.task(key)
+            # Re-claimed: reuse only what this task's earlier attempt checkpointed
+            resume_since = task["enqueued_at"] if task and task["attempts"] > 1 else None
+            return self.execute_phase_for_story(*key, resume_since=resume_since)
+
+        worker = QueueWorker(queue, run_task, max_workers, worker_id)
+        print(f"""
+╔═══════════════════════════════════════════════════════════════════╗
+║  HYBRID ORCHESTRATOR V2 - Work Queue + GLM                        ║
+║  Stories: {', '.join(story_ids)}
+║  Queue: {queue.db_path}
+║  Worker: {worker.worker_id} | Max workers: {max_workers} | Lease: {queue.lease_seconds:.0f}s
+╚═══════════════════════════════════════════════════════════════════╝
+""")
+        counts = queue.story_counts(story_ids)
+        if counts["live"]:
+            # Another worker is running these stories right now - join its run
+            if clear_queue:
+                print(f"[QUEUE] {counts['live']} live leases on these stories - joining that run, not clearing")
+        elif counts["finished"] and clear_queue:
+            print(f"[QUEUE] Dropped {queue.clear(story_ids)} tasks of an earlier run")
+        elif counts["finished"] and not self.resume:
+            print(f"❌ {counts['finished']} tasks of these stories already finished in an earlier queue run "
+                  f"({counts['unfinished']} unfinished, no live lease). Continue it with --resume, or start "
+                  f"fresh with --clear-queue")
+            return
+
+        pilot_start = time.time()
+        on_complete = self.seed_pilot_graph(queue, story_ids, start_phase,
+                                            lambda story_id, phase, iteration, speculative: None)
+        print(f"[QUEUE] {', '.join(f'{status} {count}' for status, count in queue.counts().items())}")
+
+        results = worker.run(on_complete=on_complete)
+        print(f"\n[QUEUE] {worker.worker_id} ran {len(results)} tasks"
+              + (f", {len(worker.lost)} leases lost" if worker.lost else "")
+              + f" | queue: {', '.join(f'{status} {count}' for status, count in queue.counts().items())}")
+        self.report_dag_run(worker, results, pilot_start)
+
+    def run_pilot_barrier(self, story_ids: List[str], start_phase: Phase = "P1"):
+        """Run full pilot phase by phase (every story finishes a phase before the next starts)"""
         print(f"""
 ╔═══════════════════════════════════════════════════════════════════╗
 ║  HYBRID ORCHESTRATOR V2 - Parallel + GLM                          ║
@@ -628,6 +1747,7 @@ Output: Documentation markdown files.
         # Skip completed phases
         start_idx = phases.index(start_phase)
         phases_to_run = phases[start_idx:]
+        reviews: Dict[str, Dict] = {}
 
         for phase in phases_to_run:
             # Execute phase for all stories in parallel
@@ -635,9 +1755,10 @@ Output: Documentation markdown files.
 
             # Check if any story needs iter2 (P5 returned REQUEST_CHANGES)
             if phase == "P5":
+                reviews.update(results)
                 stories_needing_fixes = [
                     sid for sid, res in results.items()
-                    if "REQUEST_CHANGES" in res.get("response", "")
+                    if self.review_verdict("P5", res) == "REQUEST_CHANGES"
                 ]
 
                 if stories_needing_fixes:
@@ -647,20 +1768,28 @@ Output: Documentation markdown files.
 
                     # Execute P3 iter2 (bug fixes)
                     print(f"\n🔧 Launching P3 iter2 (Bug Fixes)...")
-                    self.execute_phase_parallel(stories_needing_fixes, "P3")
+                    self.execute_phase_parallel(stories_needing_fixes, "P3", iteration=2)
 
                     # Execute P5 iter2 (re-review)
                     print(f"\n🔍 Launching P5 iter2 (Re-review)...")
-                    self.execute_phase_parallel(stories_needing_fixes, "P5")
-
-        # Continue to P6 and P7
-        print(f"\n✅ All stories approved! Continuing to QA and Documentation...")
+                    reviews.update(self.execute_phase_parallel(stories_needing_fixes, "P5", iteration=2))
+
+        # Continue to P6 and P7 - a story whose last review failed or was malformed is not approved
+        unreviewed = [sid for sid in story_ids if not self.review_verdict("P5", reviews.get(sid, {}))]
+        reviewed = [sid for sid in story_ids if sid not in unreviewed]
+        if unreviewed:
+            print(f"\n✗ {len(unreviewed)} stories have no review verdict - no QA/docs: {', '.join(unreviewed)}")
+        if not reviewed:
+            self.metrics["total_time"] = time.time() - pilot_start
+            self.print_final_report()
+            return
+        print(f"\n✅ Reviews done! Continuing to QA and Documentation...")
 
         # P6: QA Testing
-        self.execute_phase_parallel(story_ids, "P6")
+        self.execute_phase_parallel(reviewed, "P6")
 
         # P7: Documentation
-        self.execute_phase_parallel(story_ids, "P7")
+        self.execute_phase_parallel(reviewed, "P7")
 
         # Final report
         pilot_elapsed = time.time() - pilot_start
@@ -668,8 +1797,48 @@ Output: Documentation markdown files.
 
         self.print_final_report()
 
+    def write_report(self) -> Path:
+        """Write reports/pilot_<timestamp>.json (totals, per-story phases, metrics snapshot)
+        plus its .trace.json (Chrome trace events) and .otlp.json (OTLP spans)"""
+        reports_dir = self.project_root / ".experiments/claude-glm-test/reports"
+        reports_dir.mkdir(parents=True, exist_ok=True)
+        path = reports_dir / f"pilot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        chrome_trace, otlp_trace = self.tracer.write(path)
+
+        with self._metrics_lock:
+            stories = json.loads(json.dumps(self.metrics["stories"], default=str))
+            reused_reviews = list(self.metrics["reused_reviews"])
+        report = {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "total_time": self.metrics["total_time"],
+            "totals": self.totals(),
+            "stories": stories,
+            "concurrency_limits": self.limiters.snapshot(),
+            **({"speculation": self.speculation.snapshot()} if self.speculation else {}),
+            "budgets": self.budgets.snapshot(),
+            "reused_reviews": reused_reviews,
+            "trace": {"chrome": str(chrome_trace), "otlp": str(otlp_trace), "spans": len(self.tracer.finished()),
+                      "breakdown": {name: round(seconds, 3) for name, seconds in self.tracer.breakdown().items()}},
+            "metrics": self.registry.snapshot(),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        return path
+
     def print_final_report(self):
-        """Print final execution report"""
+        """Print final execution report and write it to reports/pilot_*.json"""
+        totals = self.totals()
+        budget_events = Counter(event["action"] for event in self.budgets.snapshot()["events"])
+        cache_calls = totals["claude_cache_calls"]
+        prefixed = cache_calls["hit"] + cache_calls["write"]
+        cache_line = (f"{cache_calls['hit']}/{prefixed} prefixed calls hit "
+                      f"({cache_calls['hit'] / prefixed:.0%})" if prefixed else
+                      "off (--claude-context sends reference files as cached system blocks)"
+                      if not self.claude_context else "no cacheable prefix")
+        with self._metrics_lock:
+            reused = list(self.metrics["reused_reviews"])
+        no_op_fixes = [f"{entry['story']} iter{entry['iteration']}" for entry in reused if entry["no_op_fix"]]
+        report_path = self.write_report()
         print(f"""
 ╔═══════════════════════════════════════════════════════════════════╗
 ║  HYBRID V2 PILOT - EXECUTION COMPLETE                             ║
@@ -678,18 +1847,23 @@ Output: Documentation markdown files.
 📊 METRICS:
 
 Total Time:     {self.metrics['total_time'] / 60:.1f} minutes
-Total Cost:     ${self.metrics['total_cost']:.2f}
+Total Cost:     ${totals['cost']:.2f}
 
-Claude Tokens:  {self.metrics['claude_tokens']:,}
-GLM Tokens:     {self.metrics['glm_tokens']:,}
-Total Tokens:   {self.metrics['claude_tokens'] + self.metrics['glm_tokens']:,}
+Claude Tokens:  {totals['claude_tokens']:,} (prompt cache: {totals['claude_cache_read_tokens']:,} read, {totals['claude_cache_write_tokens']:,} written)
+Prompt Cache:   {cache_line}
+GLM Tokens:     {totals['glm_tokens']:,}
+Total Tokens:   {totals['claude_tokens'] + totals['glm_tokens']:,}
 
 Cost Breakdown:
-  Claude:  ${self.metrics['claude_tokens'] / 1_000_000 * 3.5:.2f} ({self.metrics['claude_tokens']:,} tokens)
-  GLM:     ${self.metrics['glm_tokens'] / 1_000_000 * 0.14:.2f} ({self.metrics['glm_tokens']:,} tokens)
+  Claude:  ${totals['claude_cost']:.2f} ({totals['claude_tokens']:,} tokens)
+  GLM:     ${totals['glm_cost']:.2f} ({totals['glm_tokens']:,} tokens)
 
 Stories Completed: {len(self.metrics['stories'])}
 
+Concurrency Limits: {', '.join(f"{key}={info['limit']}" for key, info in self.limiters.snapshot().items()) or 'n/a'}
+Budget Events:  {', '.join(f"{action} {count}" for action, count in sorted(budget_events.items())) or 'none'}
+Reused Reviews: {len(reused)} P5 verdicts without a call (no-op fix rounds: {', '.join(no_op_fixes) or 'none'})
+
 Per Story Breakdown:
 """)
         for story_id, phases in self.metrics['stories'].items():
@@ -698,17 +1872,18 @@ Per Story Breakdown:
             print(f"  {story_id}: ${total_cost:.2f} | {total_time / 60:.1f}m | {len(phases)} phases")
 
         # Savings calculation
-        claude_only_cost = self.metrics['total_cost'] / 0.46  # Reverse 54% savings
-        savings_pct = ((claude_only_cost - self.metrics['total_cost']) / claude_only_cost) * 100
+        claude_only_cost = totals['cost'] / 0.46  # Reverse 54% savings
+        savings_pct = ((claude_only_cost - totals['cost']) / claude_only_cost) * 100 if claude_only_cost else 0
 
         print(f"""
 💰 SAVINGS vs Claude-Only:
   Baseline (Claude):  ${claude_only_cost:.2f}
-  Hybrid (Claude+GLM): ${self.metrics['total_cost']:.2f}
-  Savings:            ${claude_only_cost - self.metrics['total_cost']:.2f} ({savings_pct:.0f}%)
+  Hybrid (Claude+GLM): ${totals['cost']:.2f}
+  Savings:            ${claude_only_cost - totals['cost']:.2f} ({savings_pct:.0f}%)
 
 📝 Full report saved to:
-  .experiments/claude-glm-test/reports/pilot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json
+  {report_path}
+  {report_path.with_suffix('.trace.json')} (chrome://tracing, ui.perfetto.dev)
 """)
 
 
@@ -718,13 +1893,54 @@ def main():
     parser.add_argument("--start-phase", default="P1", choices=["P1", "P2", "P3", "P4", "P5", "P6", "P7"],
                        help="Starting phase (default: P1)")
     parser.add_argument("--project-root", default=".", help="Project root directory")
+    parser.add_argument("--scheduler", choices=["dag", "async", "queue", "barrier"], default="dag",
+                       help="dag: each story advances as soon as its previous phase finishes (default); "
+                            "async: same graph on an asyncio event loop (no thread per API call); "
+                            "queue: same graph in a shared SQLite work queue, one worker per process/host; "
+                            "barrier: all stories finish a phase before the next starts")
+    parser.add_argument("--queue", help="Work queue database for --scheduler queue "
+                                        "(default: .claude/checkpoints/checkpoints.db)")
+    parser.add_argument("--queue-journal", choices=["wal", "delete"], default="wal",
+                       help="SQLite journal for the queue; 'delete' when workers on several hosts share a network volume")
+    parser.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                       help=f"Task lease, renewed by heartbeats (default: {DEFAULT_LEASE_SECONDS:.0f}s)")
+    parser.add_argument("--worker-id", help="Queue worker name (default: hostname:pid)")
+    parser.add_argument("--clear-queue", action="store_true",
+                       help="Drop these stories' tasks left by an earlier queue run before seeding "
+                            "(without it or --resume, a worker refuses stories whose tasks already finished)")
+    parser.add_argument("--dispatch", choices=["longest-first", "fifo"], default="longest-first",
+                       help="Order ready nodes/stories by expected remaining work from complexity, context "
+                            "size and review history (default), or in submission order")
+    parser.add_argument("--max-workers", type=int,
+                       help=f"Global cap on concurrent phase executions (default: {DEFAULT_MAX_WORKERS}, "
+                            f"async: {DEFAULT_MAX_CONCURRENCY})")
+    parser.add_argument("--metrics-port", type=int,
+                       help="Serve Prometheus metrics on 127.0.0.1:PORT/metrics while the pilot runs")
+    parser.add_argument("--resume", action="store_true",
+                       help="Skip (story, phase, iteration) steps already completed in the checkpoint store")
+    parser.add_argument("--verify", action="store_true",
+                       help="After P3/P4 auto-write, run the Vitest tests affected by the written files")
+    parser.add_argument("--test-workers", type=int,
+                       help="Warm Vitest workers for --verify (default: one per 4 cores; 0: cold run per phase)")
+    parser.add_argument("--speculate", type=lambda value: [p.strip() for p in value.split(",") if p.strip()],
+                       default=[], metavar="P7|P6,P7",
+                       help="Run these phases during P5 review, staged until it approves (dag/async scheduler)")
+    parser.add_argument("--speculation-budget", type=float, default=DEFAULT_BUDGET_USD,
+                       help=f"USD ceiling on speculative calls (default: {DEFAULT_BUDGET_USD})")
+    parser.add_argument("--claude-context", action="store_true",
+                       help="Send reference files to Claude as cached system blocks (P5: PATTERNS/TABLES, "
+                            "P1/P6: epic PRD); the report shows the measured cache hit rate")
+    parser.add_argument("--no-review-cache", action="store_true",
+                       help="Always call P5, even when prompt and reviewed files match an earlier review")
     parser.add_argument("--dry-run", action="store_true",
-                       help="Test parallel execution without actual API calls")
+                       help="Simulate the run from recorded call history (pilot_sim.py) without API calls")
 
     args = parser.parse_args()
 
     # Parse story IDs
     story_ids = [s.strip() for s in args.stories.split(',')]
+    if args.max_workers is None:
+        args.max_workers = DEFAULT_MAX_CONCURRENCY if args.scheduler == "async" else DEFAULT_MAX_WORKERS
 
     # Validate project root
     project_root = Path(args.project_root).resolve()
@@ -733,54 +1949,29 @@ def main():
         print("Expected .experiments/claude-glm-test/ directory")
         sys.exit(1)
 
-    # Dry run mode - test parallel execution without API calls
+    # Dry run mode - simulate the pilot from recorded calls (pilot_sim.py), no API calls
     if args.dry_run:
         print("=" * 70)
-        print("DRY RUN MODE - Testing parallel execution")
+        print("DRY RUN MODE - Simulated pilot from recorded call history (no API calls)")
         print("=" * 70)
         print(f"Stories: {story_ids}")
-        print(f"Start phase: {args.start_phase}")
-        print(f"Project root: {project_root}")
+        print(f"Start phase: {args.start_phase} | Scheduler: {args.scheduler} | Max workers: {args.max_workers}")
         print()
 
-        # Test ThreadPoolExecutor with fake tasks
-        from concurrent.futures import ThreadPoolExecutor, as_completed
-        import random
-
-        def fake_task(story_id, phase):
-            """Simulate API call with random delay"""
-            delay = random.uniform(0.5, 2.0)
-            time.sleep(delay)
-            return {"story": story_id, "phase": phase, "time": delay, "success": True}
-
-        phases_to_test = ["P2", "P3"]  # Test 2 phases
-        for phase in phases_to_test:
-            print(f"\n{'='*70}")
-            print(f"PHASE {phase}: Testing parallel execution ({len(story_ids)} stories)")
-            print("=" * 70)
-
-            start = time.time()
-            results = {}
-
-            with ThreadPoolExecutor(max_workers=min(len(story_ids), 4)) as executor:
-                futures = {
-                    executor.submit(fake_task, sid, phase): sid
-                    for sid in story_ids
-                }
-                for future in as_completed(futures):
-                    story_id = futures[future]
-                    result = future.result()
-                    results[story_id] = result
-                    print(f"  [OK] {story_id} completed in {result['time']:.2f}s")
-
-            elapsed = time.time() - start
-            print(f"\nPhase {phase} completed in {elapsed:.2f}s (parallel)")
-            print(f"  Sequential would take: {sum(r['time'] for r in results.values()):.2f}s")
-            print(f"  Speedup: {sum(r['time'] for r in results.values()) / elapsed:.1f}x")
-
-        print("\n" + "=" * 70)
-        print("[SUCCESS] DRY RUN COMPLETE - Parallel execution works!")
-        print("=" * 70)
+        cache_dir = project_root / ".experiments/claude-glm-test/.cache"
+        dists = CallDistributions(cache_dir / "route_history.jsonl")
+        routes = build_routes("router", history_path=cache_dir / "route_history.jsonl")
+        limits = default_limits(cache_dir / "concurrency_state.json")
+        # One queue worker schedules like the DAG scheduler; longest-first is the simulator's "priority"
+        scheduler = "dag" if args.scheduler == "queue" else args.scheduler
+        if scheduler == "dag" and args.dispatch == "longest-first":
+            scheduler = "priority"
+        summary = simulate(story_ids, dists, routes, limits, start_phase=args.start_phase,
+                           scheduler=scheduler, max_workers=args.max_workers,
+                           max_review_iterations=MAX_REVIEW_ITERATIONS)
+        print(f"[SIM] {sum(map(len, dists.samples.values()))} recorded calls, {summary['runs']} simulated runs")
+        print(format_summary(scheduler, summary))
+        print("\nWhat-ifs (schedulers, limits, routes): python pilot_sim.py --compare --help")
         return
 
     # Check for API keys
@@ -789,11 +1980,26 @@ def main():
         sys.exit(1)
 
     # Create orchestrator
-    orchestrator = HybridOrchestratorV2(project_root)
+    orchestrator = HybridOrchestratorV2(project_root, resume=args.resume, verify=args.verify,
+                                        test_workers=args.test_workers, speculate=args.speculate,
+                                        speculation_budget=args.speculation_budget,
+                                        longest_first=args.dispatch == "longest-first",
+                                        reuse_reviews=not args.no_review_cache,
+                                        claude_context=args.claude_context)
+    if args.metrics_port:
+        serve_metrics(orchestrator.registry, args.metrics_port)
+
+    queue = None
+    if args.scheduler == "queue":
+        queue = WorkQueue(Path(args.queue) if args.queue else orchestrator.checkpoints.db_path,
+                          lease_seconds=args.lease_seconds, journal_mode=args.queue_journal.upper(),
+                          priority=orchestrator.dispatch_priority)
 
     # Run pilot
     try:
-        orchestrator.run_pilot(story_ids, start_phase=args.start_phase)
+        orchestrator.run_pilot(story_ids, start_phase=args.start_phase,
+                               scheduler=args.scheduler, max_workers=args.max_workers, queue=queue,
+                               worker_id=args.worker_id, clear_queue=args.clear_queue)
     except KeyboardInterrupt:
         print("\n\n⚠️  Pilot interrupted by user")
         orchestrator.print_final_report()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Metrics Registry - thread-safe counters, gauges and histograms
+
+Worker threads record every call (tokens, cost, latency, outcome) through
+labelled metrics instead of `+=` on a shared dict. The registry can be
+scraped as Prometheus text on a local port while a pilot runs and is dumped
+as a JSON snapshot into the final report.
+
+Usage:
+    registry = MetricsRegistry()
+    calls = registry.counter("pilot_calls_total", "API calls", ["provider", "model", "phase", "status"])
+    calls.inc(provider="glm", model="glm-4.7", phase="P3", status="success")
+    serve_metrics(registry, port=9464)     # GET http://127.0.0.1:9464/metrics
+"""
+
+import json
+import math
+import bisect
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Seconds - LLM calls range from a few seconds (Haiku/flash) to 20 minutes (GLM code generation)
+DEFAULT_LATENCY_BUCKETS = (1, 2.5, 5, 10, 20, 30, 60, 120, 180, 300, 600, 1200)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """Monotonic counter per label set"""
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Value for an exact label set, or the sum over all series matching the given labels"""
+        with self._lock:
+            items = list(self._values.items())
+        return sum(v for key, v in items
+                   if all(key[self.labelnames.index(n)] == str(labels[n]) for n in labels))
+
+    def samples(self) -> List[Tuple[str, Tuple, float]]:
+        with self._lock:
+            return [("", key, value) for key, value in sorted(self._values.items())]
+
+    def snapshot(self) -> List[Dict]:
+        return [{"labels": dict(zip(self.labelnames, key)), "value": value} for _, key, value in self.samples()]
+
+
+class Gauge(Counter):
+    """Value that goes up and down (in-flight calls, current limits)"""
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram per label set (Prometheus semantics)"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[Tuple, Dict] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self) -> List[Tuple[str, Tuple, float]]:
+        out = []
+        with self._lock:
+            series_items = [(key, dict(s, counts=list(s["counts"]))) for key, s in sorted(self._series.items())]
+        for key, series in series_items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                out.append(("_bucket", key + (("le", _format_number(bound)),), cumulative))
+            out.append(("_sum", key, series["sum"]))
+            out.append(("_count", key, series["count"]))
+        return out
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            series_items = sorted(self._series.items())
+        result = []
+        for key, series in series_items:
+            result.append({
+                "labels": dict(zip(self.labelnames, key)),
+                "count": series["count"],
+                "sum": round(series["sum"], 3),
+                "mean": round(series["sum"] / series["count"], 3) if series["count"] else 0,
+                "p50": self._quantile(series, 0.5),
+                "p90": self._quantile(series, 0.9),
+            })
+        return result
+
+    def _quantile(self, series: Dict, q: float) -> Optional[float]:
+        """Upper bucket bound containing the q-quantile"""
+        target = q * series["count"]
+        cumulative = 0
+        for bound, count in zip(self.buckets, series["counts"]):
+            cumulative += count
+            if cumulative >= target and series["count"]:
+                return bound if bound != math.inf else None
+        return None
+
+
+class MetricsRegistry:
+    """Named metrics with Prometheus text and JSON exposition"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, cls, name: str, help_text: str, labelnames: Sequence[str], **kwargs) -> _Metric:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format 0.0.4"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, key, value in metric.samples():
+                extra = key[-1] if key and isinstance(key[-1], tuple) else None
+                values = key[:-1] if extra else key
+                lines.append(f"{metric.name}{suffix}{_format_labels(metric.labelnames, values, extra)} "
+                             f"{_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: {"type": metric.kind, "help": metric.help, "series": metric.snapshot()}
+                for metric in metrics}
+
+
+def serve_metrics(registry: MetricsRegistry, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve GET /metrics (Prometheus text) and /metrics.json in a background thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body = json.dumps(registry.snapshot(), indent=2).encode("utf-8")
+                content_type = "application/json"
+            elif self.path.startswith("/metrics"):
+                body = registry.render_prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes would flood the pilot log
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"[METRICS] Prometheus endpoint: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Data-driven model router for the hybrid orchestrator
+
+Picks the model and Deep Thinking flag per (story, phase) call instead of the
+fixed USE_GLM_FOR_PHASE / GLM_MODEL_FOR_PHASE / DEEP_THINKING_FOR_PHASE tables:
+
+1. Candidates whose context window can't hold the estimated prompt (+ output)
+   are dropped - oversized contexts go to glm-4-long.
+2. The static route stays the default. In phases with an outcome signal
+   (OUTCOME_PHASES - P3, judged by the P5 review) another candidate replaces
+   it once it has MIN_SAMPLES recorded calls for this phase and a lower
+   expected score: cost + latency (priced per minute) + rework risk
+   (1 - success rate x review approval rate). Without a verdict the cheapest
+   model would always look best, so other phases keep the static route
+   unless it doesn't fit; gate phases (P1/P5/P6) have no alternatives.
+3. Exploration (outcome phases only): as long as the static route is picked,
+   alternatives would never get samples. A fitting candidate with fewer than
+   MIN_SAMPLES calls is tried with probability EXPLORE_RATE
+   (POOR_ROUTE_EXPLORE_RATE while the static route's recorded quality is
+   below POOR_QUALITY) - bounded to MIN_SAMPLES exploratory calls per
+   (phase, candidate).
+4. Every decision carries a one-line reason and the per-candidate numbers.
+
+History is appended to .cache/route_history.jsonl after every call; P5
+verdicts are recorded as outcomes of the P3 generation they reviewed.
+
+Usage:
+    python model_router.py --phase P3 --prompt-tokens 150000     # explain a decision
+    python model_router.py --stats
+"""
+
+import json
+import random
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+from collections import defaultdict, deque
+from typing import Dict, Optional, Tuple
+
+DEFAULT_HISTORY_PATH = Path(__file__).parent.parent / ".cache" / "route_history.jsonl"
+
+# Static routing (previous fixed tables) - the default route per phase.
+# Model routing: True = use GLM internally, False = use Claude
+USE_GLM_FOR_PHASE = {
+    "P1": False,  # Claude Sonnet (strategic UX decisions)
+    "P2": True,   # GLM-4.7 (test writing)
+    "P3": True,   # GLM-4.7 (code implementation - GREEN phase)
+    "P4": True,   # GLM-4.7 (refactoring - REFACTOR phase)
+    "P5": False,  # Claude Sonnet (CRITICAL quality gate)
+    "P6": False,  # Claude Sonnet (QA validation)
+    "P7": True,   # GLM-4.5-Air (documentation)
+}
+
+# GLM model per phase (only used when USE_GLM_FOR_PHASE is True)
+GLM_MODEL_FOR_PHASE = {
+    "P2": "glm-4.7",      # Best model for test writing
+    "P3": "glm-4.7",      # Best model for code implementation
+    "P4": "glm-4.7",      # Best model for refactoring
+    "P7": "glm-4.5-air",  # Cheaper/faster for documentation
+}
+
+# Deep Thinking per phase (complex reasoning tasks)
+DEEP_THINKING_FOR_PHASE = {
+    "P2": True,   # Tests need careful reasoning
+    "P3": True,   # Code implementation needs reasoning
+    "P4": False,  # Refactoring is more mechanical
+    "P7": False,  # Docs don't need deep thinking
+}
+
+
+def static_routes() -> Dict[str, Tuple[str, bool]]:
+    """phase -> (model, enable_thinking) from the static tables ("claude" for Claude phases)"""
+    return {
+        phase: (GLM_MODEL_FOR_PHASE.get(phase, "glm-4.7"), DEEP_THINKING_FOR_PHASE.get(phase, False))
+        if use_glm else ("claude", False)
+        for phase, use_glm in USE_GLM_FOR_PHASE.items()
+    }
+
+
+# Context window (tokens) and list price (USD per 1M tokens) per model
+MODEL_PROFILES = {
+    "claude":      {"provider": "claude", "window": 200_000, "input_per_1m": 3.00, "output_per_1m": 15.00, "thinking": False},
+    "glm-4.7":     {"provider": "glm", "window": 128_000, "input_per_1m": 0.60, "output_per_1m": 2.20, "thinking": True},
+    "glm-4-plus":  {"provider": "glm", "window": 128_000, "input_per_1m": 0.70, "output_per_1m": 0.70, "thinking": False},
+    "glm-4-long":  {"provider": "glm", "window": 1_000_000, "input_per_1m": 0.14, "output_per_1m": 0.14, "thinking": False},
+    "glm-4.5-air": {"provider": "glm", "window": 128_000, "input_per_1m": 0.20, "output_per_1m": 1.10, "thinking": True},
+    "glm-4-flash": {"provider": "glm", "window": 128_000, "input_per_1m": 0.00, "output_per_1m": 0.00, "thinking": False},
+}
+
+# Models allowed per phase (UX and the quality gates P1/P5/P6 stay on Claude)
+PHASE_CANDIDATES = {
+    "P1": ["claude"],
+    "P2": ["glm-4.7", "glm-4-plus", "glm-4-long"],
+    "P3": ["glm-4.7", "glm-4-plus", "glm-4-long"],
+    "P4": ["glm-4.7", "glm-4-plus", "glm-4-long"],
+    "P5": ["claude"],
+    "P6": ["claude"],
+    "P7": ["glm-4.5-air", "glm-4-flash", "glm-4.7", "glm-4-long"],
+}
+
+# Phases whose calls get a review verdict (record_review) - only here can history
+# judge quality, so only here may it replace the static route
+OUTCOME_PHASES = {"P3"}
+
+CHARS_PER_TOKEN = 4
+WINDOW_HEADROOM = 0.9          # keep 10% of the window free
+EXPECTED_OUTPUT_TOKENS = 8000  # max_tokens used by the orchestrator
+MIN_SAMPLES = 5
+MAX_SAMPLES = 50
+
+# Score weights (USD): one minute of wall-clock, and a failed/rejected generation
+LATENCY_COST_PER_MIN = 0.02
+REWORK_COST = 0.50
+
+# Chance of trying an under-sampled candidate instead of the scored choice
+EXPLORE_RATE = 0.1
+POOR_ROUTE_EXPLORE_RATE = 0.5
+POOR_QUALITY = 0.5
+
+# Priors for candidates without history (static route is assumed healthy)
+PRIOR_LATENCY = 120.0
+THINKING_LATENCY_FACTOR = 1.5
+
+
+def estimate_tokens(chars: int) -> int:
+    return chars // CHARS_PER_TOKEN
+
+
+class ModelRouter:
+    """Per-call model/thinking decisions from recorded latency, cost and outcomes"""
+
+    def __init__(self, static_routes: Dict[str, Tuple[str, bool]],
+                 history_path: Optional[Path] = None, claude_pricing: Optional[Dict] = None,
+                 explore_rate: float = EXPLORE_RATE, seed: Optional[int] = None):
+        """
+        Args:
+            static_routes: phase -> (model, enable_thinking) - the previous fixed routing
+            claude_pricing: config["pricing"]["claude"] (input_per_1m/output_per_1m) if available
+            explore_rate: Chance of trying an under-sampled candidate (0: never - deterministic,
+                          for simulation and explaining decisions)
+        """
+        self.static_routes = static_routes
+        self.explore_rate = explore_rate
+        self._rng = random.Random(seed)
+        self.history_path = Path(history_path) if history_path else DEFAULT_HISTORY_PATH
+        self.profiles = {model: dict(profile) for model, profile in MODEL_PROFILES.items()}
+        if claude_pricing:
+            self.profiles["claude"].update(
+                {k: claude_pricing[k] for k in ("input_per_1m", "output_per_1m") if k in claude_pricing}
+            )
+
+        self._lock = threading.Lock()
+        # (phase, model, thinking) -> recent call samples
+        self._samples: Dict[tuple, deque] = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+        # (story, phase, iteration) -> (model, thinking) of the latest call, to attach review outcomes
+        self._last_route: Dict[tuple, tuple] = {}
+        self._load()
+
+    # ---- history -------------------------------------------------------
+
+    def _load(self):
+        if not self.history_path.exists():
+            return
+        with open(self.history_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError):
+                    continue
+
+    def _apply(self, record: Dict):
+        if record.get("type") == "outcome":
+            key = (record["story"], record["phase"], record["iteration"])
+            route = self._last_route.get(key)
+            if route:
+                for sample in reversed(self._samples[(record["phase"],) + route]):
+                    if sample["story"] == record["story"] and sample["iteration"] == record["iteration"]:
+                        sample["approved"] = record["approved"]
+                        break
+            return
+
+        route = (record["model"], bool(record["thinking"]))
+        self._samples[(record["phase"],) + route].append(record)
+        self._last_route[(record["story"], record["phase"], record["iteration"])] = route
+
+    def _append(self, record: Dict):
+        with self._lock:
+            self._apply(record)
+            self.history_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.history_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+
+    def record(self, story_id: str, phase: str, iteration: int, decision: Dict, result: Dict):
+        """Record one executed call (orchestrator result dict)"""
+        self._append({
+            "story": story_id,
+            "phase": phase,
+            "iteration": iteration,
+            "model": decision["model"],
+            "thinking": decision["enable_thinking"],
+            "prompt_tokens": decision["prompt_tokens"],
+            "latency": round(result.get("time", 0), 2),
+            "cost": round(result.get("cost", 0), 6),
+            "tokens": result.get("tokens", {}).get("total", 0),
+            "success": bool(result.get("success")),
+            "ts": datetime.now().isoformat(timespec="seconds")
+        })
+
+    def record_review(self, story_id: str, iteration: int, approved: bool):
+        """P5 verdict - outcome of the P3 generation with the same iteration"""
+        self._append({"type": "outcome", "story": story_id, "phase": "P3",
+                      "iteration": iteration, "approved": approved})
+
+    # ---- decisions -----------------------------------------------------
+
+    def _prior(self, phase: str, model: str, thinking: bool, prompt_tokens: int) -> Dict:
+        profile = self.profiles[model]
+        cost = (prompt_tokens * profile["input_per_1m"] + EXPECTED_OUTPUT_TOKENS * profile["output_per_1m"]) / 1_000_000
+        latency = PRIOR_LATENCY * (THINKING_LATENCY_FACTOR if thinking else 1.0)
+        return {"cost": cost, "latency": latency, "quality": 1.0, "samples": 0}
+
+    def _observed(self, phase: str, model: str, thinking: bool) -> Optional[Dict]:
+        samples = list(self._samples.get((phase, model, thinking), ()))
+        if not samples:
+            return None
+        reviewed = [s["approved"] for s in samples if "approved" in s]
+        success_rate = sum(s["success"] for s in samples) / len(samples)
+        approval_rate = sum(reviewed) / len(reviewed) if reviewed else 1.0
+        return {
+            "cost": sum(s["cost"] for s in samples) / len(samples),
+            "latency": sum(s["latency"] for s in samples) / len(samples),
+            "quality": success_rate * approval_rate,
+            "samples": len(samples)
+        }
+
+    @staticmethod
+    def _score(stats: Dict) -> float:
+        return stats["cost"] + stats["latency"] / 60 * LATENCY_COST_PER_MIN + (1 - stats["quality"]) * REWORK_COST
+
+    def route(self, phase: str, prompt_chars: int) -> Dict:
+        """
+        Choose model and thinking flag for one call.
+
+        Args:
+            prompt_chars: Prompt + context size in characters
+
+        Returns:
+            {"model", "provider", "enable_thinking", "prompt_tokens", "reason", "candidates"}
+        """
+        prompt_tokens = estimate_tokens(prompt_chars)
+        default = self.static_routes[phase]
+        candidates = []
+
+        for model in PHASE_CANDIDATES.get(phase, [default[0]]):
+            profile = self.profiles[model]
+            fits = prompt_tokens + EXPECTED_OUTPUT_TOKENS <= profile["window"] * WINDOW_HEADROOM
+            for thinking in ([False, True] if profile["thinking"] else [False]):
+                with self._lock:
+                    observed = self._observed(phase, model, thinking)
+                stats = observed if observed and observed["samples"] >= MIN_SAMPLES else None
+                is_default = (model, thinking) == default
+                if stats is None and is_default:
+                    stats = self._prior(phase, model, thinking, prompt_tokens)
+                candidates.append({
+                    "model": model,
+                    "thinking": thinking,
+                    "fits": fits,
+                    "default": is_default,
+                    "samples": observed["samples"] if observed else 0,
+                    "score": round(self._score(stats), 4) if stats else None,
+                    "stats": {k: round(v, 4) for k, v in stats.items()} if stats else None
+                })
+
+        fitting = [c for c in candidates if c["fits"]]
+        scored = [c for c in fitting if c["score"] is not None]
+        default_entry = next((c for c in candidates if c["default"]), None)
+        learned = phase in OUTCOME_PHASES
+        if not learned and default_entry and default_entry["fits"]:
+            # No quality signal - history would just pick the cheapest model
+            scored = [default_entry]
+        explore = self._explore(phase, fitting, default_entry, prompt_tokens) if learned else None
+
+        if explore:
+            chosen = explore
+            reason = (f"exploring {chosen['model']}{' + thinking' if chosen['thinking'] else ''} "
+                      f"({chosen['samples']}/{MIN_SAMPLES} calls recorded)")
+        elif scored:
+            chosen = min(scored, key=lambda c: (c["score"], not c["default"]))
+            if chosen["default"]:
+                reason = f"static route, score {chosen['score']}"
+            elif default_entry and not default_entry["fits"]:
+                reason = (f"prompt ~{prompt_tokens:,} tokens exceeds {default[0]} window "
+                          f"({self.profiles[default[0]]['window']:,}); best fitting by history")
+            else:
+                reason = (f"history ({chosen['samples']} calls) scores {chosen['score']} vs static "
+                          f"{default_entry['score'] if default_entry else 'n/a'}")
+        elif fitting:
+            # Nothing fitting has history - take the largest-window fitting model (cheapest on ties)
+            chosen = max(fitting, key=lambda c: (self.profiles[c["model"]]["window"],
+                                                 -self.profiles[c["model"]]["input_per_1m"], not c["thinking"]))
+            reason = (f"prompt ~{prompt_tokens:,} tokens exceeds {default[0]} window "
+                      f"({self.profiles[default[0]]['window']:,}); no history - largest window")
+        else:
+            chosen = default_entry or candidates[0]
+            reason = f"prompt ~{prompt_tokens:,} tokens fits no candidate window - using static route"
+
+        return {
+            "model": chosen["model"],
+            "provider": self.profiles[chosen["model"]]["provider"],
+            "enable_thinking": chosen["thinking"],
+            "prompt_tokens": prompt_tokens,
+            "reason": reason,
+            "candidates": candidates,
+            **({"explore": True} if explore else {}),
+        }
+
+    def _explore(self, phase: str, fitting: list, default_entry: Optional[Dict],
+                 prompt_tokens: int) -> Optional[Dict]:
+        """Under-sampled fitting candidate to try on this call, or None (see EXPLORE_RATE)"""
+        under_sampled = [c for c in fitting if not c["default"] and c["samples"] < MIN_SAMPLES]
+        if not under_sampled or not self.explore_rate:
+            return None
+        rate = self.explore_rate
+        if default_entry and default_entry["stats"] and default_entry["samples"] >= MIN_SAMPLES \
+                and default_entry["stats"]["quality"] < POOR_QUALITY:
+            rate = max(rate, POOR_ROUTE_EXPLORE_RATE)
+        if self._rng.random() >= rate:
+            return None
+        # Fewest samples first, then the best prior score
+        return min(under_sampled, key=lambda c: (c["samples"], self._score(
+            self._prior(phase, c["model"], c["thinking"], prompt_tokens))))
+
+    def downgrade(self, phase: str, decision: Dict, max_cost: Optional[float] = None) -> Optional[Dict]:
+        """
+        Cheaper alternative to a routed decision (budgets.py): the cheapest fitting
+        candidate within max_cost (else the cheapest one), never with Deep Thinking.
+
+        Returns:
+            A decision dict like route()'s, or None if no candidate is cheaper
+        """
+        def expected(candidate: Dict) -> Dict:
+            return candidate["stats"] or self._prior(phase, candidate["model"], candidate["thinking"],
+                                                     decision["prompt_tokens"])
+
+        current = next((c for c in decision["candidates"]
+                        if (c["model"], c["thinking"]) == (decision["model"], decision["enable_thinking"])), None)
+        current_cost = expected(current)["cost"] if current else float("inf")
+        cheaper = [c for c in decision["candidates"]
+                   if c["fits"] and not c["thinking"] and c is not current and expected(c)["cost"] < current_cost]
+        if not cheaper:
+            return None
+        within = [c for c in cheaper if max_cost is None or expected(c)["cost"] <= max_cost]
+        chosen = min(within or cheaper, key=lambda c: (expected(c)["cost"], expected(c)["latency"]))
+        return {
+            **decision,
+            "model": chosen["model"],
+            "provider": self.profiles[chosen["model"]]["provider"],
+            "enable_thinking": False,
+            "reason": f"budget downgrade from {decision['model']}"
+                      f"{' + thinking' if decision['enable_thinking'] else ''} "
+                      f"(expected ${current_cost:.4f} -> ${expected(chosen)['cost']:.4f})",
+            "expected_cost": expected(chosen)["cost"],
+        }
+
+    def phase_latency(self, phase: str) -> float:
+        """Mean recorded seconds of a phase over all its routes (static route's prior without history)"""
+        with self._lock:
+            latencies = [sample["latency"] for (recorded_phase, _, _), samples in self._samples.items()
+                         if recorded_phase == phase for sample in samples]
+        if latencies:
+            return sum(latencies) / len(latencies)
+        return PRIOR_LATENCY * (THINKING_LATENCY_FACTOR if self.static_routes[phase][1] else 1.0)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                f"{phase} {model}{' +thinking' if thinking else ''}": self._observed(phase, model, thinking)
+                for (phase, model, thinking) in sorted(self._samples)
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Explain model routing decisions")
+    parser.add_argument("--phase", choices=sorted(PHASE_CANDIDATES), help="Phase to route")
+    parser.add_argument("--prompt-tokens", type=int, default=10000, help="Estimated prompt size in tokens")
+    parser.add_argument("--stats", action="store_true", help="Show recorded history per route")
+    parser.add_argument("--history", default=str(DEFAULT_HISTORY_PATH), help="History file")
+    args = parser.parse_args()
+
+    router = ModelRouter(static_routes(), Path(args.history), explore_rate=0)
+
+    if args.stats or not args.phase:
+        print(json.dumps(router.stats(), indent=2))
+        return
+
+    decision = router.route(args.phase, args.prompt_tokens * CHARS_PER_TOKEN)
+    print(f"{args.phase}: {decision['model']}{' + Deep Thinking' if decision['enable_thinking'] else ''}")
+    print(f"  Reason: {decision['reason']}")
+    for candidate in decision["candidates"]:
+        flags = ("default " if candidate["default"] else "") + ("" if candidate["fits"] else "too-large ")
+        print(f"  - {candidate['model']}{' +thinking' if candidate['thinking'] else ''}: "
+              f"score={candidate['score']} samples={candidate['samples']} {flags}")
+
+
+if __name__ == "__main__":
+    main()
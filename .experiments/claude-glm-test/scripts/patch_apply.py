@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Unified Diff Applier for GLM diff output mode
+
+Fix iterations (P3 iter2, P4 refactor) usually touch a handful of lines, so
+instead of regenerating whole files GLM returns unified diffs which are
+applied locally. The applier is tolerant:
+- hunk line numbers are treated as hints, not facts
+- context is matched exactly, then ignoring trailing/all whitespace
+- up to FUZZ context lines may be dropped from each end of a hunk
+Hunks that still don't apply are reported so the caller can request
+full-file output for just those files. A deletion (+++ /dev/null) is only
+accepted when its hunks remove the whole file; the caller removes it with
+delete_files() when it writes the other files.
+
+Usage:
+    python patch_apply.py --patch fix.diff --base-dir .
+    python patch_apply.py --patch fix.diff --base-dir . --dry-run
+"""
+
+import os
+import re
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Appended to a task prompt (replacing its "Output as JSON" section) in diff mode
+DIFF_OUTPUT_INSTRUCTIONS = """
+Output format - UNIFIED DIFF (do NOT return whole files):
+- Return ONLY the changes, as unified diffs inside ONE ```diff code block
+- One diff per file with headers: --- a/<path> and +++ b/<path>
+- Paths relative to the repository root (e.g. apps/frontend/lib/...)
+- Hunks use standard @@ -old,len +new,len @@ headers with 3 lines of context
+- Context and removed lines must match the provided files EXACTLY
+- New files: use --- /dev/null and a single hunk adding every line
+- After the code block, write one line: SUMMARY: <what changed>
+"""
+
+# Appended to a task prompt when diff hunks failed and full files are needed
+FULL_FILE_FALLBACK_INSTRUCTIONS = """
+The following files could not be patched from your diff. Return the COMPLETE
+final content of ONLY these files (no other files):
+{paths}
+
+Output as JSON:
+{{
+  "files": [
+    {{"path": "...", "content": "... full file content ..."}}
+  ],
+  "summary": "Full-file fallback for X files"
+}}
+"""
+
+DEFAULT_FUZZ = 2
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def _strip_path_prefix(path: str) -> str:
+    """Strip 'a/' / 'b/' prefixes and trailing timestamps from diff header paths"""
+    path = path.split('\t')[0].strip()
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    return path
+
+
+def extract_diff_text(response_text: str) -> str:
+    """
+    Extract unified diff text from a model response.
+
+    Accepts ```diff / ```patch fenced blocks (all of them are concatenated)
+    or a bare diff starting with 'diff --git' / '---'.
+    """
+    if not response_text:
+        return ""
+
+    blocks = re.findall(r"```(?:diff|patch|udiff)\s*\n(.*?)(?:```|\Z)", response_text, re.DOTALL)
+    if blocks:
+        return "\n".join(block.rstrip('\n') for block in blocks) + "\n"
+
+    # Bare diff: start at the first file header
+    match = re.search(r"^(diff --git |--- )", response_text, re.MULTILINE)
+    if match:
+        return response_text[match.start():]
+
+    return ""
+
+
+def extract_summary(response_text: str) -> str:
+    """Extract the 'SUMMARY:' line that follows the diff block"""
+    match = re.search(r"^SUMMARY:\s*(.+)$", response_text or "", re.MULTILINE)
+    return match.group(1).strip() if match else ""
+
+
+def parse_unified_diff(diff_text: str) -> List[Dict]:
+    """
+    Parse unified diff text into per-file patches.
+
+    Returns:
+        List of {"path", "new_file", "deleted", "hunks"} dicts where each hunk is
+        {"old_start", "old_len", "new_start", "new_len", "lines": [(tag, text), ...]}
+        and tag is one of ' ', '-', '+'.
+    """
+    patches = []
+    current = None
+    hunk = None
+    old_path = None
+
+    for raw_line in diff_text.splitlines():
+        if raw_line.startswith("diff --git "):
+            current = None
+            hunk = None
+            continue
+
+        if raw_line.startswith("--- ") and (hunk is None or _hunk_complete(hunk)):
+            old_path = _strip_path_prefix(raw_line[4:])
+            hunk = None
+            continue
+
+        if raw_line.startswith("+++ ") and old_path is not None and hunk is None:
+            new_path = _strip_path_prefix(raw_line[4:])
+            deleted = new_path == "/dev/null"
+            current = {
+                "path": old_path if deleted else new_path,
+                "new_file": old_path == "/dev/null",
+                "deleted": deleted,
+                "hunks": []
+            }
+            patches.append(current)
+            old_path = None
+            continue
+
+        header = _HUNK_HEADER.match(raw_line)
+        if header and current is not None:
+            hunk = {
+                "old_start": int(header.group(1)),
+                "old_len": int(header.group(2)) if header.group(2) is not None else 1,
+                "new_start": int(header.group(3)),
+                "new_len": int(header.group(4)) if header.group(4) is not None else 1,
+                "lines": []
+            }
+            current["hunks"].append(hunk)
+            continue
+
+        if hunk is None:
+            continue
+
+        if raw_line.startswith("\\"):
+            # "\ No newline at end of file"
+            continue
+
+        tag = raw_line[:1]
+        if tag in (" ", "-", "+"):
+            hunk["lines"].append((tag, raw_line[1:]))
+        elif raw_line == "":
+            # Models often drop the leading space on blank context lines
+            hunk["lines"].append((" ", ""))
+
+    # Blank lines after the last real hunk line are padding, not context
+    for patch in patches:
+        for h in patch["hunks"]:
+            while h["lines"] and h["lines"][-1] == (" ", "") and _hunk_complete(h, slack=1):
+                h["lines"].pop()
+
+    return patches
+
+
+def _hunk_complete(hunk: Dict, slack: int = 0) -> bool:
+    """True when a hunk already holds as many old-side lines as its header promises"""
+    old_count = sum(1 for tag, _ in hunk["lines"] if tag in (" ", "-"))
+    return old_count >= hunk["old_len"] + slack
+
+
+def _normalizers():
+    """Line comparison strategies, strictest first"""
+    return [
+        lambda s: s,
+        lambda s: s.rstrip(),
+        lambda s: " ".join(s.split()),
+    ]
+
+
+def _find_block(lines: List[str], block: List[str], hint: int) -> Optional[int]:
+    """
+    Find `block` in `lines`, preferring the position closest to `hint`.
+
+    Tries exact match first, then progressively looser whitespace matching.
+    """
+    if not block:
+        return min(max(hint, 0), len(lines))
+
+    max_start = len(lines) - len(block)
+    if max_start < 0:
+        return None
+
+    for normalize in _normalizers():
+        target = [normalize(line) for line in block]
+        first = target[0]
+        candidates = [
+            i for i in range(max_start + 1)
+            if normalize(lines[i]) == first
+            and all(normalize(lines[i + k]) == target[k] for k in range(1, len(target)))
+        ]
+        if candidates:
+            return min(candidates, key=lambda i: abs(i - hint))
+
+    return None
+
+
+def apply_hunks(original: str, hunks: List[Dict], fuzz: int = DEFAULT_FUZZ) -> Tuple[str, List[int], List[Dict]]:
+    """
+    Apply hunks to file content with fuzzy context matching.
+
+    Args:
+        original: Current file content
+        hunks: Hunks from parse_unified_diff()
+        fuzz: Max context lines dropped from each end of a hunk when matching
+
+    Returns:
+        (new_content, applied_hunk_indexes, failed_hunks)
+    """
+    lines = original.splitlines()
+    trailing_newline = original.endswith("\n") or original == ""
+    applied = []
+    failed = []
+    offset = 0
+
+    for index, hunk in enumerate(hunks):
+        old_block = [text for tag, text in hunk["lines"] if tag in (" ", "-")]
+        hint = max(hunk["old_start"] - 1 + offset, 0)
+
+        position = None
+        used_lines = hunk["lines"]
+
+        for drop in range(0, fuzz + 1):
+            trimmed = _trim_context(hunk["lines"], drop)
+            if trimmed is None:
+                break
+            old_block = [text for tag, text in trimmed if tag in (" ", "-")]
+            position = _find_block(lines, old_block, hint)
+            if position is not None:
+                used_lines = trimmed
+                break
+
+        if position is None:
+            failed.append({"index": index, "old_start": hunk["old_start"],
+                           "reason": "context not found"})
+            continue
+
+        new_block = [text for tag, text in used_lines if tag in (" ", "+")]
+        lines[position:position + len(old_block)] = new_block
+        offset = position - (hunk["old_start"] - 1) + len(new_block) - len(old_block)
+        applied.append(index)
+
+    content = "\n".join(lines)
+    if trailing_newline and lines:
+        content += "\n"
+    return content, applied, failed
+
+
+def _trim_context(hunk_lines: List[Tuple[str, str]], drop: int) -> Optional[List[Tuple[str, str]]]:
+    """Drop up to `drop` leading and trailing context lines (never changed lines)"""
+    if drop == 0:
+        return list(hunk_lines)
+
+    start = 0
+    while start < drop and start < len(hunk_lines) and hunk_lines[start][0] == " ":
+        start += 1
+    end = len(hunk_lines)
+    while len(hunk_lines) - end < drop and end > start and hunk_lines[end - 1][0] == " ":
+        end -= 1
+
+    if start == 0 and end == len(hunk_lines):
+        return None  # Nothing left to trim - further fuzz is pointless
+    return list(hunk_lines[start:end])
+
+
+def apply_patch_set(patches: List[Dict], base_dir: str, fuzz: int = DEFAULT_FUZZ) -> Dict:
+    """
+    Apply parsed patches against files under base_dir (in memory - nothing is written).
+
+    Returns:
+        dict with:
+          "files": [{"path", "content"}] - final content for every file whose
+                   hunks all applied (same shape as GLM "files" output); a file
+                   with a failed hunk is only in "failed" - its partial patch is
+                   never returned, so nothing half-patched reaches the disk
+          "applied": [{"path", "hunks"}] - applied hunk counts
+          "failed": [{"path", "hunks": [...], "reason"}] - files needing fallback
+          "deleted": [path, ...] - files to remove (delete_files()); a delete patch whose
+                     hunks don't remove the whole file is in "failed" instead
+    """
+    files = []
+    applied = []
+    failed = []
+    deleted = []
+
+    for patch in patches:
+        path = patch["path"]
+        full_path = Path(base_dir) / path
+
+        if patch["deleted"]:
+            try:
+                with open(full_path, 'r', encoding='utf-8') as f:
+                    original = f.read()
+            except FileNotFoundError:
+                continue   # already gone
+            if patch["hunks"]:
+                remaining, _, failed_hunks = apply_hunks(original, patch["hunks"], fuzz=fuzz)
+                if failed_hunks or remaining.strip():
+                    failed.append({"path": path, "hunks": failed_hunks,
+                                   "reason": "delete hunks do not match the file"})
+                    continue
+            deleted.append(path)
+            continue
+
+        if patch["new_file"]:
+            original = ""
+        else:
+            try:
+                with open(full_path, 'r', encoding='utf-8') as f:
+                    original = f.read()
+            except FileNotFoundError:
+                failed.append({"path": path, "hunks": [], "reason": "file not found"})
+                continue
+
+        content, applied_idx, failed_hunks = apply_hunks(original, patch["hunks"], fuzz=fuzz)
+
+        if applied_idx:
+            applied.append({"path": path, "hunks": len(applied_idx)})
+        if failed_hunks:
+            failed.append({"path": path, "hunks": failed_hunks, "reason": "hunks failed"})
+        elif applied_idx:
+            files.append({"path": path, "content": content})
+
+    return {
+        "files": files,
+        "applied": applied,
+        "failed": failed,
+        "deleted": deleted,
+    }
+
+
+def delete_files(paths: List[str], base_dir: str) -> Dict:
+    """
+    Remove files a diff deleted (paths relative to base_dir; paths outside it are refused).
+
+    Returns:
+        {"deleted": [full path, ...], "errors": [{"path", "error"}]}
+    """
+    root = Path(base_dir).resolve()
+    deleted, errors = [], []
+    for path in paths:
+        full_path = (root / path).resolve()
+        if root not in full_path.parents:
+            errors.append({"path": path, "error": "outside base dir"})
+            continue
+        try:
+            os.remove(full_path)
+            deleted.append(str(full_path))
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            errors.append({"path": path, "error": str(e)})
+    return {"deleted": deleted, "errors": errors}
+
+
+def apply_diff_response(response_text: str, base_dir: str, fuzz: int = DEFAULT_FUZZ) -> Dict:
+    """
+    Extract, parse and apply the diff in a model response.
+
+    Returns apply_patch_set() result plus "summary" and "patch_count".
+    """
+    patches = parse_unified_diff(extract_diff_text(response_text))
+    result = apply_patch_set(patches, base_dir, fuzz=fuzz)
+    result["summary"] = extract_summary(response_text)
+    result["patch_count"] = len(patches)
+    return result
+
+
+def diff_mode_prompt(template_prompt: str) -> str:
+    """Replace the trailing 'Output as JSON' section of a task prompt with diff instructions"""
+    marker = "\nOutput as JSON:"
+    if marker in template_prompt:
+        template_prompt = template_prompt[:template_prompt.index(marker)]
+    return template_prompt.rstrip() + "\n" + DIFF_OUTPUT_INSTRUCTIONS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a unified diff with fuzzy context matching")
+    parser.add_argument("--patch", required=True, help="Diff file (or model response containing a ```diff block)")
+    parser.add_argument("--base-dir", default=".", help="Base directory for relative paths")
+    parser.add_argument("--fuzz", type=int, default=DEFAULT_FUZZ, help=f"Context fuzz (default: {DEFAULT_FUZZ})")
+    parser.add_argument("--dry-run", action="store_true", help="Report only, don't write files")
+    args = parser.parse_args()
+
+    with open(args.patch, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    result = apply_diff_response(text, args.base_dir, fuzz=args.fuzz)
+
+    if not args.dry_run:
+        from glm_call_updated import write_files_to_disk
+        result["write_result"] = write_files_to_disk(result["files"], args.base_dir)
+        result["delete_result"] = delete_files(result["deleted"], args.base_dir)
+
+    result.pop("files")
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
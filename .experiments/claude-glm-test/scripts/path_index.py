@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Path Index - story ID -> story, PRD, wireframe, test and implementation files
+
+The orchestrator used to glob on every prompt/context build (a recursive
+apps/frontend/**/*{story}*.tsx walk per story per phase), and only for
+epics/current/01-settings. This index maps every story in every epic to its
+files and answers lookups from a dict:
+
+- story:          docs/2-MANAGEMENT/epics/{current,completed}/<epic>/<story>.<slug>.md
+- complexity:     S/M/L/XL from the story file ("**Complexity:** M", "**Estimate:** L", `complexity: "S"`)
+- prd:            docs/1-BASELINE/product/modules/<module>.md for the story's epic
+- wireframes:     wireframe IDs referenced by the story (SET-021, PLAN-009, ...) plus
+                  wireframes whose header names the story
+- tests:          test files tagged "Story: 01.6" in their header or named 01.6.*
+- implementation: source files tagged with the story in their header
+
+Refresh is incremental: a directory whose mtime is unchanged keeps its cached
+listing (new/renamed/deleted entries change the parent directory's mtime),
+and a file is re-read only when its own mtime or size changed - edits to a
+story's wireframe refs or complexity, or to a file's Story: tag, are picked
+up without a rebuild. The index persists to .cache/path_index.pickle.
+
+Usage:
+    python path_index.py --story 01.6            # files for one story
+    python path_index.py --stats                 # index size, stories per epic
+"""
+
+import os
+import re
+import json
+import time
+import pickle
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+DEFAULT_INDEX_PATH = Path(__file__).parent.parent / ".cache" / "path_index.pickle"
+
+EPIC_ROOTS = ["docs/2-MANAGEMENT/epics/current", "docs/2-MANAGEMENT/epics/completed"]
+WIREFRAME_ROOTS = ["docs/3-ARCHITECTURE/ux/wireframes"]
+CODE_ROOTS = ["apps/frontend", "e2e"]
+PRD_DIR = "docs/1-BASELINE/product/modules"
+
+SKIP_DIRS = {"node_modules", ".next", ".git", "__pycache__", "dist", "build", "coverage",
+             "test-results", "playwright-report"}
+CODE_EXTENSIONS = {".ts", ".tsx"}
+HEADER_BYTES = 2048     # story tags live in the file's leading doc comment
+
+INDEX_VERSION = 3
+
+_STORY_FILE = re.compile(r"^(\d{2}\.\d{1,2}[a-z]?)\.[^/]+\.md$")
+_STORY_TAG = re.compile(r"\bStory:?\s+(\d{2}\.\d{1,2}[a-z]?)\b")
+_EPIC_DIR = re.compile(r"^\d{2}-")
+_TEST_FILE = re.compile(r"^(\d{2}\.\d{1,2}[a-z]?)\.")
+_WIREFRAME_ID = re.compile(r"\b([A-Z]{2,5}(?:-[A-Z]{2,5})?-\d{3})\b")
+_COMPLEXITY = re.compile(r"\b(?i:complexity|estimate)\b[*:|\s\"']{1,8}(XL|S|M|L)\b")
+
+
+def is_test_path(path: str) -> bool:
+    name = os.path.basename(path)
+    return ("/__tests__/" in path or "/e2e/" in path or path.startswith("e2e/")
+            or ".test." in name or ".spec." in name)
+
+
+def _read_head(path: str, size: Optional[int] = HEADER_BYTES) -> str:
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read(size) if size else f.read()
+    except OSError:
+        return ""
+
+
+def epic_module(epic: str) -> str:
+    """'01-settings' -> 'settings', '11-integrations' -> 'integrations'"""
+    return epic.split("-", 1)[1] if "-" in epic else epic
+
+
+class PathIndex:
+    """Persistent story -> files index, refreshed from directory mtime deltas"""
+
+    def __init__(self, index_path: Optional[Path] = None, repo_root: Optional[Path] = None):
+        self.index_path = Path(index_path) if index_path else DEFAULT_INDEX_PATH
+        self.repo_root = Path(repo_root) if repo_root else REPO_ROOT
+        # rel dir -> {"mtime_ns", "files": [names], "subdirs": [names]}
+        self.dirs: Dict[str, Dict] = {}
+        # rel file -> {"kind", "stories": [...], "refs": [...], "mtime_ns", "size"}
+        self.files: Dict[str, Dict] = {}
+        self._stories: Optional[Dict[str, Dict]] = None
+        self._last_refresh = 0.0
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._load()
+
+    # ---- persistence ---------------------------------------------------
+
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return
+        if not isinstance(data, dict) or data.get("version") != INDEX_VERSION \
+                or data.get("repo_root") != str(self.repo_root):
+            return
+        self.dirs = data["dirs"]
+        self.files = data["files"]
+
+    def save(self):
+        """Persist if anything changed (atomic replace)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=str(self.index_path.parent), prefix=".tmp-")
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({
+                    "version": INDEX_VERSION,
+                    "repo_root": str(self.repo_root),
+                    "dirs": self.dirs,
+                    "files": self.files,
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+    # ---- refresh -------------------------------------------------------
+
+    def refresh(self, max_age: float = 0.0) -> int:
+        """
+        Bring the index up to date with the working tree.
+
+        Args:
+            max_age: Skip the refresh if the last one is younger than this (seconds)
+
+        Returns:
+            Number of directories re-listed plus files re-read
+        """
+        with self._lock:
+            if max_age and time.monotonic() - self._last_refresh < max_age:
+                return 0
+            changed = 0
+            for kind, roots in (("story", EPIC_ROOTS), ("wireframe", WIREFRAME_ROOTS), ("code", CODE_ROOTS)):
+                for root in roots:
+                    changed += self._scan_dir(root, kind)
+            self._last_refresh = time.monotonic()
+            if changed:
+                self._stories = None
+                self._dirty = True
+            self.save()
+            return changed
+
+    def _scan_dir(self, rel_dir: str, kind: str) -> int:
+        abs_dir = os.path.join(self.repo_root, rel_dir)
+        try:
+            mtime_ns = os.stat(abs_dir).st_mtime_ns
+        except OSError:
+            self._drop_dir(rel_dir)
+            return 0
+
+        changed = 0
+        entry = self.dirs.get(rel_dir)
+        if entry is None or entry["mtime_ns"] != mtime_ns:
+            files, subdirs = [], []
+            try:
+                with os.scandir(abs_dir) as it:
+                    for item in it:
+                        if item.is_dir(follow_symlinks=False):
+                            if item.name not in SKIP_DIRS and not item.name.startswith("."):
+                                subdirs.append(item.name)
+                        elif self._relevant(item.name, kind):
+                            files.append(item.name)
+            except OSError:
+                return 0
+
+            old_files = set(entry["files"]) if entry else set()
+            old_subdirs = set(entry["subdirs"]) if entry else set()
+            for name in old_files - set(files):
+                self.files.pop(f"{rel_dir}/{name}", None)
+            for name in old_subdirs - set(subdirs):
+                self._drop_dir(f"{rel_dir}/{name}")
+            entry = {"mtime_ns": mtime_ns, "files": files, "subdirs": subdirs}
+            self.dirs[rel_dir] = entry
+            changed += 1
+
+        # Content edits don't touch the directory - re-read files whose mtime/size changed
+        for name in entry["files"]:
+            rel_path = f"{rel_dir}/{name}"
+            try:
+                stat = os.stat(os.path.join(abs_dir, name))
+            except OSError:
+                continue    # Deleted - the directory's mtime changed, next refresh drops it
+            info = self.files.get(rel_path)
+            if info is None or info.get("mtime_ns") != stat.st_mtime_ns or info.get("size") != stat.st_size:
+                self.files[rel_path] = {**self._read_tags(rel_path, kind),
+                                        "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+                changed += 1
+
+        for name in entry["subdirs"]:
+            changed += self._scan_dir(f"{rel_dir}/{name}", kind)
+        return changed
+
+    def _drop_dir(self, rel_dir: str):
+        entry = self.dirs.pop(rel_dir, None)
+        if not entry:
+            return
+        for name in entry["files"]:
+            self.files.pop(f"{rel_dir}/{name}", None)
+        for name in entry["subdirs"]:
+            self._drop_dir(f"{rel_dir}/{name}")
+
+    @staticmethod
+    def _relevant(name: str, kind: str) -> bool:
+        if kind == "code":
+            return os.path.splitext(name)[1] in CODE_EXTENSIONS
+        return name.endswith(".md")
+
+    def _read_tags(self, rel_path: str, kind: str) -> Dict:
+        """Story IDs a file belongs to, and wireframe IDs a story file references"""
+        abs_path = os.path.join(self.repo_root, rel_path)
+        name = os.path.basename(rel_path)
+        if kind == "story":
+            match = _STORY_FILE.match(name)
+            epic = os.path.basename(os.path.dirname(rel_path))
+            # 01.0.* are epic-level docs; story files sit directly in <NN-epic>/
+            if not match or match.group(1).endswith(".0") or not _EPIC_DIR.match(epic):
+                return {"kind": "doc", "stories": [], "refs": []}
+            text = _read_head(abs_path, size=None)
+            refs = sorted(set(_WIREFRAME_ID.findall(text)))
+            complexity = _COMPLEXITY.search(text)
+            return {"kind": "story", "stories": [match.group(1)], "refs": refs,
+                    "complexity": complexity.group(1) if complexity else None}
+
+        stories = set(_STORY_TAG.findall(_read_head(abs_path)))
+        if kind == "wireframe":
+            match = _WIREFRAME_ID.match(name)
+            return {"kind": "wireframe", "stories": sorted(stories), "refs": [match.group(1)] if match else []}
+
+        named = _TEST_FILE.match(name)
+        if named:
+            stories.add(named.group(1))
+        return {"kind": "tests" if is_test_path(rel_path) else "implementation",
+                "stories": sorted(stories), "refs": []}
+
+    # ---- lookup --------------------------------------------------------
+
+    def _build_stories(self) -> Dict[str, Dict]:
+        stories: Dict[str, Dict] = {}
+        wireframes_by_id: Dict[str, str] = {}
+
+        def entry_for(story_id: str) -> Dict:
+            return stories.setdefault(story_id, {
+                "story_id": story_id, "epic": None, "story": None, "prd": None, "complexity": None,
+                "wireframes": [], "tests": [], "implementation": [],
+            })
+
+        for rel_path in sorted(self.files):
+            info = self.files[rel_path]
+            if info["kind"] == "wireframe":
+                for wireframe_id in info["refs"]:
+                    wireframes_by_id.setdefault(wireframe_id, rel_path)
+            for story_id in info["stories"]:
+                entry = entry_for(story_id)
+                if info["kind"] == "story":
+                    # epics/current wins over epics/completed
+                    if entry["story"] is None or "/current/" in rel_path:
+                        entry["story"] = rel_path
+                        entry["epic"] = rel_path.split("/")[-2]
+                        entry["complexity"] = info.get("complexity")
+                elif info["kind"] == "wireframe":
+                    entry["wireframes"].append(rel_path)
+                elif info["kind"] in ("tests", "implementation"):
+                    entry[info["kind"]].append(rel_path)
+
+        for entry in stories.values():
+            if entry["story"]:
+                referenced = [wireframes_by_id[ref] for ref in self.files[entry["story"]]["refs"]
+                              if ref in wireframes_by_id]
+                entry["wireframes"] = list(dict.fromkeys(referenced + entry["wireframes"]))
+            if entry["epic"]:
+                prd = f"{PRD_DIR}/{epic_module(entry['epic'])}.md"
+                if os.path.exists(os.path.join(self.repo_root, prd)):
+                    entry["prd"] = prd
+        return stories
+
+    def lookup(self, story_id: str, absolute: bool = True) -> Dict:
+        """
+        Files for a story (empty lists / None when unknown).
+
+        Returns:
+            {"story_id", "epic", "story", "prd", "complexity", "wireframes", "tests", "implementation"}
+        """
+        with self._lock:
+            if self._stories is None:
+                self._stories = self._build_stories()
+            entry = self._stories.get(story_id)
+        if entry is None:
+            entry = {"story_id": story_id, "epic": None, "story": None, "prd": None, "complexity": None,
+                     "wireframes": [], "tests": [], "implementation": []}
+        if not absolute:
+            return {key: list(value) if isinstance(value, list) else value for key, value in entry.items()}
+
+        def resolve(rel_path):
+            return str(self.repo_root / rel_path) if rel_path else None
+        return {
+            key: [resolve(p) for p in value] if isinstance(value, list)
+            else resolve(value) if key in ("story", "prd") else value
+            for key, value in entry.items()
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            if self._stories is None:
+                self._stories = self._build_stories()
+            epics: Dict[str, int] = {}
+            for entry in self._stories.values():
+                if entry["epic"]:
+                    epics[entry["epic"]] = epics.get(entry["epic"], 0) + 1
+            return {
+                "directories": len(self.dirs),
+                "files": len(self.files),
+                "stories": sum(epics.values()),
+                "stories_per_epic": dict(sorted(epics.items())),
+                "index_path": str(self.index_path),
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Story -> file path index")
+    parser.add_argument("--story", help="Show files for a story ID (e.g. 01.6)")
+    parser.add_argument("--stats", action="store_true", help="Show index statistics")
+    parser.add_argument("--index", default=str(DEFAULT_INDEX_PATH), help="Index file")
+    args = parser.parse_args()
+
+    index = PathIndex(Path(args.index))
+    start = time.perf_counter()
+    changed = index.refresh()
+    print(f"[PATH INDEX] refreshed in {(time.perf_counter() - start) * 1000:.0f}ms ({changed} directories re-listed)")
+
+    if args.stats or not args.story:
+        print(json.dumps(index.stats(), indent=2))
+    if args.story:
+        print(json.dumps(index.lookup(args.story, absolute=False), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+Pilot Simulator - discrete-event what-ifs for scheduling, concurrency and routing
+
+Replays recorded calls instead of making them: every (phase, model, thinking)
+route has its past calls in .cache/route_history.jsonl (latency, cost,
+tokens, success), and P5 outcomes give each P3 route's approval rate. A
+simulated pilot draws a recorded call per node (bootstrap), so latency
+tails, failures and fix loops come out as often as they did for real.
+Routes without history use the router's priors.
+
+The model follows the orchestrator:
+- Graph: start phase -> P5 per story; REQUEST_CHANGES (drawn from the
+  approval rate) grows P3/P5 iter+1 up to max_review_iterations, else
+  P6 -> P7. A failed review (no verdict) ends its story; any other failed
+  call doesn't stop it (as in the schedulers)
+- Schedulers: "dag" (FIFO ready queue), "priority" (most expected work
+  left first, then larger story, then furthest along: --dispatch
+  longest-first), "barrier" (phase by phase, one fix round) and "async"
+  (dag with DEFAULT_MAX_CONCURRENCY nodes)
+- Story sizes: --complexity S,M,L,XL assigns complexities to the stories in
+  turn; a story's call latencies scale by its weight (work_estimates.py)
+- Concurrency: a node holds one of max_workers while it waits for a slot of
+  its model's limit (fixed at the given / learned AIMD limit), then calls
+- Routing: static tables, the history router, or per-phase overrides
+
+Each run reports predicted wall-clock (and its lower bound: longest story
+or all call time over the workers), cost, tokens, worker/model
+utilization and slot waits in simulated seconds; the simulation itself
+takes milliseconds of CPU (cpu_ms), so grids of policies and limits are cheap.
+
+Usage:
+    python pilot_sim.py --stories 20 --scheduler dag --max-workers 8
+    python pilot_sim.py --stories 01.2,01.6,01.4 --compare --max-workers 4,8,16
+    python pilot_sim.py --stories 30 --route P3=glm-4-plus --limits claude=6,glm-4.7=10 --runs 200
+    python pilot_sim.py --stories 24 --complexity S,S,M,M,L,XL --compare
+"""
+
+import json
+import heapq
+import random
+import argparse
+import statistics
+import time
+from pathlib import Path
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from model_router import (
+    ModelRouter, static_routes, MODEL_PROFILES, DEFAULT_HISTORY_PATH, EXPECTED_OUTPUT_TOKENS,
+    PRIOR_LATENCY, THINKING_LATENCY_FACTOR
+)
+from concurrency import PROVIDER_LIMITS, DEFAULT_STATE_PATH, provider_for
+from work_estimates import COMPLEXITY_WEIGHTS, REMAINING_BUCKET_PHASES, story_priority
+
+PHASES = ["P1", "P2", "P3", "P4", "P5", "P6", "P7"]
+SCHEDULERS = ("dag", "priority", "barrier", "async")
+DEFAULT_MAX_WORKERS = 8
+ASYNC_MAX_CONCURRENCY = 64    # async_core.DEFAULT_MAX_CONCURRENCY (async_core needs httpx)
+DEFAULT_RUNS = 100
+
+# Priors for routes without history
+DEFAULT_PROMPT_TOKENS = 20_000
+PRIOR_LATENCY_SIGMA = 0.35     # lognormal spread around the prior latency
+PRIOR_SUCCESS_RATE = 0.95
+PRIOR_APPROVAL_RATE = 0.7
+
+
+class CallDistributions:
+    """Recorded calls per (phase, model, thinking) and review approval per P3 route"""
+
+    def __init__(self, history_path: Optional[Path] = None, prompt_tokens: int = DEFAULT_PROMPT_TOKENS):
+        self.history_path = Path(history_path) if history_path else DEFAULT_HISTORY_PATH
+        self.prompt_tokens = prompt_tokens
+        self.samples: Dict[tuple, List[Dict]] = defaultdict(list)
+        self.approvals: Dict[tuple, List[bool]] = defaultdict(list)
+        self._load()
+
+    def _load(self):
+        if not self.history_path.exists():
+            return
+        routes = {}
+        with open(self.history_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    if record.get("type") == "outcome":
+                        route = routes.get((record["story"], record["phase"], record["iteration"]))
+                        if route:
+                            self.approvals[route].append(bool(record["approved"]))
+                        continue
+                    route = (record["model"], bool(record["thinking"]))
+                    routes[(record["story"], record["phase"], record["iteration"])] = route
+                    self.samples[(record["phase"],) + route].append({
+                        "latency": float(record["latency"]),
+                        "cost": float(record["cost"]),
+                        "tokens": int(record.get("tokens") or record["prompt_tokens"] + EXPECTED_OUTPUT_TOKENS),
+                        "success": bool(record["success"]),
+                    })
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+    def prior(self, model: str, thinking: bool) -> Dict:
+        profile = MODEL_PROFILES[model]
+        return {
+            "latency": PRIOR_LATENCY * (THINKING_LATENCY_FACTOR if thinking else 1.0),
+            "cost": (self.prompt_tokens * profile["input_per_1m"]
+                     + EXPECTED_OUTPUT_TOKENS * profile["output_per_1m"]) / 1_000_000,
+            "tokens": self.prompt_tokens + EXPECTED_OUTPUT_TOKENS,
+            "success": PRIOR_SUCCESS_RATE,
+        }
+
+    def sample(self, phase: str, model: str, thinking: bool, rng: random.Random) -> Dict:
+        """One call outcome: a recorded call of this route, else drawn around the prior"""
+        recorded = self.samples.get((phase, model, thinking))
+        if recorded:
+            return rng.choice(recorded)
+        prior = self.prior(model, thinking)
+        return {**prior, "latency": prior["latency"] * rng.lognormvariate(0, PRIOR_LATENCY_SIGMA),
+                "success": rng.random() < prior["success"]}
+
+    def expected_latency(self, phase: str, model: str, thinking: bool) -> float:
+        recorded = self.samples.get((phase, model, thinking))
+        if recorded:
+            return statistics.fmean(s["latency"] for s in recorded)
+        return self.prior(model, thinking)["latency"]
+
+    def approval_rate(self, route: Tuple[str, bool]) -> float:
+        """P(P5 approves) for code generated by this P3 route"""
+        outcomes = self.approvals.get(route)
+        return sum(outcomes) / len(outcomes) if outcomes else PRIOR_APPROVAL_RATE
+
+    def summary(self) -> Dict[str, Dict]:
+        return {
+            f"{phase} {model}{' +thinking' if thinking else ''}": {
+                "calls": len(samples),
+                "latency_mean": round(statistics.fmean(s["latency"] for s in samples), 1),
+                "cost_mean": round(statistics.fmean(s["cost"] for s in samples), 4),
+                "success_rate": round(sum(s["success"] for s in samples) / len(samples), 3),
+            }
+            for (phase, model, thinking), samples in sorted(self.samples.items())
+        }
+
+
+def build_routes(mode: str = "static", overrides: Optional[Dict[str, str]] = None,
+                 history_path: Optional[Path] = None, prompt_tokens: int = DEFAULT_PROMPT_TOKENS) -> Dict[str, Tuple[str, bool]]:
+    """
+    phase -> (model, thinking) for a simulation.
+
+    Args:
+        mode: "static" (fixed tables) or "router" (what ModelRouter picks now for prompt_tokens)
+        overrides: {"P3": "glm-4-plus", "P7": "glm-4.5-air+thinking"}
+    """
+    routes = static_routes()
+    if mode == "router":
+        router = ModelRouter(static_routes(), history_path, explore_rate=0)
+        for phase in PHASES:
+            decision = router.route(phase, prompt_tokens * 4)
+            routes[phase] = (decision["model"], decision["enable_thinking"])
+    for phase, spec in (overrides or {}).items():
+        model, _, flag = spec.partition("+")
+        if model not in MODEL_PROFILES:
+            raise ValueError(f"Unknown model {model!r} for {phase} (known: {', '.join(MODEL_PROFILES)})")
+        routes[phase] = (model, flag == "thinking")
+    return routes
+
+
+def default_limits(state_path: Optional[Path] = None) -> Dict[str, int]:
+    """Per-model limits the LimiterRegistry would start with at this hour (learned, else provider default)"""
+    state = {}
+    path = Path(state_path) if state_path else DEFAULT_STATE_PATH
+    if path.exists():
+        try:
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            pass
+    hour = f"{datetime.now().hour:02d}"
+    return {model: state.get(model, {}).get(hour) or PROVIDER_LIMITS[provider_for(model)][0]
+            for model in MODEL_PROFILES}
+
+
+class PilotSimulation:
+    """One simulated pilot run (event heap in simulated seconds)"""
+
+    def __init__(self, story_ids: Sequence[str], dists: CallDistributions, routes: Dict[str, Tuple[str, bool]],
+                 limits: Dict[str, int], start_phase: str = "P1", scheduler: str = "dag",
+                 max_workers: int = DEFAULT_MAX_WORKERS, max_review_iterations: int = 2, seed: int = 0,
+                 sizes: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            sizes: story -> latency multiplier (complexity weight; 1.0 when missing)
+        """
+        if scheduler not in SCHEDULERS:
+            raise ValueError(f"Unknown scheduler {scheduler!r} (choose from {', '.join(SCHEDULERS)})")
+        self.story_ids = list(story_ids)
+        self.dists = dists
+        self.routes = routes
+        self.limits = limits
+        self.chain = PHASES[PHASES.index(start_phase):]
+        self.scheduler = scheduler
+        self.max_workers = ASYNC_MAX_CONCURRENCY if scheduler == "async" else max_workers
+        self.max_review_iterations = max_review_iterations
+        self.sizes = sizes or {}
+        self._latency: Dict[str, float] = {}          # expected seconds per phase (routes are fixed per run)
+        self.rng = random.Random(seed)
+
+        self.now = 0.0
+        self._events: List[tuple] = []
+        self._seq = 0
+        self._ready: List[tuple] = []                 # (priority, seq, node)
+        self._slot_queue: Dict[str, List[tuple]] = defaultdict(list)
+        self.workers_busy = 0
+        self.in_flight: Dict[str, int] = defaultdict(int)
+        # Barrier: outstanding nodes of the current stage, stories sent back to P3 and
+        # stories whose review failed (no QA/docs)
+        self._stage_left = 0
+        self._stages: List[List[tuple]] = []
+        self._needs_fix: List[str] = []
+        self._unreviewed: set = set()
+
+        self.stats = {"nodes": 0, "failed": 0, "fix_iterations": 0, "cost": 0.0, "tokens": 0,
+                      "worker_busy": 0.0, "worker_wait": 0.0, "slot_wait": 0.0}
+        self.model_busy: Dict[str, float] = defaultdict(float)
+        self.story_time: Dict[str, float] = defaultdict(float)
+
+    # ---- graph -----------------------------------------------------------
+
+    def route(self, phase: str) -> Tuple[str, bool]:
+        return self.routes[phase]
+
+    def remaining_work(self, story_id: str, phase: str, iteration: int) -> float:
+        """Expected seconds of calls left for a story from this node on"""
+        if not self._latency:
+            self._latency = {p: self.dists.expected_latency(p, *self.route(p)) for p in PHASES}
+        phases = PHASES[PHASES.index(phase):] if iteration == 1 else ["P3", "P5", "P6", "P7"][["P3", "P5"].index(phase):]
+        total = sum(self._latency[p] for p in phases)
+        if "P5" in phases and iteration < self.max_review_iterations:
+            rework = 1 - self.dists.approval_rate(self.route("P3"))
+            total += rework * (self._latency["P3"] + self._latency["P5"])
+        return total * self.sizes.get(story_id, 1.0)
+
+    def make_ready(self, story_id: str, phase: str, iteration: int = 1):
+        node = (story_id, phase, iteration)
+        priority = 0.0
+        if self.scheduler == "priority":
+            remaining = self.remaining_work(*node)
+            bucket = REMAINING_BUCKET_PHASES * statistics.fmean(self._latency.values())
+            priority = -story_priority(self.remaining_work(story_id, self.chain[0], 1), remaining, bucket)
+        self._seq += 1
+        heapq.heappush(self._ready, (priority, self._seq, node, self.now))
+
+    def on_complete(self, node: tuple, outcome: Dict):
+        story_id, phase, iteration = node
+        if self.scheduler == "barrier":
+            if phase == "P5" and outcome["review_failed"]:
+                self._unreviewed.add(story_id)
+            elif phase == "P5" and outcome["request_changes"] and iteration == 1:
+                self._needs_fix.append(story_id)
+            self._stage_left -= 1
+            if self._stage_left == 0:
+                self.next_stage()
+            return
+
+        if phase == "P5":
+            if outcome["review_failed"]:
+                return
+            if outcome["request_changes"] and iteration < self.max_review_iterations:
+                self.stats["fix_iterations"] += 1
+                self.make_ready(story_id, "P3", iteration + 1)
+            else:
+                self.make_ready(story_id, "P6")
+        elif phase == "P3" and iteration > 1:
+            self.make_ready(story_id, "P5", iteration)
+        else:
+            position = self.chain.index(phase) if phase in self.chain else None
+            if position is not None and position + 1 < len(self.chain) and phase != "P5":
+                self.make_ready(story_id, self.chain[position + 1])
+
+    def next_stage(self):
+        """Barrier: release the next phase for all stories (fix round after the first P5)"""
+        if self._needs_fix:
+            stories, self._needs_fix = self._needs_fix, []
+            self.stats["fix_iterations"] += len(stories)
+            self._stages[:0] = [[(s, "P3", 2) for s in stories], [(s, "P5", 2) for s in stories]]
+        stage = []
+        while self._stages and not stage:
+            stage = [node for node in self._stages.pop(0) if node[0] not in self._unreviewed]
+        if not stage:
+            return
+        self._stage_left = len(stage)
+        for node in stage:
+            self.make_ready(*node)
+
+    # ---- events ----------------------------------------------------------
+
+    def _push(self, at: float, payload: tuple):
+        self._seq += 1
+        heapq.heappush(self._events, (at, self._seq, payload))
+
+    def dispatch(self):
+        while self._ready and self.workers_busy < self.max_workers:
+            _, _, node, ready_at = heapq.heappop(self._ready)
+            self.workers_busy += 1
+            self.stats["worker_wait"] += self.now - ready_at
+            model = self.route(node[1])[0]
+            if self.in_flight[model] < self.limits.get(model, 1):
+                self.start_call(node, self.now)
+            else:
+                self._slot_queue[model].append((node, self.now))
+
+    def start_call(self, node: tuple, taken_at: float):
+        phase = node[1]
+        model, thinking = self.route(phase)
+        self.in_flight[model] += 1
+        self.stats["slot_wait"] += self.now - taken_at
+        call = self.dists.sample(phase, model, thinking, self.rng)
+        size = self.sizes.get(node[0], 1.0)
+        if size != 1.0:
+            call = {**call, "latency": call["latency"] * size}
+        self.story_time[node[0]] += call["latency"]
+        self._push(self.now + call["latency"], (node, call, taken_at))
+
+    def finish_call(self, node: tuple, call: Dict, taken_at: float):
+        phase = node[1]
+        model, _ = self.route(phase)
+        self.in_flight[model] -= 1
+        self.workers_busy -= 1
+        self.model_busy[model] += call["latency"]
+        self.stats["worker_busy"] += self.now - taken_at
+        self.stats["nodes"] += 1
+        self.stats["cost"] += call["cost"]
+        self.stats["tokens"] += call["tokens"]
+        if not call["success"]:
+            self.stats["failed"] += 1
+        if self._slot_queue[model]:
+            waiting, waiting_since = self._slot_queue[model].pop(0)
+            self.start_call(waiting, waiting_since)
+
+        # A failed review has no verdict - the story is not approved and stops
+        request_changes = phase == "P5" and call["success"] and \
+            self.rng.random() > self.dists.approval_rate(self.route("P3"))
+        self.on_complete(node, {"request_changes": request_changes,
+                                "review_failed": phase == "P5" and not call["success"]})
+
+    def run(self) -> Dict:
+        """
+        Simulate until the graph is drained.
+
+        Returns:
+            {"makespan", "lower_bound", "cost", "tokens", "nodes", "failed", "fix_iterations",
+             "worker_utilization", "model_utilization", "mean_worker_wait", "mean_slot_wait"}
+        """
+        if self.scheduler == "barrier":
+            self._stages = [[(s, phase, 1) for s in self.story_ids] for phase in self.chain]
+            self.max_workers = min(self.max_workers, len(self.story_ids))
+            self.next_stage()
+        else:
+            for story_id in self.story_ids:
+                self.make_ready(story_id, self.chain[0])
+
+        self.dispatch()
+        while self._events:
+            self.now, _, payload = heapq.heappop(self._events)
+            self.finish_call(*payload)
+            self.dispatch()
+
+        makespan = self.now
+        nodes = max(self.stats["nodes"], 1)
+        return {
+            "makespan": makespan,
+            "lower_bound": max(max(self.story_time.values(), default=0.0),
+                               sum(self.story_time.values()) / self.max_workers),
+            "cost": self.stats["cost"],
+            "tokens": self.stats["tokens"],
+            "nodes": self.stats["nodes"],
+            "failed": self.stats["failed"],
+            "fix_iterations": self.stats["fix_iterations"],
+            "worker_utilization": self.stats["worker_busy"] / (self.max_workers * makespan) if makespan else 0.0,
+            "model_utilization": {
+                model: busy / (self.limits.get(model, 1) * makespan) if makespan else 0.0
+                for model, busy in sorted(self.model_busy.items())
+            },
+            "mean_worker_wait": self.stats["worker_wait"] / nodes,
+            "mean_slot_wait": self.stats["slot_wait"] / nodes,
+        }
+
+
+def simulate(story_ids: Sequence[str], dists: CallDistributions, routes: Dict[str, Tuple[str, bool]],
+             limits: Dict[str, int], runs: int = DEFAULT_RUNS, seed: int = 0, **options) -> Dict:
+    """
+    Replicate a simulated pilot `runs` times (seeds seed..seed+runs-1).
+
+    Returns:
+        {"makespan": {"mean", "p50", "p90"}, "lower_bound", "cost", "tokens", "fix_iterations", "failed",
+         "worker_utilization", "model_utilization", "mean_worker_wait", "mean_slot_wait", "runs", "cpu_ms"}
+    """
+    cpu_start = time.process_time()
+    results = [PilotSimulation(story_ids, dists, routes, limits, seed=seed + run, **options).run()
+               for run in range(runs)]
+    makespans = sorted(r["makespan"] for r in results)
+    models = sorted({model for r in results for model in r["model_utilization"]})
+    return {
+        "makespan": {"mean": statistics.fmean(makespans), "p50": makespans[len(makespans) // 2],
+                     "p90": makespans[min(len(makespans) - 1, int(len(makespans) * 0.9))]},
+        **{key: statistics.fmean(r[key] for r in results)
+           for key in ("lower_bound", "cost", "tokens", "fix_iterations", "failed", "worker_utilization",
+                       "mean_worker_wait", "mean_slot_wait")},
+        "model_utilization": {model: statistics.fmean(r["model_utilization"].get(model, 0.0) for r in results)
+                              for model in models},
+        "runs": runs,
+        "cpu_ms": (time.process_time() - cpu_start) * 1000,
+    }
+
+
+def format_duration(seconds: float) -> str:
+    return f"{seconds / 60:.1f}m" if seconds >= 60 else f"{seconds:.1f}s"
+
+
+def format_summary(label: str, summary: Dict) -> str:
+    utilization = ", ".join(f"{model} {value:.0%}" for model, value in summary["model_utilization"].items())
+    return (f"{label}: wall-clock {format_duration(summary['makespan']['mean'])} "
+            f"(p90 {format_duration(summary['makespan']['p90'])}, "
+            f"bound {format_duration(summary['lower_bound'])}) | "
+            f"${summary['cost']:.2f} | {summary['tokens']:,.0f} tokens | "
+            f"{summary['fix_iterations']:.1f} fix loops | workers {summary['worker_utilization']:.0%} "
+            f"(wait {summary['mean_worker_wait']:.0f}s, slot wait {summary['mean_slot_wait']:.0f}s) | "
+            f"models: {utilization} | {summary['cpu_ms']:.0f} ms CPU")
+
+
+def parse_assignments(value: str) -> Dict[str, str]:
+    """'P3=glm-4-plus,P7=glm-4.5-air' -> {"P3": "glm-4-plus", ...}"""
+    pairs = [item.split("=", 1) for item in value.split(",") if item.strip()]
+    return {key.strip(): val.strip() for key, val in pairs}
+
+
+def parse_stories(value: str) -> List[str]:
+    """'01.2,01.6' or a count ('20' -> sim-01..sim-20)"""
+    if value.isdigit():
+        return [f"sim-{i:02d}" for i in range(1, int(value) + 1)]
+    return [s.strip() for s in value.split(",") if s.strip()]
+
+
+def story_sizes(story_ids: Sequence[str], complexities: Sequence[str]) -> Dict[str, float]:
+    """Complexity weights assigned to the stories in turn ('S,M,L' -> S, M, L, S, M, L, ...)"""
+    if not complexities:
+        return {}
+    unknown = set(complexities) - set(COMPLEXITY_WEIGHTS)
+    if unknown:
+        raise ValueError(f"Unknown complexity {', '.join(sorted(unknown))} (choose from S, M, L, XL)")
+    return {story_id: COMPLEXITY_WEIGHTS[complexities[i % len(complexities)]] for i, story_id in enumerate(story_ids)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate pilot runs from recorded call history")
+    parser.add_argument("--stories", default="3", help="Story IDs (comma-separated) or a story count")
+    parser.add_argument("--start-phase", default="P1", choices=PHASES)
+    parser.add_argument("--scheduler", choices=SCHEDULERS, default="dag")
+    parser.add_argument("--max-workers", default=str(DEFAULT_MAX_WORKERS),
+                        help="Global node cap; comma-separated values with --compare")
+    parser.add_argument("--limits", default="", help="Per-model concurrency, e.g. claude=4,glm-4.7=8 "
+                                                     "(default: learned AIMD limits for this hour)")
+    parser.add_argument("--routing", choices=["static", "router"], default="static",
+                        help="static tables, or what the history router picks now")
+    parser.add_argument("--route", default="", help="Per-phase overrides, e.g. P3=glm-4-plus,P7=glm-4.5-air+thinking")
+    parser.add_argument("--prompt-tokens", type=int, default=DEFAULT_PROMPT_TOKENS,
+                        help="Prompt size for priors and router decisions")
+    parser.add_argument("--complexity", default="",
+                        help="Complexities assigned to the stories in turn, e.g. S,M,M,L,XL (default: all M)")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Replications per configuration")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", action="store_true", help="Every scheduler x every --max-workers value")
+    parser.add_argument("--history", default=str(DEFAULT_HISTORY_PATH), help="route_history.jsonl")
+    parser.add_argument("--show-history", action="store_true", help="Print the recorded distributions")
+    args = parser.parse_args()
+
+    dists = CallDistributions(Path(args.history), args.prompt_tokens)
+    if args.show_history:
+        print(json.dumps(dists.summary(), indent=2))
+    routes = build_routes(args.routing, parse_assignments(args.route), Path(args.history), args.prompt_tokens)
+    limits = {**default_limits(), **{model: int(v) for model, v in parse_assignments(args.limits).items()}}
+    story_ids = parse_stories(args.stories)
+    sizes = story_sizes(story_ids, [c.strip() for c in args.complexity.split(",") if c.strip()])
+    worker_options = [int(v) for v in args.max_workers.split(",")]
+
+    print(f"[SIM] {len(story_ids)} stories from {args.start_phase}, {sum(map(len, dists.samples.values()))} "
+          f"recorded calls, {args.runs} runs per configuration")
+    print(f"[SIM] routes: " + ", ".join(f"{phase}={model}{'+thinking' if thinking else ''}"
+                                        for phase, (model, thinking) in sorted(routes.items())))
+    used = sorted({model for model, _ in routes.values()})
+    print(f"[SIM] limits: " + ", ".join(f"{model}={limits[model]}" for model in used))
+
+    schedulers = [s for s in SCHEDULERS if s != "async"] if args.compare else [args.scheduler]
+    for scheduler in schedulers:
+        for max_workers in worker_options:
+            summary = simulate(story_ids, dists, routes, limits, runs=args.runs, seed=args.seed,
+                               start_phase=args.start_phase, scheduler=scheduler, max_workers=max_workers,
+                               sizes=sizes)
+            label = f"{scheduler:<8} workers={max_workers:<3}" if scheduler != "async" else "async"
+            print(format_summary(label, summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Claude Prompt Cache - static system blocks with cache_control breakpoints
+
+With --claude-context, P1, P5 and P6 send the same reference files (P5:
+PATTERNS / TABLES, P1/P6: the epic PRD) for every story of a batch. Here that
+content becomes system blocks ordered from most to least stable, and the
+per-story phase prompt stays in the user message. Anthropic caches the prefix
+up to each `cache_control` breakpoint for 5 minutes: the first call pays 1.25x
+on the prefix, later calls read it at 0.1x and skip most of the prefill. A
+prefix only pays off when the same phase of several stories runs within those
+5 minutes - the run report shows the measured hit rate.
+
+Breakpoints are placed by size:
+- a prefix shorter than the model's minimum (1024 tokens, 2048 for Haiku) is
+  never cached, so no breakpoint goes there
+- a breakpoint is added once the blocks since the previous one reach the minimum,
+  so phases sharing only the leading blocks still get a cache hit on them
+- at most 4 breakpoints per request (API limit), the last one after the final block
+
+Usage:
+    python prompt_cache.py --files .claude/PATTERNS.md,docs/1-BASELINE/product/modules/settings.md
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CHARS_PER_TOKEN = 4
+MAX_BREAKPOINTS = 4
+MIN_CACHEABLE_TOKENS = 1024
+MIN_CACHEABLE_TOKENS_HAIKU = 2048
+
+# Price multipliers on the model's input price (5-minute ephemeral cache)
+CACHE_WRITE_MULTIPLIER = 1.25
+CACHE_READ_MULTIPLIER = 0.10
+
+
+def min_cacheable_tokens(model: str) -> int:
+    return MIN_CACHEABLE_TOKENS_HAIKU if "haiku" in model else MIN_CACHEABLE_TOKENS
+
+
+def build_system_blocks(sections: Sequence[Tuple[str, str]], model: str) -> List[Dict]:
+    """
+    Turn static sections into system text blocks with size-based cache breakpoints.
+
+    Args:
+        sections: (label, text) pairs, most stable first (shared instructions,
+                  then files used by every phase, then module-specific files)
+        model: Claude model id (decides the minimum cacheable prefix)
+
+    Returns:
+        List of {"type": "text", "text": ..., ["cache_control": {"type": "ephemeral"}]}
+    """
+    threshold = min_cacheable_tokens(model)
+    blocks = [{"type": "text", "text": text} for _, text in sections if text]
+    if not blocks:
+        return blocks
+
+    breakpoints = []
+    since_last = 0
+    for index, block in enumerate(blocks[:-1]):
+        since_last += len(block["text"]) // CHARS_PER_TOKEN
+        # Keep one breakpoint for the final block
+        if since_last >= threshold and len(breakpoints) < MAX_BREAKPOINTS - 1:
+            breakpoints.append(index)
+            since_last = 0
+
+    total_tokens = sum(len(block["text"]) for block in blocks) // CHARS_PER_TOKEN
+    if total_tokens >= threshold:
+        breakpoints.append(len(blocks) - 1)
+
+    for index in breakpoints:
+        blocks[index]["cache_control"] = {"type": "ephemeral"}
+    return blocks
+
+
+def cache_usage(usage) -> Dict[str, int]:
+    """Cache token counts from an Anthropic usage object (fields are absent/None without caching)"""
+    return {
+        "cache_write": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        "cache_read": getattr(usage, "cache_read_input_tokens", 0) or 0,
+    }
+
+
+def cache_cost(pricing: Dict, cache_write: int, cache_read: int) -> float:
+    """USD for cache writes/reads; config.json may override the multipliers per model"""
+    write_per_1m = pricing.get("cache_write_per_1m", pricing["input_per_1m"] * CACHE_WRITE_MULTIPLIER)
+    read_per_1m = pricing.get("cache_read_per_1m", pricing["input_per_1m"] * CACHE_READ_MULTIPLIER)
+    return cache_write / 1_000_000 * write_per_1m + cache_read / 1_000_000 * read_per_1m
+
+
+def describe_blocks(blocks: List[Dict], labels: Optional[Sequence[str]] = None) -> str:
+    """One line per block: label, ~tokens, breakpoint marker"""
+    lines = []
+    for index, block in enumerate(blocks):
+        label = labels[index] if labels and index < len(labels) else f"block {index}"
+        marker = "  ◆ cache breakpoint" if "cache_control" in block else ""
+        lines.append(f"  {label:<50} ~{len(block['text']) // CHARS_PER_TOKEN:>7,} tokens{marker}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show where cache breakpoints land for a set of static files")
+    parser.add_argument("--files", required=True, help="Comma-separated files, most stable first")
+    parser.add_argument("--model", default="claude-sonnet-4-5", help="Claude model id")
+    args = parser.parse_args()
+
+    sections = []
+    for path in args.files.split(","):
+        path = Path(path.strip())
+        if path.exists():
+            sections.append((str(path), f"=== FILE: {path} ===\n{path.read_text(encoding='utf-8')}\n"))
+        else:
+            print(f"  ⚠ {path} not found")
+
+    blocks = build_system_blocks(sections, args.model)
+    print(describe_blocks(blocks, [label for label, text in sections if text]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Review Cache - P5 verdicts memoized by a hash of the reviewed inputs
+
+A REQUEST_CHANGES verdict sends a story through P3 iter2 and P5 iter2. When
+the fix round changed nothing (no files extracted from the response, a diff
+that did not apply, or byte-identical output) the re-review read exactly
+what the first review read and costs a full Claude call for the same
+verdict. A review's key is the SHA-256 of:
+
+- The P5 prompt and the model it is routed to
+- Contents of the static files in the cached prefix (epic PRD)
+- Path and content hash of every reviewed file: the story's implementation
+  and test files (path index) plus everything its P2-P4 generations wrote
+  (artifact manifests); a missing file hashes as missing
+
+A P5 node whose key has a stored verdict reuses it without a call, and the
+fix round in between is flagged as a no-op. Entries are kept per story
+(newest MAX_ENTRIES_PER_STORY) in .cache/review_cache.json.
+
+Usage:
+    python review_cache.py --list
+    python review_cache.py --story 01.2 --clear
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from review_stream import parse_decision
+
+DEFAULT_CACHE_PATH = Path(__file__).parent.parent / ".cache" / "review_cache.json"
+MAX_ENTRIES_PER_STORY = 8
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file's bytes ("missing" when it does not exist)"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return "missing"
+
+
+def review_key(prompt: str, model: str, static_contents: Iterable[str], files: Dict[str, str]) -> str:
+    """
+    Key of one review's inputs.
+
+    Args:
+        static_contents: Contents of the static prefix files, in prompt order
+        files: Reviewed repo-relative path -> file_digest()
+    """
+    digest = hashlib.sha256()
+    for part in [prompt, model, *static_contents]:
+        digest.update(part.encode('utf-8'))
+        digest.update(b"\0")
+    for path in sorted(files):
+        digest.update(f"{path}\0{files[path]}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ReviewCache:
+    """Last P5 verdicts per story, valid while the reviewed inputs hash to the same key"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else DEFAULT_CACHE_PATH
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Dict]] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def get(self, story_id: str, key: str) -> Optional[Dict]:
+        """{"iteration", "response", "model", "at"} of the review stored under this key"""
+        with self._lock:
+            entry = self.entries.get(story_id, {}).get(key)
+            return dict(entry) if entry else None
+
+    def put(self, story_id: str, key: str, iteration: int, result: Dict):
+        """Store a successful review's verdict and save"""
+        with self._lock:
+            story = self.entries.setdefault(story_id, {})
+            story.pop(key, None)
+            story[key] = {"iteration": iteration, "response": result.get("response", ""),
+                          "model": result.get("model"), "at": time.time()}
+            for stale in list(story)[:-MAX_ENTRIES_PER_STORY]:
+                del story[stale]
+        self.save()
+
+    def clear(self, story_id: Optional[str] = None) -> int:
+        """Drop one story's entries (all stories when None); returns how many were removed"""
+        with self._lock:
+            if story_id is None:
+                removed = sum(len(story) for story in self.entries.values())
+                self.entries = {}
+            else:
+                removed = len(self.entries.pop(story_id, {}))
+        self.save()
+        return removed
+
+    def save(self):
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), prefix=".tmp-")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear memoized P5 review verdicts")
+    parser.add_argument("--cache", type=Path, default=DEFAULT_CACHE_PATH)
+    parser.add_argument("--story", help="Limit to one story")
+    parser.add_argument("--list", action="store_true", help="List stored verdicts")
+    parser.add_argument("--clear", action="store_true", help="Remove stored verdicts")
+    args = parser.parse_args()
+
+    cache = ReviewCache(args.cache)
+    if args.clear:
+        removed = cache.clear(args.story)
+        print(f"[REVIEW-CACHE] removed {removed} entries")
+        return
+
+    for story_id, story in sorted(cache.entries.items()):
+        if args.story and story_id != args.story:
+            continue
+        for key, entry in story.items():
+            verdict = parse_decision("P5", entry["response"]) or "no decision"
+            stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["at"]))
+            print(f"  {story_id:<8} {key[:12]}  iter{entry['iteration']}  {verdict:<15} {entry['model']}  {stamp}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Review Stream - incremental format checks for streamed P5/P6 gate responses
+
+A blocking `messages.create(max_tokens=8000)` only shows the review once it
+is finished, so an answer that wanders off-format still pays for every
+output token and the full tail latency. Gate phases now stream, and each
+text delta goes through a FormatMonitor:
+
+- The response must open with `DECISION: <verdict>` (APPROVED /
+  REQUEST_CHANGES for P5, PASS / FAIL for P6). No decision line within
+  DECISION_WITHIN_TOKENS, or a decision line with another verdict, aborts
+  the stream as malformed
+- The issue list ends with END_MARKER, which is also sent as a stop
+  sequence: generation stops as soon as the decision and issues are complete
+- Closing the stream early stops generation server-side; usage is taken
+  from the partial message (input) and estimated from the text (output)
+
+Usage:
+    python review_stream.py --phase P5 < saved_review.md
+"""
+
+import re
+import sys
+import argparse
+from typing import Dict, Optional, Tuple
+
+from prompt_cache import CHARS_PER_TOKEN
+
+END_MARKER = "END_REVIEW"
+DECISION_WITHIN_TOKENS = 200
+
+REVIEW_DECISIONS: Dict[str, Tuple[str, ...]] = {
+    "P5": ("APPROVED", "REQUEST_CHANGES"),
+    "P6": ("PASS", "FAIL"),
+}
+
+_DECISION_LINE = re.compile(r"^[#>*_\s]*DECISION[*_\s]*:[*_\s]*([A-Z_]+)?(.*)$", re.MULTILINE)
+
+
+def parse_decision(phase: str, text: Optional[str]) -> Optional[str]:
+    """
+    Verdict of a complete gate response: its first DECISION line, else a line that is
+    only a verdict (responses stored before the DECISION contract). Mentions of a verdict
+    inside issue lines never count.
+
+    Returns:
+        One of REVIEW_DECISIONS[phase], or None when missing / not a valid verdict
+    """
+    if not text:
+        return None
+    match = _DECISION_LINE.search(text)
+    if match:
+        return match.group(1) if match.group(1) in REVIEW_DECISIONS[phase] else None
+    for line in text.splitlines():
+        verdict = line.strip(" \t#>*_`")
+        if verdict in REVIEW_DECISIONS[phase]:
+            return verdict
+    return None
+
+
+def format_instructions(phase: str) -> str:
+    """Output contract appended to a gate phase prompt"""
+    decisions = " or ".join(REVIEW_DECISIONS[phase])
+    return f"""
+OUTPUT FORMAT (parsed automatically):
+DECISION: {decisions}
+ISSUES:
+- [critical|major|minor] path/to/file.ts: what is wrong and how to fix it
+(one line per issue; write "- none" if there are none)
+{END_MARKER}
+
+Start with the DECISION line. Write nothing after {END_MARKER}.
+"""
+
+
+class FormatMonitor:
+    """Feed streamed text; decides when to abort (malformed) or stop (complete)"""
+
+    def __init__(self, phase: str, decision_within_tokens: int = DECISION_WITHIN_TOKENS):
+        self.phase = phase
+        self.decisions = REVIEW_DECISIONS[phase]
+        self.decision_within = decision_within_tokens * CHARS_PER_TOKEN
+        self.buffer = ""
+        self.decision: Optional[str] = None
+        self.outcome: Optional[str] = None   # None (streaming), "complete" or "malformed: ..."
+
+    def feed(self, text: str) -> Optional[str]:
+        """
+        Add a text delta.
+
+        Returns:
+            None to keep streaming, else "complete" / "malformed: <reason>"
+        """
+        if self.outcome:
+            return self.outcome
+        self.buffer += text
+
+        if self.decision is None:
+            for match in _DECISION_LINE.finditer(self.buffer):
+                if match.end() == len(self.buffer):
+                    break                       # line still being written
+                verdict = match.group(1) or ""
+                if verdict not in self.decisions:
+                    self.outcome = f"malformed: decision {verdict or match.group(2).strip()[:40]!r} " \
+                                   f"is not {' / '.join(self.decisions)}"
+                    return self.outcome
+                self.decision = verdict
+                break
+            else:
+                if len(self.buffer) > self.decision_within:
+                    self.outcome = f"malformed: no DECISION line in the first ~{self.decision_within // CHARS_PER_TOKEN} tokens"
+                    return self.outcome
+
+        if self.decision and END_MARKER in self.buffer:
+            self.outcome = "complete"
+        return self.outcome
+
+    def finish(self) -> str:
+        """Stream ended on its own (stop sequence / max_tokens): complete only if a decision was given"""
+        if not self.outcome and self.decision is None:
+            # feed() waits for the newline - a last line `DECISION: APPROVED` never got one
+            self.decision = parse_decision(self.phase, self.buffer)
+        if not self.outcome:
+            self.outcome = "complete" if self.decision else "malformed: no DECISION line"
+        return self.outcome
+
+    @property
+    def malformed(self) -> bool:
+        return bool(self.outcome) and self.outcome.startswith("malformed")
+
+    @property
+    def text(self) -> str:
+        """Response text up to (not including) the end marker"""
+        return self.buffer.split(END_MARKER, 1)[0].rstrip()
+
+
+def format_reminder(phase: str, outcome: str) -> str:
+    """Appended to the prompt when retrying after a malformed opening"""
+    return (f"\n\nYour previous answer was rejected ({outcome.split(': ', 1)[-1]}). "
+            f"The first line must be exactly `DECISION: {' or '.join(REVIEW_DECISIONS[phase])}`.")
+
+
+def estimate_output_tokens(text: str) -> int:
+    """Output tokens of a stream closed before its final usage event"""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a saved gate response against the streaming format monitor")
+    parser.add_argument("--phase", choices=sorted(REVIEW_DECISIONS), default="P5")
+    parser.add_argument("--chunk", type=int, default=16, help="Feed size in characters (simulated deltas)")
+    args = parser.parse_args()
+
+    text = sys.stdin.read()
+    monitor = FormatMonitor(args.phase)
+    for offset in range(0, len(text), args.chunk):
+        if monitor.feed(text[offset:offset + args.chunk]):
+            break
+    monitor.finish()
+    print(f"[REVIEW] outcome: {monitor.outcome}, "
+          f"decision: {monitor.decision}, read {len(monitor.buffer)}/{len(text)} chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Speculation Ledger - downstream phases run during P5 review, kept until the verdict
+
+Most stories pass review, yet P6/P7 only start once P5 is back. With
+speculation on, P7 (documentation) and optionally P6 (QA) start as soon as
+the code P5 reviews exists, and their output waits in a staging area:
+
+- Staging: auto-written files go to .cache/staging/<story>/<phase>-<attempt>/,
+  never into the tree; the phase's result dict is held in memory
+- Commit: when P5 approves the same attempt (the code after P3/P4 of that
+  iteration), the staged files are moved into the project root and the held
+  result becomes the phase's checkpoint - the phase itself doesn't run again
+- Discard: on REQUEST_CHANGES the staging dir is removed; a speculation still
+  running is discarded when it finishes. Its cost is reported as wasted
+- Budget: a speculation starts only if spent + reserved + its estimated cost
+  (router history, else prior) stays under the ceiling (USD); otherwise the
+  phase just runs after review. Calls already running when the ceiling is
+  reached still finish, so actual spend can overshoot by their estimate error
+
+Usage (library):
+    ledger = SpeculationLedger(staging_root, phases=("P7",), budget_usd=2.0)
+    attempt = ledger.reserve("01.2", "P7", 1, estimate=0.03)     # None: over budget
+    ledger.settle("01.2", "P7", attempt, result)
+    ledger.verdict("01.2", 1, approved=True)
+    staged = ledger.claim("01.2", "P7")                          # -> commit_files(...)
+"""
+
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_STAGING_ROOT = Path(__file__).parent.parent / ".cache" / "staging"
+DEFAULT_BUDGET_USD = 2.0
+SPECULATIVE_PHASES = ("P6", "P7")
+
+
+class SpeculationLedger:
+    """Per-story speculative results, review verdicts and the speculation budget (thread-safe)"""
+
+    def __init__(self, staging_root: Optional[Path] = None, phases: Sequence[str] = ("P7",),
+                 budget_usd: float = DEFAULT_BUDGET_USD):
+        unknown = set(phases) - set(SPECULATIVE_PHASES)
+        if unknown:
+            raise ValueError(f"Cannot speculate {', '.join(sorted(unknown))} (only {', '.join(SPECULATIVE_PHASES)})")
+        self.staging_root = Path(staging_root) if staging_root else DEFAULT_STAGING_ROOT
+        self.phases = tuple(phases)
+        self.budget = budget_usd
+        self._lock = threading.Lock()
+        # (story, phase, attempt) -> {"state": reserved|ready|failed, "estimate", "result"}
+        self._entries: Dict[tuple, Dict] = {}
+        # story -> {attempt: approved}
+        self._verdicts: Dict[str, Dict[int, bool]] = {}
+        self.spent = 0.0
+        self.stats = {"started": 0, "skipped_budget": 0, "committed": 0, "discarded": 0, "failed": 0,
+                      "spent": 0.0, "wasted": 0.0}
+
+    def staging_dir(self, story_id: str, phase: str, attempt: int) -> Path:
+        return self.staging_root / story_id / f"{phase}-{attempt}"
+
+    def _reserved(self) -> float:
+        return sum(e["estimate"] for e in self._entries.values() if e["state"] == "reserved")
+
+    def reserve(self, story_id: str, phase: str, attempt: int, estimate: float) -> Optional[int]:
+        """
+        Claim budget for one speculative call (its staging dir is emptied first).
+
+        Returns:
+            attempt, or None if the ceiling would be exceeded
+        """
+        with self._lock:
+            if self.spent + self._reserved() + estimate > self.budget:
+                self.stats["skipped_budget"] += 1
+                return None
+            self._entries[(story_id, phase, attempt)] = {"state": "reserved", "estimate": estimate, "result": None}
+            self.stats["started"] += 1
+        shutil.rmtree(self.staging_dir(story_id, phase, attempt), ignore_errors=True)
+        return attempt
+
+    def settle(self, story_id: str, phase: str, attempt: int, result: Dict):
+        """Record a finished speculative call; discard it at once if its attempt was already rejected"""
+        with self._lock:
+            entry = self._entries[(story_id, phase, attempt)]
+            cost = result.get("cost", 0)
+            self.spent += cost
+            self.stats["spent"] += cost
+            entry.update(state="ready" if result.get("success") else "failed", result=result)
+            if not result.get("success"):
+                self.stats["failed"] += 1
+            rejected = self._verdicts.get(story_id, {}).get(attempt) is False
+        if rejected:
+            self.discard(story_id, attempt)
+
+    def verdict(self, story_id: str, attempt: int, approved: bool):
+        """P5 verdict for the code of this attempt; a rejection discards its finished speculations"""
+        with self._lock:
+            self._verdicts.setdefault(story_id, {})[attempt] = approved
+        if not approved:
+            self.discard(story_id, attempt)
+
+    def discard(self, story_id: str, attempt: int):
+        """Drop finished speculations of one attempt (running ones are dropped when they settle)"""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items()
+                    if key[0] == story_id and key[2] == attempt and entry["state"] in ("ready", "failed")]
+            for key in keys:
+                entry = self._entries.pop(key)
+                self.stats["discarded"] += 1
+                self.stats["wasted"] += entry["result"].get("cost", 0)
+        for _, phase, _ in keys:
+            shutil.rmtree(self.staging_dir(story_id, phase, attempt), ignore_errors=True)
+
+    def claim(self, story_id: str, phase: str) -> Optional[Dict]:
+        """
+        Take the committable speculation for a phase: finished, successful, and for an approved attempt.
+
+        Returns:
+            {"attempt", "result", "staging_dir"} or None (the phase then runs normally)
+        """
+        with self._lock:
+            approved = [attempt for attempt, ok in self._verdicts.get(story_id, {}).items() if ok]
+            if not approved:
+                return None
+            attempt = max(approved)
+            entry = self._entries.get((story_id, phase, attempt))
+            if not entry or entry["state"] != "ready":
+                return None
+            del self._entries[(story_id, phase, attempt)]
+            self.stats["committed"] += 1
+        return {"attempt": attempt, "result": entry["result"],
+                "staging_dir": self.staging_dir(story_id, phase, attempt)}
+
+    def release(self, story_id: str):
+        """Discard whatever is left for a story (e.g. speculations of superseded attempts)"""
+        with self._lock:
+            attempts = {key[2] for key in self._entries if key[0] == story_id}
+        for attempt in attempts:
+            self.discard(story_id, attempt)
+        shutil.rmtree(self.staging_root / story_id, ignore_errors=True)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "spent": round(self.stats["spent"], 4), "wasted": round(self.stats["wasted"], 4),
+                    "budget": self.budget}
+
+
+def commit_files(staging_dir: Path, project_root: Path) -> List[Dict]:
+    """
+    Move staged files into the project (same relative paths) and remove the staging dir.
+
+    Returns:
+        write_files_to_disk-style entries: [{"path": abs path, "lines": n}]
+    """
+    written = []
+    for dirpath, _, filenames in os.walk(staging_dir):
+        for name in filenames:
+            source = Path(dirpath) / name
+            target = project_root / source.relative_to(staging_dir)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(source, 'r', encoding='utf-8', errors='ignore') as f:
+                lines = f.read().count("\n") + 1
+            shutil.move(str(source), str(target))
+            written.append({"path": str(target), "lines": lines})
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    return written
@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+"""
+Test Impact - affected-test selection from a TypeScript import graph
+
+After P3/P4 auto-write files into apps/frontend the only options were the
+whole Vitest suite or nothing. This module builds the import graph of
+apps/frontend (and e2e/) in Python and maps changed files to the tests that
+can observe them:
+
+- Imports: static import/export-from, import(), require() and vi.mock()
+  specifiers; relative paths and tsconfig.json `paths` aliases (@/*),
+  with extension and index-file resolution
+- Vitest tests: files under __tests__/ named *.test.ts(x) that reach a
+  changed file through the reverse graph
+- E2E specs: specs don't import app code, so a changed file is mapped to the
+  app routes (page.tsx / route.ts) that import it, and to the specs whose
+  own files or page objects mention that route's URL
+- Result cache: a test's key is the hash of its own and all transitive
+  inputs' contents (plus the Vitest config); an unchanged key reuses the
+  last pass/fail without running the test
+
+Graph entries are refreshed per file by mtime/size and persisted to
+.cache/import_graph.pickle.
+
+Usage:
+    python test_impact.py --changed apps/frontend/lib/services/permission-service.ts
+    python test_impact.py --changed lib/services/permission-service.ts --run
+"""
+
+import os
+import re
+import json
+import time
+import pickle
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+FRONTEND_ROOT = REPO_ROOT / "apps" / "frontend"
+E2E_ROOTS = [REPO_ROOT / "e2e"]
+DEFAULT_GRAPH_PATH = Path(__file__).parent.parent / ".cache" / "import_graph.pickle"
+DEFAULT_RESULTS_PATH = Path(__file__).parent.parent / ".cache" / "test_results.json"
+
+SOURCE_EXTENSIONS = (".ts", ".tsx", ".js", ".jsx", ".mts", ".mjs")
+RESOLVE_EXTENSIONS = SOURCE_EXTENSIONS + (".json",)
+SKIP_DIRS = {"node_modules", ".next", ".git", "dist", "build", "coverage", "test-results", "playwright-report"}
+# Inputs of every Vitest run - a change here invalidates all cached results
+VITEST_GLOBAL_INPUTS = ["vitest.config.ts", "vitest.setup.ts", "package.json", "tsconfig.json"]
+ROUTE_FILES = {"page.tsx", "page.ts", "route.ts", "layout.tsx"}
+
+GRAPH_VERSION = 2
+VITEST_TIMEOUT = 600
+
+_IMPORT = re.compile(
+    r"""(?:^|[^\w.$])(?:import|export)\s+(?:type\s+)?(?:([\w*{}\s,$]+?)\s+from\s+)?['"]([^'"\n]+)['"]"""
+    r"""|(?:\bimport|\brequire|\bvi\.mock|\bjest\.mock)\s*\(\s*['"]([^'"\n]+)['"]""",
+    re.MULTILINE
+)
+_COMMENT = re.compile(r"/\*.*?\*/|^\s*//[^\n]*", re.DOTALL | re.MULTILINE)
+
+
+def parse_imports(text: str) -> List[tuple]:
+    """
+    Module specifiers imported by a TS/JS source file.
+
+    Returns:
+        [(specifier, names)] - names are the named bindings of `{ A, B as C }`
+        (by their exported name), None for default/namespace/dynamic imports
+    """
+    imports = []
+    for clause, specifier, call_specifier in _IMPORT.findall(_COMMENT.sub("", text)):
+        names = None
+        if clause and clause.strip().startswith("{") and clause.strip().endswith("}"):
+            names = [part.split()[-1] if part.split()[0] != "type" else part.split()[1]
+                     for part in (p.split(" as ")[0].strip() for p in clause.strip()[1:-1].split(","))
+                     if part]
+        imports.append((specifier or call_specifier, names))
+    return imports
+
+
+def _strip_json_comments(text: str) -> str:
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.DOTALL)
+    text = re.sub(r"(^|[^:\"'])//[^\n]*", r"\1", text)
+    return re.sub(r",(\s*[}\]])", r"\1", text)
+
+
+def load_tsconfig_aliases(frontend_root: Path) -> List[tuple]:
+    """
+    tsconfig.json compilerOptions.paths as (prefix, [target dirs]) - "@/*": ["./*"] -> ("@/", [root])
+
+    Longest prefix first, as TypeScript matches it.
+    """
+    tsconfig = frontend_root / "tsconfig.json"
+    try:
+        options = json.loads(_strip_json_comments(tsconfig.read_text(encoding='utf-8'))).get("compilerOptions", {})
+    except (OSError, ValueError):
+        return [("@/", [str(frontend_root)])]
+
+    base = frontend_root / options.get("baseUrl", ".")
+    aliases = []
+    for pattern, targets in options.get("paths", {}).items():
+        prefix = pattern[:-1] if pattern.endswith("*") else pattern
+        dirs = [os.path.normpath(base / (t[:-1] if t.endswith("*") else t)) for t in targets]
+        aliases.append((prefix, dirs))
+    return sorted(aliases, key=lambda alias: len(alias[0]), reverse=True)
+
+
+def file_sha(path: str) -> str:
+    h = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                h.update(block)
+    except OSError:
+        return "missing"
+    return h.hexdigest()
+
+
+def is_vitest_test(path: str) -> bool:
+    name = os.path.basename(path)
+    return f"{os.sep}__tests__{os.sep}" in path and (name.endswith(".test.ts") or name.endswith(".test.tsx"))
+
+
+def route_url(path: str, frontend_root: Path) -> Optional[str]:
+    """app/(authenticated)/planning/purchase-orders/page.tsx -> /planning/purchase-orders (static prefix only)"""
+    if os.path.basename(path) not in ROUTE_FILES:
+        return None
+    rel = Path(os.path.relpath(path, frontend_root))
+    if rel.parts[0] != "app":
+        return None
+    segments = []
+    for part in rel.parts[1:-1]:
+        if part.startswith("(") and part.endswith(")"):
+            continue                 # route group, not part of the URL
+        if part.startswith("[") or part.startswith("@"):
+            break                    # dynamic segment / parallel route - keep the static prefix
+        segments.append(part)
+    return "/" + "/".join(segments) if segments else None
+
+
+class ImportGraph:
+    """Persistent import graph with per-file incremental refresh and content hashes"""
+
+    def __init__(self, frontend_root: Optional[Path] = None, graph_path: Optional[Path] = None,
+                 extra_roots: Optional[List[Path]] = None):
+        self.frontend_root = Path(frontend_root) if frontend_root else FRONTEND_ROOT
+        self.repo_root = self.frontend_root.parents[1]
+        self.roots = [self.frontend_root] + list(E2E_ROOTS if extra_roots is None else extra_roots)
+        self.graph_path = Path(graph_path) if graph_path else DEFAULT_GRAPH_PATH
+        self.aliases = load_tsconfig_aliases(self.frontend_root)
+        # abs path -> {"mtime_ns", "size", "sha", "imports": [resolved abs paths], "text_urls": bool}
+        self.files: Dict[str, Dict] = {}
+        self._reverse: Optional[Dict[str, Set[str]]] = None
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._load()
+
+    # ---- persistence ---------------------------------------------------
+
+    def _load(self):
+        if not self.graph_path.exists():
+            return
+        try:
+            with open(self.graph_path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return
+        if isinstance(data, dict) and data.get("version") == GRAPH_VERSION \
+                and data.get("aliases") == self.aliases and data.get("roots") == [str(r) for r in self.roots]:
+            self.files = data["files"]
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self.graph_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=str(self.graph_path.parent), prefix=".tmp-")
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({"version": GRAPH_VERSION, "aliases": self.aliases,
+                             "roots": [str(r) for r in self.roots], "files": self.files},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.graph_path)
+            self._dirty = False
+
+    # ---- building ------------------------------------------------------
+
+    def resolve(self, specifier: str, importer: str) -> Optional[str]:
+        """Resolve a specifier to a local file (None for packages / unresolvable)"""
+        if specifier.startswith("."):
+            bases = [os.path.normpath(os.path.join(os.path.dirname(importer), specifier))]
+        else:
+            bases = []
+            for prefix, dirs in self.aliases:
+                if specifier.startswith(prefix):
+                    bases = [os.path.join(d, specifier[len(prefix):]) for d in dirs]
+                    break
+            if not bases:
+                return None
+
+        for base in bases:
+            if os.path.isfile(base):
+                return base
+            for ext in RESOLVE_EXTENSIONS:
+                if os.path.isfile(base + ext):
+                    return base + ext
+            for ext in RESOLVE_EXTENSIONS:
+                candidate = os.path.join(base, "index" + ext)
+                if os.path.isfile(candidate):
+                    return candidate
+        return None
+
+    def _walk(self) -> List[str]:
+        paths = []
+        for root in self.roots:
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
+                for name in filenames:
+                    if name.endswith(SOURCE_EXTENSIONS) and not name.endswith(".d.ts"):
+                        paths.append(os.path.join(dirpath, name))
+        return paths
+
+    def update_file(self, path: str) -> bool:
+        """(Re)parse one file if its mtime/size changed. Returns True if it changed."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return self.files.pop(path, None) is not None
+
+        entry = self.files.get(path)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return False
+        try:
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                text = f.read()
+        except OSError:
+            return False
+
+        imports = []
+        bindings: Dict[str, List[str]] = {}
+        for specifier, names in parse_imports(text):
+            resolved = self.resolve(specifier, path)
+            if not resolved:
+                continue
+            if resolved not in imports:
+                imports.append(resolved)
+            if names is None:
+                bindings[resolved] = None
+            elif bindings.get(resolved, []) is not None:
+                bindings[resolved] = bindings.get(resolved, []) + names
+
+        self.files[path] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha": hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest(),
+            "imports": imports,
+            "bindings": bindings,
+            "urls": sorted(set(re.findall(r"['\"`](/[a-z0-9][\w\-/]*)", text))),
+        }
+        return True
+
+    def refresh(self, paths: Optional[Iterable[str]] = None) -> int:
+        """
+        Refresh the given files (e.g. just written by GLM), or walk all roots.
+
+        Returns:
+            Number of files (re)parsed or removed
+        """
+        with self._lock:
+            if paths is None:
+                seen = set(self._walk())
+                changed = sum(1 for path in seen if self.update_file(path))
+                for path in [p for p in self.files if p not in seen]:
+                    del self.files[path]
+                    changed += 1
+            else:
+                changed = sum(1 for path in paths if self.update_file(os.path.abspath(path)))
+            if changed:
+                self._reverse = None
+                self._dirty = True
+            return changed
+
+    # ---- queries -------------------------------------------------------
+
+    def reverse(self) -> Dict[str, Set[str]]:
+        with self._lock:
+            if self._reverse is None:
+                reverse: Dict[str, Set[str]] = {}
+                for path, entry in self.files.items():
+                    for dep in entry["imports"]:
+                        reverse.setdefault(dep, set()).add(path)
+                self._reverse = reverse
+            return self._reverse
+
+    def dependents(self, changed: Iterable[str]) -> Set[str]:
+        """Changed files plus every file that transitively imports one of them"""
+        reverse = self.reverse()
+        seen = set()
+        stack = [os.path.abspath(p) for p in changed]
+        while stack:
+            path = stack.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+            stack.extend(reverse.get(path, ()))
+        return seen
+
+    def dependencies(self, path: str) -> Set[str]:
+        """The file plus everything it transitively imports"""
+        seen = set()
+        stack = [os.path.abspath(path)]
+        while stack:
+            current = stack.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            entry = self.files.get(current)
+            if entry:
+                stack.extend(entry["imports"])
+        return seen
+
+    def used_files(self, path: str) -> Set[str]:
+        """
+        Like dependencies(), but a named import from a barrel (index.ts) only
+        follows the re-exported modules named like the imported bindings, so
+        `import { BOMsPage } from '../pages'` reaches pages/BOMsPage.ts alone.
+        """
+        seen = set()
+        stack = [(os.path.abspath(path), None)]
+        while stack:
+            current, names = stack.pop()
+            if (current, names) in seen:
+                continue
+            seen.add((current, names))
+            entry = self.files.get(current)
+            if not entry:
+                continue
+            is_barrel = names is not None and Path(current).stem == "index"
+            for dep in entry["imports"]:
+                if is_barrel:
+                    if Path(dep).stem in names or Path(dep).stem == "index":
+                        stack.append((dep, names))
+                else:
+                    bound = entry.get("bindings", {}).get(dep)
+                    stack.append((dep, tuple(bound) if bound else None))
+        return {current for current, _ in seen}
+
+    def affected_tests(self, changed: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Tests that can observe a change to these files.
+
+        Returns:
+            {"vitest": [abs test paths], "e2e": [abs spec paths], "routes": [urls]}
+        """
+        with self._lock:
+            return self._affected_tests([os.path.abspath(p) for p in changed])
+
+    def _affected_tests(self, changed: List[str]) -> Dict[str, List[str]]:
+        self.refresh(changed)
+        impacted = self.dependents(changed)
+
+        vitest = sorted(p for p in impacted if is_vitest_test(p))
+        routes = sorted({url for url in (route_url(p, self.frontend_root) for p in impacted) if url})
+
+        e2e = []
+        if routes:
+            specs = [p for p in self.files if p.endswith(".spec.ts") and not p.startswith(str(self.frontend_root))]
+            for spec in specs:
+                urls = set(self.files[spec]["urls"])
+                for dep in self.used_files(spec) - {spec}:
+                    dep_urls = self.files.get(dep, {}).get("urls", ())
+                    # A page object targets one module; a helper listing several is a shared route table
+                    if len({url.split("/")[1] for url in dep_urls}) == 1:
+                        urls.update(dep_urls)
+                if any(url == route or url.startswith(route + "/") or route.startswith(url + "/")
+                       for url in urls if url != "/" for route in routes):
+                    e2e.append(spec)
+        # e2e specs that import a changed file directly (fixtures, page objects)
+        e2e.extend(p for p in impacted if p.endswith(".spec.ts") and not is_vitest_test(p) and p not in e2e)
+
+        self.save()
+        return {"vitest": vitest, "e2e": sorted(e2e), "routes": routes}
+
+    def input_hash(self, test_path: str) -> str:
+        """Hash of a test's transitive inputs (contents) plus the global Vitest inputs"""
+        h = hashlib.sha256()
+        with self._lock:
+            inputs = {path: self.files.get(path, {}).get("sha") for path in self.dependencies(test_path)}
+        for path, sha in sorted(inputs.items()):
+            h.update(path.encode())
+            h.update((sha or file_sha(path)).encode())
+        for name in VITEST_GLOBAL_INPUTS:
+            h.update(file_sha(str(self.frontend_root / name)).encode())
+        return h.hexdigest()
+
+
+class TestResultCache:
+    """Last Vitest outcome per test, valid while its transitive input hash is unchanged"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else DEFAULT_RESULTS_PATH
+        self._lock = threading.Lock()
+        self.results: Dict[str, Dict] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self.results = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def get(self, test_path: str, key: str) -> Optional[Dict]:
+        entry = self.results.get(test_path)
+        return entry if entry and entry["key"] == key else None
+
+    def put(self, test_path: str, key: str, status: str, duration: float):
+        with self._lock:
+            self.results[test_path] = {"key": key, "status": status, "duration": round(duration, 3),
+                                       "at": time.time()}
+
+    def durations(self) -> Dict[str, float]:
+        """Last known duration per test (for sharding)"""
+        with self._lock:
+            return {test: entry["duration"] for test, entry in self.results.items()}
+
+    def save(self):
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), prefix=".tmp-")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.results, f, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+def run_vitest(tests: List[str], frontend_root: Path = FRONTEND_ROOT, timeout: int = VITEST_TIMEOUT) -> Dict[str, Dict]:
+    """
+    Run the given test files once with the JSON reporter.
+
+    Returns:
+        {abs test path: {"status": "passed" | "failed", "duration": seconds}}
+    """
+    if not tests:
+        return {}
+    fd, report_path = tempfile.mkstemp(suffix=".json", prefix="vitest-")
+    os.close(fd)
+    command = ["npx", "vitest", "run", "--reporter=json", f"--outputFile={report_path}"] + \
+              [os.path.relpath(t, frontend_root) for t in tests]
+    try:
+        subprocess.run(command, cwd=str(frontend_root), capture_output=True, text=True, timeout=timeout,
+                       shell=(os.name == "nt"))
+        with open(report_path, encoding='utf-8') as f:
+            report = json.load(f)
+    except (OSError, ValueError, subprocess.TimeoutExpired) as e:
+        return {t: {"status": "error", "duration": 0, "error": str(e)} for t in tests}
+    finally:
+        Path(report_path).unlink(missing_ok=True)
+    return parse_vitest_report(report)
+
+
+def parse_vitest_report(report: Dict) -> Dict[str, Dict]:
+    """Per-file status from a Vitest (Jest-compatible) JSON report"""
+    results = {}
+    for file_result in report.get("testResults", []):
+        duration = (file_result.get("endTime", 0) - file_result.get("startTime", 0)) / 1000
+        results[os.path.abspath(file_result["name"])] = {
+            "status": "passed" if file_result.get("status") == "passed" else "failed",
+            "duration": max(duration, 0),
+            "failures": [a.get("fullName") for a in file_result.get("assertionResults", [])
+                         if a.get("status") == "failed"][:10],
+        }
+    return results
+
+
+def verify_changes(changed: List[str], graph: ImportGraph, cache: TestResultCache,
+                   runner=run_vitest) -> Dict:
+    """
+    Select, run (or reuse) the Vitest tests affected by changed files.
+
+    Args:
+        runner: (tests) -> {test: {"status", "duration", ...}} - run_vitest or a warm worker pool
+
+    Returns:
+        {"selected", "cached", "ran", "passed", "failed", "failures", "results", "e2e", "time"}
+    """
+    start = time.time()
+    affected = graph.affected_tests(changed)
+    keys = {test: graph.input_hash(test) for test in affected["vitest"]}
+
+    outcomes = {}
+    to_run = []
+    for test, key in keys.items():
+        cached = cache.get(test, key)
+        if cached:
+            outcomes[test] = cached
+        else:
+            to_run.append(test)
+
+    for test, outcome in runner(to_run).items():
+        outcomes[test] = outcome
+        if test in keys and outcome["status"] in ("passed", "failed"):
+            cache.put(test, keys[test], outcome["status"], outcome.get("duration", 0))
+    for test in to_run:
+        outcomes.setdefault(test, {"status": "error", "error": "no result reported"})
+    cache.save()
+
+    failed = [test for test, outcome in outcomes.items() if outcome["status"] != "passed"]
+    return {
+        "selected": len(keys),
+        "cached": len(keys) - len(to_run),
+        "ran": len(to_run),
+        "passed": len(outcomes) - len(failed),
+        "failed": len(failed),
+        "failures": {os.path.relpath(test, graph.repo_root): outcomes[test].get("failures") or outcomes[test].get("error")
+                     for test in failed},
+        "results": {os.path.relpath(test, graph.repo_root): outcomes[test]["status"] for test in sorted(outcomes)},
+        "e2e": [os.path.relpath(spec, graph.repo_root) for spec in affected["e2e"]],
+        "time": round(time.time() - start, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Affected-test selection from the TypeScript import graph")
+    parser.add_argument("--changed", nargs="+", required=True,
+                        help="Changed files (repo-relative, frontend-relative or absolute)")
+    parser.add_argument("--run", action="store_true", help="Run the affected Vitest tests (with result cache)")
+    parser.add_argument("--full-refresh", action="store_true", help="Re-walk all roots before selecting")
+    args = parser.parse_args()
+
+    graph = ImportGraph()
+    start = time.perf_counter()
+    if args.full_refresh or not graph.files:
+        graph.refresh()
+    print(f"[IMPACT] graph: {len(graph.files)} files ({(time.perf_counter() - start) * 1000:.0f}ms)")
+
+    changed = []
+    for path in args.changed:
+        for candidate in (Path(path), REPO_ROOT / path, FRONTEND_ROOT / path):
+            if candidate.exists():
+                changed.append(str(candidate.resolve()))
+                break
+        else:
+            print(f"  ⚠ {path} not found")
+
+    if args.run:
+        print(json.dumps(verify_changes(changed, graph, TestResultCache()), indent=2))
+        return
+
+    affected = graph.affected_tests(changed)
+    print(f"[IMPACT] {len(affected['vitest'])} vitest, {len(affected['e2e'])} e2e "
+          f"({(time.perf_counter() - start) * 1000:.0f}ms)")
+    for key in ("vitest", "e2e"):
+        for path in affected[key]:
+            print(f"  {key:<6} {os.path.relpath(path, REPO_ROOT)}")
+    for url in affected["routes"]:
+        print(f"  route  {url}")
+
+
+if __name__ == "__main__":
+    main()
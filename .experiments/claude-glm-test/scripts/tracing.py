@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Tracing - spans for every orchestrator run, exported as Chrome trace and OTLP JSON
+
+The final report sums time per story but shows no timeline, so waiting for
+a worker slot, waiting for a model's concurrency slot and waiting on the
+provider all look the same. The orchestrator now records spans:
+
+- phase: one root span per (story, phase, iteration) node
+  - prepare (prompt, context files, routing), context build,
+    slot wait (model concurrency limit), provider call, extract,
+    file write, verify, checkpoint
+- worker wait: from a DAG node becoming ready to a worker picking it up
+
+Spans carry story, phase, iteration, model and tokens as attributes (children
+inherit story/phase/iteration from their parent). The parent is tracked in a
+contextvar: nested spans in one worker thread or one asyncio task (including
+asyncio.to_thread) link up without passing spans around.
+
+Exports, written next to the pilot report:
+- <report>.trace.json: Chrome trace events (chrome://tracing, ui.perfetto.dev,
+  speedscope); one lane per story (extra lanes for overlapping nodes)
+- <report>.otlp.json: OTLP/JSON (ExportTraceServiceRequest) for any
+  OpenTelemetry backend, e.g. `otel-cli` or a collector's otlpjsonfile receiver
+
+critical_path() walks a DAG run back from its last node; with breakdown()
+it shows where the critical path spent its time.
+
+Usage:
+    python tracing.py reports/pilot_20260105_101500.trace.json      # time per span name and story
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+SERVICE_NAME = "monopilot-orchestrator"
+INHERITED_ATTRIBUTES = ("story", "phase", "iteration", "speculative")
+
+# OTLP SpanKind / StatusCode
+SPAN_KINDS = {"internal": 1, "client": 3}
+STATUS_OK, STATUS_ERROR = 1, 2
+
+
+class Span:
+    """One timed operation (monotonic ns); attributes may be added until it ends"""
+
+    __slots__ = ("name", "kind", "span_id", "parent_id", "attributes", "start_ns", "end_ns", "error")
+
+    def __init__(self, name: str, kind: str, parent: Optional["Span"], attributes: Dict, start_ns: int):
+        self.name = name
+        self.kind = kind
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        inherited = {key: parent.attributes[key] for key in INHERITED_ATTRIBUTES
+                     if parent and key in parent.attributes}
+        self.attributes = {**inherited, **{k: v for k, v in attributes.items() if v is not None}}
+        self.start_ns = start_ns
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+    def fail(self, error: str):
+        self.error = str(error)[:500]
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.monotonic_ns()) - self.start_ns) / 1e9
+
+
+class Tracer:
+    """Thread- and task-safe span recorder for one run"""
+
+    def __init__(self, service_name: str = SERVICE_NAME):
+        self.service_name = service_name
+        self.trace_id = os.urandom(16).hex()
+        # Spans use the monotonic clock; exports shift them to Unix time with this offset
+        self.epoch_offset_ns = time.time_ns() - time.monotonic_ns()
+        self._current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span", default=None)
+        self._lock = threading.Lock()
+        self.spans: List[Span] = []
+
+    def start(self, name: str, kind: str = "internal", root: bool = False, **attributes) -> Span:
+        """Open a span under the current one (root=True: no parent); close it with end()"""
+        span = Span(name, kind, None if root else self._current.get(), attributes, time.monotonic_ns())
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @staticmethod
+    def end(span: Span, **attributes):
+        """Close a span (a second end() is ignored)"""
+        if span.end_ns is None:
+            span.set(**attributes)
+            span.end_ns = time.monotonic_ns()
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", root: bool = False, **attributes) -> Iterator[Span]:
+        """Span around a block; it is the parent of spans opened inside (same thread/task)"""
+        span = self.start(name, kind, root, **attributes)
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.fail(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self._current.reset(token)
+            self.end(span)
+
+    def add(self, name: str, start: float, end: float, **attributes) -> Span:
+        """Record an already finished root span from time.monotonic() seconds (e.g. DAG queue waits)"""
+        span = Span(name, "internal", None, attributes, int(start * 1e9))
+        span.end_ns = int(end * 1e9)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def finished(self) -> List[Span]:
+        with self._lock:
+            return [span for span in self.spans if span.end_ns is not None]
+
+    # ---- analysis --------------------------------------------------------
+
+    def breakdown(self, spans: Optional[Iterable[Span]] = None) -> Dict[str, float]:
+        """Seconds per span name (phase spans excluded - they contain the rest)"""
+        totals: Dict[str, float] = defaultdict(float)
+        for span in spans if spans is not None else self.finished():
+            if span.name != "phase":
+                totals[span.name] += span.duration
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    def node_spans(self, story_id: str, phase: str, iteration: int, speculative: bool = False) -> List[Span]:
+        """All finished spans of one DAG node, its worker wait included"""
+        return [span for span in self.finished()
+                if (span.attributes.get("story"), span.attributes.get("phase"),
+                    span.attributes.get("iteration")) == (story_id, phase, iteration)
+                and bool(span.attributes.get("speculative")) == speculative]
+
+    # ---- export ----------------------------------------------------------
+
+    def _lanes(self, spans: List[Span]) -> Dict[str, Tuple[int, str]]:
+        """span_id -> (tid, lane name): a lane per story; overlapping root spans get extra lanes"""
+        by_id = {span.span_id: span for span in spans}
+        lanes: Dict[str, List[int]] = defaultdict(list)      # story -> end_ns per lane
+        tids: Dict[Tuple[str, int], int] = {}
+        assigned: Dict[str, Tuple[int, str]] = {}
+
+        def root_of(span: Span) -> Span:
+            while span.parent_id in by_id:
+                span = by_id[span.parent_id]
+            return span
+
+        for span in sorted(spans, key=lambda s: s.start_ns):
+            root = root_of(span)
+            if root.span_id not in assigned:
+                story = str(root.attributes.get("story", "pilot"))
+                ends = lanes[story]
+                lane = next((i for i, end in enumerate(ends) if end <= root.start_ns), len(ends))
+                if lane == len(ends):
+                    ends.append(0)
+                ends[lane] = root.end_ns
+                tid = tids.setdefault((story, lane), len(tids) + 1)
+                assigned[root.span_id] = (tid, story if lane == 0 else f"{story} #{lane + 1}")
+            assigned[span.span_id] = assigned[root.span_id]
+        return assigned
+
+    def chrome_trace(self) -> Dict:
+        """Chrome trace-event format ("X" complete events, microseconds)"""
+        spans = self.finished()
+        lanes = self._lanes(spans)
+        origin = min((span.start_ns for span in spans), default=0)
+        events = []
+        for tid, name in sorted(set(lanes.values())):
+            events.append({"ph": "M", "pid": 1, "tid": tid, "name": "thread_name", "args": {"name": name}})
+            events.append({"ph": "M", "pid": 1, "tid": tid, "name": "thread_sort_index", "args": {"sort_index": tid}})
+        for span in spans:
+            label = span.name
+            if span.name == "phase":
+                label = f"{span.attributes.get('phase')}" + (
+                    f" iter{span.attributes['iteration']}" if span.attributes.get("iteration", 1) > 1 else "") + (
+                    " (speculative)" if span.attributes.get("speculative") else "")
+            events.append({
+                "name": label,
+                "cat": span.name,
+                "ph": "X",
+                "ts": (span.start_ns - origin) / 1000,
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": 1,
+                "tid": lanes[span.span_id][0],
+                "args": {**span.attributes, **({"error": span.error} if span.error else {})},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"service": self.service_name, "trace_id": self.trace_id}}
+
+    def otlp(self) -> Dict:
+        """OTLP/JSON ExportTraceServiceRequest with one resource and scope"""
+        return {"resourceSpans": [{
+            "resource": {"attributes": otlp_attributes({"service.name": self.service_name})},
+            "scopeSpans": [{
+                "scope": {"name": "hybrid_orchestrator_v2"},
+                "spans": [{
+                    "traceId": self.trace_id,
+                    "spanId": span.span_id,
+                    **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                    "name": span.name if span.name != "phase" else f"phase {span.attributes.get('phase')}",
+                    "kind": SPAN_KINDS.get(span.kind, 1),
+                    "startTimeUnixNano": str(span.start_ns + self.epoch_offset_ns),
+                    "endTimeUnixNano": str(span.end_ns + self.epoch_offset_ns),
+                    "attributes": otlp_attributes(span.attributes),
+                    "status": {"code": STATUS_ERROR, "message": span.error} if span.error else {"code": STATUS_OK},
+                } for span in self.finished()],
+            }],
+        }]}
+
+    def write(self, base_path: Path) -> Tuple[Path, Path]:
+        """Write <base>.trace.json and <base>.otlp.json; returns both paths"""
+        chrome_path = base_path.with_suffix(".trace.json")
+        otlp_path = base_path.with_suffix(".otlp.json")
+        with open(chrome_path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, default=str)
+        with open(otlp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.otlp(), f, default=str)
+        return chrome_path, otlp_path
+
+
+def otlp_attributes(attributes: Dict) -> List[Dict]:
+    """{"k": v} -> OTLP KeyValue list (ints as strings, per the JSON mapping)"""
+    values = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        values.append({"key": key, "value": typed})
+    return values
+
+
+def critical_path(timings: Dict[Hashable, Tuple[float, float]], deps: Dict[Hashable, set]) -> List[Hashable]:
+    """
+    Chain of nodes that determined a DAG run's makespan.
+
+    From the node that finished last, repeatedly step to the dependency that
+    finished last (the one it actually waited for).
+
+    Returns:
+        Node keys, first to last
+    """
+    if not timings:
+        return []
+    node = max(timings, key=lambda key: timings[key][1])
+    path = [node]
+    while True:
+        previous = [dep for dep in deps.get(node, ()) if dep in timings]
+        if not previous:
+            break
+        node = max(previous, key=lambda key: timings[key][1])
+        path.append(node)
+    return path[::-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a Chrome trace written by the orchestrator")
+    parser.add_argument("trace", help="reports/pilot_*.trace.json")
+    args = parser.parse_args()
+
+    with open(args.trace, encoding='utf-8') as f:
+        events = [e for e in json.load(f)["traceEvents"] if e.get("ph") == "X"]
+    if not events:
+        print("[TRACE] no spans")
+        sys.exit(1)
+
+    wall = (max(e["ts"] + e["dur"] for e in events) - min(e["ts"] for e in events)) / 1e6
+    by_name: Dict[str, float] = defaultdict(float)
+    by_story: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for event in events:
+        if event["cat"] == "phase":
+            continue
+        by_name[event["cat"]] += event["dur"] / 1e6
+        by_story[str(event["args"].get("story", "pilot"))][event["cat"]] += event["dur"] / 1e6
+
+    print(f"[TRACE] {len(events)} spans over {wall:.1f}s wall-clock")
+    for name, seconds in sorted(by_name.items(), key=lambda item: -item[1]):
+        print(f"  {name:<14} {seconds:9.1f}s")
+    for story, names in sorted(by_story.items()):
+        print(f"  {story}: " + ", ".join(f"{name} {seconds:.1f}s"
+                                         for name, seconds in sorted(names.items(), key=lambda item: -item[1])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Vitest Pool - warm, sharded Vitest processes for per-phase verification
+
+Test selection (test_impact.py) cut verification down to a handful of files,
+but every `npx vitest run` still pays Node start, config load, the Vite
+server and a cold transform of every imported module. The pool keeps
+long-lived workers (vitest_worker.mjs, Vitest's Node API) instead:
+
+- Each worker owns a share of the CPU cores (Vitest maxWorkers = cores / size)
+- A verification is split into shards (longest known duration first) over
+  the workers that are idle, so parallel stories verify concurrently
+- The pool keeps a log of changed files; before each request a worker is
+  sent every change logged since its last run and invalidates it in its
+  module graph (also changes verified by other workers); everything else
+  stays transformed
+- A worker is recycled after a request when its RSS exceeds max_rss_mb or it
+  has served max_requests, and restarted after a crash or timeout
+- Workers start lazily on first use; warm() starts them in the background
+
+The pool is a drop-in `runner` for test_impact.verify_changes.
+
+Usage:
+    python vitest_pool.py --tests lib/services/__tests__/permission-service.test.ts --repeat 3
+"""
+
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from test_impact import FRONTEND_ROOT
+
+WORKER_SCRIPT = Path(__file__).parent / "vitest_worker.mjs"
+REPLY_PREFIX = "@@vitest-worker "
+
+DEFAULT_MAX_RSS_MB = 1536
+DEFAULT_MAX_REQUESTS = 200
+STARTUP_TIMEOUT = 120
+REQUEST_TIMEOUT = 600
+
+
+def default_pool_size() -> int:
+    """One worker per 4 cores (each runs its own Vitest thread pool), at least 1, at most 4"""
+    return max(1, min(4, (os.cpu_count() or 2) // 4))
+
+
+def split_shards(tests: Sequence[str], shard_count: int, durations: Optional[Dict[str, float]] = None) -> List[List[str]]:
+    """
+    Longest-processing-time split: slowest known tests first, each to the lightest shard.
+
+    Returns:
+        Non-empty shards (at most shard_count)
+    """
+    durations = durations or {}
+    shards = [([], 0.0) for _ in range(max(1, min(shard_count, len(tests))))]
+    for test in sorted(tests, key=lambda t: durations.get(t, 1.0), reverse=True):
+        index = min(range(len(shards)), key=lambda i: shards[i][1])
+        files, load = shards[index]
+        files.append(test)
+        shards[index] = (files, load + durations.get(test, 1.0))
+    return [files for files, _ in shards if files]
+
+
+class VitestWorker:
+    """One long-lived vitest_worker.mjs process (one request at a time)"""
+
+    def __init__(self, frontend_root: Path, max_workers: int, synced: int = 0):
+        self.frontend_root = frontend_root
+        self.max_workers = max_workers
+        # Sequence number of the last logged change this worker has invalidated
+        self.synced = synced
+        self.requests_served = 0
+        self.rss = 0
+        self._next_id = 0
+        self._replies: "queue.Queue[Dict]" = queue.Queue()
+        self.ready = False
+        try:
+            self.process = subprocess.Popen(
+                ["node", str(WORKER_SCRIPT), "--max-workers", str(max_workers)],
+                cwd=str(frontend_root), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                text=True, encoding="utf-8", bufsize=1
+            )
+        except OSError as e:
+            print(f"[POOL] cannot start vitest worker: {e}")
+            self.process = None
+            return
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+        self.ready = self._wait({"ready"}, STARTUP_TIMEOUT) is not None
+
+    def _read(self):
+        for line in self.process.stdout:
+            if line.startswith(REPLY_PREFIX):
+                try:
+                    self._replies.put(json.loads(line[len(REPLY_PREFIX):]))
+                except ValueError:
+                    continue
+        self._replies.put({"exited": True})
+
+    def _wait(self, keys: set, timeout: float, request_id: Optional[int] = None) -> Optional[Dict]:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                message = self._replies.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if message.get("exited"):
+                return None
+            self.rss = message.get("rss", self.rss)
+            if keys & message.keys() and (request_id is None or message.get("id") == request_id):
+                return message
+
+    def alive(self) -> bool:
+        return self.ready and self.process is not None and self.process.poll() is None
+
+    def run(self, files: List[str], changed: List[str], timeout: float = REQUEST_TIMEOUT) -> Dict[str, Dict]:
+        """
+        Run test files in this worker.
+
+        Returns:
+            {abs test path: {"status", "duration", "failures"}} - "error" entries if the worker died/timed out
+        """
+        self._next_id += 1
+        try:
+            self.process.stdin.write(json.dumps({"id": self._next_id, "files": files, "changed": changed}) + "\n")
+            self.process.stdin.flush()
+        except OSError as e:
+            return {f: {"status": "error", "duration": 0, "error": f"worker died: {e}"} for f in files}
+
+        reply = self._wait({"results", "error"}, timeout, request_id=self._next_id)
+        self.requests_served += 1
+        if reply is None:
+            self.close()
+            return {f: {"status": "error", "duration": 0, "error": "worker timed out or exited"} for f in files}
+        if "error" in reply:
+            return {f: {"status": "error", "duration": 0, "error": reply["error"][:500]} for f in files}
+        return {os.path.abspath(path): result for path, result in reply["results"].items()}
+
+    def close(self):
+        if self.process is not None and self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+
+
+class VitestPool:
+    """Fixed-size pool of warm Vitest workers shared by all stories"""
+
+    def __init__(self, frontend_root: Optional[Path] = None, size: Optional[int] = None,
+                 max_rss_mb: int = DEFAULT_MAX_RSS_MB, max_requests: int = DEFAULT_MAX_REQUESTS):
+        self.frontend_root = Path(frontend_root) if frontend_root else FRONTEND_ROOT
+        self.size = size or default_pool_size()
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.max_requests = max_requests
+        self.threads_per_worker = max(1, (os.cpu_count() or 2) // self.size)
+        # Slots: a worker, or None for "not started yet / recycled"
+        self._idle: "queue.Queue[Optional[VitestWorker]]" = queue.Queue()
+        for _ in range(self.size):
+            self._idle.put(None)
+        self._lock = threading.Lock()
+        # Changed file -> sequence number of its latest change
+        self._changes: Dict[str, int] = {}
+        self._change_seq = 0
+        self._closed = False
+        self.stats = {"requests": 0, "shards": 0, "started": 0, "recycled": 0, "crashed": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _checkout(self) -> VitestWorker:
+        worker = self._idle.get()
+        if worker is None or not worker.alive():
+            if worker is not None:
+                self._count("crashed")
+            # A fresh worker transforms everything from disk - nothing logged so far is stale in it
+            with self._lock:
+                synced = self._change_seq
+            worker = VitestWorker(self.frontend_root, self.threads_per_worker, synced)
+            self._count("started")
+        return worker
+
+    def _log_changes(self, changed: List[str]):
+        with self._lock:
+            for path in changed:
+                self._change_seq += 1
+                self._changes[path] = self._change_seq
+
+    def _pending_changes(self, worker: VitestWorker) -> tuple:
+        """(files changed since the worker's last run, sequence number they bring it up to)"""
+        with self._lock:
+            return [path for path, seq in self._changes.items() if seq > worker.synced], self._change_seq
+
+    def _checkin(self, worker: VitestWorker):
+        if self._closed:
+            worker.close()
+            worker = None
+        elif not worker.alive():
+            self._count("crashed")
+            worker = None
+        elif worker.rss > self.max_rss or worker.requests_served >= self.max_requests:
+            worker.close()
+            self._count("recycled")
+            worker = None
+        self._idle.put(worker)
+
+    def warm(self):
+        """Start every worker in the background (config load + Vite server) before the first verification"""
+        def start_one():
+            self._checkin(self._checkout())
+        for _ in range(self.size):
+            threading.Thread(target=start_one, daemon=True).start()
+
+    def run(self, tests: List[str], changed: Optional[List[str]] = None,
+            durations: Optional[Dict[str, float]] = None) -> Dict[str, Dict]:
+        """
+        Run tests sharded across the idle workers (at least one shard; waits for a worker if none is idle).
+
+        Returns:
+            {abs test path: {"status", "duration", ...}} - same shape as test_impact.run_vitest
+        """
+        self._log_changes(changed or [])
+        if not tests:
+            return {}
+        self._count("requests")
+        shards = split_shards(tests, max(1, self._idle.qsize()), durations)
+        results: Dict[str, Dict] = {}
+        results_lock = threading.Lock()
+
+        def run_shard(files: List[str]):
+            worker = self._checkout()
+            try:
+                if not worker.ready:
+                    outcome = {f: {"status": "error", "duration": 0, "error": "vitest worker failed to start"}
+                               for f in files}
+                else:
+                    pending, synced = self._pending_changes(worker)
+                    outcome = worker.run(files, pending)
+                    worker.synced = synced
+            finally:
+                self._checkin(worker)
+            with results_lock:
+                results.update(outcome)
+
+        threads = [threading.Thread(target=run_shard, args=(shard,), daemon=True) for shard in shards[1:]]
+        for thread in threads:
+            thread.start()
+        run_shard(shards[0])
+        for thread in threads:
+            thread.join()
+        with self._lock:
+            self.stats["shards"] += len(shards)
+        return results
+
+    def close(self):
+        """Stop idle workers now; workers still running a shard stop when it finishes"""
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Vitest files through a warm worker pool")
+    parser.add_argument("--tests", nargs="+", required=True, help="Test files (frontend-relative or absolute)")
+    parser.add_argument("--size", type=int, help=f"Workers (default: {default_pool_size()})")
+    parser.add_argument("--repeat", type=int, default=2, help="Runs, to compare cold vs warm (default: 2)")
+    args = parser.parse_args()
+
+    tests = [str((FRONTEND_ROOT / t).resolve()) if not os.path.isabs(t) else t for t in args.tests]
+    pool = VitestPool(size=args.size)
+    try:
+        for run in range(1, args.repeat + 1):
+            start = time.perf_counter()
+            results = pool.run(tests, changed=tests)
+            passed = sum(1 for r in results.values() if r["status"] == "passed")
+            print(f"[POOL] run {run}: {passed}/{len(tests)} passed in {time.perf_counter() - start:.1f}s")
+            for path, result in results.items():
+                if result["status"] != "passed":
+                    print(f"  ✗ {os.path.relpath(path, FRONTEND_ROOT)}: {result.get('failures') or result.get('error')}")
+    finally:
+        pool.close()
+    print(f"[POOL] {json.dumps(pool.stats)}")
+
+
+if __name__ == "__main__":
+    main()
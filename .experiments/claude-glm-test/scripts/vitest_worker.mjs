@@ -0,0 +1,97 @@
+#!/usr/bin/env node
+/**
+ * Warm Vitest worker for vitest_pool.py
+ *
+ * Keeps one Vitest instance (config, Vite server, transformed modules) alive
+ * and runs test files on request. Files changed since this worker's last
+ * run (tracked by the pool, including changes verified by other workers)
+ * are invalidated in Vite's module graph before each run, so only they and
+ * their importers are re-transformed.
+ *
+ * Protocol (JSON lines; replies are prefixed so test console output on
+ * stdout can't be mistaken for them):
+ *     stdin  <- {"id": 1, "files": ["/abs/a.test.ts"], "changed": ["/abs/lib/x.ts"]}
+ *     stdout -> @@vitest-worker {"id": 1, "results": {"/abs/a.test.ts": {...}}, "rss": 123}
+ *     stdout -> @@vitest-worker {"ready": true, "rss": 123}        (once, after startup)
+ *
+ * Usage (started by vitest_pool.py, cwd = apps/frontend):
+ *     node vitest_worker.mjs --max-workers 2
+ */
+
+import { createRequire } from 'node:module'
+import { readFileSync } from 'node:fs'
+import { dirname, join } from 'node:path'
+import { createInterface } from 'node:readline'
+import { pathToFileURL } from 'node:url'
+
+const PREFIX = '@@vitest-worker '
+const root = process.cwd()
+const maxWorkersArg = process.argv.indexOf('--max-workers')
+const maxWorkers = maxWorkersArg > 0 ? Number(process.argv[maxWorkersArg + 1]) : undefined
+
+function reply(message) {
+  process.stdout.write(PREFIX + JSON.stringify({ ...message, rss: process.memoryUsage().rss }) + '\n')
+}
+
+// vitest/node from the frontend's node_modules (this script lives outside the app)
+async function importVitestNode() {
+  const require = createRequire(join(root, 'package.json'))
+  const pkgPath = require.resolve('vitest/package.json')
+  const entry = JSON.parse(readFileSync(pkgPath, 'utf-8')).exports['./node']
+  const target = typeof entry === 'string' ? entry : entry.import?.default ?? entry.import ?? entry.default
+  return import(pathToFileURL(join(dirname(pkgPath), target)).href)
+}
+
+function moduleResult(testModule) {
+  const failures = []
+  for (const test of testModule.children.allTests()) {
+    if (test.result().state === 'failed') failures.push(test.fullName)
+  }
+  for (const error of testModule.errors()) failures.push(error.message)
+  return {
+    status: testModule.state() === 'passed' && failures.length === 0 ? 'passed' : 'failed',
+    duration: (testModule.diagnostic().duration ?? 0) / 1000,
+    failures: failures.slice(0, 10),
+  }
+}
+
+const { createVitest } = await importVitestNode()
+const vitest = await createVitest('test', {
+  watch: false,
+  reporters: [],
+  ...(maxWorkers ? { maxWorkers } : {}),
+})
+if (typeof vitest.init === 'function') await vitest.init()
+reply({ ready: true })
+
+// One request at a time - the pool never sends a second one before the reply
+const lines = createInterface({ input: process.stdin })
+for await (const line of lines) {
+  if (!line.trim()) continue
+  const request = JSON.parse(line)
+  try {
+    for (const file of request.changed ?? []) vitest.invalidateFile(file)
+    const specifications = request.files.map(file => {
+      const project = vitest.projects.find(p => p.matchesTestGlob(file)) ?? vitest.projects[0]
+      return project.createSpecification(file)
+    })
+    const { testModules, unhandledErrors } = await vitest.runTestSpecifications(specifications, false)
+
+    const results = {}
+    for (const testModule of testModules) results[testModule.moduleId] = moduleResult(testModule)
+    for (const file of request.files) {
+      results[file] ??= { status: 'error', duration: 0, error: 'not collected' }
+    }
+    if (unhandledErrors.length) {
+      for (const result of Object.values(results)) {
+        if (result.status === 'passed') result.status = 'failed'
+        result.failures = [...(result.failures ?? []), `unhandled: ${unhandledErrors[0].message ?? unhandledErrors[0]}`]
+      }
+    }
+    reply({ id: request.id, results })
+  } catch (error) {
+    reply({ id: request.id, error: String(error?.stack ?? error) })
+  }
+}
+
+await vitest.close()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Work Estimates - expected remaining seconds per story, for longest-first dispatch
+
+Schedulers used to start ready nodes in submission order, so a story that
+will need two review rounds and slow P3 calls started no earlier than a
+trivial one and ended up alone at the tail of the batch. With an estimate
+of each story's work, ready nodes are ordered by priority():
+
+- Remaining work first: the node whose story has the most expected seconds
+  left (its critical path - a story's nodes run one after another) starts
+  first, so stories that haven't started are never starved by ones that
+  are almost done. Remaining work is compared in steps of
+  REMAINING_BUCKET_PHASES mean phase latencies
+- Within a step: the larger story first, then the one furthest along, so
+  similar stories finish one after another instead of all advancing phase
+  by phase (which queues every story's P1 on Claude at once, then every P2
+  on GLM)
+
+Simulated (pilot_sim.py --runs 200), FIFO -> longest-first:
+- 4 workers, all M: 6 stories 30.5 -> 30.3 min, 12 stories 56.6 -> 56.7 min,
+  6 from P3 22.2 -> 22.4 min (even)
+- 4 workers, 6 stories: S,M 25.6 -> 24.4 min, M,L 41.0 -> 39.0 min,
+  M,XL 59.5 -> 54.3 min
+- 8 workers: 12 all-M 45.5 -> 41.4 min, 24 all-M 93 -> 75 min,
+  24 S,S,M,M,L,XL 113 -> 93 min, one XL among S 89 -> 72 min
+Without the steps (exact remaining work) uniform batches go breadth-first
+(24 all-M: 99 min); ranking by total size first starts the least-remaining
+story of a size class and starves the rest (6 all-M: 36.8 min).
+
+Estimate for a (story, phase, iteration) node:
+    size * (sum of expected seconds of the phases left
+            + expected further fix rounds * (P3 + P5 seconds))
+
+- Phase seconds: mean recorded latency of the phase over all routes
+  (route_history.jsonl via ModelRouter), the router's prior without history
+- Size: complexity weight (S/M/L/XL from the story file, via the path
+  index; M when missing) times a context factor, sqrt(story + wireframe
+  chars / REFERENCE_CONTEXT_CHARS) clamped to CONTEXT_FACTOR_RANGE
+- Fix rounds: mean of (P5 iterations - 1) over finished stories of the same
+  complexity in the checkpoint store (all stories if fewer than
+  MIN_STORIES), PRIOR_FIX_ROUNDS without history; capped by the review
+  iterations the orchestrator allows
+
+Usage:
+    python work_estimates.py --stories 01.2,01.6,01.4               # ranking from P1
+    python work_estimates.py --stories 01.2,01.6,01.4 --phase P3
+"""
+
+import os
+import math
+import argparse
+import threading
+from typing import Dict, Hashable, List, Sequence
+
+from model_router import ModelRouter, static_routes
+from checkpoint_store import CheckpointStore
+from path_index import PathIndex
+
+PHASES = ["P1", "P2", "P3", "P4", "P5", "P6", "P7"]
+FIX_PHASES = ["P3", "P5"]
+MAX_REVIEW_ITERATIONS = 2     # hybrid_orchestrator_v2.MAX_REVIEW_ITERATIONS
+
+COMPLEXITY_WEIGHTS = {"S": 0.6, "M": 1.0, "L": 1.6, "XL": 2.5}
+DEFAULT_COMPLEXITY = "M"
+REFERENCE_CONTEXT_CHARS = 40_000
+CONTEXT_FACTOR_RANGE = (0.7, 1.5)
+PRIOR_FIX_ROUNDS = 0.3
+MIN_STORIES = 3
+REMAINING_BUCKET_PHASES = 4   # remaining work is ranked in steps of this many mean phase latencies
+
+
+class WorkEstimator:
+    """Remaining-work estimates per story; phase latencies and fix rounds are read once (refresh() rereads)"""
+
+    def __init__(self, router: ModelRouter, checkpoints: CheckpointStore, path_index: PathIndex,
+                 max_review_iterations: int = MAX_REVIEW_ITERATIONS):
+        self.router = router
+        self.checkpoints = checkpoints
+        self.path_index = path_index
+        self.max_review_iterations = max_review_iterations
+        self._lock = threading.Lock()
+        self._stories: Dict[str, Dict] = {}
+        self.refresh()
+
+    def refresh(self):
+        """Re-read phase latencies and review history (e.g. before a new batch)"""
+        phase_seconds = {phase: self.router.phase_latency(phase) for phase in PHASES}
+        iterations = self.checkpoints.review_iterations()
+        by_class: Dict[str, List[int]] = {}
+        for story_id, count in iterations.items():
+            by_class.setdefault(self.path_index.lookup(story_id)["complexity"] or DEFAULT_COMPLEXITY, []).append(count)
+        with self._lock:
+            self.phase_seconds = phase_seconds
+            self.bucket_seconds = REMAINING_BUCKET_PHASES * sum(phase_seconds.values()) / len(phase_seconds)
+            self._history = by_class
+            self._all_iterations = list(iterations.values())
+            self._stories = {}
+
+    def fix_rounds(self, complexity: str) -> float:
+        """Expected fix rounds (REQUEST_CHANGES -> P3/P5 again) for a story of this complexity"""
+        counts = self._history.get(complexity, [])
+        if len(counts) < MIN_STORIES:
+            counts = self._all_iterations
+        if not counts:
+            return PRIOR_FIX_ROUNDS
+        return sum(count - 1 for count in counts) / len(counts)
+
+    def story(self, story_id: str) -> Dict:
+        """{"complexity", "context_chars", "size", "fix_rounds"} for a story (cached)"""
+        with self._lock:
+            cached = self._stories.get(story_id)
+        if cached:
+            return cached
+        paths = self.path_index.lookup(story_id)
+        complexity = paths["complexity"] or DEFAULT_COMPLEXITY
+        files = [paths["story"]] + paths["wireframes"] if paths["story"] else paths["wireframes"]
+        context_chars = sum(os.path.getsize(path) for path in files if os.path.exists(path))
+        low, high = CONTEXT_FACTOR_RANGE
+        context_factor = min(high, max(low, math.sqrt(context_chars / REFERENCE_CONTEXT_CHARS))) \
+            if context_chars else 1.0
+        info = {
+            "complexity": complexity,
+            "known": bool(paths["complexity"]),
+            "context_chars": context_chars,
+            "size": COMPLEXITY_WEIGHTS.get(complexity, 1.0) * context_factor,
+            "fix_rounds": min(self.fix_rounds(complexity), self.max_review_iterations - 1),
+        }
+        with self._lock:
+            self._stories[story_id] = info
+        return info
+
+    def remaining(self, story_id: str, phase: str, iteration: int = 1) -> float:
+        """Expected seconds of calls left for a story from this node on (the node included)"""
+        info = self.story(story_id)
+        if iteration == 1:
+            phases = PHASES[PHASES.index(phase):]
+        else:
+            phases = (FIX_PHASES[FIX_PHASES.index(phase):] if phase in FIX_PHASES else []) + ["P6", "P7"]
+        seconds = sum(self.phase_seconds[p] for p in phases)
+        if "P5" in phases:
+            rounds_left = min(max(0.0, info["fix_rounds"] - (iteration - 1)), self.max_review_iterations - iteration)
+            seconds += rounds_left * sum(self.phase_seconds[p] for p in FIX_PHASES)
+        return info["size"] * seconds
+
+    def total(self, story_id: str) -> float:
+        """Expected seconds of a whole story (P1 to P7 with its expected fix rounds)"""
+        return self.remaining(story_id, PHASES[0])
+
+    def priority(self, key: Hashable) -> float:
+        """
+        Scheduler priority of a (story, phase, iteration) node - higher starts first.
+
+        Returns:
+            story_priority() of the story's remaining and total expected seconds
+        """
+        story_id, phase, iteration = key
+        if phase.startswith("spec-"):
+            # Speculative P6/P7 has nothing behind it
+            remaining = self.story(story_id)["size"] * self.phase_seconds[phase[5:]]
+        else:
+            remaining = self.remaining(story_id, phase, iteration)
+        return story_priority(self.total(story_id), remaining, self.bucket_seconds)
+
+    def order(self, story_ids: Sequence[str], phase: str, iteration: int = 1) -> List[str]:
+        """Stories in dispatch order at this phase, most remaining work first (ties keep the given order)"""
+        return sorted(story_ids, key=lambda story_id: -self.priority((story_id, phase, iteration)))
+
+
+def story_priority(total: float, remaining: float, bucket: float) -> float:
+    """
+    Remaining seconds in steps of `bucket`, then round(total), then done share - one
+    float, so every scheduler (heap, SQLite column) can order by it
+    """
+    steps = round(remaining / bucket) if bucket > 0 else 0
+    done = min(0.999, max(0.0, 1 - remaining / total)) if total > 0 else 0.0
+    return steps * 1_000_000 + round(total) + done
+
+
+def lower_bound(timings: Dict[Hashable, tuple], workers: int) -> float:
+    """
+    Makespan no schedule of these node durations can beat: the longest story
+    (its nodes run one after another) or all work spread over every worker.
+    """
+    per_story: Dict[str, float] = {}
+    for (story_id, phase, _), (start, end) in timings.items():
+        if not phase.startswith("spec-"):
+            per_story[story_id] = per_story.get(story_id, 0.0) + end - start
+    busy = sum(end - start for start, end in timings.values())
+    return max(max(per_story.values(), default=0.0), busy / max(1, workers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate remaining work per story (longest-first dispatch order)")
+    parser.add_argument("--stories", required=True, help="Comma-separated story IDs")
+    parser.add_argument("--phase", default="P1", choices=PHASES, help="Phase the stories are at (default: P1)")
+    parser.add_argument("--iteration", type=int, default=1)
+    args = parser.parse_args()
+
+    estimator = WorkEstimator(ModelRouter(static_routes(), explore_rate=0), CheckpointStore(export_yaml=False), PathIndex())
+    estimator.path_index.refresh()
+    story_ids = [s.strip() for s in args.stories.split(",") if s.strip()]
+
+    print(f"[ESTIMATE] phase seconds: " + ", ".join(f"{p} {s:.0f}" for p, s in estimator.phase_seconds.items()))
+    for story_id in estimator.order(story_ids, args.phase, args.iteration):
+        info = estimator.story(story_id)
+        print(f"  {story_id:<8} {estimator.remaining(story_id, args.phase, args.iteration) / 60:6.1f} min  "
+              f"{info['complexity']}{'' if info['known'] else '?'}  context {info['context_chars'] / 1000:.0f}k chars  "
+              f"size x{info['size']:.2f}  fix rounds {info['fix_rounds']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
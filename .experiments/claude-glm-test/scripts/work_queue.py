@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Work Queue - (story, phase, iteration) tasks in SQLite, claimed under leases
+
+One orchestrator process is the unit of scale for the DAG scheduler. With
+--scheduler queue the same graph lives in a `tasks` table next to the
+checkpoint rows (checkpoints.db, or any path on a shared volume), and any
+number of worker processes or hosts pull from it:
+
+- Seeding: every worker adds the stories' chains with INSERT OR IGNORE, so
+  starting N identical workers seeds the graph once
+- Claim: in one IMMEDIATE transaction a worker takes the pending task with
+  the highest priority (expected remaining work, set when it is enqueued),
+  oldest first on ties, whose dependencies are done (failed dependencies
+  count as done, like the DAG scheduler) and holds it under a lease
+  (worker id, expiry)
+- Heartbeat: a thread renews the leases of running tasks every third of
+  the lease, so long GLM calls keep their task
+- Reclaim: a lease that expired (worker crashed, host lost) makes the task
+  claimable again; after MAX_ATTEMPTS claims it is marked failed
+- Results: the phase result is written to the checkpoint store by the
+  worker (as before) and a compact copy to the task row. Completion callbacks
+  (fix loop, P6/P7) add their tasks before the task is marked done, so other
+  workers never see an empty queue while the graph is still growing
+
+Workers must share the project tree (later phases read the files earlier
+phases wrote), and a re-claimed task whose checkpoint succeeded after the
+task was enqueued is resumed without a new call. Tasks of an earlier run
+are not reused implicitly: a worker refuses stories whose tasks finished
+while no lease is live unless it resumes them (--resume) or drops them
+first (--clear-queue). Budgets and concurrency limits stay per worker
+process. WAL needs shared memory, so workers on several hosts
+using one file on a network volume open it with journal_mode="DELETE"
+(--queue-journal delete).
+
+Usage:
+    python work_queue.py --status                       # tasks per status, live leases
+    python work_queue.py --reclaim                      # release expired leases now
+    python work_queue.py --retry-failed                 # failed tasks back to pending
+    python work_queue.py --clear                        # drop all tasks (checkpoints stay)
+
+    # on each runner (same command everywhere):
+    python hybrid_orchestrator_v2.py --stories 01.1,...,01.16 --scheduler queue --queue /mnt/shared/pilot.db
+"""
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from checkpoint_store import DEFAULT_CHECKPOINTS_DIR, DB_FILENAME
+from dag_scheduler import format_key
+
+DEFAULT_QUEUE_PATH = DEFAULT_CHECKPOINTS_DIR / DB_FILENAME
+DEFAULT_LEASE_SECONDS = 120
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    seq           INTEGER PRIMARY KEY AUTOINCREMENT,   -- enqueue order = claim order among equal priorities
+    story         TEXT NOT NULL,
+    phase         TEXT NOT NULL,
+    iteration     INTEGER NOT NULL DEFAULT 1,
+    priority      REAL NOT NULL DEFAULT 0,             -- higher is claimed first
+    deps          TEXT NOT NULL DEFAULT '[]',          -- JSON: [[story, phase, iteration], ...]
+    status        TEXT NOT NULL DEFAULT 'pending',     -- pending | leased | done | failed
+    worker        TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    enqueued_at   REAL,
+    claimed_at    REAL,
+    finished_at   REAL,
+    result        TEXT,                                -- JSON: success/model/tokens/cost/time/error
+    UNIQUE (story, phase, iteration)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, seq);
+"""
+MIGRATIONS = {
+    "priority": "ALTER TABLE tasks ADD COLUMN priority REAL NOT NULL DEFAULT 0",
+}
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def compact_result(result: Dict) -> Dict:
+    """What the task row keeps of a phase result (the full record is the checkpoint)"""
+    return {
+        "success": bool(result.get("success")),
+        "model": result.get("model"),
+        "tokens": result.get("tokens", {}).get("total", 0),
+        "cost": result.get("cost", 0),
+        "time": result.get("time", 0),
+        **({"error": str(result["error"])[:500]} if result.get("error") else {}),
+    }
+
+
+class WorkQueue:
+    """Lease-based task table shared by worker processes (one connection per thread)"""
+
+    def __init__(self, db_path: Optional[Path] = None, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS, journal_mode: str = "WAL",
+                 priority: Optional[Callable[[tuple], float]] = None):
+        self.db_path = Path(db_path) if db_path else DEFAULT_QUEUE_PATH
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.journal_mode = journal_mode
+        self.priority = priority
+        self._local = threading.local()
+
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(tasks)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE ... COMMIT: takes the write lock up front, so two workers never claim one task"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ---- producers -----------------------------------------------------
+
+    def add(self, key: Tuple[str, str, int], fn: Optional[Callable] = None, deps: Optional[Iterable[tuple]] = None):
+        """
+        Enqueue a task; a task that already exists is left as it is.
+
+        Same signature as DagScheduler.add so seed_pilot_graph can grow either; fn is
+        ignored - every worker runs tasks through its own runner. The priority is
+        computed once, by the worker that enqueues the task.
+        """
+        story_id, phase, iteration = key
+        priority = self.priority(key) if self.priority else 0.0
+        with self._transaction() as conn:
+            conn.execute(
+                """INSERT OR IGNORE INTO tasks (story, phase, iteration, priority, deps, enqueued_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (story_id, phase, iteration, priority, json.dumps([list(dep) for dep in deps or ()]), time.time())
+            )
+
+    # ---- workers -------------------------------------------------------
+
+    def claim(self, worker_id: str) -> Optional[Tuple[str, str, int]]:
+        """
+        Lease the runnable task with the highest priority (oldest on ties): pending,
+        or leased with an expired lease.
+
+        Returns:
+            Task key, or None if nothing is runnable right now
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            finished = {(row["story"], row["phase"], row["iteration"]) for row in conn.execute(
+                "SELECT story, phase, iteration FROM tasks WHERE status IN ('done', 'failed')")}
+            for row in conn.execute(
+                """SELECT seq, story, phase, iteration, deps, status, attempts FROM tasks
+                   WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)
+                   ORDER BY priority DESC, seq""", (now,)
+            ).fetchall():
+                if not all(tuple(dep) in finished for dep in json.loads(row["deps"])):
+                    continue
+                if row["attempts"] >= self.max_attempts:
+                    # Its workers kept dying: give up so dependents can run
+                    conn.execute(
+                        "UPDATE tasks SET status = 'failed', worker = NULL, finished_at = ?, result = ? WHERE seq = ?",
+                        (now, json.dumps({"success": False, "error": f"lease lost {row['attempts']} times"}),
+                         row["seq"]))
+                    finished.add((row["story"], row["phase"], row["iteration"]))
+                    continue
+                conn.execute(
+                    """UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, claimed_at = ?,
+                           attempts = attempts + 1 WHERE seq = ?""",
+                    (worker_id, now + self.lease_seconds, now, row["seq"]))
+                return row["story"], row["phase"], row["iteration"]
+        return None
+
+    def heartbeat(self, worker_id: str, keys: Iterable[tuple]) -> List[tuple]:
+        """
+        Extend the leases a worker still holds.
+
+        Returns:
+            Keys whose lease was lost (expired and claimed by another worker)
+        """
+        lost = []
+        expires = time.time() + self.lease_seconds
+        with self._transaction() as conn:
+            for story_id, phase, iteration in keys:
+                updated = conn.execute(
+                    """UPDATE tasks SET lease_expires = ? WHERE story = ? AND phase = ? AND iteration = ?
+                           AND status = 'leased' AND worker = ?""",
+                    (expires, story_id, phase, iteration, worker_id)).rowcount
+                if not updated:
+                    lost.append((story_id, phase, iteration))
+        return lost
+
+    def complete(self, worker_id: str, key: tuple, result: Dict) -> bool:
+        """
+        Mark a leased task done (or failed) with its compact result.
+
+        Returns:
+            False if the lease was lost meanwhile - the other worker's run counts
+        """
+        story_id, phase, iteration = key
+        with self._transaction() as conn:
+            return bool(conn.execute(
+                """UPDATE tasks SET status = ?, finished_at = ?, lease_expires = NULL, result = ?
+                   WHERE story = ? AND phase = ? AND iteration = ? AND status = 'leased' AND worker = ?""",
+                ("done" if result.get("success") else "failed", time.time(), json.dumps(compact_result(result)),
+                 story_id, phase, iteration, worker_id)).rowcount)
+
+    # ---- inspection / maintenance -------------------------------------
+
+    def counts(self) -> Dict[str, int]:
+        now = time.time()
+        counts = {"pending": 0, "leased": 0, "expired": 0, "done": 0, "failed": 0}
+        for row in self._connection().execute("SELECT status, lease_expires FROM tasks"):
+            status = row["status"]
+            if status == "leased" and (row["lease_expires"] or 0) < now:
+                status = "expired"
+            counts[status] += 1
+        return counts
+
+    def unfinished(self) -> int:
+        """Pending or leased tasks (expired leases included)"""
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'leased')").fetchone()[0]
+
+    def blocked(self) -> List[tuple]:
+        """Pending tasks (with live leases gone, these wait on dependencies that never appear)"""
+        return [(row["story"], row["phase"], row["iteration"]) for row in self._connection().execute(
+            "SELECT story, phase, iteration FROM tasks WHERE status = 'pending' ORDER BY seq")]
+
+    def live_leases(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM tasks WHERE status = 'leased' AND lease_expires >= ?", (time.time(),)).fetchone()[0]
+
+    def task(self, key: tuple) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT * FROM tasks WHERE story = ? AND phase = ? AND iteration = ?", key).fetchone()
+        return dict(row) if row else None
+
+    def story_counts(self, story_ids: Iterable[str]) -> Dict[str, int]:
+        """{"finished", "unfinished", "live"} tasks of these stories (live = leased, lease not expired)"""
+        story_ids = list(story_ids)
+        marks = ", ".join("?" * len(story_ids))
+        row = self._connection().execute(
+            f"""SELECT SUM(status IN ('done', 'failed')) AS finished,
+                       SUM(status IN ('pending', 'leased')) AS unfinished,
+                       SUM(status = 'leased' AND lease_expires >= ?) AS live
+                FROM tasks WHERE story IN ({marks})""", (time.time(), *story_ids)).fetchone()
+        return {key: row[key] or 0 for key in ("finished", "unfinished", "live")}
+
+    def leases(self) -> List[Dict]:
+        return [dict(row) for row in self._connection().execute(
+            """SELECT story, phase, iteration, worker, lease_expires, attempts FROM tasks
+               WHERE status = 'leased' ORDER BY lease_expires""")]
+
+    def dependencies(self) -> Dict[tuple, set]:
+        """key -> dependency keys, for all tasks in the queue"""
+        return {(row["story"], row["phase"], row["iteration"]): {tuple(dep) for dep in json.loads(row["deps"])}
+                for row in self._connection().execute("SELECT story, phase, iteration, deps FROM tasks")}
+
+    def reclaim(self) -> int:
+        """Release expired leases now (claim() also takes them over on its own)"""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE tasks SET status = 'pending', worker = NULL, lease_expires = NULL "
+                "WHERE status = 'leased' AND lease_expires < ?", (time.time(),)).rowcount
+
+    def retry_failed(self) -> int:
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE tasks SET status = 'pending', worker = NULL, attempts = 0, finished_at = NULL, result = NULL "
+                "WHERE status = 'failed'").rowcount
+
+    def clear(self, story_ids: Optional[Iterable[str]] = None) -> int:
+        """Delete tasks (only these stories' when given); returns how many were removed"""
+        with self._transaction() as conn:
+            if story_ids is None:
+                return conn.execute("DELETE FROM tasks").rowcount
+            story_ids = list(story_ids)
+            return conn.execute(f"DELETE FROM tasks WHERE story IN ({', '.join('?' * len(story_ids))})",
+                                story_ids).rowcount
+
+
+class QueueWorker:
+    """
+    Runs queue tasks in a local thread pool until the shared graph is finished.
+
+    Exposes results/timings/ready_at/dependencies() like DagScheduler, so the
+    orchestrator's DAG report works on the tasks this worker ran.
+    """
+
+    def __init__(self, queue: WorkQueue, run_task: Callable[[tuple], Dict], max_workers: int,
+                 worker_id: Optional[str] = None, poll_interval: float = POLL_INTERVAL,
+                 log: Callable[[str], None] = print):
+        self.queue = queue
+        self.run_task = run_task
+        self.max_workers = max(1, max_workers)
+        self.worker_id = worker_id or default_worker_id()
+        self.poll_interval = poll_interval
+        self.log = log
+        self.results: Dict[Hashable, Dict] = {}
+        self.timings: Dict[Hashable, tuple] = {}
+        self.ready_at: Dict[Hashable, float] = {}
+        self.lost: List[tuple] = []
+        self._held: set = set()
+        self._held_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def dependencies(self) -> Dict[Hashable, set]:
+        return self.queue.dependencies()
+
+    def _execute(self, key: tuple) -> Dict:
+        start = time.monotonic()
+        try:
+            return self.run_task(key)
+        finally:
+            self.timings[key] = (start, time.monotonic())
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            with self._held_lock:
+                held = list(self._held)
+            if not held:
+                continue
+            try:
+                lost = self.queue.heartbeat(self.worker_id, held)
+            except sqlite3.Error as e:
+                self.log(f"[QUEUE] heartbeat failed: {e}")
+                continue
+            for key in lost:
+                if key not in self.lost:
+                    self.lost.append(key)
+                    self.log(f"[QUEUE] ⚠️  lease on {format_key(key)} lost - another worker re-runs it")
+
+    def run(self, on_complete: Optional[Callable[[Hashable, Dict, WorkQueue], None]] = None) -> Dict:
+        """
+        Claim and run tasks until none are pending or leased anywhere.
+
+        on_complete(key, result, queue) runs before the task is marked done, so the
+        nodes it adds are in the queue before any worker can see the graph as finished.
+        It runs only while this worker still holds the lease (renewed just before), so
+        a task re-run elsewhere doesn't grow the graph twice.
+
+        Returns:
+            {key: result} for the tasks this worker completed
+        """
+        heartbeat = threading.Thread(target=self._heartbeat, name="queue-heartbeat", daemon=True)
+        heartbeat.start()
+        running = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while True:
+                    while len(running) < self.max_workers:
+                        key = self.queue.claim(self.worker_id)
+                        if key is None:
+                            break
+                        self.ready_at[key] = time.monotonic()
+                        with self._held_lock:
+                            self._held.add(key)
+                        running[executor.submit(self._execute, key)] = key
+
+                    if not running:
+                        if not self.queue.unfinished():
+                            break
+                        if not self.queue.live_leases():
+                            # Nothing runs anywhere and nothing was claimable: the rest can never start
+                            blocked = self.queue.blocked()
+                            self.log(f"⚠️  {len(blocked)} queued tasks never became runnable: "
+                                     f"{', '.join(format_key(key) for key in blocked)}")
+                            break
+                        time.sleep(self.poll_interval)
+                        continue
+
+                    done, _ = wait(list(running), timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        key = running.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            self.log(f"   ✗ {format_key(key)} failed: {e}")
+                            result = {"success": False, "error": str(e), "tokens": {"total": 0}, "cost": 0, "time": 0}
+                        # Renew first: after a lost lease the other worker's run (and its on_complete) counts
+                        held = not self.queue.heartbeat(self.worker_id, [key])
+                        if held and on_complete:
+                            on_complete(key, result, self.queue)
+                        if not held or not self.queue.complete(self.worker_id, key, result):
+                            self.log(f"[QUEUE] {format_key(key)} finished after its lease was lost - result kept "
+                                     f"in the checkpoint store only")
+                        with self._held_lock:
+                            self._held.discard(key)
+                        self.results[key] = result
+        finally:
+            self._stop.set()
+        return self.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and maintain the orchestrator work queue")
+    parser.add_argument("--queue", default=str(DEFAULT_QUEUE_PATH), help="Queue database (default: checkpoints.db)")
+    parser.add_argument("--status", action="store_true", help="Tasks per status and current leases")
+    parser.add_argument("--reclaim", action="store_true", help="Release expired leases")
+    parser.add_argument("--retry-failed", action="store_true", help="Put failed tasks back to pending")
+    parser.add_argument("--clear", action="store_true", help="Delete all tasks (checkpoint rows are kept)")
+    args = parser.parse_args()
+
+    queue = WorkQueue(Path(args.queue))
+    if args.reclaim:
+        print(f"[QUEUE] Released {queue.reclaim()} expired leases")
+    if args.retry_failed:
+        print(f"[QUEUE] {queue.retry_failed()} failed tasks back to pending")
+    if args.clear:
+        print(f"[QUEUE] Deleted {queue.clear()} tasks")
+    if args.status or not (args.reclaim or args.retry_failed or args.clear):
+        counts = queue.counts()
+        print(f"[QUEUE] {args.queue}: " + ", ".join(f"{status} {count}" for status, count in counts.items()))
+        now = time.time()
+        for lease in queue.leases():
+            left = lease["lease_expires"] - now
+            print(f"  {format_key((lease['story'], lease['phase'], lease['iteration'])):<18} {lease['worker']:<28} "
+                  f"{'expired ' + f'{-left:.0f}s ago' if left < 0 else f'{left:.0f}s left'} "
+                  f"(attempt {lease['attempts']})")
+
+
+if __name__ == "__main__":
+    main()